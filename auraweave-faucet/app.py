@@ -1,11 +1,20 @@
 import os
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, g, Response
 from flask_cors import CORS
 from web3 import Web3
 from web3.middleware import geth_poa_middleware
 from dotenv import load_dotenv
 import json
+import time
 import logging
+import threading
+
+# rpc_batch, chain_state, tx_engine, receipt_tracker, rpc_pool, metrics and tracing are
+# copies of the agents' modules, so the faucet deploys on its own; keep them in step.
+from mint_queue import MintQueue, MintSubmitter
+from metrics import get_metrics, instrument_provider, HTTP_REQUESTS
+from rpc_pool import PooledHTTPProvider
+from tracing import get_tracer
 
 load_dotenv() 
 
@@ -13,24 +22,55 @@ app = Flask(__name__)
 CORS(app, resources={r"/*": {"origins": "*"}})
 
 # --- Configuration ---
-RPC_URL = os.getenv("SEPOLIA_RPC_URL")
+# Comma-separated URLs are pooled: reads go to the healthiest endpoint, mints stick to one.
+RPC_URLS = [url.strip() for url in (os.getenv("SEPOLIA_RPC_URL") or "").split(',') if url.strip()]
+RPC_URL = RPC_URLS[0] if RPC_URLS else None
 FAUCET_OPERATOR_PRIVATE_KEY = os.getenv("FAUCET_OPERATOR_PRIVATE_KEY")
 MOCK_ERC20_ADDRESS = os.getenv("MOCK_ERC20_CONTRACT_ADDRESS")
 MINT_AMOUNT_UNITS_STR = os.getenv("MINT_AMOUNT_UNITS", "100") 
+INSTANCE_DIR = os.path.join(os.path.dirname(__file__), 'instance')
+MINT_QUEUE_DB = os.getenv("FAUCET_QUEUE_DB", os.path.join(INSTANCE_DIR, 'mint_queue.sqlite3'))
+MINT_COOLDOWN_SECONDS = int(os.getenv("FAUCET_COOLDOWN_SECONDS", "600"))
+MINT_SUBMIT_INTERVAL_SECONDS = float(os.getenv("FAUCET_SUBMIT_INTERVAL_SECONDS", "2"))
+# Per-phase spans of every mint (estimate, fee lookup, build, sign, send) as JSONL, for this share of mints.
+TRACE_FILE = os.getenv("AURAWEAVE_TRACE_FILE")
+TRACE_SAMPLE_RATE = float(os.getenv("AURAWEAVE_TRACE_SAMPLE_RATE", "1.0"))
 
 
 # Basic logging
-logging.basicConfig(level=logging.INFO)
+logging.basicConfig(level=getattr(logging, os.getenv("AURAWEAVE_LOG_LEVEL", "INFO").upper(), logging.INFO))
+if TRACE_FILE:
+    get_tracer().configure(TRACE_FILE, TRACE_SAMPLE_RATE)
 
 if not all([RPC_URL, FAUCET_OPERATOR_PRIVATE_KEY, MOCK_ERC20_ADDRESS]):
     app.logger.error("CRITICAL: Missing one or more environment variables (RPC_URL, FAUCET_OPERATOR_PRIVATE_KEY, MOCK_ERC20_CONTRACT_ADDRESS)")
     
 
 # --- Web3 Setup ---
+# Nothing connects or opens the queue database at import: every gunicorn
+# worker starts straight away, opens the queue on first use (get_mint_queue)
+# and connects on its first request (see ensure_web3), retrying at most every
+# WEB3_INIT_RETRY_SECONDS after a failure.
+WEB3_INIT_RETRY_SECONDS = float(os.getenv("FAUCET_WEB3_RETRY_SECONDS", "15"))
 w3 = None
 faucet_account = None
 mock_erc20_contract = None
 MOCK_ERC20_ABI = None 
+mint_queue = None
+mint_submitter = None
+_web3_init_lock = threading.Lock()
+_web3_init_failed_at = None
+_mint_queue_lock = threading.Lock()
+
+def start_mint_submitter():
+    global mint_submitter
+    if mint_submitter and mint_submitter.is_alive():
+        return
+    mint_submitter = MintSubmitter(
+        get_mint_queue(), w3, mock_erc20_contract, faucet_account,
+        lock_path=MINT_QUEUE_DB + '.submitter.lock', poll_interval=MINT_SUBMIT_INTERVAL_SECONDS,
+    )
+    mint_submitter.start()
 
 def initialize_web3():
     global w3, faucet_account, mock_erc20_contract, MOCK_ERC20_ABI
@@ -39,13 +79,15 @@ def initialize_web3():
         return False
 
     try:
-        w3 = Web3(Web3.HTTPProvider(RPC_URL))
+        provider = PooledHTTPProvider(RPC_URLS) if len(RPC_URLS) > 1 else Web3.HTTPProvider(RPC_URL)
+        new_w3 = Web3(instrument_provider(provider))
         
-        w3.middleware_onion.inject(geth_poa_middleware, layer=0)
+        new_w3.middleware_onion.inject(geth_poa_middleware, layer=0)
 
-        if not w3.is_connected():
-            app.logger.error(f"Failed to connect to Ethereum node at {RPC_URL}")
+        if not new_w3.is_connected():
+            app.logger.error(f"Failed to connect to Ethereum node at {provider}")
             return False
+        w3 = new_w3
 
         faucet_account = w3.eth.account.from_key(FAUCET_OPERATOR_PRIVATE_KEY)
         app.logger.info(f"Faucet operator address: {faucet_account.address}")
@@ -67,14 +109,56 @@ def initialize_web3():
 
         mock_erc20_contract = w3.eth.contract(address=MOCK_ERC20_ADDRESS, abi=MOCK_ERC20_ABI)
         app.logger.info(f"MockERC20 contract initialized at address: {MOCK_ERC20_ADDRESS}")
+        start_mint_submitter()
         return True
     except Exception as e:
         app.logger.error(f"Error during Web3 initialization: {e}")
         return False
 
 
-if not initialize_web3():
-    app.logger.error("Web3 initialization failed on startup. Faucet may not function.")
+def get_mint_queue():
+    """Opens the mint queue database on first use, in the worker that uses it rather than at import."""
+    global mint_queue
+    if mint_queue is None:
+        with _mint_queue_lock:
+            if mint_queue is None:
+                mint_queue = MintQueue(MINT_QUEUE_DB, cooldown_seconds=MINT_COOLDOWN_SECONDS)
+    return mint_queue
+
+
+def ensure_web3():
+    """Initializes Web3 and the mint submitter on first use; True once the faucet can mint."""
+    global _web3_init_failed_at
+    if mock_erc20_contract is not None:
+        return True
+    with _web3_init_lock:
+        if mock_erc20_contract is not None:
+            return True
+        if _web3_init_failed_at is not None and time.monotonic() - _web3_init_failed_at < WEB3_INIT_RETRY_SECONDS:
+            return False
+        if initialize_web3():
+            _web3_init_failed_at = None
+            return True
+        _web3_init_failed_at = time.monotonic()
+        app.logger.error("Web3 initialization failed. Faucet may not function.")
+        return False
+
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+    if request.endpoint != 'metrics':
+        # Any request (health checks included) brings the submitter up, so queued mints drain after a restart.
+        ensure_web3()
+
+
+@app.after_request
+def record_request_time(response):
+    started = g.pop('request_started', None)
+    if started is not None and request.url_rule is not None and request.url_rule.rule != '/metrics':
+        HTTP_REQUESTS.observe((f"{request.method} {request.url_rule.rule}",), time.perf_counter() - started,
+                              error=response.status_code >= 500)
+    return response
 
 
 @app.route('/request-tokens', methods=['POST'])
@@ -94,62 +178,44 @@ def request_tokens():
         return jsonify({"error": "Invalid recipient Ethereum address"}), 400
     
     recipient_address = w3.to_checksum_address(recipient_address_str)
+    amount_to_mint_wei = w3.to_wei(MINT_AMOUNT_UNITS_STR, 'ether')
 
     try:
-        
-        amount_to_mint_wei = w3.to_wei(MINT_AMOUNT_UNITS_STR, 'ether')
+        job, duplicate = get_mint_queue().enqueue(recipient_address, amount_to_mint_wei)
+    except Exception as e:
+        app.logger.error(f"Error queuing token request for {recipient_address}: {e}")
+        return jsonify({"error": "Could not queue the token request. Please try again later."}), 500
 
-        nonce = w3.eth.get_transaction_count(faucet_account.address)
-        
-        
-        tx_fields = {
-            'from': faucet_account.address,
-            'nonce': nonce,
-        }
-        latest_block = w3.eth.get_block('latest')
-        base_fee = latest_block.get('baseFeePerGas')
-        if base_fee is not None:
-            priority_fee = w3.to_wei('2', 'gwei') 
-            tx_fields['maxPriorityFeePerGas'] = priority_fee
-            tx_fields['maxFeePerGas'] = (base_fee * 2) + priority_fee
-        else: 
-            tx_fields['gasPrice'] = w3.eth.gas_price
-
-        app.logger.info(f"Attempting to mint {MINT_AMOUNT_UNITS_STR} MUSDC to {recipient_address}")
-        
-        mint_tx = mock_erc20_contract.functions.mint(
-            recipient_address,
-            amount_to_mint_wei
-        ).build_transaction(tx_fields)
-
-       
-        try:
-            gas_estimate = w3.eth.estimate_gas(mint_tx)
-            mint_tx['gas'] = gas_estimate + 20000 
-        except Exception as e:
-            app.logger.warning(f"Gas estimation failed for mint: {e}. Using default 200k.")
-            mint_tx['gas'] = 200000
-
-
-        try:
-            signed_tx = w3.eth.account.sign_transaction(mint_tx, FAUCET_OPERATOR_PRIVATE_KEY)
-            tx_hash = w3.eth.send_raw_transaction(signed_tx.rawTransaction)
-            app.logger.info(f"Mint transaction sent: {w3.to_hex(tx_hash)} for {recipient_address}")
-        except Exception as e:
-            app.logger.error(f"Failed to send transaction: {str(e)}")
-            return jsonify({"error": "Failed to send transaction"}), 500
-
-        # Don't wait for receipt here to keep API responsive, user can check Etherscan
+    status_url = f"/request-tokens/{job['jobId']}"
+    if duplicate:
         return jsonify({
-            "message": f"{MINT_AMOUNT_UNITS_STR} MockUSDC mint transaction sent to {recipient_address}.",
-            "transactionHash": w3.to_hex(tx_hash)
-        }), 200
-
-    except Exception as e:
-        app.logger.error(f"Error processing token request for {recipient_address}: {e}")
-        import traceback
-        traceback.print_exc()
-        return jsonify({"error": f"An error occurred: {str(e)}"}), 500
+            "error": f"A token request for {recipient_address} was already accepted recently. Try again later.",
+            "jobId": job['jobId'],
+            "status": job['status'],
+            "transactionHash": job['transactionHash'],
+            "statusUrl": status_url,
+        }), 429, {"Retry-After": str(MINT_COOLDOWN_SECONDS)}
+
+    app.logger.info(f"Queued mint of {MINT_AMOUNT_UNITS_STR} MUSDC to {recipient_address} (job {job['jobId']})")
+    return jsonify({
+        "message": f"{MINT_AMOUNT_UNITS_STR} MockUSDC mint queued for {recipient_address}.",
+        "jobId": job['jobId'],
+        "status": job['status'],
+        "statusUrl": status_url,
+    }), 202, {"Location": status_url}
+
+
+@app.route('/request-tokens/<job_id>', methods=['GET'])
+def request_tokens_status(job_id):
+    job = get_mint_queue().get(job_id)
+    if not job:
+        return jsonify({"error": "Unknown job id"}), 404
+    return jsonify(job), 200
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    # Per gunicorn worker: each process keeps its own counters.
+    return Response(get_metrics().render_prometheus(), mimetype='text/plain; version=0.0.4')
 
 @app.route('/')
 def home():
@@ -158,7 +224,5 @@ def home():
 if __name__ == '__main__':
     # For local development, not used by Gunicorn/Railway
     # Try to re-initialize web3 if it failed at startup
-    if not w3 or not faucet_account or not mock_erc20_contract:
-        app.logger.info("Re-attempting Web3 initialization for local run...")
-        initialize_web3()
+    ensure_web3()
     app.run(debug=True, host='0.0.0.0', port=int(os.getenv("PORT", 5001)))
\ No newline at end of file
@@ -0,0 +1,265 @@
+import json
+import time
+import atexit
+import threading
+from contextlib import contextmanager
+
+# Seconds. Wide enough for a local node (ms) and a congested public RPC or gateway (tens of s).
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class _Series:
+    __slots__ = ('count', 'errors', 'total', 'buckets')
+
+    def __init__(self, bucket_count):
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+        self.buckets = [0] * bucket_count
+
+
+class Histogram:
+    """Latency histogram plus an error counter, per combination of label values."""
+
+    def __init__(self, name, help_text, label_names, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self.bucket_bounds = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels, seconds, error=False):
+        labels = tuple(str(label) for label in labels)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = _Series(len(self.bucket_bounds))
+            series.count += 1
+            series.total += seconds
+            if error:
+                series.errors += 1
+            for index, bound in enumerate(self.bucket_bounds):
+                if seconds <= bound:
+                    series.buckets[index] += 1
+                    break
+
+    @contextmanager
+    def time(self, *labels):
+        started = time.perf_counter()
+        try:
+            yield
+        except BaseException:
+            self.observe(labels, time.perf_counter() - started, error=True)
+            raise
+        self.observe(labels, time.perf_counter() - started)
+
+    def snapshot(self):
+        with self._lock:
+            return [
+                {
+                    'labels': dict(zip(self.label_names, labels)), 'count': series.count,
+                    'errors': series.errors, 'total_seconds': round(series.total, 6),
+                    'buckets': dict(zip(self.bucket_bounds, series.buckets)),
+                }
+                for labels, series in sorted(self._series.items())
+            ]
+
+    def render(self):
+        lines = [
+            f"# HELP {self.name}_duration_seconds {self.help_text}",
+            f"# TYPE {self.name}_duration_seconds histogram",
+        ]
+        error_lines = [
+            f"# HELP {self.name}_errors_total Failures among {self.name}_duration_seconds_count.",
+            f"# TYPE {self.name}_errors_total counter",
+        ]
+        with self._lock:
+            series_items = sorted(self._series.items())
+            for labels, series in series_items:
+                label_text = ','.join(f'{name}="{_escape(value)}"' for name, value in zip(self.label_names, labels))
+                prefix = label_text + ',' if label_text else ''
+                cumulative = 0
+                for bound, count in zip(self.bucket_bounds, series.buckets):
+                    cumulative += count
+                    lines.append(f'{self.name}_duration_seconds_bucket{{{prefix}le="{bound}"}} {cumulative}')
+                lines.append(f'{self.name}_duration_seconds_bucket{{{prefix}le="+Inf"}} {series.count}')
+                lines.append(f'{self.name}_duration_seconds_sum{{{label_text}}} {series.total}')
+                lines.append(f'{self.name}_duration_seconds_count{{{label_text}}} {series.count}')
+                error_lines.append(f'{self.name}_errors_total{{{label_text}}} {series.errors}')
+        return lines + error_lines
+
+
+class MetricsRegistry:
+    """All histograms of one process. Each gunicorn worker has its own."""
+
+    def __init__(self):
+        self._histograms = {}
+        self._lock = threading.Lock()
+        self._exit_dump_path = None
+
+    def histogram(self, name, help_text, label_names, buckets=DEFAULT_BUCKETS):
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = Histogram(name, help_text, label_names, buckets)
+            return histogram
+
+    def snapshot(self):
+        with self._lock:
+            histograms = list(self._histograms.values())
+        return {'taken_at': time.time(), 'metrics': {histogram.name: histogram.snapshot() for histogram in histograms}}
+
+    def render_prometheus(self):
+        with self._lock:
+            histograms = list(self._histograms.values())
+        lines = []
+        for histogram in histograms:
+            lines.extend(histogram.render())
+        return '\n'.join(lines) + '\n'
+
+    def top(self, limit=10):
+        """(metric, labels, count, errors, total_seconds) with the most total time first."""
+        rows = []
+        for name, series_list in self.snapshot()['metrics'].items():
+            for series in series_list:
+                rows.append((name, series['labels'], series['count'], series['errors'], series['total_seconds']))
+        return sorted(rows, key=lambda row: -row[4])[:limit]
+
+    def dump(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.snapshot(), f, indent=2)
+
+    def print_summary(self, limit=10):
+        rows = self.top(limit)
+        if not rows:
+            return
+        print(f"\n{'metric':<28}{'labels':<42}{'count':>7}{'errors':>7}{'total s':>10}{'mean ms':>10}")
+        for name, labels, count, errors, total in rows:
+            label_text = ','.join(f"{key}={value}" for key, value in labels.items())
+            print(f"{name:<28}{label_text[:41]:<42}{count:>7}{errors:>7}{total:>10.3f}{total / count * 1000:>10.1f}")
+
+    def dump_at_exit(self, path):
+        """Write a snapshot to `path` and print the costliest calls when the process exits."""
+        with self._lock:
+            first = self._exit_dump_path is None
+            self._exit_dump_path = path
+        if first:
+            atexit.register(self._dump_on_exit)
+
+    def _dump_on_exit(self):
+        try:
+            self.dump(self._exit_dump_path)
+            self.print_summary()
+            print(f"Metrics snapshot written to {self._exit_dump_path}")
+        except Exception as e:
+            print(f"Could not write metrics snapshot to {self._exit_dump_path}: {e}")
+
+
+_registry = MetricsRegistry()
+
+
+def get_metrics():
+    return _registry
+
+
+RPC_REQUESTS = _registry.histogram(
+    'auraweave_rpc_request', "JSON-RPC requests by method; batched calls share their round trip's time.", ('method',))
+RPC_ROUND_TRIPS = _registry.histogram(
+    'auraweave_rpc_round_trip', "HTTP round trips to the JSON-RPC endpoint, single or batched.", ('kind',))
+RPC_ENDPOINTS = _registry.histogram(
+    'auraweave_rpc_endpoint', "Requests per endpoint of an RPC pool, as primary, hedge, failover or sticky (writes).",
+    ('endpoint', 'role'))
+IPFS_REQUESTS = _registry.histogram(
+    'auraweave_ipfs_request', "IPFS cat/add and gateway requests by source.", ('operation', 'source'))
+HTTP_REQUESTS = _registry.histogram(
+    'auraweave_http_request', "HTTP requests served, by endpoint.", ('endpoint',))
+
+
+def _is_error(response):
+    return not isinstance(response, dict) or response.get('error') is not None
+
+
+def instrument_provider(provider):
+    """Times every request a web3 provider sends. Call it before the first request:
+    web3 caches the provider's request function on first use."""
+    if getattr(provider, '_auraweave_instrumented', False):
+        return provider
+    make_request = provider.make_request
+
+    def timed_make_request(method, params):
+        started = time.perf_counter()
+        error = True
+        try:
+            response = make_request(method, params)
+            error = _is_error(response)
+            return response
+        finally:
+            elapsed = time.perf_counter() - started
+            RPC_REQUESTS.observe((method,), elapsed, error=error)
+            RPC_ROUND_TRIPS.observe(('single',), elapsed, error=error)
+
+    provider.make_request = timed_make_request
+    make_batch_request = getattr(provider, 'make_batch_request', None)
+    if make_batch_request is not None:
+        def timed_make_batch_request(requests):
+            started = time.perf_counter()
+            responses = None
+            try:
+                responses = make_batch_request(requests)
+                return responses
+            finally:
+                record_batch([method for method, _ in requests], time.perf_counter() - started,
+                             responses if isinstance(responses, list) else None)
+
+        provider.make_batch_request = timed_make_batch_request
+    provider._auraweave_instrumented = True
+    return provider
+
+
+def instrument_async_provider(provider):
+    """instrument_provider() for an AsyncHTTPProvider, whose request methods are coroutines."""
+    if getattr(provider, '_auraweave_instrumented', False):
+        return provider
+    make_request = provider.make_request
+    make_batch_request = provider.make_batch_request
+
+    async def timed_make_request(method, params):
+        started = time.perf_counter()
+        error = True
+        try:
+            response = await make_request(method, params)
+            error = _is_error(response)
+            return response
+        finally:
+            elapsed = time.perf_counter() - started
+            RPC_REQUESTS.observe((method,), elapsed, error=error)
+            RPC_ROUND_TRIPS.observe(('single',), elapsed, error=error)
+
+    async def timed_make_batch_request(requests):
+        started = time.perf_counter()
+        responses = None
+        try:
+            responses = await make_batch_request(requests)
+            return responses
+        finally:
+            record_batch([method for method, _ in requests], time.perf_counter() - started,
+                         responses if isinstance(responses, list) else None)
+
+    provider.make_request = timed_make_request
+    provider.make_batch_request = timed_make_batch_request
+    provider._auraweave_instrumented = True
+    return provider
+
+
+def record_batch(methods, elapsed, responses=None):
+    """Records one batched round trip; `responses` (in request order) marks the failed calls."""
+    failed_batch = responses is None
+    RPC_ROUND_TRIPS.observe(('batch',), elapsed, error=failed_batch)
+    for index, method in enumerate(methods):
+        error = failed_batch or (index < len(responses) and _is_error(responses[index]))
+        RPC_REQUESTS.observe((method,), elapsed, error=error)
@@ -0,0 +1,298 @@
+import os
+import time
+import uuid
+import fcntl
+import sqlite3
+import logging
+import threading
+from collections import OrderedDict
+from rpc_batch import RpcBatch
+from chain_state import get_chain_state
+from tx_engine import get_tx_engine, is_rejection
+from tracing import get_tracer
+
+STATUS_QUEUED = "queued"
+STATUS_SENT = "sent"
+STATUS_MINED = "mined"
+STATUS_FAILED = "failed"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS mint_jobs (
+    id TEXT PRIMARY KEY,
+    address TEXT NOT NULL,
+    amount_wei TEXT NOT NULL,
+    status TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    nonce INTEGER,
+    tx_hash TEXT,
+    raw_tx TEXT,
+    block_number INTEGER,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS mint_jobs_status ON mint_jobs (status, created_at);
+CREATE INDEX IF NOT EXISTS mint_jobs_address ON mint_jobs (address, created_at);
+"""
+
+logger = logging.getLogger(__name__)
+tracer = get_tracer()
+
+
+class TTLCache:
+    def __init__(self, ttl_seconds, max_entries=10000):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            return value
+
+    def set(self, key, value, ttl_seconds=None):
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+class MintQueue:
+    """Durable SQLite queue of faucet mint jobs, shared by all gunicorn workers."""
+
+    def __init__(self, db_path, cooldown_seconds=600):
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self.db_path = db_path
+        self.cooldown_seconds = cooldown_seconds
+        self.recent_requests = TTLCache(cooldown_seconds)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, timeout=10, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+
+    def _row_to_job(self, row):
+        if row is None:
+            return None
+        return {
+            "jobId": row["id"],
+            "address": row["address"],
+            "amountWei": row["amount_wei"],
+            "status": row["status"],
+            "transactionHash": row["tx_hash"],
+            "blockNumber": row["block_number"],
+            "error": row["error"],
+            "createdAt": row["created_at"],
+            "updatedAt": row["updated_at"],
+        }
+
+    def enqueue(self, address, amount_wei):
+        """Returns (job, duplicate). A duplicate is the job already queued for this address within the cooldown."""
+        key = address.lower()
+        cached_job_id = self.recent_requests.get(key)
+        if cached_job_id:
+            job = self.get(cached_job_id)
+            # A failed mint does not hold the address; the database check below agrees.
+            if job is not None and job["status"] != STATUS_FAILED:
+                return job, True
+
+        now = time.time()
+        with self._lock, self._conn:
+            # Another worker may have accepted this address; its TTL cache is not ours.
+            row = self._conn.execute(
+                "SELECT * FROM mint_jobs WHERE address = ? COLLATE NOCASE AND created_at > ? AND status != ? "
+                "ORDER BY created_at DESC LIMIT 1",
+                (address, now - self.cooldown_seconds, STATUS_FAILED),
+            ).fetchone()
+            if row is not None:
+                self.recent_requests.set(key, row["id"], ttl_seconds=row["created_at"] + self.cooldown_seconds - now)
+                return self._row_to_job(row), True
+
+            job_id = uuid.uuid4().hex
+            self._conn.execute(
+                "INSERT INTO mint_jobs (id, address, amount_wei, status, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (job_id, address, str(amount_wei), STATUS_QUEUED, now, now),
+            )
+        self.recent_requests.set(key, job_id)
+        return self.get(job_id), False
+
+    def get(self, job_id):
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM mint_jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._row_to_job(row)
+
+    def jobs_with_status(self, status, limit=50):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM mint_jobs WHERE status = ? ORDER BY created_at LIMIT ?", (status, limit)
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def _update(self, job_id, **fields):
+        fields["updated_at"] = time.time()
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        with self._lock, self._conn:
+            self._conn.execute(f"UPDATE mint_jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id))
+
+    def mark_sent(self, job_id, nonce, tx_hash, raw_tx):
+        self._update(job_id, status=STATUS_SENT, nonce=nonce, tx_hash=tx_hash, raw_tx=raw_tx, error=None)
+
+    def mark_mined(self, job_id, block_number):
+        self._update(job_id, status=STATUS_MINED, block_number=block_number)
+
+    def mark_failed(self, job_id, error, block_number=None):
+        self._update(job_id, status=STATUS_FAILED, error=str(error), block_number=block_number)
+
+    def requeue(self, job_id, error=None):
+        self._update(job_id, status=STATUS_QUEUED, nonce=None, tx_hash=None, raw_tx=None, error=error)
+
+
+class MintSubmitter(threading.Thread):
+    """Drains the mint queue through the operator's tx engine.
+
+    Every gunicorn worker starts one of these, but only the holder of the
+    submitter lock file does any work, so nonces are never handed out twice.
+    """
+
+    def __init__(self, queue, w3, token_contract, operator_account,
+                 lock_path, poll_interval=2.0, max_send_attempts=3):
+        super().__init__(name="mint-submitter", daemon=True)
+        self.queue = queue
+        self.w3 = w3
+        self.token_contract = token_contract
+        self.operator_account = operator_account
+        self.lock_path = lock_path
+        self.poll_interval = poll_interval
+        self.max_send_attempts = max_send_attempts
+        self.chain_state = get_chain_state(w3)
+        self.engine = get_tx_engine(w3, operator_account)
+        self._lock_file = None
+        self._stop_event = threading.Event()
+        self._send_attempts = {}
+
+    def stop(self):
+        self._stop_event.set()
+
+    def _acquire_lock(self):
+        if self._lock_file is not None:
+            return True
+        lock_file = open(self.lock_path, "a")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self._lock_file = lock_file
+        logger.info(f"Mint submitter active in process {os.getpid()}")
+        return True
+
+    def run(self):
+        while not self._stop_event.is_set():
+            if self._acquire_lock():
+                try:
+                    self.check_sent()
+                    self.process_queued()
+                except Exception as e:
+                    logger.error(f"Mint submitter loop error: {e}")
+            self._stop_event.wait(self.poll_interval)
+
+    def process_queued(self):
+        jobs = self.queue.jobs_with_status(STATUS_QUEUED)
+        if not jobs:
+            return
+        fee_state = self.chain_state.fees()
+        for job in jobs:
+            self.submit(job, fee_state)
+
+    def submit(self, job, fee_state):
+        with tracer.span('mint', job=job['id']):
+            self._submit(job, fee_state)
+
+    def _submit(self, job, fee_state):
+        call = self.token_contract.functions.mint(job['address'], int(job['amount_wei']))
+        try:
+            gas = self.engine.estimate_gas(call, default_gas=200000, margin=20000, label=f"mint job {job['id']}")
+        except Exception as e:
+            logger.error(f"Failed to build mint transaction for job {job['id']}: {e}")
+            self.queue.mark_failed(job['id'], e)
+            return
+
+        recorded = []
+
+        def record(nonce, tx_hash, raw_tx):
+            # Record the signed transaction before broadcasting so a restart re-sends
+            # the same transaction instead of minting twice.
+            self.queue.mark_sent(job['id'], nonce, tx_hash, self.w3.to_hex(raw_tx))
+            recorded.append(tx_hash)
+
+        try:
+            submission = self.engine.submit(
+                call, gas=gas, fee_state=fee_state, track=False, before_send=record, label=f"mint job {job['id']}",
+            )
+        except Exception as e:
+            if recorded and not is_rejection(e):
+                # The node may have taken it (a timeout, a dropped connection). Signing a new mint
+                # could mint twice; check_sent finds the receipt or re-sends the recorded bytes.
+                logger.warning(f"Send of mint transaction {recorded[-1]} for job {job['id']} is unconfirmed ({e}); "
+                               f"leaving it to the receipt check")
+                self._send_attempts.pop(job['id'], None)
+                return
+            attempts = self._send_attempts.get(job['id'], 0) + 1
+            self._send_attempts[job['id']] = attempts
+            logger.error(f"Failed to send mint transaction for job {job['id']} (attempt {attempts}): {e}")
+            if attempts >= self.max_send_attempts:
+                self.queue.mark_failed(job['id'], e)
+            else:
+                self.queue.requeue(job['id'], error=str(e))
+            return
+        self._send_attempts.pop(job['id'], None)
+        logger.info(f"Mint transaction sent: {submission.tx_hash} for {job['address']} "
+                    f"(job {job['id']}, nonce {submission.nonce})")
+
+    def check_sent(self):
+        jobs = self.queue.jobs_with_status(STATUS_SENT, limit=200)
+        if not jobs:
+            return
+        batch = RpcBatch(self.w3)
+        receipt_reads = [batch.get_transaction_receipt(job['tx_hash']) for job in jobs]
+        batch.execute()
+        for job, receipt_read in zip(jobs, receipt_reads):
+            try:
+                receipt = receipt_read.get()
+            except Exception:
+                continue
+            if receipt is None:
+                self._rebroadcast_if_unknown(job)
+                continue
+            if receipt['status'] == 1:
+                self.queue.mark_mined(job['id'], receipt['blockNumber'])
+            else:
+                self.queue.mark_failed(job['id'], "Mint transaction reverted", receipt['blockNumber'])
+
+    def _rebroadcast_if_unknown(self, job):
+        try:
+            self.w3.eth.get_transaction(job['tx_hash'])
+            return
+        except Exception:
+            pass
+        try:
+            self.w3.eth.send_raw_transaction(job['raw_tx'])
+            logger.info(f"Re-broadcast mint transaction {job['tx_hash']} (job {job['id']})")
+        except Exception as e:
+            message = str(e).lower()
+            if "already known" in message:
+                return
+            if "nonce too low" in message:
+                # No receipt and the nonce is spent: another transaction took the slot.
+                logger.warning(f"Mint transaction {job['tx_hash']} was dropped; re-queuing job {job['id']}")
+                self.queue.requeue(job['id'], error="Transaction dropped")
+                return
+            logger.warning(f"Re-broadcast of {job['tx_hash']} failed: {e}")
@@ -0,0 +1,301 @@
+import time
+import logging
+import threading
+from concurrent.futures import Future
+from web3 import Web3
+from rpc_batch import RpcBatch, format_receipt
+from chain_state import get_chain_state, bump_fees
+
+# How long past its deadline a waiter blocks on a receipt Future, in case a poll hangs on the RPC call.
+RESULT_GRACE_SECONDS = 60
+
+logger = logging.getLogger(__name__)
+_trackers = {}
+_trackers_lock = threading.Lock()
+
+
+class TransactionReplaced(Exception):
+    """The sender's nonce was used by a transaction we were not tracking."""
+
+
+class TransactionDropped(Exception):
+    """The node forgot the transaction and it could not be rebroadcast."""
+
+
+def _hex(tx_hash):
+    return tx_hash if isinstance(tx_hash, str) else Web3.to_hex(tx_hash)
+
+
+def raw_bytes(signed_tx):
+    """The signed transaction's bytes under both eth-account spellings."""
+    return getattr(signed_tx, 'raw_transaction', None) or signed_tx.rawTransaction
+
+
+class TrackedTransaction:
+    __slots__ = ('hashes', 'future', 'sender', 'nonce', 'transaction', 'account', 'raw_tx',
+                 'label', 'submitted_at', 'submitted_block', 'deadline', 'rebroadcasts', 'nonce_passed')
+
+    def __init__(self, tx_hash, future, sender, nonce, transaction, account, raw_tx, label, deadline):
+        self.hashes = [tx_hash]
+        self.future = future
+        self.sender = sender
+        self.nonce = nonce
+        self.transaction = transaction
+        self.account = account
+        self.raw_tx = raw_tx
+        self.label = label
+        self.submitted_at = time.monotonic()
+        self.submitted_block = None
+        self.deadline = deadline
+        self.rebroadcasts = 0
+        self.nonce_passed = 0
+
+
+class ReceiptTracker:
+    """Follows the chain head once for every pending transaction of a w3 instance.
+
+    Each `track()` returns a Future that resolves to the receipt. On every new
+    block, all pending receipts are looked up in one JSON-RPC batch, or with
+    `eth_getBlockReceipts` once many transactions are pending. Sender nonces
+    go in the same batch. A nonce that moves past a transaction with no receipt
+    means it was replaced. Transactions pending longer than
+    `stuck_after_seconds` are re-signed with bumped fees, when their
+    transaction dict and account were given, or rebroadcast as-is otherwise.
+    """
+
+    def __init__(self, w3, poll_interval=1.0, stuck_after_seconds=90, max_rebroadcasts=3,
+                 block_receipts_threshold=16):
+        self.w3 = w3
+        self.poll_interval = poll_interval
+        self.stuck_after_seconds = stuck_after_seconds
+        self.max_rebroadcasts = max_rebroadcasts
+        self.block_receipts_threshold = block_receipts_threshold
+        self.chain_state = get_chain_state(w3)
+        self._pending = {}
+        self._unchecked = set()
+        self._last_block = None
+        self._block_receipts_supported = None
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    def track(self, tx_hash, timeout=240, transaction=None, account=None, signed_tx=None, label=None):
+        """`transaction` + `account` (a LocalAccount) let a stuck tx be re-signed with higher fees;
+        `signed_tx` alone lets it be rebroadcast unchanged if the node drops it."""
+        tx_hash = _hex(tx_hash)
+        future = Future()
+        sender = transaction.get('from') if transaction else (account.address if account else None)
+        nonce = transaction.get('nonce') if transaction else None
+        tracked = TrackedTransaction(
+            tx_hash, future, sender, nonce, dict(transaction) if transaction else None, account,
+            raw_bytes(signed_tx) if signed_tx is not None else None, label or tx_hash,
+            time.monotonic() + timeout,
+        )
+        with self._lock:
+            self._pending[tx_hash] = tracked
+            self._unchecked.add(tx_hash)
+            self._ensure_running()
+        self._wakeup.set()
+        return future
+
+    def wait(self, tx_hash, timeout=240, **kwargs):
+        return self.track(tx_hash, timeout=timeout, **kwargs).result(timeout + RESULT_GRACE_SECONDS)
+
+    def pending_count(self):
+        with self._lock:
+            return len({id(tracked) for tracked in self._pending.values()})
+
+    def _ensure_running(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name='receipt-tracker', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._lock:
+                if not self._pending:
+                    self._thread = None
+                    return
+            try:
+                self.poll()
+            except Exception as e:
+                logger.warning(f"Receipt tracker poll failed: {e}")
+                # Deadlines still apply while the node is unreachable.
+                self._expire()
+            self._wakeup.wait(self.poll_interval)
+            self._wakeup.clear()
+
+    def poll(self):
+        with self._lock:
+            tracked_list = list({id(t): t for t in self._pending.values()}.values())
+            unchecked = set(self._unchecked)
+            self._unchecked.clear()
+        if not tracked_list:
+            return
+        try:
+            self._poll(tracked_list, unchecked)
+        except Exception:
+            # Hashes that never got their first lookup still need it.
+            with self._lock:
+                self._unchecked |= {h for h in unchecked if h in self._pending}
+            raise
+        self._expire()
+
+    def _poll(self, tracked_list, unchecked):
+        head_batch = RpcBatch(self.w3)
+        head_read = head_batch.block_number()
+        head_batch.execute()
+        head = head_read.get()
+        new_block = self._last_block is None or head > self._last_block
+        if new_block:
+            self.chain_state.observe_block(head)
+
+        # Receipts only appear with new blocks; freshly tracked hashes get one lookup straight away.
+        to_check = tracked_list if new_block else [t for t in tracked_list if set(t.hashes) & unchecked]
+        if to_check:
+            self._resolve(to_check, head, new_block, unchecked)
+        self._last_block = head if self._last_block is None else max(self._last_block, head)
+
+        now = time.monotonic()
+        for tracked in tracked_list:
+            if tracked.future.done():
+                continue
+            if tracked.submitted_block is None:
+                tracked.submitted_block = head
+            if now < tracked.deadline and now - tracked.submitted_at >= self.stuck_after_seconds:
+                self._unstick(tracked)
+
+    def _expire(self):
+        now = time.monotonic()
+        with self._lock:
+            expired = [t for t in {id(t): t for t in self._pending.values()}.values() if now >= t.deadline]
+        for tracked in expired:
+            self._finish(tracked, error=TimeoutError(
+                f"Transaction {tracked.hashes[-1]} ({tracked.label}) not mined after the timeout"))
+
+    def _resolve(self, tracked_list, head, new_block, unchecked):
+        batch = RpcBatch(self.w3)
+        use_block_receipts = (
+            new_block and self._last_block is not None and self._block_receipts_supported is not False
+            and len(tracked_list) >= self.block_receipts_threshold and head - self._last_block <= 8
+        )
+        block_reads = []
+        hash_reads = {}
+        if use_block_receipts:
+            block_reads = [
+                batch.add('eth_getBlockReceipts', [hex(number)],
+                          lambda raw: [format_receipt(receipt) for receipt in (raw or [])])
+                for number in range(self._last_block + 1, head + 1)
+            ]
+        # New blocks' receipts only cover hashes already looked up once; a fresh hash may have been mined earlier.
+        for tracked in tracked_list:
+            for tx_hash in tracked.hashes:
+                if not use_block_receipts or tx_hash in unchecked:
+                    hash_reads[tx_hash] = batch.get_transaction_receipt(tx_hash)
+        senders = {tracked.sender for tracked in tracked_list if tracked.sender and tracked.nonce is not None}
+        nonce_reads = {sender: batch.get_transaction_count(sender, 'latest') for sender in senders}
+        batch.execute()
+
+        receipts = {}
+        if use_block_receipts:
+            try:
+                for read in block_reads:
+                    for receipt in read.get():
+                        receipts[_hex(receipt['transactionHash']).lower()] = receipt
+                self._block_receipts_supported = True
+            except Exception:
+                # Not every node has eth_getBlockReceipts; look the hashes up directly instead.
+                self._block_receipts_supported = False
+                return self._resolve(tracked_list, head, False, unchecked)
+        failed = set()
+        for tx_hash, read in hash_reads.items():
+            try:
+                receipt = read.get()
+            except Exception:
+                failed.add(tx_hash)
+                continue
+            if receipt is not None:
+                receipts[tx_hash.lower()] = receipt
+        if failed:
+            # A block-receipts range only covers blocks after _last_block; these need a direct lookup again.
+            with self._lock:
+                self._unchecked |= {h for h in failed if h in self._pending}
+
+        for tracked in tracked_list:
+            receipt = next((receipts[h.lower()] for h in tracked.hashes if h.lower() in receipts), None)
+            if receipt is not None:
+                self._finish(tracked, receipt=receipt)
+                continue
+            if failed.intersection(tracked.hashes):
+                # No answer for it this time, so a passed nonce says nothing yet.
+                continue
+            read = nonce_reads.get(tracked.sender)
+            if read is None:
+                continue
+            try:
+                confirmed_nonce = read.get()
+            except Exception:
+                continue
+            if confirmed_nonce > tracked.nonce:
+                # Give the receipt lookup one more block before calling it replaced (lagging node).
+                tracked.nonce_passed += 1
+                if tracked.nonce_passed >= 2:
+                    self._finish(tracked, error=TransactionReplaced(
+                        f"Nonce {tracked.nonce} of {tracked.sender} was used by another transaction "
+                        f"({tracked.label}: {', '.join(tracked.hashes)})"))
+
+    def _unstick(self, tracked):
+        if tracked.rebroadcasts >= self.max_rebroadcasts:
+            return
+        tracked.rebroadcasts += 1
+        tracked.submitted_at = time.monotonic()
+        if tracked.transaction is not None and tracked.account is not None:
+            replacement = bump_fees(tracked.transaction, self.chain_state.fee_params())
+            signed = tracked.account.sign_transaction(replacement)
+            raw_tx = raw_bytes(signed)
+            tracked.transaction = replacement
+            tracked.raw_tx = raw_tx
+            action = "Replacing stuck transaction with bumped fees"
+        elif tracked.raw_tx is not None:
+            raw_tx = tracked.raw_tx
+            action = "Rebroadcasting stuck transaction"
+        else:
+            return
+        try:
+            new_hash = _hex(self.w3.eth.send_raw_transaction(raw_tx))
+        except Exception as e:
+            message = str(e).lower()
+            if 'already known' in message or 'nonce too low' in message:
+                # Already in the pool, or already mined; the next poll will tell.
+                return
+            logger.warning(f"{action} {tracked.label} failed: {e}")
+            return
+        logger.info(f"{action} {tracked.label}: {tracked.hashes[-1]} -> {new_hash}")
+        with self._lock:
+            if new_hash not in tracked.hashes:
+                tracked.hashes.append(new_hash)
+            self._pending[new_hash] = tracked
+            self._unchecked.add(new_hash)
+
+    def _finish(self, tracked, receipt=None, error=None):
+        with self._lock:
+            for tx_hash in tracked.hashes:
+                self._pending.pop(tx_hash, None)
+                self._unchecked.discard(tx_hash)
+        if tracked.future.done():
+            return
+        if tracked.sender:
+            self.chain_state.invalidate(tracked.sender)
+        if error is not None:
+            tracked.future.set_exception(error)
+        else:
+            tracked.future.set_result(receipt)
+
+
+def get_receipt_tracker(w3, **kwargs):
+    with _trackers_lock:
+        tracker = _trackers.get(id(w3))
+        if tracker is None or tracker.w3 is not w3:
+            tracker = ReceiptTracker(w3, **kwargs)
+            _trackers[id(w3)] = tracker
+        return tracker
@@ -0,0 +1,238 @@
+import json
+import time
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+from web3.providers.base import JSONBaseProvider
+from metrics import RPC_ENDPOINTS
+
+logger = logging.getLogger(__name__)
+
+# Sent to one endpoint only: writes, so every node sees our transactions in nonce order, and calls
+# answered from a node's own state (filters live on the node that created them, pending nonces
+# differ between nodes until transactions propagate).
+STICKY_METHODS = {
+    'eth_sendRawTransaction', 'eth_sendTransaction', 'eth_newFilter', 'eth_newBlockFilter',
+    'eth_newPendingTransactionFilter', 'eth_getFilterChanges', 'eth_getFilterLogs', 'eth_uninstallFilter',
+}
+# JSON-RPC errors that mean "not now" rather than "no": the request goes to another endpoint.
+RATE_LIMIT_CODES = {-32005, 429}
+SAMPLE_WINDOW = 64
+MIN_HEDGE_SAMPLES = 8
+DEFAULT_HEDGE_DELAY = 0.5
+MIN_HEDGE_DELAY = 0.05
+MAX_COOLDOWN_SECONDS = 30
+HEADERS = {'Content-Type': 'application/json'}
+
+
+class EndpointError(ConnectionError):
+    """An endpoint did not answer: connection error, timeout, HTTP error or rate limit."""
+
+
+def endpoint_label(uri):
+    # Hosted RPC URLs carry API keys in the path or user info; logs and metrics only get the host.
+    parts = urlsplit(uri)
+    port = f":{parts.port}" if parts.port else ""
+    return f"{parts.scheme}://{parts.hostname}{port}"
+
+
+def _is_sticky(method, params):
+    # A pending nonce must come from the node the transactions go to, or it can miss our own pool entries.
+    return method in STICKY_METHODS or (method == 'eth_getTransactionCount' and 'pending' in (params or ()))
+
+
+def _rate_limited(response):
+    if not isinstance(response, dict) or not isinstance(response.get('error'), dict):
+        return False
+    error = response['error']
+    message = str(error.get('message', '')).lower()
+    return error.get('code') in RATE_LIMIT_CODES or 'rate limit' in message or 'too many requests' in message
+
+
+class Endpoint:
+    """One RPC URL: a keep-alive session plus rolling latency and error samples."""
+
+    def __init__(self, uri, order, pool_size=32, timeout=30):
+        self.uri = uri
+        self.label = endpoint_label(uri)
+        self.order = order
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.latencies = deque(maxlen=SAMPLE_WINDOW)
+        self.outcomes = deque(maxlen=SAMPLE_WINDOW)
+        self.failures = 0
+        self.down_until = 0.0
+        self._lock = threading.Lock()
+
+    def post(self, body):
+        response = self.session.post(self.uri, data=body, headers=HEADERS, timeout=self.timeout)
+        response.raise_for_status()
+        return response.content
+
+    def record_success(self, seconds):
+        with self._lock:
+            self.latencies.append(seconds)
+            self.outcomes.append(0)
+            self.failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.outcomes.append(1)
+            self.failures += 1
+            self.down_until = time.monotonic() + min(MAX_COOLDOWN_SECONDS, 2 ** (self.failures - 1))
+
+    def score(self, now):
+        """Lower is better; None while the endpoint is cooling down after a failure."""
+        with self._lock:
+            if self.down_until:
+                if now < self.down_until:
+                    return None
+                # Back from a cooldown: judged on latency again until it fails again.
+                self.down_until = 0.0
+                self.outcomes.clear()
+            if not self.latencies:
+                # Untried endpoints rank first, in configured order, so each gets measured.
+                return self.order * 1e-6
+            median = sorted(self.latencies)[len(self.latencies) // 2]
+            error_rate = sum(self.outcomes) / len(self.outcomes) if self.outcomes else 0.0
+            return median * (1 + 10 * error_rate)
+
+    def hedge_delay(self):
+        with self._lock:
+            if len(self.latencies) < MIN_HEDGE_SAMPLES:
+                return DEFAULT_HEDGE_DELAY
+            ordered = sorted(self.latencies)
+        return max(MIN_HEDGE_DELAY, ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))])
+
+
+class PooledHTTPProvider(JSONBaseProvider):
+    """A web3 HTTP provider spread over several RPC endpoints.
+
+    Each request goes to the endpoint with the best rolling score (median
+    latency, weighted by recent errors); an endpoint that fails is skipped
+    for a cooldown that doubles with each consecutive failure, and the
+    request moves on to the next one. Reads are idempotent, so when
+    `hedge_reads` is set a read the best endpoint has not answered within
+    its p95 latency is also sent to the runner-up, and the first answer
+    wins. STICKY_METHODS all go to one endpoint, which only changes when it
+    fails. JSON-RPC errors (reverts and the like) are answers, not failures,
+    except rate limits.
+    """
+
+    def __init__(self, endpoint_uris, hedge_reads=True, timeout=30, pool_size=32):
+        super().__init__()
+        if not endpoint_uris:
+            raise ValueError("PooledHTTPProvider needs at least one endpoint URI")
+        self.endpoints = [Endpoint(uri, order, pool_size, timeout) for order, uri in enumerate(endpoint_uris)]
+        self.hedge_reads = hedge_reads and len(self.endpoints) > 1
+        self._sticky = None
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix="rpc-hedge") if self.hedge_reads else None
+
+    def __str__(self):
+        return f"RPC pool {', '.join(endpoint.label for endpoint in self.endpoints)}"
+
+    @property
+    def endpoint_uri(self):
+        # For messages and per-endpoint caches; RpcBatch posts through post_batch() instead.
+        return self.ranked()[0].label
+
+    def ranked(self):
+        """Endpoints best first; if all are cooling down, the one that comes back soonest first."""
+        now = time.monotonic()
+        scored = [(endpoint.score(now), endpoint.order, endpoint) for endpoint in self.endpoints]
+        available = sorted((score, order, endpoint) for score, order, endpoint in scored if score is not None)
+        if available:
+            return [endpoint for _, _, endpoint in available]
+        return sorted(self.endpoints, key=lambda endpoint: endpoint.down_until)
+
+    def make_request(self, method, params):
+        body = self.encode_rpc_request(method, params)
+        if _is_sticky(method, params):
+            return self._send_sticky(body)
+        return self._send(body)
+
+    def post_batch(self, payload):
+        """Sends a JSON-RPC batch (a list of request dicts) and returns the decoded response.
+
+        A batch with any sticky request in it goes to the sticky endpoint whole.
+        """
+        body = json.dumps(payload).encode('utf-8')
+        if any(_is_sticky(request.get('method'), request.get('params')) for request in payload):
+            return self._send_sticky(body)
+        return self._send(body)
+
+    def _attempt(self, endpoint, body, role):
+        started = time.perf_counter()
+        try:
+            response = self.decode_rpc_response(endpoint.post(body))
+            if _rate_limited(response):
+                raise EndpointError(f"{endpoint.label} is rate limiting requests")
+        except Exception as e:
+            endpoint.record_failure()
+            RPC_ENDPOINTS.observe((endpoint.label, role), time.perf_counter() - started, error=True)
+            if isinstance(e, EndpointError):
+                raise
+            raise EndpointError(f"{endpoint.label}: {e}") from e
+        elapsed = time.perf_counter() - started
+        endpoint.record_success(elapsed)
+        RPC_ENDPOINTS.observe((endpoint.label, role), elapsed)
+        return response
+
+    def _send(self, body):
+        ranked = self.ranked()
+        if self.hedge_reads:
+            return self._send_hedged(body, ranked)
+        last_error = None
+        for index, endpoint in enumerate(ranked):
+            try:
+                return self._attempt(endpoint, body, 'primary' if index == 0 else 'failover')
+            except EndpointError as e:
+                last_error = e
+        raise last_error
+
+    def _send_hedged(self, body, ranked):
+        primary, backups = ranked[0], ranked[1:]
+        pending = {self._executor.submit(self._attempt, primary, body, 'primary')}
+        timeout = primary.hedge_delay()
+        last_error = None
+        while pending:
+            done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    return future.result()
+                except EndpointError as e:
+                    last_error = e
+            if backups:
+                # Nothing back within the p95 (a hedge), or a request failed (a failover).
+                role = 'failover' if done else 'hedge'
+                pending.add(self._executor.submit(self._attempt, backups.pop(0), body, role))
+            # One hedge per request; later backups only replace failed requests.
+            timeout = None
+        raise last_error
+
+    def _send_sticky(self, body):
+        with self._lock:
+            if self._sticky is None:
+                self._sticky = self.ranked()[0]
+            sticky = self._sticky
+        try:
+            return self._attempt(sticky, body, 'sticky')
+        except EndpointError:
+            others = [endpoint for endpoint in self.ranked() if endpoint is not sticky]
+            if not others:
+                raise
+            with self._lock:
+                if self._sticky is sticky:
+                    self._sticky = others[0]
+                replacement = self._sticky
+            logger.warning(f"RPC endpoint {sticky.label} failed; sending transactions to {replacement.label} from now on.")
+            # Re-sending a signed transaction is safe: the node answers "already known" if it has it.
+            return self._attempt(replacement, body, 'failover')
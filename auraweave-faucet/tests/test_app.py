@@ -0,0 +1,18 @@
+import sys
+import importlib
+import pytest
+import web3.middleware
+
+
+@pytest.mark.skipif(not hasattr(web3.middleware, 'geth_poa_middleware'), reason="the faucet runs on web3 6")
+def test_importing_the_app_opens_no_database(tmp_path, monkeypatch):
+    db_path = tmp_path / 'instance' / 'mint_queue.sqlite3'
+    monkeypatch.setenv('FAUCET_QUEUE_DB', str(db_path))
+    monkeypatch.delitem(sys.modules, 'app', raising=False)
+
+    faucet = importlib.import_module('app')
+
+    assert faucet.mint_queue is None and not db_path.exists()
+    queue = faucet.get_mint_queue()
+    assert db_path.exists() and faucet.get_mint_queue() is queue
+    monkeypatch.delitem(sys.modules, 'app')
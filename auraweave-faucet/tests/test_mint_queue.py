@@ -0,0 +1,181 @@
+import os
+import json
+from web3 import Web3
+from web3.providers.base import BaseProvider
+from eth_account import Account
+from mint_queue import MintQueue, MintSubmitter, STATUS_SENT, STATUS_MINED, STATUS_FAILED, STATUS_QUEUED
+
+DEPLOYMENT = os.path.join(os.path.dirname(__file__), '..', '..', 'backend', 'deployments', 'sepolia.json')
+OPERATOR = Account.from_key('0x' + '11' * 32)
+RECIPIENT = Web3.to_checksum_address('0x' + 'ab' * 20)
+
+
+class ScriptedProvider(BaseProvider):
+    """Answers JSON-RPC requests from `handler(method, params)`; rejects batches like many hosted nodes."""
+
+    def __init__(self, handler):
+        super().__init__()
+        self.handler = handler
+        self.requests = []
+
+    def make_request(self, method, params):
+        self.requests.append((method, params))
+        return {'jsonrpc': '2.0', 'id': len(self.requests), **self.handler(method, params)}
+
+
+class Chain:
+    """A node that mines nothing by itself: receipts are whatever the test puts in `receipts`."""
+
+    def __init__(self):
+        self.sent = []
+        self.receipts = {}
+        self.send_error = None
+        self.accept_then_time_out = False
+
+    def handle(self, method, params):
+        if method == 'eth_chainId':
+            return {'result': '0x7a69'}
+        if method == 'eth_getBlockByNumber':
+            return {'result': {'number': '0x10', 'baseFeePerGas': '0x3b9aca00', 'timestamp': '0x1'}}
+        if method in ('eth_maxPriorityFeePerGas', 'eth_gasPrice'):
+            return {'result': '0x3b9aca00'}
+        if method == 'eth_estimateGas':
+            return {'result': '0xc350'}
+        if method == 'eth_getTransactionCount':
+            return {'result': hex(len(self.sent))}
+        if method == 'eth_sendRawTransaction':
+            if self.send_error:
+                return {'error': {'code': -32000, 'message': self.send_error}}
+            self.sent.append(params[0])
+            if self.accept_then_time_out:
+                raise TimeoutError("read timed out")
+            return {'result': Web3.to_hex(Web3.keccak(hexstr=params[0]))}
+        if method == 'eth_getTransactionReceipt':
+            return {'result': self.receipts.get(params[0])}
+        if method == 'eth_getTransaction':
+            return {'result': None}
+        return {'error': {'code': -32601, 'message': f'{method} not scripted'}}
+
+
+def make_submitter(tmp_path, chain, **kwargs):
+    with open(DEPLOYMENT) as f:
+        token_info = json.load(f)['MockERC20']
+    w3 = Web3(ScriptedProvider(chain.handle))
+    token = w3.eth.contract(address=token_info['address'], abi=token_info['abi'])
+    queue = MintQueue(str(tmp_path / 'mint_queue.sqlite3'))
+    submitter = MintSubmitter(queue, w3, token, OPERATOR, str(tmp_path / 'submitter.lock'), **kwargs)
+    return queue, submitter
+
+
+def receipt(tx_hash, status):
+    return {
+        'transactionHash': tx_hash, 'blockNumber': '0x11', 'status': hex(status), 'gasUsed': '0x5208',
+        'cumulativeGasUsed': '0x5208', 'effectiveGasPrice': '0x3b9aca00', 'transactionIndex': '0x0', 'logs': [],
+    }
+
+
+def test_a_queued_job_is_recorded_with_its_signed_transaction_before_it_is_sent(tmp_path):
+    chain = Chain()
+    queue, submitter = make_submitter(tmp_path, chain)
+    job, duplicate = queue.enqueue(RECIPIENT, 10 ** 20)
+    assert not duplicate
+
+    submitter.process_queued()
+
+    row = queue.jobs_with_status(STATUS_SENT)[0]
+    assert row['id'] == job['jobId']
+    assert row['nonce'] == 0
+    assert chain.sent == [row['raw_tx']]
+    assert row['tx_hash'] == Web3.to_hex(Web3.keccak(hexstr=row['raw_tx']))
+
+
+def test_check_sent_marks_mined_and_reverted_jobs(tmp_path):
+    chain = Chain()
+    queue, submitter = make_submitter(tmp_path, chain)
+    mined, _ = queue.enqueue(RECIPIENT, 1)
+    reverted, _ = queue.enqueue(Web3.to_checksum_address('0x' + 'cd' * 20), 1)
+    submitter.process_queued()
+    hashes = {job['id']: job['tx_hash'] for job in queue.jobs_with_status(STATUS_SENT)}
+    chain.receipts[hashes[mined['jobId']]] = receipt(hashes[mined['jobId']], 1)
+    chain.receipts[hashes[reverted['jobId']]] = receipt(hashes[reverted['jobId']], 0)
+
+    submitter.check_sent()
+
+    assert queue.get(mined['jobId'])['status'] == STATUS_MINED
+    assert queue.get(mined['jobId'])['blockNumber'] == 0x11
+    assert queue.get(reverted['jobId'])['status'] == STATUS_FAILED
+    assert queue.get(reverted['jobId'])['error'] == "Mint transaction reverted"
+
+
+def test_a_dropped_transaction_whose_nonce_is_spent_is_requeued(tmp_path):
+    chain = Chain()
+    queue, submitter = make_submitter(tmp_path, chain)
+    job, _ = queue.enqueue(RECIPIENT, 1)
+    submitter.process_queued()
+    chain.send_error = 'nonce too low'
+
+    submitter.check_sent()
+
+    requeued = queue.get(job['jobId'])
+    assert requeued['status'] == STATUS_QUEUED
+    assert requeued['transactionHash'] is None
+    assert requeued['error'] == "Transaction dropped"
+
+
+def test_rejected_sends_requeue_until_the_attempt_limit(tmp_path):
+    chain = Chain()
+    chain.send_error = 'insufficient funds for gas * price + value'
+    queue, submitter = make_submitter(tmp_path, chain, max_send_attempts=2)
+    job, _ = queue.enqueue(RECIPIENT, 1)
+
+    submitter.process_queued()
+    assert queue.get(job['jobId'])['status'] == STATUS_QUEUED
+
+    submitter.process_queued()
+    assert queue.get(job['jobId'])['status'] == STATUS_FAILED
+    assert 'insufficient funds' in queue.get(job['jobId'])['error']
+
+
+def test_a_send_that_may_have_reached_the_node_is_never_signed_again(tmp_path):
+    chain = Chain()
+    chain.accept_then_time_out = True
+    queue, submitter = make_submitter(tmp_path, chain)
+    job, _ = queue.enqueue(RECIPIENT, 1)
+
+    submitter.process_queued()
+
+    row = queue.jobs_with_status(STATUS_SENT)[0]
+    assert row['id'] == job['jobId'] and chain.sent == [row['raw_tx']]
+    chain.accept_then_time_out = False
+    submitter.process_queued()
+    submitter.check_sent()
+    # At most the same signed bytes again; never a second mint on a new nonce.
+    assert set(chain.sent) == {row['raw_tx']}
+
+    chain.receipts[row['tx_hash']] = receipt(row['tx_hash'], 1)
+    submitter.check_sent()
+    assert queue.get(job['jobId'])['status'] == STATUS_MINED
+
+
+def test_enqueue_returns_the_pending_job_within_the_cooldown(tmp_path):
+    queue = MintQueue(str(tmp_path / 'mint_queue.sqlite3'), cooldown_seconds=600)
+    first, _ = queue.enqueue(RECIPIENT, 1)
+    # Another worker shares the database but not the in-memory cache.
+    other_worker = MintQueue(str(tmp_path / 'mint_queue.sqlite3'), cooldown_seconds=600)
+
+    again, duplicate = other_worker.enqueue(RECIPIENT.lower(), 1)
+
+    assert duplicate
+    assert again['jobId'] == first['jobId']
+
+
+def test_a_failed_job_does_not_hold_the_address(tmp_path):
+    queue = MintQueue(str(tmp_path / 'mint_queue.sqlite3'), cooldown_seconds=600)
+    failed, _ = queue.enqueue(RECIPIENT, 1)
+    queue.mark_failed(failed['jobId'], "Mint transaction reverted")
+
+    retry, duplicate = queue.enqueue(RECIPIENT, 1)
+
+    assert not duplicate
+    assert retry['jobId'] != failed['jobId'] and retry['status'] == STATUS_QUEUED
+    assert queue.enqueue(RECIPIENT, 1) == (retry, True)
@@ -0,0 +1,15 @@
+import os
+import pytest
+
+FAUCET_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+AGENTS_DIR = os.path.join(FAUCET_DIR, '..', 'backend', 'agents')
+VENDORED = ('rpc_batch', 'chain_state', 'tx_engine', 'receipt_tracker', 'rpc_pool', 'metrics', 'tracing')
+
+
+@pytest.mark.parametrize('module', VENDORED)
+def test_vendored_module_matches_the_agents_copy(module):
+    with open(os.path.join(FAUCET_DIR, f'{module}.py'), 'rb') as f:
+        vendored = f.read()
+    with open(os.path.join(AGENTS_DIR, f'{module}.py'), 'rb') as f:
+        upstream = f.read()
+    assert vendored == upstream, f"auraweave-faucet/{module}.py differs from backend/agents/{module}.py; copy it over again"
@@ -0,0 +1,163 @@
+import json
+import time
+import atexit
+import random
+import logging
+import threading
+import contextvars
+
+# The span the running code is inside, per thread and per asyncio task. SKIPPED marks a trace that was not sampled.
+_current = contextvars.ContextVar('auraweave_span', default=None)
+SKIPPED = object()
+
+
+def configure_logging(level):
+    """Leveled logging for diagnostic output (built transactions and the like); progress lines stay prints."""
+    logging.basicConfig(
+        level=getattr(logging, str(level).upper(), logging.WARNING),
+        format='%(asctime)s %(levelname)s %(name)s: %(message)s',
+    )
+
+
+class _NoopSpan:
+    """What span() returns while tracing is off or inside an unsampled trace: nothing is timed or written."""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def set(self, **attributes):
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class _SkippedTrace(_NoopSpan):
+    """The root of an unsampled trace; spans opened inside it are no-ops too."""
+    __slots__ = ('_token',)
+
+    def __enter__(self):
+        self._token = _current.set(SKIPPED)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        _current.reset(self._token)
+        return False
+
+
+class Span:
+    __slots__ = ('tracer', 'name', 'trace_id', 'span_id', 'parent_id', 'attributes', 'start_time', '_started', '_token')
+
+    def __init__(self, tracer, name, trace_id, parent_id, attributes):
+        self.tracer = tracer
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent_id
+        self.attributes = attributes
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def __enter__(self):
+        self._token = _current.set(self)
+        self.start_time = time.time()
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        duration = time.perf_counter() - self._started
+        _current.reset(self._token)
+        self.tracer._export(self, duration, exc)
+        return False
+
+
+class Tracer:
+    """Times the phases of a transaction or an IPFS transfer as nested spans, written as JSONL.
+
+    Off until configure() gets a path; span() then returns a shared no-op
+    object, so instrumented code costs one attribute check per phase.
+    Sampling is decided once per trace, at its root span: a trace is either
+    written whole or not at all. Each line is one finished span with its
+    trace id, span id, parent span id (null at the root), start (epoch
+    seconds), duration_ms, status and attributes. Children finish first,
+    so a trace's lines end with its root.
+    """
+
+    def __init__(self):
+        self.path = None
+        self.sample_rate = 1.0
+        self._file = None
+        self._lock = threading.Lock()
+        self._close_registered = False
+
+    @property
+    def enabled(self):
+        return self._file is not None
+
+    def configure(self, path, sample_rate=1.0):
+        """Appends spans to `path`, keeping `sample_rate` (0 to 1) of the traces; a None path turns tracing off."""
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+            self.path = path
+            self.sample_rate = max(0.0, min(1.0, float(sample_rate)))
+            self._file = open(path, 'a') if path else None
+            if self._file is not None and not self._close_registered:
+                atexit.register(self.close)
+                self._close_registered = True
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def span(self, name, parent=None, **attributes):
+        """A context manager timing one phase. `parent` continues a trace on another thread (see current())."""
+        if self._file is None:
+            return NOOP_SPAN
+        if parent is None:
+            parent = _current.get()
+        if parent is SKIPPED or isinstance(parent, _NoopSpan):
+            return NOOP_SPAN
+        if parent is None:
+            if self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+                return _SkippedTrace()
+            return Span(self, name, f"{random.getrandbits(128):032x}", None, attributes)
+        return Span(self, name, parent.trace_id, parent.span_id, attributes)
+
+    def current(self):
+        """The open span, to pass as `parent` to work handed to a thread pool; None when there is nothing to continue."""
+        span = _current.get()
+        return NOOP_SPAN if span is SKIPPED else span
+
+    def _export(self, span, duration, error):
+        record = {
+            'trace_id': span.trace_id, 'span_id': span.span_id, 'parent_id': span.parent_id, 'name': span.name,
+            'start': round(span.start_time, 6), 'duration_ms': round(duration * 1000, 3),
+            'status': 'ok' if error is None else 'error',
+        }
+        if error is not None:
+            record['error'] = f"{type(error).__name__}: {error}"[:500]
+        if span.attributes:
+            record['attributes'] = span.attributes
+        line = json.dumps(record, default=str) + '\n'
+        with self._lock:
+            if self._file is None:
+                return
+            self._file.write(line)
+            if span.parent_id is None:
+                # One flush per trace rather than per span.
+                self._file.flush()
+
+
+_tracer = Tracer()
+
+
+def get_tracer():
+    return _tracer
@@ -0,0 +1,187 @@
+import time
+import threading
+from web3 import Web3
+from web3.logs import DISCARD
+from eth_account.messages import encode_typed_data
+from listing_index import DATA_PURCHASED_TOPIC
+from chain_state import get_chain_state
+from tx_engine import get_tx_engine
+
+PERMIT_DEADLINE_SECONDS = 30 * 60
+
+
+def _address_topic(address):
+    return '0x' + '0' * 24 + address.lower()[2:]
+
+
+class AllowanceBudget:
+    """Keeps one standing DataRegistry allowance instead of an approve per purchase.
+
+    The allowance is topped up to `budget_wei` only when a purchase would
+    bring it below `low_water_wei`. Between top-ups, the remaining allowance is
+    tracked locally. It starts from the on-chain value. Every DataPurchased
+    event for our address lowers it, whether it comes from our own receipts
+    or from logs (other processes using the same key). Purchases still in
+    flight are reserved against it. If the token implements EIP-2612, top-ups
+    are done with a signed permit instead of approve().
+    """
+
+    def __init__(self, w3, token_contract, registry_contract, account, budget_wei, low_water_wei=0,
+                 approve=None):
+        self.w3 = w3
+        self.token = token_contract
+        self.registry = registry_contract
+        self.account = account
+        self.spender = registry_contract.address
+        self.budget_wei = budget_wei
+        self.low_water_wei = low_water_wei
+        # approve(spender, amount_wei, preflight=None) -> bool; the agent's own approve path.
+        self._approve = approve
+        self.chain_state = get_chain_state(w3)
+        self.allowance = None
+        # The on-chain allowance was read at baseline_block; logs are applied up to synced_block.
+        self.baseline_block = None
+        self.synced_block = None
+        self.reserved = 0
+        self._seen_events = {}
+        self._permit_supported = None
+        self._lock = threading.RLock()
+
+    @property
+    def remaining(self):
+        with self._lock:
+            return None if self.allowance is None else self.allowance - self.reserved
+
+    def observe_allowance(self, allowance_wei, block_number):
+        """Take an on-chain allowance read (e.g. from a purchase preflight) as the new baseline."""
+        with self._lock:
+            if self.baseline_block is not None and block_number < self.baseline_block:
+                return
+            self.allowance = allowance_wei
+            self.baseline_block = block_number
+            self.synced_block = max(self.synced_block or 0, block_number)
+            self._seen_events = {key: block for key, block in self._seen_events.items() if block > block_number}
+
+    def refresh(self):
+        state = self.chain_state.read({}, extra={
+            'allowance': lambda b: b.call(self.token.functions.allowance(self.account.address, self.spender)),
+            'block': lambda b: b.block_number(),
+        })
+        with self._lock:
+            self.baseline_block = None
+        self.observe_allowance(state['allowance'], state['block'])
+
+    def sync(self):
+        """Applies DataPurchased logs for our address since the last sync."""
+        if self.synced_block is None:
+            return self.refresh()
+        latest = self.w3.eth.block_number
+        if latest <= self.synced_block:
+            return
+        logs = self.w3.eth.get_logs({
+            'address': self.registry.address,
+            'fromBlock': self.synced_block + 1,
+            'toBlock': latest,
+            'topics': [DATA_PURCHASED_TOPIC, None, _address_topic(self.account.address)],
+        })
+        with self._lock:
+            for log in logs:
+                self._apply_purchase(self.registry.events.DataPurchased().process_log(log))
+            self.synced_block = max(self.synced_block, latest)
+
+    def record_receipt(self, receipt):
+        """Applies the DataPurchased events in one of our own purchase receipts."""
+        with self._lock:
+            # The token's Transfer/Approval logs share the receipt; skip them quietly.
+            for event in self.registry.events.DataPurchased().process_receipt(receipt, errors=DISCARD):
+                if event['args']['buyer'].lower() == self.account.address.lower():
+                    self._apply_purchase(event)
+
+    def _apply_purchase(self, event):
+        tx_hash = event['transactionHash']
+        key = (tx_hash if isinstance(tx_hash, str) else Web3.to_hex(tx_hash), event['logIndex'])
+        if self.allowance is None or key in self._seen_events or event['blockNumber'] <= self.baseline_block:
+            return
+        self._seen_events[key] = event['blockNumber']
+        self.allowance = max(0, self.allowance - event['args']['price'])
+
+    def reserve(self, amount_wei, preflight=None):
+        """Makes sure `amount_wei` can be spent, topping up if needed, and holds it until release().
+
+        `preflight` is handed on to the approve path, which reuses its allowance and fee reads.
+        """
+        with self._lock:
+            if self.allowance is None:
+                self.refresh()
+            remaining = self.allowance - self.reserved
+            if remaining >= amount_wei and remaining - amount_wei >= self.low_water_wei:
+                self.reserved += amount_wei
+                return True
+            target = max(self.budget_wei, self.reserved + amount_wei + self.low_water_wei)
+            print(f"Allowance budget low ({Web3.from_wei(max(remaining, 0), 'ether')} MUSDC left); "
+                  f"topping up to {Web3.from_wei(target, 'ether')} MUSDC.")
+            if not self._top_up(target, preflight):
+                return False
+            self.refresh()
+            if self.allowance - self.reserved < amount_wei:
+                print("ERROR: Allowance still too low after top-up.")
+                return False
+            self.reserved += amount_wei
+            return True
+
+    def release(self, amount_wei):
+        with self._lock:
+            self.reserved = max(0, self.reserved - amount_wei)
+
+    def supports_permit(self):
+        if self._permit_supported is None:
+            names = {entry.get('name') for entry in self.token.abi if entry.get('type') == 'function'}
+            self._permit_supported = {'permit', 'nonces', 'DOMAIN_SEPARATOR'} <= names
+        return self._permit_supported
+
+    def _top_up(self, target_wei, preflight=None):
+        if self.supports_permit():
+            try:
+                return self._permit(target_wei)
+            except Exception as e:
+                print(f"Permit failed ({e}); falling back to approve().")
+        if self._approve is None:
+            print("ERROR: No approve path configured for the allowance budget.")
+            return False
+        return self._approve(self.spender, target_wei, preflight=preflight)
+
+    def _permit(self, value_wei):
+        owner = self.account.address
+        state = self.chain_state.fees(extra={
+            'permit_nonce': lambda b: b.call(self.token.functions.nonces(owner)),
+            'name': lambda b: b.call(self.token.functions.name()),
+        })
+        deadline = int(time.time()) + PERMIT_DEADLINE_SECONDS
+        chain_id = self.chain_state.chain_id()
+        signed = self.account.sign_message(encode_typed_data(full_message={
+            'types': {
+                'EIP712Domain': [
+                    {'name': 'name', 'type': 'string'}, {'name': 'version', 'type': 'string'},
+                    {'name': 'chainId', 'type': 'uint256'}, {'name': 'verifyingContract', 'type': 'address'},
+                ],
+                'Permit': [
+                    {'name': 'owner', 'type': 'address'}, {'name': 'spender', 'type': 'address'},
+                    {'name': 'value', 'type': 'uint256'}, {'name': 'nonce', 'type': 'uint256'},
+                    {'name': 'deadline', 'type': 'uint256'},
+                ],
+            },
+            'primaryType': 'Permit',
+            # OpenZeppelin's ERC20Permit uses version "1".
+            'domain': {'name': state['name'], 'version': '1', 'chainId': chain_id,
+                       'verifyingContract': self.token.address},
+            'message': {'owner': owner, 'spender': self.spender, 'value': value_wei,
+                        'nonce': state['permit_nonce'], 'deadline': deadline},
+        }))
+        r, s = signed.r.to_bytes(32, 'big'), signed.s.to_bytes(32, 'big')
+        submission = get_tx_engine(self.w3, self.account).submit(
+            self.token.functions.permit(owner, self.spender, value_wei, deadline, signed.v, r, s),
+            gas=120000, fee_state=state, label="permit",
+        )
+        print(f"PERMIT TX SENT: {submission.tx_hash}")
+        receipt = submission.wait()
+        return receipt['status'] == 1
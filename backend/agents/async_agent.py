@@ -0,0 +1,598 @@
+import time
+import json
+import random
+import asyncio
+import argparse
+import aiohttp
+from web3 import AsyncWeb3
+import config
+from chain_state import compute_fee_params, DEFAULT_PRIORITY_FEE_WEI
+from rpc_batch import format_receipt
+from tx_engine import (
+    TransactionRejected, is_revert, send_failure_action, retry_nonce, MAX_SEND_RETRIES, DEFAULT_GAS_MARGIN,
+)
+from receipt_tracker import raw_bytes
+from ipfs_upload import multiaddr_to_url
+from cid_utils import verify_cid
+from record_stream import decode_ipfs_content
+from metrics import instrument_async_provider, record_batch, get_metrics, IPFS_REQUESTS
+from tracing import get_tracer, configure_logging
+
+# Same defaults as the blocking agents, so both bill the same gas for the same call.
+LIST_DEFAULT_GAS = 650000
+APPROVE_DEFAULT_GAS = 120000
+PURCHASE_DEFAULT_GAS = 450000
+tracer = get_tracer()
+
+
+class AsyncReceiptWaiter:
+    """Waits for many receipts with one batched eth_getTransactionReceipt per poll.
+
+    The poll loop only runs while something is waiting. The batch is posted
+    with aiohttp directly: web3's async batching flags the shared provider,
+    which would capture requests other tasks make meanwhile. Receipts are
+    formatted like RpcBatch's, so the blocking and async agents see the same shape.
+    """
+
+    def __init__(self, session, rpc_url, poll_interval=0.5):
+        self.session = session
+        self.rpc_url = rpc_url
+        self.poll_interval = poll_interval
+        self._waiting = {}
+        self._waiters = {}
+        self._task = None
+
+    async def _poll_receipts(self, hashes):
+        """The raw response for each hash, in order; None where the batch answer left one out."""
+        payload = [
+            {'jsonrpc': '2.0', 'id': index, 'method': 'eth_getTransactionReceipt', 'params': [tx_hash]}
+            for index, tx_hash in enumerate(hashes)
+        ]
+        started = time.perf_counter()
+        responses = None
+        try:
+            async with self.session.post(self.rpc_url, json=payload) as response:
+                response.raise_for_status()
+                body = await response.json(content_type=None)
+            if not isinstance(body, list):
+                # A node without batch support answers with one error object.
+                raise ValueError(f"Unexpected batch response: {str(body)[:200]}")
+            by_id = {item.get('id'): item for item in body if isinstance(item, dict)}
+            responses = [by_id.get(request['id']) for request in payload]
+            return responses
+        finally:
+            record_batch(['eth_getTransactionReceipt'] * len(hashes), time.perf_counter() - started, responses)
+
+    async def wait(self, tx_hash, timeout=240):
+        future = self._waiting.get(tx_hash)
+        if future is None:
+            future = self._waiting[tx_hash] = asyncio.get_running_loop().create_future()
+            if self._task is None or self._task.done():
+                self._task = asyncio.create_task(self._poll())
+        self._waiters[tx_hash] = self._waiters.get(tx_hash, 0) + 1
+        try:
+            with tracer.span('tx.receipt_wait', tx_hash=tx_hash):
+                return await asyncio.wait_for(asyncio.shield(future), timeout)
+        finally:
+            self._waiters[tx_hash] -= 1
+            if not self._waiters[tx_hash]:
+                del self._waiters[tx_hash]
+                # Nobody wants this receipt any more (timeout or cancellation): stop polling for it.
+                if not future.done() and self._waiting.get(tx_hash) is future:
+                    del self._waiting[tx_hash]
+                    future.cancel()
+
+    async def _poll(self):
+        while self._waiting:
+            await asyncio.sleep(self.poll_interval)
+            hashes = list(self._waiting)
+            try:
+                responses = await self._poll_receipts(hashes)
+            except Exception as e:
+                print(f"Receipt poll failed: {e}")
+                continue
+            for tx_hash, response in zip(hashes, responses):
+                if not response or not response.get('result'):
+                    continue
+                future = self._waiting.pop(tx_hash, None)
+                if future is None or future.done():
+                    continue
+                try:
+                    future.set_result(format_receipt(response['result']))
+                except Exception as e:
+                    future.set_exception(e)
+
+    def cancel(self):
+        if self._task is not None:
+            self._task.cancel()
+        for future in self._waiting.values():
+            future.cancel()
+        self._waiting.clear()
+
+
+class AsyncTxEngine:
+    """TxEngine for asyncio: signs on a local nonce and sends in nonce order behind an asyncio.Lock.
+
+    Only the sign-and-send step is serialized; estimates and receipt waits
+    from any number of tasks overlap. Send errors go through the same
+    send_failure_action() / retry_nonce() decisions as TxEngine.
+    """
+
+    def __init__(self, w3, account, rpc_limit, receipts, max_retries=MAX_SEND_RETRIES,
+                 default_priority_fee=DEFAULT_PRIORITY_FEE_WEI, fee_ttl=1.0):
+        self.w3 = w3
+        self.account = account
+        self.rpc_limit = rpc_limit
+        self.receipts = receipts
+        self.max_retries = max_retries
+        self.default_priority_fee = default_priority_fee
+        self.fee_ttl = fee_ttl
+        self.next_nonce = None
+        self._chain_id = None
+        self._fees = None
+        self._fees_at = 0.0
+        self._lock = asyncio.Lock()
+        self._fee_lock = asyncio.Lock()
+
+    async def chain_id(self):
+        async with self._fee_lock:
+            if self._chain_id is None:
+                async with self.rpc_limit:
+                    self._chain_id = await self.w3.eth.chain_id
+            return self._chain_id
+
+    async def fee_params(self):
+        # One fee read per `fee_ttl` however many tasks are sending.
+        async with self._fee_lock:
+            if self._fees is None or time.monotonic() - self._fees_at >= self.fee_ttl:
+                async with self.rpc_limit:
+                    head, gas_price = await asyncio.gather(self.w3.eth.get_block('latest'), self.w3.eth.gas_price)
+                    try:
+                        priority_fee = await self.w3.eth.max_priority_fee
+                    except Exception:
+                        priority_fee = None
+                self._fees = compute_fee_params(
+                    head.get('baseFeePerGas'), priority_fee, gas_price, self.default_priority_fee
+                )
+                self._fees_at = time.monotonic()
+            return self._fees
+
+    async def estimate_gas(self, call, default_gas, margin=DEFAULT_GAS_MARGIN, label=None):
+        try:
+            with tracer.span('tx.estimate_gas', label=label):
+                async with self.rpc_limit:
+                    estimate = await call.estimate_gas({'from': self.account.address})
+        except Exception as e:
+            if is_revert(e):
+                raise TransactionRejected(f"{label or 'transaction'} would revert: {e}") from e
+            print(f"Gas estimation failed for {label or 'transaction'}: {e}. Using default gas limit: {default_gas}")
+            return default_gas
+        return estimate + margin
+
+    async def _sync_nonce(self):
+        async with self.rpc_limit:
+            self.next_nonce = await self.w3.eth.get_transaction_count(self.account.address, 'pending')
+
+    async def send(self, call, gas, label=None):
+        """Signs and sends on the next nonce; returns (tx_hash, nonce)."""
+        with tracer.span('tx.submit', label=label) as span:
+            tx_hash, nonce = await self._send(call, gas, label)
+            span.set(tx_hash=tx_hash, nonce=nonce, gas=gas)
+        return tx_hash, nonce
+
+    async def _send(self, call, gas, label):
+        with tracer.span('tx.fee_lookup'):
+            fields = {
+                'from': self.account.address, 'gas': gas, 'chainId': await self.chain_id(), **await self.fee_params(),
+            }
+        # Every field is given, so build_transaction makes no RPC calls.
+        with tracer.span('tx.build'):
+            transaction = await call.build_transaction({**fields, 'nonce': 0})
+        async with self._lock:
+            if self.next_nonce is None:
+                await self._sync_nonce()
+            retries = 0
+            while True:
+                transaction['nonce'] = self.next_nonce
+                with tracer.span('tx.sign'):
+                    signed = self.account.sign_transaction(transaction)
+                tx_hash = AsyncWeb3.to_hex(signed.hash)
+                try:
+                    with tracer.span('tx.send', nonce=transaction['nonce'], attempt=retries + 1):
+                        async with self.rpc_limit:
+                            await self.w3.eth.send_raw_transaction(raw_bytes(signed))
+                except Exception as e:
+                    action = send_failure_action(e, retries, self.max_retries)
+                    if action == 'sent':
+                        break
+                    if action == 'raise':
+                        self.next_nonce = None
+                        raise
+                    retries += 1
+                    used_nonce = transaction['nonce']
+                    await self._sync_nonce()
+                    self.next_nonce = retry_nonce(transaction, e, used_nonce, self.next_nonce)
+                    print(f"Send of {label or 'transaction'} on nonce {used_nonce} failed ({e}); "
+                          f"retrying on nonce {self.next_nonce}.")
+                    continue
+                break
+            self.next_nonce = transaction['nonce'] + 1
+        return tx_hash, transaction['nonce']
+
+    async def transact(self, call, gas=None, default_gas=None, margin=DEFAULT_GAS_MARGIN, label=None, timeout=240):
+        if gas is None:
+            gas = await self.estimate_gas(call, default_gas, margin, label)
+        tx_hash, _ = await self.send(call, gas, label)
+        return await self.receipts.wait(tx_hash, timeout)
+
+
+class AsyncIpfs:
+    """IPFS over aiohttp: /api/v0/add and /api/v0/cat on the local node, plus gateways.
+
+    A fetch starts on the local node; each gateway joins after another
+    `hedge_delay` seconds, and the first verified answer wins.
+    """
+
+    def __init__(self, session, api_url, gateway_urls, limit, hedge_delay=0.5, timeout=60):
+        self.session = session
+        self.api_url = multiaddr_to_url(api_url)
+        self.gateway_urls = [url.rstrip('/') for url in gateway_urls]
+        self.limit = limit
+        self.hedge_delay = hedge_delay
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+
+    async def add_bytes(self, content, filename='data.json'):
+        with tracer.span('ipfs.add', bytes=len(content)):
+            try:
+                return await self._add(content, filename)
+            except aiohttp.ClientConnectionError:
+                # Usually a pooled keep-alive connection the node had already closed; adds are idempotent.
+                return await self._add(content, filename)
+
+    async def _add(self, content, filename):
+        form = aiohttp.FormData()
+        form.add_field('file', content, filename=filename, content_type='application/octet-stream')
+        async with self.limit:
+            with IPFS_REQUESTS.time('add', self.api_url):
+                async with self.session.post(f"{self.api_url}/api/v0/add", data=form, params={'pin': 'true'},
+                                             timeout=self.timeout) as response:
+                    response.raise_for_status()
+                    lines = [line for line in (await response.text()).splitlines() if line.strip()]
+        return json.loads(lines[-1])['Hash']
+
+    async def _from_node(self, cid):
+        async with self.limit:
+            with IPFS_REQUESTS.time('cat', 'local-node'):
+                async with self.session.post(f"{self.api_url}/api/v0/cat", params={'arg': cid},
+                                             timeout=self.timeout) as response:
+                    response.raise_for_status()
+                    return await response.read()
+
+    async def _from_gateway(self, base_url, cid):
+        async with self.limit:
+            with IPFS_REQUESTS.time('gateway', base_url):
+                async with self.session.get(f"{base_url}/{cid}", timeout=self.timeout) as response:
+                    response.raise_for_status()
+                    return await response.read()
+
+    async def _attempt(self, name, fetch, delay, cid):
+        if delay:
+            await asyncio.sleep(delay)
+        content = await fetch()
+        if verify_cid(cid, content) is False:
+            raise ValueError(f"{name} returned content that does not match {cid}")
+        return content, name
+
+    async def cat(self, cid):
+        """(content, source name) from whichever source answers first with matching content."""
+        with tracer.span('ipfs.fetch', cid=cid) as span:
+            content, source = await self._cat(cid)
+            span.set(source=source, bytes=len(content))
+        return content, source
+
+    async def _cat(self, cid):
+        attempts = [('local-node', lambda: self._from_node(cid))]
+        attempts += [(url, lambda url=url: self._from_gateway(url, cid)) for url in self.gateway_urls]
+        tasks = [
+            asyncio.create_task(self._attempt(name, fetch, index * self.hedge_delay, cid))
+            for index, (name, fetch) in enumerate(attempts)
+        ]
+        errors = []
+        try:
+            for finished in asyncio.as_completed(tasks):
+                try:
+                    return await finished
+                except Exception as e:
+                    errors.append(e)
+            raise ConnectionError(f"Every IPFS source failed for {cid}: {errors}")
+        finally:
+            for task in tasks:
+                task.cancel()
+
+
+class AsyncAgent:
+    """Asyncio versions of the producer and consumer operations, for one account.
+
+    RPC calls go through AsyncWeb3 and IPFS through aiohttp, each bounded by
+    its own semaphore (`rpc_concurrency`, `ipfs_concurrency`), so one process
+    can keep hundreds of discoveries, fetches, uploads and receipt waits in
+    flight. Use it as `async with AsyncAgent(key) as agent: ...`.
+    """
+
+    def __init__(self, private_key, rpc_url=None, ipfs_api_url=None, gateway_urls=None,
+                 rpc_concurrency=None, ipfs_concurrency=None, blob_store=None):
+        self.rpc_url = rpc_url or config.RPC_URL
+        self.ipfs_api_url = ipfs_api_url or config.IPFS_CLIENT_URL
+        self.gateway_urls = gateway_urls if gateway_urls is not None else config.IPFS_GATEWAY_URLS
+        self.rpc_limit = asyncio.Semaphore(rpc_concurrency or config.ASYNC_RPC_CONCURRENCY)
+        self.ipfs_limit = asyncio.Semaphore(ipfs_concurrency or config.ASYNC_IPFS_CONCURRENCY)
+        self.blob_store = blob_store
+        self.w3 = AsyncWeb3(instrument_async_provider(AsyncWeb3.AsyncHTTPProvider(
+            self.rpc_url, cache_allowed_requests=True, request_cache_validation_threshold=None,
+        )))
+        self.account = self.w3.eth.account.from_key(private_key)
+        self.registry = self.w3.eth.contract(address=config.DATA_REGISTRY_ADDRESS, abi=config.DATA_REGISTRY_ABI)
+        self.token = self.w3.eth.contract(address=config.MOCK_ERC20_ADDRESS, abi=config.MOCK_ERC20_ABI)
+        self.receipts = None
+        self.tx_engine = None
+        # approve() sets the allowance outright, so an approval and the purchase it covers go out back to back.
+        self._purchase_lock = asyncio.Lock()
+        # What purchases sent but not yet mined will still spend; an approval must leave room for them too.
+        self._committed_wei = 0
+        self.session = None
+        self.ipfs = None
+
+    async def __aenter__(self):
+        connector = aiohttp.TCPConnector(limit=0)
+        self.session = aiohttp.ClientSession(connector=connector)
+        self.receipts = AsyncReceiptWaiter(self.session, self.rpc_url)
+        self.tx_engine = AsyncTxEngine(self.w3, self.account, self.rpc_limit, self.receipts)
+        self.ipfs = AsyncIpfs(
+            self.session, self.ipfs_api_url, self.gateway_urls, self.ipfs_limit,
+            hedge_delay=config.IPFS_HEDGE_DELAY_SECONDS, timeout=config.IPFS_FETCH_TIMEOUT_SECONDS,
+        )
+        # web3's validation asks for the chain id on every estimate and call; reading it once
+        # before any concurrency lets the provider's request cache answer all of those.
+        await self.tx_engine.chain_id()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.receipts.cancel()
+        await self.session.close()
+        await self.w3.provider.disconnect()
+
+    async def _call(self, call):
+        async with self.rpc_limit:
+            return await call.call()
+
+    async def discover_listings(self, limit=5, offset=0):
+        async with self.rpc_limit:
+            raw_listings = await self.registry.functions.getActiveListingsDetails(limit, offset).call()
+        return [
+            {
+                'id': item[0], 'seller': item[1], 'name': item[2], 'description': item[3],
+                'dataCID': item[4], 'metadataCID': item[5], 'price_token_wei': item[6],
+                'price_musdc': self.w3.from_wei(item[6], 'ether'),
+            }
+            for item in raw_listings
+        ]
+
+    async def approve_token_spending(self, spender_address, amount_token_wei, wait=True):
+        """Approves `amount_token_wei` unless the allowance already covers it. With wait=False the
+        approval is only sent; transactions sent after it on this account run after it."""
+        with tracer.span('allowance_check'):
+            current_allowance = await self._call(self.token.functions.allowance(self.account.address, spender_address))
+        if current_allowance >= amount_token_wei:
+            return True
+        call = self.token.functions.approve(spender_address, amount_token_wei)
+        gas = await self.tx_engine.estimate_gas(call, APPROVE_DEFAULT_GAS, margin=20000, label="approve")
+        tx_hash, _ = await self.tx_engine.send(call, gas, label="approve")
+        print(f"APPROVAL TX SENT: {tx_hash}")
+        if not wait:
+            return tx_hash
+        receipt = await self.receipts.wait(tx_hash)
+        if receipt['status'] != 1:
+            print(f"ERROR: Approval transaction {tx_hash} FAILED.")
+            return False
+        return True
+
+    async def purchase_data_on_chain(self, listing_id, timeout=240):
+        with tracer.span('purchase', listing_id=listing_id) as span:
+            purchased = await self._purchase_data_on_chain(int(listing_id), timeout)
+            span.set(ok=purchased)
+        return purchased
+
+    async def _purchase_data_on_chain(self, listing_id, timeout):
+        listing, balance = await asyncio.gather(
+            self._call(self.registry.functions.getListing(listing_id)),
+            self._call(self.token.functions.balanceOf(self.account.address)),
+        )
+        price_token_wei = listing[6]
+        if not listing[7]:
+            print(f"ERROR: Listing ID {listing_id} is not active.")
+            return False
+        if balance < price_token_wei:
+            print(f"ERROR: Insufficient MUSDC for listing ID {listing_id}.")
+            return False
+        call = self.registry.functions.purchaseData(listing_id)
+        async with self._purchase_lock:
+            approval = await self.approve_token_spending(
+                config.DATA_REGISTRY_ADDRESS, self._committed_wei + price_token_wei, wait=False,
+            )
+            if approval is False:
+                return False
+            if approval is True:
+                gas = await self.tx_engine.estimate_gas(call, PURCHASE_DEFAULT_GAS, label=f"purchase {listing_id}")
+            else:
+                # The approval is still pending, so an estimate would see no allowance and revert.
+                gas = PURCHASE_DEFAULT_GAS
+            tx_hash, _ = await self.tx_engine.send(call, gas, label=f"purchase {listing_id}")
+            self._committed_wei += price_token_wei
+        print(f"PURCHASE TX SENT: {tx_hash} (listing ID {listing_id})")
+        try:
+            receipt = await self.receipts.wait(tx_hash, timeout)
+        finally:
+            self._committed_wei -= price_token_wei
+        if receipt['status'] != 1:
+            print(f"ERROR: Purchase of listing ID {listing_id} FAILED in block {receipt['blockNumber']}.")
+            return False
+        print(f"SUCCESS: Data purchased for listing ID {listing_id}. Block: {receipt['blockNumber']}")
+        return True
+
+    async def purchase_many(self, listings, timeout=240):
+        """Buys every listing with one approval for the total; the purchases are sent and confirmed concurrently."""
+        with tracer.span('batch_purchase', candidates=len(listings)) as span:
+            results = await self._purchase_many(listings, timeout)
+            span.set(purchased=sum(results))
+        return results
+
+    async def _purchase_many(self, listings, timeout):
+        total = sum(listing['price_token_wei'] for listing in listings)
+        calls = [self.registry.functions.purchaseData(listing['id']) for listing in listings]
+        async with self._purchase_lock:
+            if await self.approve_token_spending(config.DATA_REGISTRY_ADDRESS, self._committed_wei + total) is not True:
+                return [False] * len(listings)
+            gas_limits = await asyncio.gather(
+                *(self.tx_engine.estimate_gas(call, PURCHASE_DEFAULT_GAS, label="purchase") for call in calls),
+                return_exceptions=True,
+            )
+            sends = []
+            for listing, call, gas in zip(listings, calls, gas_limits):
+                if isinstance(gas, Exception):
+                    print(f"Purchase of listing ID {listing['id']} rejected: {gas}")
+                    sends.append(None)
+                else:
+                    sends.append(self.tx_engine.send(call, gas, label=f"purchase {listing['id']}"))
+            # Sent before the lock is released, so no other approval can land in between.
+            sent = await asyncio.gather(*(send for send in sends if send is not None), return_exceptions=True)
+            self._committed_wei += sum(
+                listing['price_token_wei'] for listing, send in zip(listings, sends) if send is not None
+            )
+        sent = iter(sent)
+
+        async def confirm(listing, send):
+            if send is None:
+                return False
+            result = next(sent)
+            try:
+                if isinstance(result, Exception):
+                    raise result
+                receipt = await self.receipts.wait(result[0], timeout)
+            except Exception as e:
+                print(f"Purchase of listing ID {listing['id']} failed: {e}")
+                return False
+            finally:
+                self._committed_wei -= listing['price_token_wei']
+            return receipt['status'] == 1
+
+        return await asyncio.gather(*(confirm(listing, send) for listing, send in zip(listings, sends)))
+
+    async def fetch_from_ipfs(self, cid):
+        if not cid or "DUMMY_CID" in cid:
+            print("Invalid or dummy CID provided, cannot fetch.")
+            return None
+        if self.blob_store:
+            cached_bytes = self.blob_store.get(cid)
+            if cached_bytes is not None:
+                return decode_ipfs_content(cached_bytes)
+        try:
+            content_bytes, source = await self.ipfs.cat(cid)
+        except Exception as e:
+            print(f"Error fetching CID {cid} from every IPFS source: {e}")
+            return None
+        if self.blob_store:
+            self.blob_store.put(cid, content_bytes)
+        return decode_ipfs_content(content_bytes)
+
+    async def upload_to_ipfs(self, content_dict, filename_hint="file.json"):
+        try:
+            return await self.ipfs.add_bytes(json.dumps(content_dict).encode('utf-8'), filename_hint)
+        except Exception as e:
+            print(f"Error uploading {filename_hint} to IPFS: {e}")
+            return None
+
+    async def list_data_on_chain(self, name, description, data_cid, metadata_cid, price_mock_stablecoin_units,
+                                 timeout=240):
+        """Returns the new listing id, or None."""
+        price_token_wei = self.w3.to_wei(price_mock_stablecoin_units, 'ether')
+        call = self.registry.functions.listData(name, description, data_cid, metadata_cid, price_token_wei)
+        try:
+            with tracer.span('listing', data_cid=data_cid):
+                receipt = await self.tx_engine.transact(
+                    call, default_gas=LIST_DEFAULT_GAS, label=f"listing '{name}'", timeout=timeout,
+                )
+        except Exception as e:
+            print(f"ERROR listing data '{name}': {e}")
+            return None
+        if receipt['status'] != 1:
+            print(f"ERROR: Listing tx for '{name}' FAILED in block {receipt['blockNumber']}.")
+            return None
+        events = self.registry.events.DataListed().process_receipt(receipt)
+        return events[0]['args']['listingId'] if events else None
+
+
+async def run_producer(count, concurrency):
+    """Uploads and lists `count` dummy datasets with up to `concurrency` in flight."""
+    limit = asyncio.Semaphore(concurrency)
+
+    async def publish(agent, index):
+        async with limit:
+            name = f"async-{int(time.time())}-{index}"
+            data = {"timestamp": time.time(), "sensor_id": f"async_sensor_{index}",
+                    "temperature_celsius": round(random.uniform(18.0, 28.0), 1)}
+            data_cid, metadata_cid = await asyncio.gather(
+                agent.upload_to_ipfs(data, f"{name}-data.json"),
+                agent.upload_to_ipfs({"name": name, "data_type": "environmental_sensor"}, f"{name}-meta.json"),
+            )
+            if not data_cid or not metadata_cid:
+                return None
+            return await agent.list_data_on_chain(name, "async agent dataset", data_cid, metadata_cid,
+                                                  round(random.uniform(0.1, 1.0), 2))
+
+    async with AsyncAgent(config.PRODUCER_PRIVATE_KEY) as agent:
+        return await asyncio.gather(*(publish(agent, index) for index in range(count)))
+
+
+async def run_consumer(count, fetch):
+    """Buys up to `count` of the cheapest listings that are not ours, then fetches them all at once."""
+    async with AsyncAgent(config.CONSUMER_PRIVATE_KEY) as agent:
+        listings = await agent.discover_listings(limit=max(count * 4, 50))
+        listings = [listing for listing in listings if listing['seller'].lower() != agent.account.address.lower()]
+        listings = sorted(listings, key=lambda listing: listing['price_token_wei'])[:count]
+        results = await agent.purchase_many(listings) if listings else []
+        fetched = []
+        if fetch:
+            bought = [listing for listing, ok in zip(listings, results) if ok]
+            fetched = await asyncio.gather(*(agent.fetch_from_ipfs(listing['dataCID']) for listing in bought))
+        return results, fetched
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Auraweave asyncio agents")
+    parser.add_argument('--list', type=int, default=0, help="Producer: publish this many dummy datasets")
+    parser.add_argument('--buy', type=int, default=0, help="Consumer: buy up to this many listings")
+    parser.add_argument('--concurrency', type=int, default=100, help="Datasets published at once")
+    parser.add_argument('--no-fetch', action='store_true')
+    args = parser.parse_args()
+    missing = [name for name, needed in (
+        ('PRODUCER_PRIVATE_KEY', args.list), ('CONSUMER_PRIVATE_KEY', args.buy),
+        ('DATA_REGISTRY_ADDRESS', True), ('DATA_REGISTRY_ABI', True), ('MOCK_ERC20_ADDRESS', True), ('MOCK_ERC20_ABI', True),
+    ) if needed and not getattr(config, name)]
+    if missing:
+        print(f"ERROR: {', '.join(missing)} not loaded from config. Exiting.")
+        exit()
+    if config.METRICS_SNAPSHOT_FILE:
+        get_metrics().dump_at_exit(config.METRICS_SNAPSHOT_FILE)
+    configure_logging(config.LOG_LEVEL)
+    if config.TRACE_FILE:
+        tracer.configure(config.TRACE_FILE, config.TRACE_SAMPLE_RATE)
+    started = time.perf_counter()
+    if args.list:
+        listing_ids = asyncio.run(run_producer(args.list, args.concurrency))
+        listed = sum(1 for listing_id in listing_ids if listing_id is not None)
+        print(f"Listed {listed}/{args.list} datasets in {time.perf_counter() - started:.2f}s")
+    if args.buy:
+        started = time.perf_counter()
+        results, fetched = asyncio.run(run_consumer(args.buy, not args.no_fetch))
+        print(f"Purchased {sum(results)}/{len(results)} listings, fetched "
+              f"{sum(1 for item in fetched if item is not None)} in {time.perf_counter() - started:.2f}s")
@@ -0,0 +1,383 @@
+"""Offline benchmarks for the agents' and the faucet's hot paths.
+
+    python benchmark.py                      # run, and compare with the baseline if there is one
+    python benchmark.py --save-baseline      # run and store the results as the new baseline
+    python benchmark.py --latency 0.05       # pretend the RPC provider is 50 ms away
+    python benchmark.py --only purchase_data_on_chain,request_tokens
+
+Nothing here touches the network. The chain is mock_rpc.MockChain behind a
+JSON-RPC server with a configurable delay per round trip, and IPFS is the
+in-process ipfs_standin. Each case runs in a fresh process with its own
+seeded chain, twice: once timed, once under tracemalloc for peak memory.
+RPC round trips and call counts are exact and do not depend on the
+machine, so any increase counts as a regression. Timings and memory are
+compared with --tolerance.
+
+The faucet needs its own requirements (web3 6); point --faucet-python at
+the faucet's virtualenv, or request_tokens only reports the import error.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+import tracemalloc
+import subprocess
+import urllib.request
+
+AGENTS_DIR = os.path.dirname(os.path.abspath(__file__))
+FAUCET_DIR = os.path.join(AGENTS_DIR, '..', '..', 'auraweave-faucet')
+DEFAULT_BASELINE = os.path.join(AGENTS_DIR, 'benchmark_baseline.json')
+# Fixed keys, so every run sees the same addresses (and the same calldata).
+PRODUCER_KEY = '0x' + '11' * 32
+CONSUMER_KEY = '0x' + '22' * 32
+FAUCET_KEY = '0x' + '33' * 32
+LISTING_PRICE_WEI = 10 ** 18
+EXACT_METRICS = ('rpc_round_trips', 'rpc_calls', 'ipfs_requests')
+TIMED_METRICS = ('mean_ms', 'p95_ms', 'wall_seconds', 'peak_memory_kb')
+
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * pct / 100
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def _counts(url):
+    with urllib.request.urlopen(url, timeout=10) as response:
+        return json.load(response)
+
+
+# --- worker side: runs in a fresh process, imports the code under test ---
+
+def _discover_cold(params):
+    import config
+    import consumer_agent as agent
+    from listing_index import ListingIndex
+
+    def operation(index):
+        # A brand new index each time: the whole DataListed history is read again.
+        listing_index = ListingIndex(
+            agent.get_w3(), agent.get_data_registry_contract(), os.path.join(params['scratch'], f"index-{index}.sqlite3"),
+            start_block=0, confirmations=config.REORG_CONFIRMATIONS,
+        )
+        agent.get_listing_index = lambda: listing_index
+        return len(agent.discover_listings(limit=50)) == 50
+    return [lambda index=index: operation(index) for index in range(params['ops'])], None
+
+
+def _discover_warm(params):
+    import consumer_agent as agent
+    agent.discover_listings(limit=50)
+    return [lambda: len(agent.discover_listings(limit=50)) == 50] * params['ops'], None
+
+
+def _purchase(params):
+    import consumer_agent as agent
+    return [lambda listing_id=listing_id: agent.purchase_data_on_chain(listing_id)
+            for listing_id in params['listing_ids']], None
+
+
+def _fetch_cold(params):
+    import consumer_agent as agent
+    return [lambda cid=cid: agent.fetch_from_ipfs(cid) is not None for cid in params['cids']], None
+
+
+def _fetch_cached(params):
+    import consumer_agent as agent
+    cid = params['cids'][0]
+    agent.fetch_from_ipfs(cid)
+    return [lambda: agent.fetch_from_ipfs(cid) is not None] * params['ops'], None
+
+
+def _request_tokens(params):
+    sys.path.insert(0, os.path.abspath(FAUCET_DIR))
+    import app as faucet
+    # The faucet connects on its first request; do that here so it stays out of the timed requests.
+    faucet.ensure_web3()
+    client = faucet.app.test_client()
+    job_ids = []
+
+    def operation(address):
+        response = client.post('/request-tokens', json={'address': address})
+        if response.status_code != 202:
+            return False
+        job_ids.append(response.get_json()['jobId'])
+        return True
+
+    def drain():
+        # The HTTP handler only queues; a mint is done once the submitter has it mined.
+        deadline = time.time() + 120
+        while time.time() < deadline:
+            if all(faucet.get_mint_queue().get(job_id)['status'] in ('mined', 'failed') for job_id in job_ids):
+                break
+            time.sleep(0.01)
+        return sum(1 for job_id in job_ids if faucet.get_mint_queue().get(job_id)['status'] != 'mined')
+
+    return [lambda address=address: operation(address) for address in params['addresses']], drain
+
+
+def run_worker(case, params_path, result_path, trace_memory):
+    with open(params_path) as f:
+        params = json.load(f)
+    operations, finish = WORKERS[case](params)
+    rpc_before, ipfs_before = _counts(params['rpc_url']), _counts(params['ipfs_url'])
+    if trace_memory:
+        tracemalloc.start()
+    timings = []
+    failures = 0
+    started = time.perf_counter()
+    for operation in operations:
+        operation_started = time.perf_counter()
+        ok = operation()
+        timings.append(time.perf_counter() - operation_started)
+        failures += 0 if ok else 1
+    finish_started = time.perf_counter()
+    unfinished = finish() if finish else 0
+    finish_seconds = time.perf_counter() - finish_started
+    wall_seconds = time.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1] if trace_memory else None
+    rpc_after, ipfs_after = _counts(params['rpc_url']), _counts(params['ipfs_url'])
+
+    methods = {method: count - rpc_before['methods'].get(method, 0) for method, count in rpc_after['methods'].items()}
+    result = {
+        'ops': len(timings), 'failures': failures + unfinished,
+        'wall_seconds': round(wall_seconds, 4),
+        'mean_ms': round(sum(timings) / len(timings) * 1000, 3) if timings else None,
+        'p50_ms': round(_percentile(timings, 50) * 1000, 3) if timings else None,
+        'p95_ms': round(_percentile(timings, 95) * 1000, 3) if timings else None,
+        'rpc_round_trips': rpc_after['round_trips'] - rpc_before['round_trips'],
+        'rpc_calls': rpc_after['calls'] - rpc_before['calls'],
+        'rpc_methods': {method: count for method, count in sorted(methods.items()) if count},
+        'ipfs_requests': sum(ipfs_after.values()) - sum(ipfs_before.values()),
+    }
+    if finish:
+        result['finish_seconds'] = round(finish_seconds, 4)
+    if peak is not None:
+        result['peak_memory_kb'] = round(peak / 1024, 1)
+    with open(result_path, 'w') as f:
+        json.dump(result, f)
+
+
+WORKERS = {
+    'discover_listings_cold': _discover_cold,
+    'discover_listings_warm': _discover_warm,
+    'purchase_data_on_chain': _purchase,
+    'fetch_from_ipfs_cold': _fetch_cold,
+    'fetch_from_ipfs_cached': _fetch_cached,
+    'request_tokens': _request_tokens,
+}
+
+
+# --- runner side: seeds a mock chain per case and starts the workers ---
+
+def _seed_listings(chain, count, seller):
+    for index in range(count):
+        chain.transact(seller, chain.registry.address, chain.registry.encode_call(
+            'listData', f"bench-dataset-{index}", "benchmark listing", f"bafybenchdata{index}",
+            f"bafybenchmeta{index}", LISTING_PRICE_WEI,
+        ))
+
+
+def _seed_blobs(ipfs, count, payload_bytes):
+    cids = []
+    for index in range(count):
+        record = {'index': index, 'padding': 'x' * max(0, payload_bytes - 40)}
+        cids.append(ipfs.put(json.dumps(record).encode()))
+    return cids
+
+
+def seed_case(case, chain, ipfs, options):
+    from eth_account import Account
+    producer = Account.from_key(PRODUCER_KEY).address
+    consumer = Account.from_key(CONSUMER_KEY).address
+    for address in (producer, consumer, Account.from_key(FAUCET_KEY).address):
+        chain.fund(address, 100 * 10 ** 18)
+    ops = options['ops']
+    params = {'ops': ops}
+    if case.startswith('discover_listings'):
+        _seed_listings(chain, options['listings'], producer)
+    elif case == 'purchase_data_on_chain':
+        _seed_listings(chain, ops, producer)
+        chain.mint(consumer, ops * LISTING_PRICE_WEI)
+        params['listing_ids'] = list(range(1, ops + 1))
+    elif case.startswith('fetch_from_ipfs'):
+        params['cids'] = _seed_blobs(ipfs, ops if case.endswith('cold') else 1, options['payload_kb'] * 1024)
+    elif case == 'request_tokens':
+        params['addresses'] = ['0x' + f"{index + 1:040x}" for index in range(ops)]
+    return params
+
+
+CASES = {
+    'discover_listings_cold': 5,
+    'discover_listings_warm': 50,
+    'purchase_data_on_chain': 10,
+    'fetch_from_ipfs_cold': 20,
+    'fetch_from_ipfs_cached': 200,
+    'request_tokens': 20,
+}
+
+
+def run_case(case, options, trace_memory):
+    from eth_account import Account
+    from mock_rpc import MockChain, MockRpcServer
+    from ipfs_standin import IpfsStandIn
+
+    chain = MockChain.from_deployment_file(token_owner=Account.from_key(FAUCET_KEY).address)
+    rpc = MockRpcServer(chain, latency=options['latency']).start()
+    ipfs = IpfsStandIn(latency=options['ipfs_latency']).start()
+    try:
+        with tempfile.TemporaryDirectory(prefix=f'auraweave-bench-{case}-') as scratch:
+            params = seed_case(case, chain, ipfs, options)
+            params.update({'rpc_url': rpc.url, 'ipfs_url': f"http://127.0.0.1:{ipfs.port}/", 'scratch': scratch})
+            deployment_file = os.path.join(scratch, 'deployment.json')
+            with open(deployment_file, 'w') as f:
+                json.dump(chain.deployment(), f)
+            params_path = os.path.join(scratch, 'params.json')
+            result_path = os.path.join(scratch, 'result.json')
+            with open(params_path, 'w') as f:
+                json.dump(params, f)
+
+            cache_dir = os.path.join(scratch, 'cache')
+            env = dict(os.environ, **{
+                'AURAWEAVE_NETWORK': 'localhost', 'LOCALHOST_RPC_URL': rpc.url,
+                'AURAWEAVE_DEPLOYMENT_FILE': deployment_file,
+                'PRODUCER_PRIVATE_KEY': PRODUCER_KEY, 'CONSUMER_PRIVATE_KEY': CONSUMER_KEY,
+                'IPFS_HTTP_CLIENT_URL': ipfs.api_multiaddr,
+                'IPFS_GATEWAY_URL': ipfs.gateway_url, 'IPFS_GATEWAY_URLS': ipfs.gateway_url,
+                'AURAWEAVE_CACHE_DIR': cache_dir,
+                'LISTING_INDEX_DB': os.path.join(cache_dir, 'listings.sqlite3'),
+                'IPFS_CACHE_DIR': os.path.join(cache_dir, 'ipfs'),
+                'PURCHASE_ALLOWANCE_BUDGET': '0',
+                'SEPOLIA_RPC_URL': rpc.url, 'FAUCET_OPERATOR_PRIVATE_KEY': FAUCET_KEY,
+                'MOCK_ERC20_CONTRACT_ADDRESS': chain.token.address,
+                'FAUCET_QUEUE_DB': os.path.join(scratch, 'mint_queue.sqlite3'),
+                'FAUCET_SUBMIT_INTERVAL_SECONDS': '0.05',
+            })
+            python = options['faucet_python'] if case == 'request_tokens' else sys.executable
+            command = [python, os.path.abspath(__file__), '--worker', case, '--params', params_path, '--result', result_path]
+            if trace_memory:
+                command.append('--trace-memory')
+            output = None if options['verbose'] else subprocess.DEVNULL
+            completed = subprocess.run(command, cwd=AGENTS_DIR, env=env, stdout=output, stderr=subprocess.PIPE, text=True)
+            if completed.returncode != 0:
+                error = completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else f"exit {completed.returncode}"
+                return {'error': error}
+            with open(result_path) as f:
+                return json.load(f)
+    finally:
+        rpc.stop()
+        ipfs.stop()
+
+
+def compare(results, baseline, tolerance):
+    """Returns a list of (case, metric, baseline, current, regressed)."""
+    rows = []
+    timings_comparable = baseline.get('settings', {}).get('latency') == results['settings']['latency']
+    for case, current in results['cases'].items():
+        previous = baseline.get('cases', {}).get(case)
+        if not previous or 'error' in current or 'error' in previous:
+            continue
+        for metric in EXACT_METRICS:
+            if metric in current and metric in previous:
+                rows.append((case, metric, previous[metric], current[metric], current[metric] > previous[metric]))
+        for metric in TIMED_METRICS:
+            if metric == 'peak_memory_kb' or timings_comparable:
+                if current.get(metric) is not None and previous.get(metric):
+                    rows.append((case, metric, previous[metric], current[metric],
+                                 current[metric] > previous[metric] * (1 + tolerance)))
+    return rows
+
+
+def print_results(results):
+    print(f"\n{'case':<26}{'ops':>5}{'fail':>6}{'mean ms':>10}{'p95 ms':>10}{'round trips':>13}{'calls':>7}"
+          f"{'ipfs':>6}{'peak KB':>10}")
+    for case, result in results['cases'].items():
+        if 'error' in result:
+            print(f"{case:<26}  {result['error']}")
+            continue
+        print(f"{case:<26}{result['ops']:>5}{result['failures']:>6}{result['mean_ms']:>10.2f}{result['p95_ms']:>10.2f}"
+              f"{result['rpc_round_trips']:>13}{result['rpc_calls']:>7}{result['ipfs_requests']:>6}"
+              f"{result.get('peak_memory_kb', 0):>10.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmarks for the Auraweave agents and faucet")
+    parser.add_argument('--only', help="Comma-separated cases: " + ", ".join(CASES))
+    parser.add_argument('--latency', type=float, default=0.0, help="Seconds added to every JSON-RPC round trip")
+    parser.add_argument('--ipfs-latency', type=float, default=0.0, help="Seconds added to every IPFS request")
+    parser.add_argument('--listings', type=int, default=500, help="Listings on chain for the discover cases")
+    parser.add_argument('--payload-kb', type=int, default=64, help="Size of each dataset in the fetch cases")
+    parser.add_argument('--scale', type=float, default=1.0, help="Multiply every case's operation count")
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--save-baseline', action='store_true', help="Store this run as the baseline")
+    parser.add_argument('--tolerance', type=float, default=0.25, help="Allowed slowdown/growth for timings and memory")
+    parser.add_argument('--faucet-python', default=sys.executable, help="Interpreter with the faucet's requirements")
+    parser.add_argument('--json', help="Also write the results here")
+    parser.add_argument('--verbose', action='store_true', help="Show the agents' own output")
+    parser.add_argument('--worker', help=argparse.SUPPRESS)
+    parser.add_argument('--params', help=argparse.SUPPRESS)
+    parser.add_argument('--result', help=argparse.SUPPRESS)
+    parser.add_argument('--trace-memory', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        return run_worker(args.worker, args.params, args.result, args.trace_memory)
+
+    cases = [case.strip() for case in args.only.split(',')] if args.only else list(CASES)
+    unknown = [case for case in cases if case not in CASES]
+    if unknown:
+        parser.error(f"unknown case(s): {', '.join(unknown)}")
+    settings = {
+        'latency': args.latency, 'ipfs_latency': args.ipfs_latency, 'listings': args.listings,
+        'payload_kb': args.payload_kb, 'scale': args.scale,
+    }
+    results = {
+        'settings': settings,
+        'environment': {'python': platform.python_version(), 'platform': platform.platform()},
+        'cases': {},
+    }
+    for case in cases:
+        options = dict(settings, ops=max(1, int(CASES[case] * args.scale)),
+                       faucet_python=args.faucet_python, verbose=args.verbose)
+        print(f"Running {case} ({options['ops']} ops)...")
+        result = run_case(case, options, trace_memory=False)
+        if 'error' not in result:
+            memory = run_case(case, options, trace_memory=True)
+            result['peak_memory_kb'] = memory.get('peak_memory_kb')
+        results['cases'][case] = result
+    print_results(results)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nBaseline saved to {args.baseline}")
+        return
+    if not os.path.exists(args.baseline):
+        print(f"\nNo baseline at {args.baseline}; run with --save-baseline to create one.")
+        return
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if baseline.get('settings') != settings:
+        print(f"\nNote: baseline settings {baseline.get('settings')} differ from this run; "
+              "timings are only compared when the latency matches.")
+    rows = compare(results, baseline, args.tolerance)
+    print(f"\n{'case':<26}{'metric':<18}{'baseline':>12}{'current':>12}")
+    for case, metric, previous, current, regressed in rows:
+        print(f"{case:<26}{metric:<18}{previous:>12}{current:>12}{'  REGRESSION' if regressed else ''}")
+    regressions = [row for row in rows if row[4]]
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) against {args.baseline}.")
+        sys.exit(1)
+    print("\nNo regressions.")
+
+
+if __name__ == "__main__":
+    main()
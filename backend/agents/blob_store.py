@@ -0,0 +1,125 @@
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+# Eviction frees space down to this share of max_bytes, so the directory scan runs once per batch of evictions.
+EVICT_LOW_WATER = 0.9
+
+
+class BlobStore:
+    """Size-bounded, LRU-evicted on-disk store of immutable IPFS content keyed by CID.
+
+    A small in-memory tier in front of the disk keeps hot items (listing
+    metadata) from touching the filesystem at all. A file's mtime is its
+    last-access time, which is what eviction orders by. Once the store
+    goes over `max_bytes`, the least recently used files are removed until
+    it is down to `low_water` of it.
+    """
+
+    def __init__(self, root, max_bytes=1024 * 1024 * 1024, memory_max_bytes=16 * 1024 * 1024,
+                 memory_item_max_bytes=256 * 1024, low_water=EVICT_LOW_WATER):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.low_water = low_water
+        self.memory_max_bytes = memory_max_bytes
+        self.memory_item_max_bytes = memory_item_max_bytes
+        self._memory = OrderedDict()
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+        self._disk_bytes = sum(size for _, size, _ in self._scan())
+
+    def path_for(self, cid):
+        if not cid or os.sep in cid or cid.startswith('.'):
+            raise ValueError(f"Invalid CID for blob store: {cid!r}")
+        return os.path.join(self.root, cid[-2:], cid)
+
+    def _scan(self):
+        for shard in os.listdir(self.root):
+            shard_path = os.path.join(self.root, shard)
+            if not os.path.isdir(shard_path):
+                continue
+            for name in os.listdir(shard_path):
+                if name.startswith('.'):
+                    continue
+                path = os.path.join(shard_path, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                yield path, stat.st_size, stat.st_mtime
+
+    def _remember(self, cid, data):
+        if len(data) > self.memory_item_max_bytes:
+            return
+        if cid in self._memory:
+            self._memory.move_to_end(cid)
+            return
+        self._memory[cid] = data
+        self._memory_bytes += len(data)
+        while self._memory_bytes > self.memory_max_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evicted)
+
+    def get(self, cid):
+        with self._lock:
+            data = self._memory.get(cid)
+            if data is not None:
+                self._memory.move_to_end(cid)
+                return data
+        path = self.path_for(cid)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        with self._lock:
+            self._remember(cid, data)
+        return data
+
+    def __contains__(self, cid):
+        return cid in self._memory or os.path.exists(self.path_for(cid))
+
+    def put(self, cid, data):
+        path = self.path_for(cid)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        existed = os.path.exists(path)
+        # Write to a temp file in the same directory and rename, so readers
+        # (including other agent processes) never see a partial blob.
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+        with self._lock:
+            self._remember(cid, data)
+            if not existed:
+                self._disk_bytes += len(data)
+        if self._disk_bytes > self.max_bytes:
+            self.evict()
+
+    def evict(self, target_bytes=None):
+        target = int(self.max_bytes * self.low_water) if target_bytes is None else target_bytes
+        entries = sorted(self._scan(), key=lambda entry: entry[2])
+        total = sum(size for _, size, _ in entries)
+        for path, size, _ in entries:
+            if total <= target:
+                break
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            cid = os.path.basename(path)
+            with self._lock:
+                data = self._memory.pop(cid, None)
+                if data is not None:
+                    self._memory_bytes -= len(data)
+        with self._lock:
+            self._disk_bytes = total
@@ -0,0 +1,182 @@
+import time
+import threading
+from rpc_batch import RpcBatch
+
+DEFAULT_PRIORITY_FEE_WEI = 2 * 10**9
+FEE_BUMP_NUMERATOR = 1125  # +12.5%, above the 10% geth/erigon require for a replacement
+FEE_BUMP_DENOMINATOR = 1000
+BASE_FEE = 'base_fee'
+PRIORITY_FEE = 'priority_fee'
+GAS_PRICE = 'gas_price'
+FEE_KEYS = {BASE_FEE: BASE_FEE, PRIORITY_FEE: PRIORITY_FEE, GAS_PRICE: GAS_PRICE}
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def balance_of(token_contract, owner):
+    return ('balance', token_contract, owner)
+
+
+def allowance_of(token_contract, owner, spender):
+    return ('allowance', token_contract, owner, spender)
+
+
+def _cache_key(key):
+    # Contracts are not hashable by address; key cached values on addresses only.
+    if isinstance(key, tuple):
+        return (key[0], key[1].address.lower()) + tuple(part.lower() for part in key[2:])
+    return key
+
+
+def compute_fee_params(base_fee, priority_fee, gas_price, default_priority_fee=DEFAULT_PRIORITY_FEE_WEI):
+    """The one place EIP-1559 fees are derived: 2x base fee headroom plus the priority fee."""
+    if base_fee is None:
+        return {'gasPrice': int(gas_price)}
+    priority = int(priority_fee) if priority_fee else default_priority_fee
+    return {'maxPriorityFeePerGas': priority, 'maxFeePerGas': int(base_fee) * 2 + priority}
+
+
+def bump_fees(transaction, current=None):
+    """A copy of `transaction` with fees high enough to replace it in the pool.
+
+    `current` (fee params, as from compute_fee_params) sets a floor, so a
+    transaction stuck behind a fee rise is priced at least at today's fees.
+    """
+    current = current or {}
+
+    def bump(value):
+        return value * FEE_BUMP_NUMERATOR // FEE_BUMP_DENOMINATOR + 1
+
+    bumped = dict(transaction)
+    if 'maxFeePerGas' in bumped:
+        bumped['maxPriorityFeePerGas'] = max(
+            bump(bumped['maxPriorityFeePerGas']), current.get('maxPriorityFeePerGas', 0))
+        bumped['maxFeePerGas'] = max(
+            bump(bumped['maxFeePerGas']), current.get('maxFeePerGas', 0), bumped['maxPriorityFeePerGas'])
+    else:
+        bumped['gasPrice'] = max(bump(bumped['gasPrice']), current.get('gasPrice', 0))
+    return bumped
+
+
+class ChainStateCache:
+    """Block-scoped cache for fees, token balances and allowances.
+
+    Values are kept until a new block is seen. The head is re-checked at most
+    once per `block_poll_interval`, and always in the same batch that fetches
+    the values being asked for, so a cache miss costs one round-trip.
+    """
+
+    def __init__(self, w3, block_poll_interval=1.0, default_priority_fee=DEFAULT_PRIORITY_FEE_WEI):
+        self.w3 = w3
+        self.block_poll_interval = block_poll_interval
+        self.default_priority_fee = default_priority_fee
+        self.block_number = None
+        self._checked_at = 0.0
+        self._values = {}
+        self._chain_id = None
+        self._lock = threading.RLock()
+
+    def _add_read(self, batch, key):
+        if key == BASE_FEE:
+            return batch.get_block('latest')
+        if key == PRIORITY_FEE:
+            return batch.max_priority_fee()
+        if key == GAS_PRICE:
+            return batch.gas_price()
+        if key[0] == 'balance':
+            _, token, owner = key
+            return batch.call(token.functions.balanceOf(owner))
+        if key[0] == 'allowance':
+            _, token, owner, spender = key
+            return batch.call(token.functions.allowance(owner, spender))
+        raise ValueError(f"Unknown chain state key: {key!r}")
+
+    def read(self, keys, extra=None):
+        """`keys` maps result names to state keys; `extra` maps names to uncached
+        `lambda batch: batch.<read>(...)` reads that ride along in the same request."""
+        extra = extra or {}
+        with self._lock:
+            poll_due = (
+                time.monotonic() - self._checked_at >= self.block_poll_interval
+                or (BASE_FEE in keys.values() and BASE_FEE not in self._values)
+            )
+            wanted = {name: key for name, key in keys.items() if poll_due or _cache_key(key) not in self._values}
+            if not wanted and not extra:
+                return {name: self._values[_cache_key(key)] for name, key in keys.items()}
+
+            batch = RpcBatch(self.w3)
+            # The base fee comes with the head block, which is also how a new block is noticed.
+            head_read = batch.get_block('latest') if poll_due else None
+            reads = {name: self._add_read(batch, key) for name, key in wanted.items() if key != BASE_FEE}
+            extra_reads = {name: read(batch) for name, read in extra.items()}
+            batch.execute()
+
+            if head_read is not None:
+                head = head_read.get()
+                self._observe_block(head['number'])
+                self._values[BASE_FEE] = head.get('baseFeePerGas')
+                self._checked_at = time.monotonic()
+            for name, item in reads.items():
+                key = wanted[name]
+                try:
+                    self._values[_cache_key(key)] = item.get()
+                except Exception:
+                    if key != PRIORITY_FEE:
+                        raise
+                    # Not every node implements eth_maxPriorityFeePerGas.
+                    self._values[PRIORITY_FEE] = None
+            result = {name: self._values[_cache_key(key)] for name, key in keys.items()}
+        result.update({name: item.get() for name, item in extra_reads.items()})
+        return result
+
+    def _observe_block(self, block_number):
+        if block_number != self.block_number:
+            self._values.clear()
+            self.block_number = block_number
+
+    def observe_block(self, block_number):
+        """Lets anything that already follows new heads (e.g. a receipt poller) invalidate the cache for free."""
+        with self._lock:
+            self._observe_block(block_number)
+            self._checked_at = time.monotonic()
+
+    def invalidate(self, owner=None):
+        """Drops cached values after our own transaction changed them, before a new block is seen."""
+        with self._lock:
+            if owner is None:
+                self._values.clear()
+                return
+            owner = owner.lower()
+            for key in [key for key in self._values if isinstance(key, tuple) and key[2] == owner]:
+                del self._values[key]
+
+    def fees(self, extra=None):
+        return self.read(FEE_KEYS, extra=extra)
+
+    def fee_params(self, state=None):
+        state = state if state is not None else self.fees()
+        return compute_fee_params(
+            state[BASE_FEE], state[PRIORITY_FEE], state[GAS_PRICE], self.default_priority_fee
+        )
+
+    def token_balance(self, token_contract, owner):
+        return self.read({'balance': balance_of(token_contract, owner)})['balance']
+
+    def allowance(self, token_contract, owner, spender):
+        return self.read({'allowance': allowance_of(token_contract, owner, spender)})['allowance']
+
+    def chain_id(self):
+        # Fixed for the life of the connection; saves build_transaction an eth_chainId per tx.
+        if self._chain_id is None:
+            self._chain_id = self.w3.eth.chain_id
+        return self._chain_id
+
+
+def get_chain_state(w3, **kwargs):
+    with _caches_lock:
+        cache = _caches.get(id(w3))
+        if cache is None or cache.w3 is not w3:
+            cache = ChainStateCache(w3, **kwargs)
+            _caches[id(w3)] = cache
+        return cache
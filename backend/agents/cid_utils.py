@@ -0,0 +1,149 @@
+import base64
+import hashlib
+
+BASE58_ALPHABET = "123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz"
+
+CODEC_RAW = 0x55
+CODEC_DAG_PB = 0x70
+MULTIHASH_SHA2_256 = 0x12
+
+# Content up to this size is stored by `ipfs add` (default chunker) as a single block.
+DEFAULT_CHUNK_SIZE = 262144
+
+
+class InvalidCid(ValueError):
+    pass
+
+
+def base58_decode(text):
+    number = 0
+    for char in text:
+        index = BASE58_ALPHABET.find(char)
+        if index < 0:
+            raise InvalidCid(f"Invalid base58 character {char!r}")
+        number = number * 58 + index
+    decoded = number.to_bytes((number.bit_length() + 7) // 8, 'big') if number else b''
+    leading_zeros = len(text) - len(text.lstrip('1'))
+    return b'\x00' * leading_zeros + decoded
+
+
+def read_varint(data, offset=0):
+    value, shift = 0, 0
+    while True:
+        if offset >= len(data):
+            raise InvalidCid("Truncated varint")
+        byte = data[offset]
+        value |= (byte & 0x7f) << shift
+        offset += 1
+        if not byte & 0x80:
+            return value, offset
+        shift += 7
+
+
+def encode_varint(value):
+    out = bytearray()
+    while True:
+        byte = value & 0x7f
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+
+def parse_cid(cid):
+    """Returns (version, codec, multihash_code, digest)."""
+    if cid.startswith('Qm') and len(cid) == 46:
+        multihash = base58_decode(cid)
+        version, codec = 0, CODEC_DAG_PB
+    else:
+        prefix, body = cid[:1], cid[1:]
+        if prefix == 'b':
+            padded = body.upper() + '=' * (-len(body) % 8)
+            try:
+                raw = base64.b32decode(padded)
+            except Exception as e:
+                raise InvalidCid(f"Invalid base32 CID {cid}: {e}")
+        elif prefix == 'z':
+            raw = base58_decode(body)
+        else:
+            raise InvalidCid(f"Unsupported multibase prefix in CID {cid}")
+        version, offset = read_varint(raw)
+        codec, offset = read_varint(raw, offset)
+        multihash = raw[offset:]
+        if version != 1:
+            raise InvalidCid(f"Unsupported CID version {version}")
+    code, offset = read_varint(multihash)
+    length, offset = read_varint(multihash, offset)
+    digest = multihash[offset:offset + length]
+    if len(digest) != length:
+        raise InvalidCid(f"Truncated multihash in CID {cid}")
+    return version, codec, code, digest
+
+
+def unixfs_file_block(content):
+    # dag-pb PBNode{Data: UnixFS{Type: File, Data: content, filesize}} with no links.
+    unixfs = b'\x08\x02'
+    if content:
+        unixfs += b'\x12' + encode_varint(len(content)) + content
+    unixfs += b'\x18' + encode_varint(len(content))
+    return b'\x0a' + encode_varint(len(unixfs)) + unixfs
+
+
+def verify_cid(cid, content):
+    """True if `content` hashes to `cid`, False on a mismatch, None when it cannot
+    be checked locally (chunked DAGs, hash functions other than sha2-256).
+
+    Content that fits in one block is assumed to have been added with the
+    default chunker, so a dag-pb CID that does not match its single file block
+    is a mismatch.
+    """
+    try:
+        _, codec, code, digest = parse_cid(cid)
+    except InvalidCid:
+        return None
+    if code != MULTIHASH_SHA2_256:
+        return None
+    if codec == CODEC_RAW:
+        return hashlib.sha256(content).digest() == digest
+    if codec == CODEC_DAG_PB and len(content) <= DEFAULT_CHUNK_SIZE:
+        return hashlib.sha256(unixfs_file_block(content)).digest() == digest
+    return None
+
+
+class StreamVerifier:
+    """Incremental `verify_cid` for content that arrives in chunks.
+
+    Raw-codec CIDs are hashed as the bytes go by. Single-block dag-pb files
+    are buffered up to DEFAULT_CHUNK_SIZE, so memory stays bounded. Anything
+    bigger can't be checked without the DAG, and `result()` returns None for it.
+    """
+
+    def __init__(self, cid):
+        self.cid = cid
+        try:
+            _, self.codec, code, self.digest = parse_cid(cid)
+        except InvalidCid:
+            self.codec, code, self.digest = None, None, None
+        self.checkable = code == MULTIHASH_SHA2_256 and self.codec in (CODEC_RAW, CODEC_DAG_PB)
+        self.size = 0
+        self._hash = hashlib.sha256() if self.checkable and self.codec == CODEC_RAW else None
+        self._buffer = bytearray() if self.checkable and self.codec == CODEC_DAG_PB else None
+
+    def update(self, chunk):
+        self.size += len(chunk)
+        if self._hash is not None:
+            self._hash.update(chunk)
+        elif self._buffer is not None:
+            if self.size > DEFAULT_CHUNK_SIZE:
+                self._buffer = None
+            else:
+                self._buffer += chunk
+
+    def result(self):
+        if self._hash is not None:
+            return self._hash.digest() == self.digest
+        if self._buffer is not None:
+            return verify_cid(self.cid, bytes(self._buffer))
+        return None
@@ -0,0 +1,63 @@
+import threading
+from functools import wraps
+from web3 import Web3
+from metrics import instrument_provider
+from rpc_pool import PooledHTTPProvider
+
+_lock = threading.Lock()
+_web3_by_url = {}
+_contracts = {}
+_connected = set()
+
+
+def memoized(factory):
+    """Builds the value of a zero-argument factory on the first call, once, whichever thread gets there first.
+
+    Whatever the factory returns sticks, None included; `.reset()` forgets it.
+    """
+    lock = threading.Lock()
+    state = {}
+
+    @wraps(factory)
+    def get():
+        if 'value' not in state:
+            with lock:
+                if 'value' not in state:
+                    state['value'] = factory()
+        return state['value']
+
+    get.reset = state.clear
+    return get
+
+
+def get_web3(rpc_url, hedge_reads=True):
+    """One instrumented Web3 per RPC URL, or per list of URLs, which share a PooledHTTPProvider. Creating it sends no request."""
+    urls = tuple(rpc_url) if isinstance(rpc_url, (list, tuple)) else (rpc_url,)
+    with _lock:
+        w3 = _web3_by_url.get(urls)
+        if w3 is None:
+            if len(urls) > 1:
+                provider = PooledHTTPProvider(urls, hedge_reads=hedge_reads)
+            else:
+                provider = Web3.HTTPProvider(urls[0])
+            w3 = _web3_by_url[urls] = Web3(instrument_provider(provider))
+        return w3
+
+
+def require_connection(w3):
+    """Raises ConnectionError unless the node answers. Checked once per w3, when something first needs the chain."""
+    if id(w3) in _connected:
+        return
+    if not w3.is_connected():
+        raise ConnectionError(f"Failed to connect to Ethereum node at {getattr(w3.provider, 'endpoint_uri', w3.provider)}")
+    _connected.add(id(w3))
+
+
+def get_contract(w3, address, abi):
+    """Contract objects per (w3, address): the ABI is parsed once per process and network."""
+    key = (id(w3), address.lower())
+    with _lock:
+        contract = _contracts.get(key)
+        if contract is None:
+            contract = _contracts[key] = w3.eth.contract(address=address, abi=abi)
+        return contract
@@ -0,0 +1,152 @@
+import zipfile
+
+# numpy (npz) and pyarrow (arrow) are optional: they are imported when a
+# columnar dataset is written or read, so JSON-only agents run without them.
+FORMATS = ('npz', 'arrow')
+_NPZ_MAGIC = b'PK\x03\x04'
+_ARROW_MAGIC = b'ARROW1'
+_ZIP_LOCAL_HEADER_SIZE = 30
+
+# Column dtypes of the producer's sensor readings.
+SENSOR_SCHEMA = {
+    'timestamp': 'float64',
+    'sensor_id': 'str',
+    'temperature_celsius': 'float32',
+    'humidity_percent': 'float32',
+    'co2_ppm': 'int32',
+}
+
+
+def _numpy():
+    try:
+        import numpy
+    except ImportError as e:
+        raise ImportError("Columnar datasets need numpy: pip install numpy") from e
+    return numpy
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.ipc
+    except ImportError as e:
+        raise ImportError("Arrow datasets need pyarrow: pip install pyarrow") from e
+    return pyarrow
+
+
+def records_to_columns(records, schema=SENSOR_SCHEMA):
+    """Typed numpy arrays, one per schema column, from an iterable of record dicts."""
+    np = _numpy()
+    values = {name: [] for name in schema}
+    for record in records:
+        for name, column in values.items():
+            column.append(record[name])
+    return {name: np.asarray(values[name], dtype=dtype) for name, dtype in schema.items()}
+
+
+def describe_columns(columns, data_format):
+    """What goes in the dataset's metadata so a consumer knows how to read it."""
+    return {
+        'format': data_format,
+        'rows': len(next(iter(columns.values()))) if columns else 0,
+        'columns': {name: str(array.dtype) for name, array in columns.items()},
+    }
+
+
+def write_columns(columns, path, data_format='npz'):
+    """Writes equal-length arrays as an uncompressed .npz or a single-batch Arrow IPC file."""
+    if data_format == 'npz':
+        np = _numpy()
+        # savez (not savez_compressed) stores members as-is, which is what lets load_columns map them.
+        with open(path, 'wb') as f:
+            np.savez(f, **columns)
+    elif data_format == 'arrow':
+        pa = _pyarrow()
+        table = pa.table({name: pa.array(array) for name, array in columns.items()})
+        with pa.OSFile(path, 'wb') as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table, max_chunksize=max(table.num_rows, 1))
+    else:
+        raise ValueError(f"Unknown columnar format: {data_format!r} (expected one of {FORMATS})")
+    return path
+
+
+def sniff_format(path):
+    """'npz', 'arrow' or None, from the first bytes of the file."""
+    with open(path, 'rb') as f:
+        head = f.read(len(_ARROW_MAGIC))
+    if head.startswith(_NPZ_MAGIC):
+        return 'npz'
+    if head.startswith(_ARROW_MAGIC):
+        return 'arrow'
+    return None
+
+
+def _npz_member_offset(f, info):
+    f.seek(info.header_offset)
+    header = f.read(_ZIP_LOCAL_HEADER_SIZE)
+    if header[:4] != _NPZ_MAGIC:
+        raise ValueError(f"Bad zip local header for {info.filename}")
+    name_length = int.from_bytes(header[26:28], 'little')
+    extra_length = int.from_bytes(header[28:30], 'little')
+    return info.header_offset + _ZIP_LOCAL_HEADER_SIZE + name_length + extra_length
+
+
+def _map_npz(path):
+    np = _numpy()
+    columns = {}
+    with zipfile.ZipFile(path) as archive, open(path, 'rb') as f:
+        for info in archive.infolist():
+            name = info.filename[:-4] if info.filename.endswith('.npy') else info.filename
+            if info.compress_type != zipfile.ZIP_STORED:
+                # Compressed members have no bytes to map; these are decompressed into memory.
+                with archive.open(info) as member:
+                    columns[name] = np.lib.format.read_array(member)
+                continue
+            f.seek(_npz_member_offset(f, info))
+            version = np.lib.format.read_magic(f)
+            if version == (1, 0):
+                shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+            else:
+                shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+            if dtype.hasobject:
+                raise ValueError(f"Column {name} holds Python objects and cannot be memory-mapped")
+            columns[name] = np.memmap(
+                path, dtype=dtype, mode='r', offset=f.tell(), shape=shape,
+                order='F' if fortran_order else 'C',
+            )
+    return columns
+
+
+def _map_arrow(path):
+    pa = _pyarrow()
+    # The table's buffers point into the mapping, which stays open as long as they are referenced.
+    table = pa.ipc.open_file(pa.memory_map(path, 'r')).read_all()
+    return {name: table.column(name).to_numpy() for name in table.column_names}
+
+
+def load_columns(path, data_format=None):
+    """Memory-maps a columnar dataset and returns {column: numpy array}.
+
+    Numeric columns are views of the file: nothing is read until it is
+    used, and nothing is parsed. Arrow string columns are the exception and
+    are converted to object arrays.
+    """
+    data_format = data_format or sniff_format(path)
+    if data_format == 'npz':
+        return _map_npz(path)
+    if data_format == 'arrow':
+        return _map_arrow(path)
+    raise ValueError(f"{path} is not a columnar dataset (format {data_format!r})")
+
+
+def iter_rows(columns, limit=None):
+    """Record dicts rebuilt from columns, for display; use the arrays themselves for real work."""
+    names = list(columns)
+    rows = len(columns[names[0]]) if names else 0
+    for index in range(rows if limit is None else min(rows, limit)):
+        row = {}
+        for name in names:
+            value = columns[name][index]
+            row[name] = value.item() if hasattr(value, 'item') else value
+        yield row
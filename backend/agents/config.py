@@ -1,70 +1,199 @@
-
 import os
 import json
+import threading
+from functools import lru_cache
 from dotenv import load_dotenv
 
+# Importing this module does nothing by itself: every setting below is read
+# from the environment the first time it is asked for (`from config import X`
+# counts) and kept from then on. Deployment files are parsed once per path.
+
+_lock = threading.Lock()
+_env_loaded = False
+
+
 def load_env_vars():
-    dotenv_path_root = os.path.join(os.path.dirname(__file__), '..', '.env')
-    if os.path.exists(dotenv_path_root):
-        load_dotenv(dotenv_path=dotenv_path_root)
-load_env_vars()
-
-ACTIVE_NETWORK = os.getenv("AURAWEAVE_NETWORK", "localhost").lower() 
-if ACTIVE_NETWORK == "localhost":
-    RPC_URL = "http://127.0.0.1:8545" 
-elif ACTIVE_NETWORK == "sepolia": 
-    RPC_URL = os.getenv("SEPOLIA_RPC_URL")
-    if not RPC_URL:
-        raise ValueError("SEPOLIA_RPC_URL not set in .env for 'sepolia' network")
-else:
-    raise ValueError(f"Unsupported AURAWEAVE_NETWORK: {ACTIVE_NETWORK}")
-
-PRODUCER_PRIVATE_KEY = os.getenv("PRODUCER_PRIVATE_KEY")
-CONSUMER_PRIVATE_KEY = os.getenv("CONSUMER_PRIVATE_KEY")
-
-if not PRODUCER_PRIVATE_KEY or not CONSUMER_PRIVATE_KEY:
-    print("WARNING: PRODUCER_PRIVATE_KEY or CONSUMER_PRIVATE_KEY not found in .env.")
-    print("Ensure these are set after running 'npx hardhat node' for local testing.")
-
-IPFS_CLIENT_URL = os.getenv("IPFS_HTTP_CLIENT_URL", "/ip4/127.0.0.1/tcp/5001/http")
-IPFS_GATEWAY_URL = os.getenv("IPFS_GATEWAY_URL", "http://127.0.0.1:8080/ipfs/")
-
-CONTRACT_INFO_FILE = os.path.join(os.path.dirname(__file__), '..', 'deployments', f'{ACTIVE_NETWORK}.json')
-
-def get_deployment_details():
-    if not os.path.exists(CONTRACT_INFO_FILE):
-        raise FileNotFoundError(f"Deployment info file not found: {CONTRACT_INFO_FILE} for network '{ACTIVE_NETWORK}'")
-    with open(CONTRACT_INFO_FILE, 'r') as f:
+    global _env_loaded
+    with _lock:
+        if _env_loaded:
+            return
+        dotenv_path_root = os.path.join(os.path.dirname(__file__), '..', '.env')
+        if os.path.exists(dotenv_path_root):
+            load_dotenv(dotenv_path=dotenv_path_root)
+        _env_loaded = True
+
+
+def _env(name, default=None):
+    load_env_vars()
+    return os.getenv(name, default)
+
+
+def _rpc_urls():
+    # Comma-separated URLs make a pool (see rpc_pool); the first one is RPC_URL.
+    network = _setting('ACTIVE_NETWORK')
+    if network == "localhost":
+        value = _env("LOCALHOST_RPC_URL", "http://127.0.0.1:8545")
+    elif network == "sepolia":
+        value = _env("SEPOLIA_RPC_URL")
+        if not value:
+            raise ValueError("SEPOLIA_RPC_URL not set in .env for 'sepolia' network")
+    else:
+        raise ValueError(f"Unsupported AURAWEAVE_NETWORK: {network}")
+    return [url.strip() for url in value.split(',') if url.strip()]
+
+
+def _rpc_ws_url():
+    # Optional: with a WebSocket endpoint the consumer daemon subscribes to new listings instead of polling.
+    network = _setting('ACTIVE_NETWORK')
+    if network == "localhost":
+        return _env("LOCALHOST_WS_URL")
+    if network == "sepolia":
+        return _env("SEPOLIA_WS_URL")
+    return None
+
+
+def _optional_int(name):
+    value = _env(name)
+    return int(value) if value else None
+
+
+def _contract_info_file(network=None):
+    network = network or _setting('ACTIVE_NETWORK')
+    default = os.path.join(os.path.dirname(__file__), '..', 'deployments', f'{network}.json')
+    return _env("AURAWEAVE_DEPLOYMENT_FILE", default)
+
+
+@lru_cache(maxsize=None)
+def _read_deployment(path):
+    with open(path, 'r') as f:
         return json.load(f)
 
-# Load all deployment details
-DEPLOYMENT_DETAILS = None
-DATA_REGISTRY_ADDRESS = None
-DATA_REGISTRY_ABI = None
-MOCK_ERC20_ADDRESS = None
-MOCK_ERC20_ABI = None
 
-try:
-    DEPLOYMENT_DETAILS = get_deployment_details()
-    DATA_REGISTRY_INFO = DEPLOYMENT_DETAILS.get('DataRegistry', {})
-    MOCK_ERC20_INFO = DEPLOYMENT_DETAILS.get('MockERC20', {})
+def get_deployment_details(network=None):
+    """The parsed deployments/<network>.json, read once per file."""
+    path = _contract_info_file(network)
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Deployment info file not found: {path} for network '{network or _setting('ACTIVE_NETWORK')}'")
+    return _read_deployment(os.path.abspath(path))
 
-    DATA_REGISTRY_ADDRESS = DATA_REGISTRY_INFO.get('address')
-    DATA_REGISTRY_ABI = DATA_REGISTRY_INFO.get('abi')
-    MOCK_ERC20_ADDRESS = MOCK_ERC20_INFO.get('address')
-    MOCK_ERC20_ABI = MOCK_ERC20_INFO.get('abi')
 
-    if not all([DATA_REGISTRY_ADDRESS, DATA_REGISTRY_ABI, MOCK_ERC20_ADDRESS, MOCK_ERC20_ABI]):
+@lru_cache(maxsize=None)
+def _deployment_or_none(network):
+    try:
+        details = get_deployment_details(network)
+    except FileNotFoundError as e:
+        print(f"Warning: {e}")
+        print(f"Contract details not loaded. Ensure contracts are deployed to the '{network}' network.")
+        return None
+    if not all(details.get(name, {}).get(key) for name in ('DataRegistry', 'MockERC20') for key in ('address', 'abi')):
         print("Warning: Some contract details might be missing from deployment file.")
+    return details
+
+
+def _contract_field(contract_name, key):
+    details = _deployment_or_none(_setting('ACTIVE_NETWORK'))
+    return (details or {}).get(contract_name, {}).get(key)
+
+
+def _data_registry_start_block():
+    # First block worth scanning for DataRegistry events; older deployment files don't record it.
+    return int(_env("DATA_REGISTRY_START_BLOCK", _contract_field('DataRegistry', 'blockNumber') or 0))
+
+
+def _agent_cache_dir():
+    return _env("AURAWEAVE_CACHE_DIR", os.path.join(os.path.dirname(__file__), '.cache'))
+
+
+_SETTINGS = {
+    'ACTIVE_NETWORK': lambda: _env("AURAWEAVE_NETWORK", "localhost").lower(),
+    'RPC_URLS': _rpc_urls,
+    'RPC_URL': lambda: _setting('RPC_URLS')[0],
+    # With several RPC_URLS, reads the best endpoint is slow to answer are also sent to the next best.
+    'RPC_HEDGE_READS': lambda: _env("RPC_HEDGE_READS", "1") not in ("0", "false", "no"),
+    'RPC_WS_URL': _rpc_ws_url,
+    'PRODUCER_PRIVATE_KEY': lambda: _env("PRODUCER_PRIVATE_KEY"),
+    'CONSUMER_PRIVATE_KEY': lambda: _env("CONSUMER_PRIVATE_KEY"),
+
+    'IPFS_CLIENT_URL': lambda: _env("IPFS_HTTP_CLIENT_URL", "/ip4/127.0.0.1/tcp/5001/http"),
+    'IPFS_GATEWAY_URL': lambda: _env("IPFS_GATEWAY_URL", "http://127.0.0.1:8080/ipfs/"),
+    # Extra gateways raced against the local node when fetching; comma-separated.
+    'IPFS_GATEWAY_URLS': lambda: [
+        url.strip() for url in _env("IPFS_GATEWAY_URLS", _setting('IPFS_GATEWAY_URL')).split(',') if url.strip()
+    ],
+    'IPFS_HEDGE_DELAY_SECONDS': lambda: float(_env("IPFS_HEDGE_DELAY_SECONDS", "0.5")),
+    'IPFS_HEDGE_MAX_PARALLEL': lambda: int(_env("IPFS_HEDGE_MAX_PARALLEL", "3")),
+    'IPFS_FETCH_TIMEOUT_SECONDS': lambda: float(_env("IPFS_FETCH_TIMEOUT_SECONDS", "60")),
+
+    'AGENT_CACHE_DIR': _agent_cache_dir,
+    'LISTING_INDEX_DB': lambda: _env(
+        "LISTING_INDEX_DB", os.path.join(_agent_cache_dir(), f"listings_{_setting('ACTIVE_NETWORK')}.sqlite3")),
+    # Producer-side record of uploaded content and listings, so re-runs skip what is already live.
+    'PUBLISH_MANIFEST_DB': lambda: _env(
+        "PUBLISH_MANIFEST_DB", os.path.join(_agent_cache_dir(), f"published_{_setting('ACTIVE_NETWORK')}.sqlite3")),
+    # Consumer-side record of listings already bought, so they are never bought twice.
+    'ENTITLEMENTS_DB': lambda: _env(
+        "ENTITLEMENTS_DB", os.path.join(_agent_cache_dir(), f"entitlements_{_setting('ACTIVE_NETWORK')}.sqlite3")),
+    'LOG_CHUNK_BLOCKS': lambda: int(_env("LOG_CHUNK_BLOCKS", "2000")),
+    'REORG_CONFIRMATIONS': lambda: int(_env("REORG_CONFIRMATIONS", "6")),
+    'IPFS_CACHE_DIR': lambda: _env("IPFS_CACHE_DIR", os.path.join(_agent_cache_dir(), 'ipfs')),
+    'IPFS_CACHE_MAX_MB': lambda: int(_env("IPFS_CACHE_MAX_MB", "1024")),
+    'IPFS_MEMORY_CACHE_MB': lambda: int(_env("IPFS_MEMORY_CACHE_MB", "16")),
+    'IPFS_ADD_CHUNKER': lambda: _env("IPFS_ADD_CHUNKER", "size-262144"),
+    'IPFS_ADD_CID_VERSION': lambda: _optional_int("IPFS_ADD_CID_VERSION"),
+    # MUSDC the consumer approves at once; 0 keeps the exact approve-per-purchase behaviour.
+    'PURCHASE_ALLOWANCE_BUDGET': lambda: float(_env("PURCHASE_ALLOWANCE_BUDGET", "0")),
+    'PURCHASE_ALLOWANCE_LOW_WATER': lambda: float(_env("PURCHASE_ALLOWANCE_LOW_WATER", "0")),
+    'DOWNLOAD_DIR': lambda: _env("AURAWEAVE_DOWNLOAD_DIR", os.path.join(_agent_cache_dir(), 'downloads')),
+    # Requests async agents keep in flight at once, per resource.
+    'ASYNC_RPC_CONCURRENCY': lambda: int(_env("ASYNC_RPC_CONCURRENCY", "64")),
+    'ASYNC_IPFS_CONCURRENCY': lambda: int(_env("ASYNC_IPFS_CONCURRENCY", "32")),
+    # Consumer daemon: seconds between head checks when polling, listings it holds before the watcher waits,
+    # and listings bought per approve + purchase round.
+    'DAEMON_POLL_SECONDS': lambda: float(_env("DAEMON_POLL_SECONDS", "1.0")),
+    'DAEMON_QUEUE_SIZE': lambda: int(_env("DAEMON_QUEUE_SIZE", "100")),
+    'DAEMON_BATCH_SIZE': lambda: int(_env("DAEMON_BATCH_SIZE", "20")),
+    # When set, agents write their RPC/IPFS timing metrics here as JSON on exit.
+    'METRICS_SNAPSHOT_FILE': lambda: _env("AURAWEAVE_METRICS_FILE"),
+    # When set, agents append per-phase transaction and IPFS spans here as JSONL, for this share of traces.
+    'TRACE_FILE': lambda: _env("AURAWEAVE_TRACE_FILE"),
+    'TRACE_SAMPLE_RATE': lambda: float(_env("AURAWEAVE_TRACE_SAMPLE_RATE", "1.0")),
+    'LOG_LEVEL': lambda: _env("AURAWEAVE_LOG_LEVEL", "WARNING"),
+
+    'CONTRACT_INFO_FILE': _contract_info_file,
+    'DEPLOYMENT_DETAILS': lambda: _deployment_or_none(_setting('ACTIVE_NETWORK')),
+    'DATA_REGISTRY_ADDRESS': lambda: _contract_field('DataRegistry', 'address'),
+    'DATA_REGISTRY_ABI': lambda: _contract_field('DataRegistry', 'abi'),
+    'MOCK_ERC20_ADDRESS': lambda: _contract_field('MockERC20', 'address'),
+    'MOCK_ERC20_ABI': lambda: _contract_field('MockERC20', 'abi'),
+    'DATA_REGISTRY_START_BLOCK': _data_registry_start_block,
+}
+
+
+def _setting(name):
+    if name in globals():
+        return globals()[name]
+    factory = _SETTINGS.get(name)
+    if factory is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = factory()
+    globals()[name] = value
+    return value
+
+
+def __getattr__(name):
+    return _setting(name)
+
 
-except FileNotFoundError as e:
-    print(f"Warning: {e}")
-    print("Contract details not loaded. Ensure contracts are deployed to the '{ACTIVE_NETWORK}' network.")
-except KeyError as e:
-    print(f"Warning: Key {e} not found in deployment file. Structure might be incorrect.")
+def __dir__():
+    return sorted(set(globals()) | set(_SETTINGS))
 
 
-print(f"--- AGENT CONFIG USING NETWORK: {ACTIVE_NETWORK} ---")
-if RPC_URL: print(f"RPC URL: {RPC_URL}")
-if DATA_REGISTRY_ADDRESS: print(f"DataRegistry Address: {DATA_REGISTRY_ADDRESS}")
-if MOCK_ERC20_ADDRESS: print(f"MockERC20 Address: {MOCK_ERC20_ADDRESS}")
\ No newline at end of file
+def print_config_summary():
+    print(f"--- AGENT CONFIG USING NETWORK: {_setting('ACTIVE_NETWORK')} ---")
+    print(f"RPC URL: {_setting('RPC_URL')}")
+    if len(_setting('RPC_URLS')) > 1:
+        print(f"RPC pool: {len(_setting('RPC_URLS'))} endpoints, hedged reads {'on' if _setting('RPC_HEDGE_READS') else 'off'}")
+    for label, name in (("DataRegistry Address", 'DATA_REGISTRY_ADDRESS'), ("MockERC20 Address", 'MOCK_ERC20_ADDRESS')):
+        value = _setting(name)
+        if value:
+            print(f"{label}: {value}")
@@ -1,60 +1,182 @@
+import os
 import time
 import json
+import queue
+import shutil
+import logging
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from web3 import Web3
-import ipfshttpclient
-import requests
-from config import (
-    RPC_URL, CONSUMER_PRIVATE_KEY, IPFS_CLIENT_URL, IPFS_GATEWAY_URL,
-    DATA_REGISTRY_ADDRESS, DATA_REGISTRY_ABI,
-    MOCK_ERC20_ADDRESS, MOCK_ERC20_ABI
-)
-
-
-w3 = Web3(Web3.HTTPProvider(RPC_URL))
-if not w3.is_connected():
-    print(f"ERROR: Failed to connect to Ethereum node at {RPC_URL}")
-    exit()
-
-if not CONSUMER_PRIVATE_KEY:
-    print("ERROR: CONSUMER_PRIVATE_KEY not found in environment. Exiting.")
-    exit()
-consumer_account = w3.eth.account.from_key(CONSUMER_PRIVATE_KEY)
-print(f"Consumer Agent Address: {consumer_account.address}")
-try:
-    balance_eth = w3.from_wei(w3.eth.get_balance(consumer_account.address), 'ether')
-    print(f"Consumer Balance (ETH for gas): {balance_eth} ETH")
-except Exception as e:
-    print(f"Could not fetch ETH balance for consumer: {e}")
-
-try:
-    ipfs_client = ipfshttpclient.connect(IPFS_CLIENT_URL)
-    print(f"Connected to IPFS node: {IPFS_CLIENT_URL}")
-except Exception as e:
-    print(f"WARNING: Could not connect to IPFS client: {e}. Will try gateway for downloads.")
-    ipfs_client = None
-
-if not DATA_REGISTRY_ADDRESS or not DATA_REGISTRY_ABI or not MOCK_ERC20_ADDRESS or not MOCK_ERC20_ABI:
-    print("ERROR: Contract details (DataRegistry or MockERC20) not fully loaded from config. Exiting consumer.")
-    exit()
-
-data_registry_contract = w3.eth.contract(address=DATA_REGISTRY_ADDRESS, abi=DATA_REGISTRY_ABI)
-mock_erc20_contract = w3.eth.contract(address=MOCK_ERC20_ADDRESS, abi=MOCK_ERC20_ABI)
+import config
+from clients import get_web3, get_contract, require_connection, memoized
+from blob_store import BlobStore
+from ipfs_fetch import build_fetcher
+from record_stream import iter_records, decode_ipfs_content
+from columnar import FORMATS as COLUMNAR_FORMATS, load_columns, sniff_format, iter_rows
+from listing_index import ListingIndex
+from listing_catalog import ListingCatalog
+from listing_watcher import ListingWatcher
+from entitlements import EntitlementStore
+from chain_state import get_chain_state, balance_of, allowance_of, FEE_KEYS
+from receipt_tracker import TransactionReplaced
+from tx_engine import get_tx_engine, TransactionRejected
+from allowance_budget import AllowanceBudget
+from purchase_policy import PurchasePolicy
+from metrics import get_metrics
+from tracing import get_tracer, configure_logging
+
+
+# Importing this module reads no settings and touches nothing; the getters
+# below build what they need on first use, and start() checks it all.
+logger = logging.getLogger(__name__)
+tracer = get_tracer()
+
+
+@memoized
+def get_w3():
+    return get_web3(config.RPC_URLS, hedge_reads=config.RPC_HEDGE_READS)
+
+
+@memoized
+def get_consumer_account():
+    if not config.CONSUMER_PRIVATE_KEY:
+        raise ValueError("CONSUMER_PRIVATE_KEY not found in environment.")
+    return get_w3().eth.account.from_key(config.CONSUMER_PRIVATE_KEY)
+
+
+def get_data_registry_contract():
+    if not config.DATA_REGISTRY_ADDRESS or not config.DATA_REGISTRY_ABI:
+        raise ValueError("DataRegistry contract details not loaded from config.")
+    return get_contract(get_w3(), config.DATA_REGISTRY_ADDRESS, config.DATA_REGISTRY_ABI)
+
+
+def get_mock_erc20_contract():
+    if not config.MOCK_ERC20_ADDRESS or not config.MOCK_ERC20_ABI:
+        raise ValueError("MockERC20 contract details not loaded from config.")
+    return get_contract(get_w3(), config.MOCK_ERC20_ADDRESS, config.MOCK_ERC20_ABI)
+
+
+def get_chain_cache():
+    return get_chain_state(get_w3())
+
+
+def get_engine():
+    return get_tx_engine(get_w3(), get_consumer_account())
+
+
+def configure_runtime():
+    """Metrics, logging and tracing setup from config; run by the CLI rather than on import."""
+    if config.METRICS_SNAPSHOT_FILE:
+        get_metrics().dump_at_exit(config.METRICS_SNAPSHOT_FILE)
+    configure_logging(config.LOG_LEVEL)
+    if config.TRACE_FILE:
+        tracer.configure(config.TRACE_FILE, config.TRACE_SAMPLE_RATE)
+
+
+@memoized
+def get_ipfs_client():
+    try:
+        import ipfshttpclient
+        client = ipfshttpclient.connect(config.IPFS_CLIENT_URL)
+        print(f"Connected to IPFS node: {config.IPFS_CLIENT_URL}")
+        return client
+    except Exception as e:
+        print(f"WARNING: Could not connect to IPFS client: {e}. Will try gateway for downloads.")
+        return None
+
+
+@memoized
+def get_ipfs_fetcher():
+    return build_fetcher(
+        get_ipfs_client(), config.IPFS_GATEWAY_URLS, hedge_delay=config.IPFS_HEDGE_DELAY_SECONDS,
+        max_parallel=config.IPFS_HEDGE_MAX_PARALLEL, timeout=config.IPFS_FETCH_TIMEOUT_SECONDS,
+    )
+
+
+@memoized
+def get_blob_store():
+    try:
+        return BlobStore(
+            config.IPFS_CACHE_DIR, max_bytes=config.IPFS_CACHE_MAX_MB * 1024 * 1024,
+            memory_max_bytes=config.IPFS_MEMORY_CACHE_MB * 1024 * 1024,
+        )
+    except Exception as e:
+        print(f"WARNING: Could not open IPFS cache at {config.IPFS_CACHE_DIR}: {e}. Every fetch will hit the network.")
+        return None
+
+
+@memoized
+def get_listing_catalog():
+    return ListingCatalog()
+
+
+@memoized
+def get_listing_index():
+    try:
+        return ListingIndex(
+            get_w3(), get_data_registry_contract(), config.LISTING_INDEX_DB,
+            start_block=config.DATA_REGISTRY_START_BLOCK, chunk_size=config.LOG_CHUNK_BLOCKS,
+            confirmations=config.REORG_CONFIRMATIONS,
+        )
+    except Exception as e:
+        print(f"WARNING: Could not open listing index at {config.LISTING_INDEX_DB}: {e}. Falling back to on-chain discovery.")
+        return None
+
+
+@memoized
+def get_entitlements():
+    try:
+        return EntitlementStore(
+            get_w3(), get_data_registry_contract(), config.ENTITLEMENTS_DB, get_consumer_account().address,
+            start_block=config.DATA_REGISTRY_START_BLOCK, chunk_size=config.LOG_CHUNK_BLOCKS,
+            confirmations=config.REORG_CONFIRMATIONS,
+        )
+    except Exception as e:
+        print(f"WARNING: Could not open entitlement store at {config.ENTITLEMENTS_DB}: {e}. Owned listings will not be skipped.")
+        return None
+
 
 def get_mock_token_balance():
     try:
-        balance_wei = mock_erc20_contract.functions.balanceOf(consumer_account.address).call()
-        return w3.from_wei(balance_wei, 'ether') # Display as whole tokens
+        balance_wei = get_chain_cache().token_balance(get_mock_erc20_contract(), get_consumer_account().address)
+        return Web3.from_wei(balance_wei, 'ether') # Display as whole tokens
     except Exception as e:
         print(f"Error getting MockUSDC balance: {e}")
         return 0
 
-print(f"Consumer MockUSDC Balance: {get_mock_token_balance()} MUSDC")
 
+def start():
+    """Checks the settings and the node and shows the account and balances; run by the CLI rather than on import."""
+    configure_runtime()
+    config.print_config_summary()
+    try:
+        get_consumer_account()
+        get_data_registry_contract()
+        get_mock_erc20_contract()
+        require_connection(get_w3())
+    except (ValueError, ConnectionError) as e:
+        print(f"ERROR: {e} Exiting consumer.")
+        exit()
+    print(f"Consumer Agent Address: {get_consumer_account().address}")
+    try:
+        balance_eth = Web3.from_wei(get_w3().eth.get_balance(get_consumer_account().address), 'ether')
+        print(f"Consumer Balance (ETH for gas): {balance_eth} ETH")
+    except Exception as e:
+        print(f"Could not fetch ETH balance for consumer: {e}")
+    print(f"Consumer MockUSDC Balance: {get_mock_token_balance()} MUSDC")
+    sync_allowance_budget()
 
-def discover_listings(limit=5, offset=0):
-    print(f"\nDiscovering listings (limit {limit}, offset {offset})...")
+
+def format_listing(listing):
+    listing['price_musdc'] = Web3.from_wei(listing['price_token_wei'], 'ether')
+    print(f"  Found: ID {listing['id']}, Name: '{listing['name']}', Price: {listing['price_musdc']} MUSDC, DataCID: {listing['dataCID']}, MetaCID: {listing['metadataCID']}")
+    return listing
+
+
+def discover_listings_on_chain(limit=5, offset=0):
     try:
-        listings_data = data_registry_contract.functions.getActiveListingsDetails(limit, offset).call()
+        listings_data = get_data_registry_contract().functions.getActiveListingsDetails(limit, offset).call()
         if not listings_data:
             print("No active listings found.")
             return []
@@ -66,9 +188,7 @@ def discover_listings(limit=5, offset=0):
                 'description': item_tuple[3], 'dataCID': item_tuple[4], 'metadataCID': item_tuple[5],
                 'price_token_wei': item_tuple[6], 'active': item_tuple[7]
             }
-            listing['price_musdc'] = w3.from_wei(listing['price_token_wei'], 'ether')
-            formatted_listings.append(listing)
-            print(f"  Found: ID {listing['id']}, Name: '{listing['name']}', Price: {listing['price_musdc']} MUSDC, DataCID: {listing['dataCID']}, MetaCID: {listing['metadataCID']}")
+            formatted_listings.append(format_listing(listing))
         return formatted_listings
     except Exception as e:
         print(f"Error discovering listings: {e}")
@@ -76,79 +196,133 @@ def discover_listings(limit=5, offset=0):
         return []
 
 
-def approve_token_spending(spender_address, amount_token_wei):
-    if not isinstance(amount_token_wei, int):
-        try:
-            amount_token_wei = int(amount_token_wei)
-        except ValueError:
-            print(f"ERROR: amount_token_wei '{amount_token_wei}' is not a valid integer for approval.")
-            return False
+def sync_listing_index():
+    listing_index = get_listing_index()
+    if not listing_index:
+        return False
+    try:
+        new_events = listing_index.sync()
+        print(f"Listing index synced to block {listing_index.checkpoint} ({new_events} events read, {listing_index.count()} listings).")
+        return True
+    except Exception as e:
+        print(f"Error syncing listing index: {e}")
+        return False
+
 
-    print(f"\nApproving DataRegistry ({spender_address}) to spend {w3.from_wei(amount_token_wei, 'ether')} MUSDC...")
+def sync_entitlements():
+    """Brings the owned-listing store up to the head; returns it (None if unavailable)."""
+    entitlements = get_entitlements()
+    if entitlements is None:
+        return None
     try:
-        nonce = w3.eth.get_transaction_count(consumer_account.address)
-        current_allowance = mock_erc20_contract.functions.allowance(consumer_account.address, spender_address).call()
-        if current_allowance >= amount_token_wei:
-            print("Sufficient allowance already set.")
-            return True
+        new_purchases = entitlements.sync()
+        print(f"Entitlements synced to block {entitlements.checkpoint} ({new_purchases} purchases read, {len(entitlements)} listings owned).")
+    except Exception as e:
+        print(f"Error syncing entitlements: {e}. Using the {len(entitlements)} owned listings already recorded.")
+    return entitlements
+
+
+def record_entitlement(listing, receipt):
+    entitlements = get_entitlements()
+    if entitlements is None:
+        return
+    try:
+        entitlements.record_purchase(listing, receipt['transactionHash'], receipt['blockNumber'])
+    except Exception as e:
+        print(f"WARNING: Could not record the purchase of listing {listing['id']}: {e}")
+
+
+def discover_listings(limit=5, offset=0, refresh=True, **filters):
+    print(f"\nDiscovering listings (limit {limit}, offset {offset})...")
+    if refresh and not sync_listing_index():
+        print("Listing index unavailable. Falling back to getActiveListingsDetails.")
+        return discover_listings_on_chain(limit, offset)
+    listing_index = get_listing_index()
+    if not listing_index:
+        return discover_listings_on_chain(limit, offset)
+
+    listings = listing_index.query(limit=limit, offset=offset, **filters)
+    if not listings:
+        print("No active listings found.")
+        return []
+    return [format_listing(listing) for listing in listings]
 
+
+def search_listings(text=None, limit=5, offset=0, refresh=True, **filters):
+    """discover_listings() answered by the in-memory catalog, which can also match words in names and descriptions."""
+    print(f"\nSearching listings{f' for {text!r}' if text else ''} (limit {limit}, offset {offset})...")
+    catalog = get_listing_catalog()
+    if refresh:
         try:
-            estimated_gas = mock_erc20_contract.functions.approve(
-                spender_address, amount_token_wei
-            ).estimate_gas({'from': consumer_account.address})
-            print(f"Debug: Estimated gas for approve: {estimated_gas}")
+            if sync_listing_index():
+                catalog.sync_from_index(get_listing_index())
+            else:
+                print("Listing index unavailable. Loading the catalog from getActiveListingsDetails.")
+                catalog.load_pages(get_data_registry_contract())
         except Exception as e:
-            print(f"Gas estimation failed for approve: {e}. Using default gas limit: 100000")
-            estimated_gas = 100000
+            print(f"Error refreshing the listing catalog: {e}")
+            if not len(catalog):
+                return []
+    records = catalog.query(text=text, limit=limit, offset=offset, **filters)
+    if not records:
+        print("No matching listings found.")
+        return []
+    return [format_listing(record.to_dict()) for record in records]
 
-        transaction_dict_approve = {
-            'from': consumer_account.address,
-            'nonce': nonce,
-            'gas': estimated_gas + 20000,
-        }
 
-        latest_block_approve = w3.eth.get_block('latest')
-        base_fee_approve = latest_block_approve.get('baseFeePerGas')
+def fetch_approval_preflight(spender_address):
+    return get_chain_cache().read(
+        {'allowance': allowance_of(get_mock_erc20_contract(), get_consumer_account().address, spender_address), **FEE_KEYS},
+    )
 
-        if base_fee_approve is not None: 
-            try:
-                max_priority_fee_gwei = w3.to_wei('2', 'gwei') 
-                transaction_dict_approve['maxPriorityFeePerGas'] = int(max_priority_fee_gwei)
-            except ValueError:
-                print("Error converting max_priority_fee_gwei to int. Using default.")
-                transaction_dict_approve['maxPriorityFeePerGas'] = 2 * 10**9 
 
-            try:
-                calculated_max_fee = (int(base_fee_approve) * 2) + transaction_dict_approve['maxPriorityFeePerGas']
-                transaction_dict_approve['maxFeePerGas'] = int(calculated_max_fee)
-            except ValueError:
-                print("Error calculating or converting maxFeePerGas. Using a fallback.")
-                transaction_dict_approve['maxFeePerGas'] = int(w3.eth.gas_price * 3) if w3.eth.gas_price else 50 * 10**9
-
-            print(f"Debug: Using EIP-1559 fees: maxPriorityFeePerGas={transaction_dict_approve['maxPriorityFeePerGas']}, maxFeePerGas={transaction_dict_approve['maxFeePerGas']}")
-        else: # Legacy network
-            transaction_dict_approve['gasPrice'] = int(w3.eth.gas_price) 
-            print(f"Debug: Using legacy gasPrice: {transaction_dict_approve['gasPrice']}")
-        
-        print(f"Debug: Transaction dict for approve: {transaction_dict_approve}")
+def fetch_purchase_preflight(listing_id, spender_address=None):
+    # Everything the purchase path needs before sending anything, in one round-trip.
+    address, token = get_consumer_account().address, get_mock_erc20_contract()
+    return get_chain_cache().read(
+        {
+            'balance': balance_of(token, address),
+            'allowance': allowance_of(token, address, spender_address or config.DATA_REGISTRY_ADDRESS),
+            **FEE_KEYS,
+        },
+        extra={
+            'listing': lambda b: b.call(get_data_registry_contract().functions.getListing(listing_id)),
+        },
+    )
 
-      
-        transaction_approve = mock_erc20_contract.functions.approve(
-            spender_address, amount_token_wei 
-        ).build_transaction(transaction_dict_approve) 
 
-        print(f"Debug: Built transaction for approve: {transaction_approve}")
+def approve_token_spending(spender_address, amount_token_wei, preflight=None):
+    with tracer.span('approve', spender=spender_address, amount_wei=amount_token_wei) as span:
+        approved = _approve_token_spending(spender_address, amount_token_wei, preflight)
+        span.set(ok=approved)
+    return approved
 
-       
-        signed_tx_approve = w3.eth.account.sign_transaction(transaction_approve, CONSUMER_PRIVATE_KEY)
-        print(f"Debug: Signed transaction for approve. Type: {type(signed_tx_approve)}")
 
-        
-        tx_hash_bytes = None 
+def _approve_token_spending(spender_address, amount_token_wei, preflight=None):
+    if not isinstance(amount_token_wei, int):
+        try:
+            amount_token_wei = int(amount_token_wei)
+        except ValueError:
+            print(f"ERROR: amount_token_wei '{amount_token_wei}' is not a valid integer for approval.")
+            return False
+
+    print(f"\nApproving DataRegistry ({spender_address}) to spend {Web3.from_wei(amount_token_wei, 'ether')} MUSDC...")
+    try:
+        if preflight is None:
+            with tracer.span('allowance_check'):
+                preflight = fetch_approval_preflight(spender_address)
+        current_allowance = preflight['allowance']
+        if current_allowance >= amount_token_wei:
+            print("Sufficient allowance already set.")
+            return True
+
         try:
-            tx_hash_bytes = w3.eth.send_raw_transaction(signed_tx_approve.raw_transaction) 
-            tx_hash_hex = w3.to_hex(tx_hash_bytes) 
-            print(f"APPROVAL TX SENT: {tx_hash_hex}")
+            submission = get_engine().submit(
+                get_mock_erc20_contract().functions.approve(spender_address, amount_token_wei),
+                default_gas=120000, margin=20000, fee_state=preflight, label="approve",
+            )
+            print(f"APPROVAL TX SENT: {submission.tx_hash}")
+            logger.debug("Transaction for approve: %s", submission.transaction)
         except Exception as send_error:
             print(f"ERROR sending approval transaction: {send_error}")
             import traceback; traceback.print_exc();
@@ -156,7 +330,7 @@ def approve_token_spending(spender_address, amount_token_wei):
 
         
         print("Waiting for approval transaction receipt...")
-        tx_receipt = w3.eth.wait_for_transaction_receipt(tx_hash_bytes, timeout=240)
+        tx_receipt = submission.wait()
 
         if tx_receipt.status == 1:
             print("SUCCESS: Token spending approved.")
@@ -171,22 +345,60 @@ def approve_token_spending(spender_address, amount_token_wei):
         return False
 
 
+@memoized
+def get_allowance_budget():
+    if config.PURCHASE_ALLOWANCE_BUDGET <= 0:
+        return None
+    return AllowanceBudget(
+        get_w3(), get_mock_erc20_contract(), get_data_registry_contract(), get_consumer_account(),
+        budget_wei=Web3.to_wei(config.PURCHASE_ALLOWANCE_BUDGET, 'ether'),
+        low_water_wei=Web3.to_wei(config.PURCHASE_ALLOWANCE_LOW_WATER, 'ether'),
+        approve=approve_token_spending,
+    )
+
+
+def sync_allowance_budget():
+    """Brings the allowance budget up to date with the chain: at start, and after a spend failed."""
+    allowance_budget = get_allowance_budget()
+    if not allowance_budget:
+        return
+    try:
+        allowance_budget.sync()
+    except Exception as e:
+        print(f"Could not sync the allowance budget: {e}")
+
+
 def purchase_data_on_chain(listing_id):
-    target_listing_details = None
+    with tracer.span('purchase', listing_id=listing_id) as span:
+        purchased = _purchase_data_on_chain(listing_id)
+        span.set(ok=purchased)
+    return purchased
+
+
+def _purchase_data_on_chain(listing_id):
     price_token_wei = None 
+    allowance_budget = get_allowance_budget()
 
     try: 
        
         if not isinstance(listing_id, int):
             listing_id = int(listing_id)
 
-        raw_listing = data_registry_contract.functions.getListing(listing_id).call()
-       ve [7]
+        entitlements = get_entitlements()
+        if entitlements is not None and entitlements.owns(listing_id):
+            print(f"Listing ID {listing_id} is already owned (DataCID: {entitlements.data_cid(listing_id)}). Not buying it again.")
+            return True
+
+        # Balance, allowance check, fee lookup and the listing, in one batched read.
+        with tracer.span('preflight'):
+            preflight = fetch_purchase_preflight(listing_id)
+        raw_listing = preflight['listing']
+        # raw_listing: id [0], seller [1], name [2], description [3], dataCID [4], metadataCID [5], price [6], active [7]
         price_token_wei = raw_listing[6]
         if not isinstance(price_token_wei, int):
             price_token_wei = int(price_token_wei)
 
-        print(f"\nAttempting to purchase listing ID {listing_id} for {w3.from_wei(price_token_wei, 'ether')} MUSDC...")
+        print(f"\nAttempting to purchase listing ID {listing_id} for {Web3.from_wei(price_token_wei, 'ether')} MUSDC...")
     except Exception as e:
         print(f"ERROR: Could not fetch details or price for listing ID {listing_id} before purchase: {e}")
         import traceback; traceback.print_exc();
@@ -194,72 +406,32 @@ def purchase_data_on_chain(listing_id):
 
     if price_token_wei is None: 
         return False
+    if preflight['balance'] < price_token_wei:
+        print(f"ERROR: MUSDC balance {Web3.from_wei(preflight['balance'], 'ether')} is below the listing price. Purchase aborted.")
+        return False
 
+    reserved_wei = 0
     try:
-       
-        approval_successful = approve_token_spending(DATA_REGISTRY_ADDRESS, price_token_wei)
+        with tracer.span('allowance'):
+            if allowance_budget:
+                allowance_budget.observe_allowance(preflight['allowance'], get_chain_cache().block_number)
+                approval_successful = allowance_budget.reserve(price_token_wei, preflight=preflight)
+                reserved_wei = price_token_wei if approval_successful else 0
+            else:
+                approval_successful = approve_token_spending(config.DATA_REGISTRY_ADDRESS, price_token_wei, preflight=preflight)
         if not approval_successful:
             print("Purchase aborted due to token approval failure.")
             return False
 
-        print("Token approval successful. Proceeding with purchase call...")
+        print("Token allowance in place. Proceeding with purchase call...")
         
-        nonce = w3.eth.get_transaction_count(consumer_account.address)
-
-
         try:
-            estimated_gas_purchase = data_registry_contract.functions.purchaseData(
-                listing_id
-            ).estimate_gas({'from': consumer_account.address}) 
-            print(f"Debug: Estimated gas for purchaseData: {estimated_gas_purchase}")
-        except Exception as e:
-            print(f"Gas estimation failed for purchaseData: {e}. Using default gas limit: 400000")
-            estimated_gas_purchase = 400000
-
-        transaction_dict_purchase = {
-            'from': consumer_account.address,
-            'nonce': nonce,
-            'gas': estimated_gas_purchase + 50000, 
-        }
-
-        latest_block_purchase = w3.eth.get_block('latest')
-        base_fee_purchase = latest_block_purchase.get('baseFeePerGas')
-
-        if base_fee_purchase is not None: 
-            try:
-                max_priority_fee_gwei = w3.to_wei('2', 'gwei')
-                transaction_dict_purchase['maxPriorityFeePerGas'] = int(max_priority_fee_gwei)
-            except ValueError:
-                transaction_dict_purchase['maxPriorityFeePerGas'] = 2 * 10**9
-
-            try:
-                calculated_max_fee = (int(base_fee_purchase) * 2) + transaction_dict_purchase['maxPriorityFeePerGas']
-                transaction_dict_purchase['maxFeePerGas'] = int(calculated_max_fee)
-            except ValueError:
-                transaction_dict_purchase['maxFeePerGas'] = int(w3.eth.gas_price * 3) if w3.eth.gas_price else 60 * 10**9
-            
-            print(f"Debug: Using EIP-1559 fees for purchase: maxPriorityFeePerGas={transaction_dict_purchase['maxPriorityFeePerGas']}, maxFeePerGas={transaction_dict_purchase['maxFeePerGas']}")
-        else: 
-            transaction_dict_purchase['gasPrice'] = int(w3.eth.gas_price)
-            print(f"Debug: Using legacy gasPrice for purchase: {transaction_dict_purchase['gasPrice']}")
-
-        print(f"Debug: Transaction dict for purchaseData: {transaction_dict_purchase}")
-
-        transaction_purchase = data_registry_contract.functions.purchaseData(
-            listing_id 
-        ).build_transaction(transaction_dict_purchase) 
-        
-        print(f"Debug: Built transaction for purchaseData: {transaction_purchase}")
-
-        signed_tx_purchase = w3.eth.account.sign_transaction(transaction_purchase, CONSUMER_PRIVATE_KEY)
-        print(f"Debug: Signed transaction for purchase. Type: {type(signed_tx_purchase)}")
-
-       
-        tx_hash_bytes_purchase = None # Initialize
-        try:
-            tx_hash_bytes_purchase = w3.eth.send_raw_transaction(signed_tx_purchase.raw_transaction) # Use .
-            tx_hash_hex_purchase = w3.to_hex(tx_hash_bytes_purchase)
-            print(f"PURCHASE TX SENT: {tx_hash_hex_purchase}")
+            submission = get_engine().submit(
+                get_data_registry_contract().functions.purchaseData(listing_id),
+                default_gas=450000, fee_state=preflight, label=f"purchase #{listing_id}",
+            )
+            print(f"PURCHASE TX SENT: {submission.tx_hash}")
+            logger.debug("Transaction for purchaseData: %s", submission.transaction)
         except Exception as send_error:
             print(f"ERROR sending purchase transaction: {send_error}")
             import traceback; traceback.print_exc();
@@ -267,19 +439,40 @@ def purchase_data_on_chain(listing_id):
 
     
         print(f"Waiting for purchase transaction receipt (listing ID: {listing_id})...")
-        tx_receipt_purchase = w3.eth.wait_for_transaction_receipt(tx_hash_bytes_purchase, timeout=240)
+        tx_receipt_purchase = submission.wait()
 
         if tx_receipt_purchase.status == 1:
+            if allowance_budget:
+                allowance_budget.record_receipt(tx_receipt_purchase)
             print(f"SUCCESS: Data purchased for listing ID {listing_id}. Block: {tx_receipt_purchase.blockNumber}")
+            record_entitlement({
+                'id': listing_id, 'name': raw_listing[2], 'dataCID': raw_listing[4],
+                'metadataCID': raw_listing[5], 'price_token_wei': price_token_wei,
+            }, tx_receipt_purchase)
             return True
         else:
             print(f"ERROR: Purchase transaction for listing ID {listing_id} FAILED. Receipt: {tx_receipt_purchase}")
+            sync_allowance_budget()
             return False
             
     except Exception as e:
         print(f"ERROR in outer try-except of purchase_data_on_chain for listing ID {listing_id}: {e}")
         import traceback; traceback.print_exc();
+        sync_allowance_budget()
         return False
+    finally:
+        if reserved_wei:
+            allowance_budget.release(reserved_wei)
+
+
+def cache_ipfs_content(cid, content_bytes):
+    blob_store = get_blob_store()
+    if not blob_store:
+        return
+    try:
+        blob_store.put(cid, content_bytes)
+    except Exception as e:
+        print(f"Could not cache CID {cid}: {e}")
 
 
 def fetch_from_ipfs(cid):
@@ -287,59 +480,436 @@ def fetch_from_ipfs(cid):
     if not cid or "DUMMY_CID" in cid:
         print("Invalid or dummy CID provided, cannot fetch.")
         return None
-    content = None
-    if ipfs_client:
+    blob_store = get_blob_store()
+    if blob_store:
+        cached_bytes = blob_store.get(cid)
+        if cached_bytes is not None:
+            print(f"CID {cid} served from local cache.")
+            return decode_ipfs_content(cached_bytes)
+    try:
+        content_bytes, source = get_ipfs_fetcher().fetch(cid)
+    except Exception as e:
+        print(f"Error fetching CID {cid} from every IPFS source: {e}")
+        return None
+    print(f"CID {cid} fetched from {source}.")
+    cache_ipfs_content(cid, content_bytes)
+    return decode_ipfs_content(content_bytes)
+
+
+def make_progress_printer(cid, min_interval=1.0):
+    last_printed = [0.0]
+
+    def report(done, total):
+        now = time.monotonic()
+        finished = total is not None and done >= total
+        if not finished and now - last_printed[0] < min_interval:
+            return
+        last_printed[0] = now
+        if total:
+            print(f"  {cid}: {done / 1024 / 1024:.1f} / {total / 1024 / 1024:.1f} MiB ({done * 100 // total}%)")
+        else:
+            print(f"  {cid}: {done / 1024 / 1024:.1f} MiB")
+    return report
+
+
+def download_from_ipfs(cid, dest_path=None, progress=None, trace_parent=None):
+    """Streams a dataset to disk and returns its path; re-running after an interruption resumes it.
+
+    `trace_parent` (tracer.current()) files the download under the caller's trace when run on a worker thread.
+    """
+    with tracer.span('download', parent=trace_parent, cid=cid):
+        return _download_from_ipfs(cid, dest_path, progress)
+
+
+def _download_from_ipfs(cid, dest_path=None, progress=None):
+    if not cid or "DUMMY_CID" in cid:
+        print("Invalid or dummy CID provided, cannot download.")
+        return None
+    dest_path = dest_path or os.path.join(config.DOWNLOAD_DIR, cid)
+    if os.path.exists(dest_path):
+        print(f"CID {cid} already downloaded to {dest_path}.")
+        return dest_path
+    os.makedirs(os.path.dirname(os.path.abspath(dest_path)), exist_ok=True)
+    blob_store = get_blob_store()
+    if blob_store and cid in blob_store:
         try:
-            content_bytes = ipfs_client.cat(cid, timeout=30)
-            try:
-                content_str = content_bytes.decode('utf-8')
-                content = json.loads(content_str)
-            except (json.JSONDecodeError, UnicodeDecodeError): content = content_str
-            return content
-        except Exception as e: print(f"Error fetching CID {cid} from IPFS client: {e}. Trying gateway...")
-    if IPFS_GATEWAY_URL:
+            shutil.copyfile(blob_store.path_for(cid), dest_path)
+            print(f"CID {cid} copied from local cache to {dest_path}.")
+            return dest_path
+        except FileNotFoundError:
+            pass
+    print(f"Downloading CID {cid} to {dest_path}...")
+    try:
+        _, source = get_ipfs_fetcher().download(cid, dest_path, progress=progress or make_progress_printer(cid))
+    except Exception as e:
+        print(f"Error downloading CID {cid}: {e}. Re-run to resume.")
+        return None
+    print(f"CID {cid} downloaded from {source}.")
+    return dest_path
+
+
+def iter_ipfs_records(cid, dest_path=None):
+    """Yields the records of an NDJSON or JSON-array dataset one at a time."""
+    path = download_from_ipfs(cid, dest_path)
+    if path is None:
+        return iter(())
+    return iter_records(path)
+
+
+def fetch_dataset_metadata(metadata_cid):
+    metadata = fetch_from_ipfs(metadata_cid)
+    return metadata if isinstance(metadata, dict) else None
+
+
+def dataset_format(path, metadata=None):
+    """The columnar format named in the metadata, else whatever the file looks like; None for JSON."""
+    data_format = (metadata or {}).get('format')
+    if data_format in COLUMNAR_FORMATS:
+        return data_format
+    return sniff_format(path)
+
+
+def load_ipfs_columns(cid, dest_path=None, metadata=None):
+    """Downloads a columnar (npz/arrow) dataset and memory-maps it as {column: numpy array}."""
+    path = download_from_ipfs(cid, dest_path)
+    if path is None:
+        return None
+    return load_columns(path, dataset_format(path, metadata))
+
+
+def print_dataset_preview(data_path, metadata=None, rows=3):
+    data_format = dataset_format(data_path, metadata)
+    if data_format:
+        try:
+            columns = load_columns(data_path, data_format)
+        except (ImportError, ValueError) as e:
+            print(f"Could not load {data_format} dataset: {e}")
+            return
+        for row in iter_rows(columns, rows):
+            print(json.dumps(row)[:500])
+        row_count = len(next(iter(columns.values()))) if columns else 0
+        print(f"Records: {row_count} ({data_format}; columns: "
+              f"{', '.join(f'{name}:{array.dtype}' for name, array in columns.items())})")
+        return
+    try:
+        record_count = 0
+        for record in iter_records(data_path):
+            if record_count < rows:
+                print(json.dumps(record)[:500])
+            record_count += 1
+        print(f"Records: {record_count}")
+    except (ValueError, UnicodeDecodeError):
+        print("Payload is not JSON records; left as a file.")
+
+
+def submit_purchases(results, preflight, receipt_timeout=240):
+    """Sends purchaseData for every planned result on consecutive nonces, without waiting in between.
+
+    A result whose send fails is marked send_failed; the tx engine keeps the
+    nonce sequence intact, so the rest still go out.
+    """
+    calls = [get_data_registry_contract().functions.purchaseData(result['id']) for result in results]
+    gas_limits = get_engine().estimate_many(calls, default_gas=450000)
+    for result, call, gas in zip(results, calls, gas_limits):
+        if isinstance(gas, TransactionRejected):
+            result['status'] = 'rejected'
+            result['error'] = str(gas)
+            print(f"Purchase of listing {result['id']} would revert: {gas}")
+            continue
         try:
-            gateway_fetch_url = f"{IPFS_GATEWAY_URL.strip('/')}/{cid}"
-            response = requests.get(gateway_fetch_url, timeout=60)
-            response.raise_for_status()
-            try: content = response.json()
-            except requests.exceptions.JSONDecodeError: content = response.text
-            return content
-        except Exception as e: print(f"Error fetching CID {cid} from IPFS gateway: {e}")
-    return None
+            submission = get_engine().submit(
+                call, gas=gas, fee_state=preflight, timeout=receipt_timeout, label=f"purchase #{result['id']}",
+            )
+        except Exception as e:
+            result['status'] = 'send_failed'
+            result['error'] = str(e)
+            print(f"ERROR sending purchase for listing {result['id']}: {e}")
+            continue
+        result['status'] = 'sent'
+        result['txHash'] = submission.tx_hash
+        result['receipt'] = submission.receipt
+        print(f"PURCHASE TX SENT (nonce {submission.nonce}): {result['txHash']} listing {result['id']}")
+
+
+def batch_purchase(policy, candidate_limit=50, fetch_data=True, fetch_workers=4, receipt_timeout=240):
+    """Buys every listing `policy` selects, then downloads each dataset as its purchase confirms.
+
+    Returns one result dict per candidate listing: purchased, skipped, rejected,
+    reverted, replaced, timeout, send_failed or not_sent, with the tx hash,
+    block and downloaded file path where there is one.
+    """
+    owned = sync_entitlements()
+    listings = search_listings(limit=candidate_limit, **policy.query_filters(get_consumer_account().address, owned))
+    return purchase_listings(policy, listings, fetch_data, fetch_workers, receipt_timeout)
+
+
+def purchase_listings(policy, listings, fetch_data=True, fetch_workers=4, receipt_timeout=240, spent_wei=0, bought=0):
+    """batch_purchase() for listings the caller already has; `spent_wei`/`bought` are passed on to policy.plan()."""
+    with tracer.span('batch_purchase', candidates=len(listings)) as span:
+        summary = _purchase_listings(policy, listings, fetch_data, fetch_workers, receipt_timeout, spent_wei, bought)
+        span.set(purchased=sum(1 for result in summary if result['status'] == 'purchased'))
+    return summary
+
+
+def _purchase_listings(policy, listings, fetch_data, fetch_workers, receipt_timeout, spent_wei, bought):
+    address, token = get_consumer_account().address, get_mock_erc20_contract()
+    allowance_budget = get_allowance_budget()
+    with tracer.span('preflight'):
+        preflight = get_chain_cache().read(
+            {
+                'balance': balance_of(token, address),
+                'allowance': allowance_of(token, address, config.DATA_REGISTRY_ADDRESS),
+                **FEE_KEYS,
+            },
+        )
+    selected, skipped = policy.plan(
+        listings, preflight['balance'], address, spent_wei, bought, owned=get_entitlements(),
+    )
+
+    def new_result(listing, status, error=None):
+        return {
+            'id': listing['id'], 'name': listing['name'], 'price_token_wei': listing['price_token_wei'],
+            'dataCID': listing['dataCID'], 'metadataCID': listing['metadataCID'], 'status': status, 'error': error,
+            'txHash': None, 'blockNumber': None, 'dataPath': None,
+        }
 
+    results = [new_result(listing, 'planned') for listing in selected]
+    summary = results + [new_result(listing, 'skipped', reason) for listing, reason in skipped]
+    total_wei = sum(result['price_token_wei'] for result in results)
+    print(f"\nBatch purchase plan: {len(results)} listings for {Web3.from_wei(total_wei, 'ether')} MUSDC "
+          f"(balance {Web3.from_wei(preflight['balance'], 'ether')} MUSDC, {len(skipped)} skipped).")
+    if not results:
+        print_purchase_summary(summary)
+        return summary
 
-if __name__ == "__main__":
+    reserved_wei = 0
+    try:
+        with tracer.span('allowance'):
+            if allowance_budget:
+                allowance_budget.observe_allowance(preflight['allowance'], get_chain_cache().block_number)
+                approved = allowance_budget.reserve(total_wei, preflight=preflight)
+                reserved_wei = total_wei if approved else 0
+            else:
+                # One approve covering the whole batch.
+                approved = approve_token_spending(config.DATA_REGISTRY_ADDRESS, total_wei, preflight=preflight)
+        if not approved:
+            for result in results:
+                result['status'] = 'not_sent'
+                result['error'] = "token approval failed"
+            print_purchase_summary(summary)
+            return summary
+
+        submit_purchases(results, preflight, receipt_timeout=receipt_timeout)
+
+        futures = {result.pop('receipt'): result for result in results if 'receipt' in result}
+        # Downloads start while other receipts are still awaited; they hang off the batch span, not the wait.
+        batch_span = tracer.current()
+        with ThreadPoolExecutor(max_workers=fetch_workers) as executor:
+            downloads = {}
+            with tracer.span('tx.receipt_wait_batch', transactions=len(futures)):
+                for future in as_completed(futures):
+                    result = futures[future]
+                    try:
+                        receipt = future.result()
+                    except TransactionReplaced as e:
+                        result['status'], result['error'] = 'replaced', str(e)
+                        continue
+                    except TimeoutError as e:
+                        result['status'], result['error'] = 'timeout', str(e)
+                        continue
+                    result['blockNumber'] = receipt['blockNumber']
+                    if receipt['status'] != 1:
+                        result['status'] = 'reverted'
+                        result['error'] = f"purchaseData reverted in block {receipt['blockNumber']}"
+                        continue
+                    result['status'] = 'purchased'
+                    record_entitlement(result, receipt)
+                    if allowance_budget:
+                        allowance_budget.record_receipt(receipt)
+                    print(f"SUCCESS: Listing {result['id']} purchased in block {receipt['blockNumber']}.")
+                    if fetch_data:
+                        downloads[executor.submit(download_from_ipfs, result['dataCID'], trace_parent=batch_span)] = result
+            for future in as_completed(downloads):
+                result = downloads[future]
+                try:
+                    result['dataPath'] = future.result()
+                except Exception as e:
+                    result['error'] = f"download failed: {e}"
+                if result['dataPath'] is None and not result['error']:
+                    result['error'] = "download failed"
+    finally:
+        if reserved_wei:
+            allowance_budget.release(reserved_wei)
+    if any(result['status'] in ('reverted', 'replaced', 'timeout') for result in results):
+        sync_allowance_budget()
+    print_purchase_summary(summary)
+    return summary
+
+
+def print_purchase_summary(summary):
+    purchased = [result for result in summary if result['status'] == 'purchased']
+    spent_wei = sum(result['price_token_wei'] for result in purchased)
+    print(f"\n--- BATCH PURCHASE SUMMARY: {len(purchased)} purchased, {Web3.from_wei(spent_wei, 'ether')} MUSDC spent ---")
+    for result in summary:
+        line = f"  [{result['status']}] #{result['id']} '{result['name']}' {Web3.from_wei(result['price_token_wei'], 'ether')} MUSDC"
+        if result['dataPath']:
+            line += f" -> {result['dataPath']}"
+        if result['error']:
+            line += f" ({result['error']})"
+        print(line)
+
+
+def run_daemon(policy, queue_size=None, batch_size=None, fetch_data=True, fetch_workers=4, receipt_timeout=240,
+               run_seconds=None):
+    """Watches for new listings and buys the ones `policy` accepts, until interrupted or out of budget.
+
+    Each DataListed event is checked against the policy as soon as the
+    watcher reads it, i.e. within a poll interval of its block. Accepted
+    listings wait in a queue of `queue_size`; while it is full the watcher
+    stops reading, and resumes from the same block once the buyer catches up.
+    The buyer takes up to `batch_size` queued listings at a time and buys
+    them with one approval, as batch_purchase() does. Returns (bought, spent_wei).
+    """
+    queue_size = queue_size or config.DAEMON_QUEUE_SIZE
+    batch_size = batch_size or config.DAEMON_BATCH_SIZE
+    pending = queue.Queue(maxsize=queue_size)
+    stopping = threading.Event()
+
+    owned = sync_entitlements()
+
+    def on_listing(listing):
+        reason = policy.rejection_reason(listing, get_consumer_account().address, owned)
+        if reason:
+            print(f"Skipping new listing ID {listing['id']} ('{listing['name']}'): {reason}.")
+            return
+        format_listing(listing)
+        if pending.full():
+            print(f"Purchase queue is full ({queue_size} listings); holding new listings back.")
+        while not stopping.is_set():
+            try:
+                pending.put(listing, timeout=1)
+                return
+            except queue.Full:
+                continue
+
+    from_block = get_w3().eth.block_number + 1
+    watcher = ListingWatcher(
+        get_w3(), get_data_registry_contract(), on_listing, from_block, poll_interval=config.DAEMON_POLL_SECONDS,
+        ws_url=config.RPC_WS_URL, chunk_size=config.LOG_CHUNK_BLOCKS,
+    ).start()
+    print(f"\n--- Consumer daemon watching for new listings from block {from_block} (Ctrl+C to stop) ---")
+
+    spent_wei = bought = 0
+    deadline = None if run_seconds is None else time.monotonic() + run_seconds
+    # Downloads run beside the next purchases; the semaphore caps how many can be queued up.
+    downloads = ThreadPoolExecutor(max_workers=fetch_workers)
+    download_slots = threading.BoundedSemaphore(queue_size)
+    try:
+        while deadline is None or time.monotonic() < deadline:
+            try:
+                listings = [pending.get(timeout=1)]
+            except queue.Empty:
+                continue
+            while len(listings) < batch_size:
+                try:
+                    listings.append(pending.get_nowait())
+                except queue.Empty:
+                    break
+            summary = purchase_listings(
+                policy, listings, fetch_data=False, receipt_timeout=receipt_timeout,
+                spent_wei=spent_wei, bought=bought,
+            )
+            for result in summary:
+                if result['status'] != 'purchased':
+                    continue
+                spent_wei += result['price_token_wei']
+                bought += 1
+                if fetch_data:
+                    download_slots.acquire()
+                    downloads.submit(download_from_ipfs, result['dataCID']).add_done_callback(
+                        lambda _: download_slots.release()
+                    )
+            if policy.exhausted(spent_wei, bought):
+                print("Purchase policy budget or item limit reached.")
+                break
+    except KeyboardInterrupt:
+        print("\nStopping consumer daemon...")
+    finally:
+        stopping.set()
+        watcher.stop()
+        downloads.shutdown(wait=True)
+    print(f"--- Consumer daemon stopped: {bought} purchased, {Web3.from_wei(spent_wei, 'ether')} MUSDC spent ---")
+    return bought, spent_wei
+
+
+def print_owned():
+    entitlements = sync_entitlements()
+    if entitlements is None:
+        return
+    print(f"\n--- {len(entitlements)} OWNED DATASETS ---")
+    for entitlement in entitlements.all():
+        print(f"  #{entitlement['listing_id']} '{entitlement['name']}' "
+              f"{Web3.from_wei(entitlement['price_token_wei'], 'ether')} MUSDC, block {entitlement['block_number']}, "
+              f"DataCID: {entitlement['dataCID']}, MetaCID: {entitlement['metadataCID']}")
+
+
+def run_single_purchase(search=None):
     print("\n--- Auraweave Consumer Agent Starting (Sepolia & Stablecoin Mode) ---")
     print(f"Consumer MockUSDC Balance (start): {get_mock_token_balance()} MUSDC")
 
-    listings = discover_listings(limit=5)
-    if not listings:
-        print("No listings found.")
+    current_musdc_balance_wei = get_chain_cache().token_balance(get_mock_erc20_contract(), get_consumer_account().address)
+    # The oldest listing that is not our own, not already bought, and fits the balance.
+    listings = search_listings(
+        text=search, limit=1, order_by='id', exclude_seller=get_consumer_account().address,
+        max_price_wei=current_musdc_balance_wei, exclude_ids=sync_entitlements(),
+    )
+    target_listing = listings[0] if listings else None
+    if not target_listing:
+        print("No affordable listings found (or only own and already purchased listings).")
     else:
-        target_listing = None
-        current_musdc_balance_wei = mock_erc20_contract.functions.balanceOf(consumer_account.address).call()
-
-        for listing in listings:
-            if listing['seller'].lower() == consumer_account.address.lower():
-                print(f"Skipping own listing ID {listing['id']}")
-                continue
-            if current_musdc_balance_wei >= listing['price_token_wei']:
-                target_listing = listing
-                print(f"Selected listing ID {target_listing['id']} ('{target_listing['name']}') for purchase.")
-                break
-        
-        if not target_listing:
-            print("No affordable listings found (or only own listings).")
+        print(f"Selected listing ID {target_listing['id']} ('{target_listing['name']}') for purchase.")
+        purchase_successful = purchase_data_on_chain(target_listing['id']) 
+        if purchase_successful:
+            print(f"Consumer MockUSDC Balance (after purchase): {get_mock_token_balance()} MUSDC")
+            data_path = download_from_ipfs(target_listing['dataCID'])
+            if data_path:
+                print("\n--- PURCHASED DATA ---")
+                print(f"Saved to: {data_path} ({os.path.getsize(data_path)} bytes)")
+                print_dataset_preview(data_path, fetch_dataset_metadata(target_listing['metadataCID']))
+                print("----------------------")
         else:
-            purchase_successful = purchase_data_on_chain(target_listing['id']) 
-            if purchase_successful:
-                print(f"Consumer MockUSDC Balance (after purchase): {get_mock_token_balance()} MUSDC")
-                data_content = fetch_from_ipfs(target_listing['dataCID'])
-                if data_content:
-                    print("\n--- PURCHASED DATA CONTENT ---")
-                    print(json.dumps(data_content, indent=2))
-                    print("----------------------------")
-            else:
-                print("Purchase was not successful.")
-    print("\n--- Auraweave Consumer Agent Finished ---")
\ No newline at end of file
+            print("Purchase was not successful.")
+    print("\n--- Auraweave Consumer Agent Finished ---")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Auraweave consumer agent")
+    parser.add_argument('--batch', action='store_true', help="Buy every listing the policy selects")
+    parser.add_argument('--max-price', type=float, help="Per-listing price cap in MUSDC")
+    parser.add_argument('--budget', type=float, help="Total MUSDC to spend in this batch")
+    parser.add_argument('--max-items', type=int)
+    parser.add_argument('--allow-seller', action='append', help="Only buy from these sellers (repeatable)")
+    parser.add_argument('--deny-seller', action='append', help="Never buy from these sellers (repeatable)")
+    parser.add_argument('--candidates', type=int, default=50, help="How many listings to consider")
+    parser.add_argument('--no-fetch', action='store_true', help="Don't download purchased datasets")
+    parser.add_argument('--search', help="Only consider listings whose name or description has all these words")
+    parser.add_argument('--daemon', action='store_true', help="Keep running and buy new listings the policy accepts")
+    parser.add_argument('--queue-size', type=int, help="Accepted listings the daemon holds before it stops reading")
+    parser.add_argument('--owned', action='store_true', help="List the datasets this account has bought, with their CIDs")
+    args = parser.parse_args()
+    start()
+    if args.owned:
+        print_owned()
+        exit()
+    policy = PurchasePolicy(
+        max_price_wei=Web3.to_wei(args.max_price, 'ether') if args.max_price is not None else None,
+        total_budget_wei=Web3.to_wei(args.budget, 'ether') if args.budget is not None else None,
+        max_items=args.max_items, allow_sellers=args.allow_seller, deny_sellers=args.deny_seller,
+        search=args.search,
+    )
+    if args.daemon:
+        run_daemon(policy, queue_size=args.queue_size, fetch_data=not args.no_fetch)
+    elif args.batch:
+        batch_purchase(policy, candidate_limit=args.candidates, fetch_data=not args.no_fetch)
+    else:
+        run_single_purchase(search=args.search)
@@ -0,0 +1,233 @@
+import os
+import sqlite3
+import threading
+from web3 import Web3
+from listing_index import DATA_PURCHASED_TOPIC, _encode_price
+from rpc_batch import RpcBatch
+
+# getListing reads per round trip when filling in the CIDs of purchases found in the logs.
+CID_READS_PER_BATCH = 200
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS owned (
+    buyer TEXT NOT NULL,
+    listing_id INTEGER NOT NULL,
+    data_cid TEXT,
+    metadata_cid TEXT,
+    name TEXT,
+    price TEXT NOT NULL,
+    tx_hash TEXT NOT NULL,
+    block_number INTEGER NOT NULL,
+    PRIMARY KEY (buyer, listing_id)
+);
+CREATE INDEX IF NOT EXISTS owned_block ON owned (buyer, block_number);
+
+CREATE TABLE IF NOT EXISTS entitlement_state (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+def _address_topic(address):
+    return '0x' + '00' * 12 + address.lower()[2:]
+
+
+class EntitlementStore:
+    """The listings one buyer owns, so it never pays twice for the same data.
+
+    Seeded from DataPurchased logs filtered on the buyer's indexed address
+    (so only this buyer's purchases are read), then kept current by
+    `sync()` and by `record_purchase()` as our own purchases confirm. The
+    whole set is held in memory, so `owns()` and `data_cid()` are dict
+    lookups; SQLite only keeps it across restarts. As in ListingIndex, the
+    last `confirmations` blocks are re-read on every sync.
+    """
+
+    def __init__(self, w3, registry_contract, db_path, buyer, start_block=0, chunk_size=2000, confirmations=6):
+        self.w3 = w3
+        self.registry = registry_contract
+        self.registry_address = registry_contract.address
+        self.buyer = Web3.to_checksum_address(buyer)
+        self._buyer_key = self.buyer.lower()
+        self.db_path = db_path
+        self.start_block = start_block
+        self.chunk_size = chunk_size
+        self.confirmations = confirmations
+        self._lock = threading.RLock()
+
+        db_dir = os.path.dirname(os.path.abspath(db_path))
+        os.makedirs(db_dir, exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+        self._check_contract()
+        self._owned = {
+            row['listing_id']: self._row_to_entitlement(row)
+            for row in self._conn.execute("SELECT * FROM owned WHERE buyer = ?", (self._buyer_key,))
+        }
+
+    def _check_contract(self):
+        stored = self._get_state('registry_address')
+        if stored and stored.lower() != self.registry_address.lower():
+            print(f"Entitlements were recorded for registry {stored}; starting over for {self.registry_address}.")
+            with self._conn:
+                self._conn.execute("DELETE FROM owned")
+                self._conn.execute("DELETE FROM entitlement_state")
+        with self._conn:
+            self._set_state('registry_address', self.registry_address)
+
+    def _get_state(self, key):
+        row = self._conn.execute("SELECT value FROM entitlement_state WHERE key = ?", (key,)).fetchone()
+        return row['value'] if row else None
+
+    def _set_state(self, key, value):
+        self._conn.execute(
+            "INSERT INTO entitlement_state (key, value) VALUES (?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+            (key, str(value)),
+        )
+
+    @property
+    def checkpoint(self):
+        value = self._get_state(f'checkpoint:{self._buyer_key}')
+        return int(value) if value is not None else None
+
+    def __len__(self):
+        return len(self._owned)
+
+    def __contains__(self, listing_id):
+        return self.owns(listing_id)
+
+    def owns(self, listing_id):
+        return int(listing_id) in self._owned
+
+    def get(self, listing_id):
+        """{'listing_id', 'dataCID', 'metadataCID', 'name', 'price_token_wei', 'tx_hash', 'block_number'} or None."""
+        return self._owned.get(int(listing_id))
+
+    def data_cid(self, listing_id):
+        entitlement = self._owned.get(int(listing_id))
+        return entitlement['dataCID'] if entitlement else None
+
+    def owned_ids(self):
+        return set(self._owned)
+
+    def all(self):
+        return [self._owned[listing_id] for listing_id in sorted(self._owned)]
+
+    def sync(self, to_block=None):
+        """Reads this buyer's DataPurchased logs up to the head. Returns the number of purchases read."""
+        with self._lock:
+            head = self.w3.eth.block_number if to_block is None else to_block
+            checkpoint = self.checkpoint
+            if checkpoint is None:
+                from_block = self.start_block
+            else:
+                from_block = max(self.start_block, checkpoint - self.confirmations + 1)
+            if from_block > head:
+                return 0
+
+            purchases = []
+            chunk_start = from_block
+            while chunk_start <= head:
+                chunk_end = min(chunk_start + self.chunk_size - 1, head)
+                try:
+                    logs = self.w3.eth.get_logs({
+                        'address': self.registry_address,
+                        'fromBlock': chunk_start,
+                        'toBlock': chunk_end,
+                        'topics': [DATA_PURCHASED_TOPIC, None, _address_topic(self.buyer)],
+                    })
+                except Exception as e:
+                    if self.chunk_size <= 1:
+                        raise
+                    self.chunk_size = max(1, self.chunk_size // 2)
+                    print(f"eth_getLogs failed for blocks {chunk_start}-{chunk_end} ({e}). Retrying with chunk size {self.chunk_size}.")
+                    continue
+                purchases.extend(self._decode(log) for log in logs)
+                chunk_start = chunk_end + 1
+
+            self._fill_cids(purchases)
+            with self._conn:
+                self._conn.execute(
+                    "DELETE FROM owned WHERE buyer = ? AND block_number >= ?", (self._buyer_key, from_block)
+                )
+                for entitlement in purchases:
+                    self._insert(entitlement)
+                self._set_state(f'checkpoint:{self._buyer_key}', head)
+            for listing_id in [listing_id for listing_id, entitlement in self._owned.items()
+                               if entitlement['block_number'] >= from_block]:
+                del self._owned[listing_id]
+            for entitlement in purchases:
+                self._owned.setdefault(entitlement['listing_id'], entitlement)
+            return len(purchases)
+
+    def _decode(self, log):
+        args = self.registry.events.DataPurchased().process_log(log)['args']
+        return {
+            'listing_id': args['listingId'], 'dataCID': None, 'metadataCID': None, 'name': None,
+            'price_token_wei': args['price'], 'tx_hash': Web3.to_hex(log['transactionHash']),
+            'block_number': log['blockNumber'],
+        }
+
+    def _fill_cids(self, purchases):
+        # DataPurchased carries no CIDs: copy them from what we already know, read the rest with getListing.
+        missing = []
+        for entitlement in purchases:
+            known = self._owned.get(entitlement['listing_id'])
+            if known and known['dataCID']:
+                entitlement.update(dataCID=known['dataCID'], metadataCID=known['metadataCID'], name=known['name'])
+            else:
+                missing.append(entitlement)
+        for start in range(0, len(missing), CID_READS_PER_BATCH):
+            chunk = missing[start:start + CID_READS_PER_BATCH]
+            batch = RpcBatch(self.w3)
+            reads = [batch.call(self.registry.functions.getListing(entitlement['listing_id'])) for entitlement in chunk]
+            batch.execute()
+            for entitlement, read in zip(chunk, reads):
+                try:
+                    raw_listing = read.get()
+                except Exception as e:
+                    print(f"Could not read the CIDs of owned listing ID {entitlement['listing_id']}: {e}")
+                    continue
+                entitlement.update(name=raw_listing[2], dataCID=raw_listing[4], metadataCID=raw_listing[5])
+
+    def record_purchase(self, listing, tx_hash, block_number):
+        """Adds a purchase we just made (a listing dict as from discovery) without waiting for the next sync."""
+        entitlement = {
+            'listing_id': int(listing['id']), 'dataCID': listing.get('dataCID'),
+            'metadataCID': listing.get('metadataCID'), 'name': listing.get('name'),
+            'price_token_wei': int(listing['price_token_wei']),
+            'tx_hash': tx_hash if isinstance(tx_hash, str) else Web3.to_hex(tx_hash),
+            'block_number': int(block_number),
+        }
+        with self._lock:
+            with self._conn:
+                self._insert(entitlement)
+            self._owned[entitlement['listing_id']] = entitlement
+
+    def _insert(self, entitlement):
+        self._conn.execute(
+            "INSERT OR REPLACE INTO owned "
+            "(buyer, listing_id, data_cid, metadata_cid, name, price, tx_hash, block_number) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                self._buyer_key, entitlement['listing_id'], entitlement['dataCID'], entitlement['metadataCID'],
+                entitlement['name'], _encode_price(entitlement['price_token_wei']), entitlement['tx_hash'],
+                entitlement['block_number'],
+            ),
+        )
+
+    @staticmethod
+    def _row_to_entitlement(row):
+        return {
+            'listing_id': row['listing_id'], 'dataCID': row['data_cid'], 'metadataCID': row['metadata_cid'],
+            'name': row['name'], 'price_token_wei': int(row['price']), 'tx_hash': row['tx_hash'],
+            'block_number': row['block_number'],
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,304 @@
+import os
+import time
+import threading
+import requests
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from requests.adapters import HTTPAdapter
+from cid_utils import verify_cid, StreamVerifier
+from metrics import IPFS_REQUESTS
+from tracing import get_tracer
+
+CHUNK_SIZE = 256 * 1024
+tracer = get_tracer()
+
+
+class FetchCancelled(Exception):
+    pass
+
+
+class CidMismatch(Exception):
+    pass
+
+
+class SourceStats:
+    """Rolling latency/health of one IPFS source (EWMA over recent fetches)."""
+
+    def __init__(self, prior_latency, alpha=0.3):
+        self.alpha = alpha
+        self.latency = prior_latency
+        self.error_rate = 0.0
+        self.successes = 0
+        self.failures = 0
+        self._lock = threading.Lock()
+
+    def record_success(self, elapsed):
+        with self._lock:
+            self.latency = (1 - self.alpha) * self.latency + self.alpha * elapsed
+            self.error_rate = (1 - self.alpha) * self.error_rate
+            self.successes += 1
+
+    def record_failure(self, penalty=1.0):
+        with self._lock:
+            self.error_rate = min(1.0, (1 - self.alpha) * self.error_rate + self.alpha * penalty)
+            self.failures += 1
+
+    @property
+    def score(self):
+        # Lower is better: a source failing half the time looks ~3x slower than it is.
+        return self.latency * (1 + 4 * self.error_rate)
+
+
+class IpfsSource:
+    # Metric label for this kind of source.
+    operation = 'fetch'
+
+    def __init__(self, name, prior_latency):
+        self.name = name
+        self.stats = SourceStats(prior_latency)
+
+    def fetch(self, cid, cancel_event, timeout):
+        raise NotImplementedError
+
+    def open_stream(self, cid, offset, timeout):
+        """Returns (chunks, start_offset, total_size). A source that can't resume
+        reports start_offset 0 and the caller starts over."""
+        raise NotImplementedError
+
+
+class LocalNodeSource(IpfsSource):
+    operation = 'cat'
+
+    def __init__(self, ipfs_client, name="local-node", prior_latency=0.2):
+        super().__init__(name, prior_latency)
+        self.ipfs_client = ipfs_client
+
+    def fetch(self, cid, cancel_event, timeout):
+        # ipfshttpclient cannot be interrupted mid-transfer; a losing fetch just finishes in the background.
+        return self.ipfs_client.cat(cid, timeout=timeout)
+
+    def open_stream(self, cid, offset, timeout):
+        return self.ipfs_client.cat(cid, offset=offset, stream=True, timeout=timeout), offset, None
+
+
+class GatewaySource(IpfsSource):
+    operation = 'gateway'
+
+    def __init__(self, base_url, prior_latency=1.0, pool_size=16):
+        super().__init__(base_url, prior_latency)
+        self.base_url = base_url.rstrip('/')
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def url_for(self, cid):
+        return f"{self.base_url}/{cid}"
+
+    def fetch(self, cid, cancel_event, timeout):
+        chunks = []
+        with self.session.get(self.url_for(cid), timeout=timeout, stream=True) as response:
+            response.raise_for_status()
+            for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                if cancel_event.is_set():
+                    # Closing the response drops the connection instead of draining it.
+                    response.close()
+                    raise FetchCancelled(cid)
+                chunks.append(chunk)
+        return b''.join(chunks)
+
+    def open_stream(self, cid, offset, timeout):
+        headers = {'Range': f'bytes={offset}-'} if offset else {}
+        response = self.session.get(self.url_for(cid), timeout=timeout, stream=True, headers=headers)
+        if response.status_code == 416:
+            # Everything is already on disk.
+            response.close()
+            return iter(()), offset, offset
+        try:
+            response.raise_for_status()
+        except Exception:
+            response.close()
+            raise
+        start = offset if response.status_code == 206 else 0
+        total = None
+        content_range = response.headers.get('Content-Range', '')
+        if '/' in content_range and not content_range.endswith('/*'):
+            total = int(content_range.rsplit('/', 1)[1])
+        elif response.headers.get('Content-Length'):
+            total = start + int(response.headers['Content-Length'])
+
+        def chunks():
+            with response:
+                yield from response.iter_content(chunk_size=CHUNK_SIZE)
+        return chunks(), start, total
+
+
+class HedgedFetcher:
+    """Races the best-ranked IPFS sources for a CID.
+
+    The best source starts immediately; another one joins every `hedge_delay`
+    seconds (or as soon as a running one fails), up to `max_parallel`. The
+    first copy that does not fail CID verification wins and the rest are
+    told to stop.
+    """
+
+    def __init__(self, sources, hedge_delay=0.5, max_parallel=3, timeout=60):
+        self.sources = list(sources)
+        self.hedge_delay = hedge_delay
+        self.max_parallel = max_parallel
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=max(4, len(self.sources) * 2), thread_name_prefix='ipfs-fetch')
+
+    def ranked_sources(self):
+        order = {id(source): index for index, source in enumerate(self.sources)}
+        return sorted(self.sources, key=lambda source: (source.stats.score, order[id(source)]))
+
+    def _fetch_from(self, source, cid, cancel_event):
+        started = time.monotonic()
+        labels = (source.operation, source.name)
+        try:
+            content = source.fetch(cid, cancel_event, self.timeout)
+        except FetchCancelled:
+            raise
+        except Exception:
+            if not cancel_event.is_set():
+                source.stats.record_failure()
+                IPFS_REQUESTS.observe(labels, time.monotonic() - started, error=True)
+            raise
+        if verify_cid(cid, content) is False:
+            source.stats.record_failure(penalty=1.0)
+            IPFS_REQUESTS.observe(labels, time.monotonic() - started, error=True)
+            raise CidMismatch(f"Content from {source.name} does not match CID {cid}")
+        source.stats.record_success(time.monotonic() - started)
+        IPFS_REQUESTS.observe(labels, time.monotonic() - started)
+        return content
+
+    def fetch(self, cid):
+        """Returns (content_bytes, source_name). Raises the last error if every source fails."""
+        if not self.sources:
+            raise RuntimeError("No IPFS sources configured")
+        with tracer.span('ipfs.fetch', cid=cid) as span:
+            content, source_name = self._fetch(cid)
+            span.set(source=source_name, bytes=len(content))
+        return content, source_name
+
+    def _fetch(self, cid):
+        deadline = time.monotonic() + self.timeout
+        cancel_event = threading.Event()
+        waiting = list(self.ranked_sources())
+        running = {}
+        errors = []
+
+        def launch_next():
+            source = waiting.pop(0)
+            running[self._executor.submit(self._fetch_from, source, cid, cancel_event)] = source
+
+        launch_next()
+        try:
+            while running:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                hedge_wait = self.hedge_delay if waiting and len(running) < self.max_parallel else remaining
+                done, _ = wait(list(running), timeout=min(hedge_wait, remaining), return_when=FIRST_COMPLETED)
+                for future in done:
+                    source = running.pop(future)
+                    error = future.exception()
+                    if error is None:
+                        return future.result(), source.name
+                    errors.append(error)
+                    print(f"IPFS source {source.name} failed for {cid}: {error}")
+                    if waiting:
+                        launch_next()
+                if not done and waiting and len(running) < self.max_parallel:
+                    launch_next()
+        finally:
+            cancel_event.set()
+        if errors:
+            raise errors[-1]
+        raise TimeoutError(f"Timed out fetching {cid} after {self.timeout}s")
+
+    def download(self, cid, dest_path, progress=None):
+        """Streams `cid` into `dest_path` without holding it in memory.
+
+        Bytes go to `dest_path + '.part'` first. An interrupted download, from
+        this call or an earlier process, resumes from the bytes already there,
+        and may finish from a different source, since a CID pins the content.
+        Sources are tried one after another rather than raced, because racing
+        a multi-GB transfer would multiply the bandwidth. `progress(done, total)`
+        is called per chunk; total is None when the source doesn't say.
+        """
+        if not self.sources:
+            raise RuntimeError("No IPFS sources configured")
+        with tracer.span('ipfs.download', cid=cid) as span:
+            dest_path, source_name = self._download(cid, dest_path, progress)
+            span.set(source=source_name, bytes=os.path.getsize(dest_path))
+        return dest_path, source_name
+
+    def _download(self, cid, dest_path, progress):
+        part_path = dest_path + '.part'
+        errors = []
+        for source in self.ranked_sources():
+            started = time.monotonic()
+            labels = (f"{source.operation}_stream", source.name)
+            try:
+                self._download_from(source, cid, part_path, progress)
+            except CidMismatch as e:
+                source.stats.record_failure()
+                IPFS_REQUESTS.observe(labels, time.monotonic() - started, error=True)
+                os.unlink(part_path)
+                errors.append(e)
+                print(f"IPFS source {source.name} served bad content for {cid}; discarded download.")
+                continue
+            except Exception as e:
+                source.stats.record_failure()
+                IPFS_REQUESTS.observe(labels, time.monotonic() - started, error=True)
+                errors.append(e)
+                print(f"IPFS download of {cid} from {source.name} interrupted: {e}")
+                continue
+            source.stats.record_success(time.monotonic() - started)
+            IPFS_REQUESTS.observe(labels, time.monotonic() - started)
+            os.replace(part_path, dest_path)
+            return dest_path, source.name
+        raise errors[-1]
+
+    def _download_from(self, source, cid, part_path, progress):
+        offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        chunks, start, total = source.open_stream(cid, offset, self.timeout)
+        verifier = StreamVerifier(cid)
+        if start:
+            # Re-hash what is already on disk so the finished file can still be verified.
+            with open(part_path, 'rb') as f:
+                for block in iter(lambda: f.read(CHUNK_SIZE), b''):
+                    verifier.update(block)
+        with open(part_path, 'r+b' if start else 'wb') as f:
+            f.seek(start)
+            f.truncate()
+            done = start
+            if progress:
+                progress(done, total)
+            for chunk in chunks:
+                f.write(chunk)
+                verifier.update(chunk)
+                done += len(chunk)
+                if progress:
+                    progress(done, total)
+        if total is not None and done != total:
+            raise IOError(f"Stream ended at {done} of {total} bytes")
+        if verifier.result() is False:
+            raise CidMismatch(f"Content from {source.name} does not match CID {cid}")
+
+    def describe(self):
+        return [
+            {'source': source.name, 'latency_s': round(source.stats.latency, 3),
+             'error_rate': round(source.stats.error_rate, 3),
+             'successes': source.stats.successes, 'failures': source.stats.failures}
+            for source in self.ranked_sources()
+        ]
+
+
+def build_fetcher(ipfs_client, gateway_urls, hedge_delay=0.5, max_parallel=3, timeout=60):
+    sources = []
+    if ipfs_client:
+        sources.append(LocalNodeSource(ipfs_client))
+    sources.extend(GatewaySource(url) for url in gateway_urls)
+    return HedgedFetcher(sources, hedge_delay=hedge_delay, max_parallel=max_parallel, timeout=timeout)
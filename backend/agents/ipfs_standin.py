@@ -0,0 +1,170 @@
+import re
+import time
+import json
+import base64
+import hashlib
+import socket
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, unquote
+
+from cid_utils import CODEC_RAW, MULTIHASH_SHA2_256
+
+# Inside the range ipfshttpclient 0.7 accepts (0.4.23 <= v < 0.8.0).
+REPORTED_VERSION = "0.7.0"
+
+
+def raw_cid(content):
+    """CIDv1, raw codec, sha2-256: what `ipfs add --raw-leaves --cid-version=1` gives single-block files."""
+    digest = hashlib.sha256(content).digest()
+    binary = bytes([1, CODEC_RAW, MULTIHASH_SHA2_256, len(digest)]) + digest
+    return 'b' + base64.b32encode(binary).decode().lower().rstrip('=')
+
+
+_BOUNDARY_PATTERN = re.compile(r'boundary="?([^";]+)"?')
+_FILENAME_PATTERN = re.compile(rb'filename="([^"]*)"')
+
+
+def iter_multipart(content_type, body):
+    """(headers, content) per part, byte for byte: binary payloads keep their CR/LF bytes."""
+    delimiter = b'--' + _BOUNDARY_PATTERN.search(content_type).group(1).encode()
+    for chunk in body.split(delimiter)[1:]:
+        if chunk.startswith(b'--'):
+            return
+        head, _, content = chunk.partition(b'\r\n\r\n')
+        headers = {}
+        for line in head.strip(b'\r\n').split(b'\r\n'):
+            name, _, value = line.partition(b':')
+            headers[name.strip().lower().decode()] = value.strip()
+        # The CRLF before the next delimiter belongs to the delimiter.
+        yield headers, content[:-2] if content.endswith(b'\r\n') else content
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        super().setup()
+        # Headers and body go out in separate writes; without this, Nagle + delayed ACK add ~40 ms per response.
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status, body=b'', content_type='application/json', headers=None):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_body(self):
+        if self.headers.get('Transfer-Encoding', '').lower() == 'chunked':
+            body = bytearray()
+            while True:
+                size = int(self.rfile.readline().split(b';')[0].strip(), 16)
+                if size == 0:
+                    self.rfile.readline()
+                    return bytes(body)
+                body += self.rfile.read(size)
+                self.rfile.readline()
+        return self.rfile.read(int(self.headers.get('Content-Length', 0)))
+
+    def do_POST(self):
+        self.server.node.delay()
+        url = urlparse(self.path)
+        if url.path == '/api/v0/version':
+            return self._send(200, json.dumps({'Version': REPORTED_VERSION}).encode())
+        if url.path == '/api/v0/add':
+            return self._add()
+        if url.path == '/api/v0/cat':
+            cid = dict(part.split('=', 1) for part in url.query.split('&') if '=' in part).get('arg', '')
+            return self._serve(unquote(cid))
+        self._send(404, b'{"Message": "not found"}')
+
+    def do_GET(self):
+        path = urlparse(self.path).path
+        if path == '/':
+            return self._send(200, json.dumps(self.server.node.counts).encode())
+        self.server.node.delay()
+        if path.startswith('/ipfs/'):
+            return self._serve(path[len('/ipfs/'):].strip('/'))
+        self._send(404, b'not found', 'text/plain')
+
+    def _serve(self, cid):
+        self.server.node.record('get')
+        content = self.server.node.blocks.get(cid)
+        if content is None:
+            return self._send(404, b'{"Message": "block not found"}')
+        self._send(200, content, 'application/octet-stream')
+
+    def _add(self):
+        body = self._read_body()
+        lines = []
+        for headers, content in iter_multipart(self.headers['Content-Type'], body):
+            filename = _FILENAME_PATTERN.search(headers.get('content-disposition', b''))
+            name = unquote(filename.group(1).decode()) if filename else ''
+            if headers.get('content-type', b'').startswith(b'application/x-directory'):
+                continue
+            cid = self.server.node.put(content)
+            lines.append({'Name': name or cid, 'Hash': cid, 'Size': str(len(content))})
+        self.server.node.record('add')
+        self._send(200, ''.join(json.dumps(line) + '\n' for line in lines).encode())
+
+
+class IpfsStandIn:
+    """An in-memory IPFS HTTP API + gateway for simulations and benchmarks.
+
+    It serves /api/v0/add (multipart, plain or chunked), /api/v0/cat,
+    /api/v0/version and /ipfs/<cid>. Every added file is stored as one raw
+    block, so the CIDs it returns pass cid_utils.verify_cid. Directories are
+    flattened. It is only meant to take IPFS out of the measurement; it is
+    not a node. `latency` delays every request; `GET /` returns the counts.
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0):
+        self.latency = latency
+        self.blocks = {}
+        self.counts = {}
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), _Handler)
+        self._server.daemon_threads = True
+        self._server.node = self
+        self._thread = None
+
+    @property
+    def port(self):
+        return self._server.server_address[1]
+
+    @property
+    def api_multiaddr(self):
+        return f"/ip4/{self._server.server_address[0]}/tcp/{self.port}/http"
+
+    @property
+    def gateway_url(self):
+        return f"http://{self._server.server_address[0]}:{self.port}/ipfs/"
+
+    def put(self, content):
+        cid = raw_cid(content)
+        with self._lock:
+            self.blocks[cid] = content
+        return cid
+
+    def delay(self):
+        if self.latency:
+            time.sleep(self.latency)
+
+    def record(self, operation):
+        with self._lock:
+            self.counts[operation] = self.counts.get(operation, 0) + 1
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name='ipfs-standin', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
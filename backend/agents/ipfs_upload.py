@@ -0,0 +1,202 @@
+import os
+import json
+import uuid
+import requests
+from urllib.parse import quote
+from metrics import IPFS_REQUESTS
+from tracing import get_tracer
+
+READ_CHUNK_BYTES = 256 * 1024
+DEFAULT_CHUNKER = 'size-262144'
+tracer = get_tracer()
+
+
+def multiaddr_to_url(address):
+    """'/ip4/127.0.0.1/tcp/5001/http' -> 'http://127.0.0.1:5001'. Plain URLs pass through."""
+    if address.startswith('http://') or address.startswith('https://'):
+        return address.rstrip('/')
+    parts = [part for part in address.split('/') if part]
+    host, port, scheme = None, None, 'http'
+    for index in range(0, len(parts) - 1, 2):
+        protocol, value = parts[index], parts[index + 1]
+        if protocol in ('ip4', 'dns', 'dns4', 'dns6'):
+            host = value
+        elif protocol == 'ip6':
+            host = f"[{value}]"
+        elif protocol == 'tcp':
+            port = value
+    if parts and parts[-1] in ('http', 'https'):
+        scheme = parts[-1]
+    if not host or not port:
+        raise ValueError(f"Cannot derive an HTTP API URL from {address!r}")
+    return f"{scheme}://{host}:{port}"
+
+
+def walk_tree(path, include_hidden=False):
+    """os.walk in sorted order, leaving out dot-files and dot-directories unless `include_hidden`.
+
+    Yields (directory, file names). publish_manifest.hash_path walks with
+    the same rule, so a tree hashes exactly as it uploads.
+    """
+    for current, dirs, files in os.walk(path):
+        dirs.sort()
+        if not include_hidden:
+            dirs[:] = [name for name in dirs if not name.startswith('.')]
+        yield current, [name for name in sorted(files) if include_hidden or not name.startswith('.')]
+
+
+class RecordReader:
+    """Serializes records from any iterable as NDJSON on demand, so `add` can stream them."""
+
+    def __init__(self, records):
+        self._records = iter(records)
+        self._buffer = b''
+        self.exhausted = False
+
+    def read(self, size=-1):
+        while not self.exhausted and (size < 0 or len(self._buffer) < size):
+            try:
+                self._buffer += json.dumps(next(self._records)).encode('utf-8') + b'\n'
+            except StopIteration:
+                self.exhausted = True
+        if size < 0:
+            data, self._buffer = self._buffer, b''
+        else:
+            data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
+
+class IpfsUploader:
+    """Streams files, directory trees or record iterables to a node's /api/v0/add.
+
+    The multipart body is produced by a generator and sent with chunked
+    transfer encoding, so at most one read chunk is in memory at a time,
+    whatever the dataset size. The node does the DAG chunking (`chunker`).
+    """
+
+    def __init__(self, api_url, chunker=DEFAULT_CHUNKER, raw_leaves=None, cid_version=None,
+                 pin=True, timeout=None):
+        self.api_url = multiaddr_to_url(api_url)
+        self.chunker = chunker
+        self.raw_leaves = raw_leaves
+        self.cid_version = cid_version
+        self.pin = pin
+        # Reads must wait for the node to finish hashing large inputs, so no read timeout by default.
+        self.timeout = timeout
+        self.session = requests.Session()
+
+    def version(self):
+        response = self.session.post(f"{self.api_url}/api/v0/version", timeout=10)
+        response.raise_for_status()
+        return response.json().get('Version')
+
+    def _params(self, **extra):
+        params = {'chunker': self.chunker, 'pin': str(self.pin).lower(), 'stream-channels': 'true'}
+        if self.raw_leaves is not None:
+            params['raw-leaves'] = str(self.raw_leaves).lower()
+        if self.cid_version is not None:
+            params['cid-version'] = str(self.cid_version)
+        params.update(extra)
+        return params
+
+    def add_path(self, path, progress=None, include_hidden=False):
+        """Uploads a file, or a directory recursively. Returns the root CID."""
+        path = os.path.abspath(path)
+        root_name = os.path.basename(path.rstrip(os.sep))
+        # A stat-only pass for the progress total; the upload walks the tree again rather than holding it.
+        files, total = 0, 0
+        for _, source, size in self._walk(path, root_name, include_hidden):
+            if source is not None:
+                files += 1
+                total += size
+        entries = self._walk(path, root_name, include_hidden)
+        results = self._add(entries, progress, total, self._params(recursive='true'), files)
+        return self._root_cid(results, root_name)
+
+    def add_records(self, records, filename='records.ndjson', progress=None):
+        """Uploads an iterable of JSON-serializable records as one NDJSON file. Returns its CID."""
+        entries = [(filename, RecordReader(records), None)]
+        results = self._add(entries, progress, None, self._params(), 1)
+        return self._root_cid(results, filename)
+
+    def add_stream(self, file_object, filename='data.bin', progress=None, total=None):
+        """Uploads anything with a `read(size)` method. Returns its CID."""
+        entries = [(filename, file_object, total)]
+        results = self._add(entries, progress, total, self._params(), 1)
+        return self._root_cid(results, filename)
+
+    def _walk(self, path, root_name, include_hidden):
+        # (name in the upload, local path | file object | None for a directory, size)
+        if os.path.isfile(path):
+            yield root_name, path, os.path.getsize(path)
+            return
+        if not os.path.isdir(path):
+            raise FileNotFoundError(path)
+        for current, files in walk_tree(path, include_hidden):
+            relative = os.path.relpath(current, os.path.dirname(path)).replace(os.sep, '/')
+            yield relative, None, None
+            for name in files:
+                file_path = os.path.join(current, name)
+                yield f"{relative}/{name}", file_path, os.path.getsize(file_path)
+
+    def _multipart(self, boundary, entries, progress, total):
+        sent = 0
+        for name, source, _ in entries:
+            if source is None:
+                yield self._part_header(boundary, name, 'application/x-directory')
+                continue
+            yield self._part_header(boundary, name, 'application/octet-stream')
+            file_object = open(source, 'rb') if isinstance(source, str) else source
+            try:
+                for chunk in iter(lambda: file_object.read(READ_CHUNK_BYTES), b''):
+                    sent += len(chunk)
+                    yield chunk
+                    if progress:
+                        progress(sent, total)
+            finally:
+                if isinstance(source, str):
+                    file_object.close()
+        yield f'\r\n--{boundary}--\r\n'.encode()
+
+    @staticmethod
+    def _part_header(boundary, name, content_type):
+        # Kubo URL-decodes part filenames, which is how nested paths survive the trip.
+        return (
+            f'\r\n--{boundary}\r\n'
+            f'Content-Disposition: form-data; name="file"; filename="{quote(name, safe="/")}"\r\n'
+            f'Content-Type: {content_type}\r\n\r\n'
+        ).encode()
+
+    def _add(self, entries, progress, total, params, files):
+        with tracer.span('ipfs.add', files=files, bytes=total), IPFS_REQUESTS.time('add', self.api_url):
+            return self._post_add(entries, progress, total, params)
+
+    def _post_add(self, entries, progress, total, params):
+        boundary = uuid.uuid4().hex
+        response = self.session.post(
+            f"{self.api_url}/api/v0/add", params=params, data=self._multipart(boundary, entries, progress, total),
+            headers={'Content-Type': f'multipart/form-data; boundary={boundary}'},
+            timeout=self.timeout, stream=True,
+        )
+        with response:
+            if response.status_code != 200:
+                raise IOError(f"IPFS add failed ({response.status_code}): {response.text[:500]}")
+            results = []
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                entry = json.loads(line)
+                if 'Message' in entry and 'Hash' not in entry:
+                    raise IOError(f"IPFS add failed: {entry['Message']}")
+                if 'Hash' in entry:
+                    results.append(entry)
+        return results
+
+    @staticmethod
+    def _root_cid(results, root_name):
+        for entry in reversed(results):
+            if entry.get('Name') == root_name:
+                return entry['Hash']
+        if results:
+            return results[-1]['Hash']
+        raise IOError("IPFS add returned no CIDs")
@@ -0,0 +1,278 @@
+import re
+import threading
+from bisect import bisect_left, bisect_right, insort
+from rpc_batch import RpcBatch
+
+_TOKEN_PATTERN = re.compile(r'[a-z0-9]+')
+# Below this many candidates (from a text or seller lookup) sorting them beats walking a sorted index.
+SORT_CANDIDATES_BELOW = 2048
+
+
+def tokenize(text):
+    return set(_TOKEN_PATTERN.findall(text.lower())) if text else set()
+
+
+class ListingRecord:
+    __slots__ = ('id', 'seller', 'seller_key', 'name', 'description', 'data_cid', 'metadata_cid',
+                 'price', 'active', 'block_number')
+
+    def __init__(self, listing_id, seller, name, description, data_cid, metadata_cid, price, active=True,
+                 block_number=None):
+        self.id = int(listing_id)
+        self.seller = seller
+        self.seller_key = seller.lower()
+        self.name = name
+        self.description = description or ''
+        self.data_cid = data_cid
+        self.metadata_cid = metadata_cid
+        self.price = int(price)
+        self.active = bool(active)
+        self.block_number = block_number
+
+    @classmethod
+    def from_tuple(cls, raw):
+        """A DataRegistry Listing struct as returned by getListing / getActiveListingsDetails."""
+        listing_id, seller, name, description, data_cid, metadata_cid, price, active = raw[:8]
+        return cls(listing_id, seller, name, description, data_cid, metadata_cid, price, active)
+
+    @classmethod
+    def from_dict(cls, listing):
+        return cls(
+            listing['id'], listing['seller'], listing['name'], listing.get('description'), listing['dataCID'],
+            listing['metadataCID'], listing['price_token_wei'], listing.get('active', True),
+            listing.get('block_number'),
+        )
+
+    def to_dict(self):
+        return {
+            'id': self.id, 'seller': self.seller, 'name': self.name, 'description': self.description,
+            'dataCID': self.data_cid, 'metadataCID': self.metadata_cid, 'price_token_wei': self.price,
+            'active': self.active, 'block_number': self.block_number,
+        }
+
+    def tokens(self):
+        return tokenize(self.name) | tokenize(self.description)
+
+
+class ListingCatalog:
+    """In-memory listings with price, id, seller and word indexes for fast selection.
+
+    Listings come from getActiveListingsDetails pages (`load_pages`) or from
+    a ListingIndex (`sync_from_index`). `query()` filters by price range,
+    sellers and words in the name or description (all words must match),
+    and returns ListingRecords in price, id or newest-first order.
+    """
+
+    def __init__(self):
+        self._records = {}
+        self._by_price = []
+        self._ids = []
+        self._by_seller = {}
+        self._by_token = {}
+        self.synced_block = None
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._records)
+
+    def __contains__(self, listing_id):
+        return int(listing_id) in self._records
+
+    def get(self, listing_id):
+        return self._records.get(int(listing_id))
+
+    def clear(self):
+        with self._lock:
+            self._records.clear()
+            self._by_price = []
+            self._ids = []
+            self._by_seller.clear()
+            self._by_token.clear()
+            self.synced_block = None
+
+    def _index(self, record):
+        self._records[record.id] = record
+        self._by_seller.setdefault(record.seller_key, set()).add(record.id)
+        for token in record.tokens():
+            self._by_token.setdefault(token, set()).add(record.id)
+
+    def _unindex(self, record):
+        del self._records[record.id]
+        self._discard(self._by_seller, record.seller_key, record.id)
+        for token in record.tokens():
+            self._discard(self._by_token, token, record.id)
+
+    @staticmethod
+    def _discard(buckets, key, listing_id):
+        bucket = buckets.get(key)
+        if bucket is not None:
+            bucket.discard(listing_id)
+            if not bucket:
+                del buckets[key]
+
+    def add(self, record):
+        with self._lock:
+            self._remove(record.id)
+            self._index(record)
+            insort(self._by_price, (record.price, record.id))
+            insort(self._ids, record.id)
+
+    def add_many(self, records):
+        """Bulk insert: the sorted indexes are rebuilt once instead of kept sorted per record."""
+        with self._lock:
+            for record in records:
+                if record.id in self._records:
+                    self._unindex(self._records[record.id])
+                self._index(record)
+            self._by_price = sorted((record.price, record.id) for record in self._records.values())
+            self._ids = sorted(self._records)
+
+    def remove(self, listing_id):
+        with self._lock:
+            return self._remove(int(listing_id))
+
+    def _remove(self, listing_id):
+        record = self._records.get(listing_id)
+        if record is None:
+            return None
+        self._unindex(record)
+        del self._by_price[bisect_left(self._by_price, (record.price, listing_id))]
+        del self._ids[bisect_left(self._ids, listing_id)]
+        return record
+
+    def load_pages(self, registry_contract, page_size=500, pages_per_request=4):
+        """Replaces the catalog with every active listing, several getActiveListingsDetails pages per round trip."""
+        records = []
+        offset = 0
+        while True:
+            batch = RpcBatch(registry_contract.w3)
+            reads = [
+                batch.call(registry_contract.functions.getActiveListingsDetails(page_size, offset + index * page_size))
+                for index in range(pages_per_request)
+            ]
+            batch.execute()
+            done = False
+            for read in reads:
+                page = read.get()
+                records.extend(ListingRecord.from_tuple(raw) for raw in page)
+                if len(page) < page_size:
+                    done = True
+                    break
+            if done:
+                break
+            offset += page_size * pages_per_request
+        with self._lock:
+            self.clear()
+            self.add_many(records)
+        return len(records)
+
+    def sync_from_index(self, listing_index):
+        """Brings the catalog up to the index's checkpoint, re-reading the blocks a sync may have rewritten."""
+        with self._lock:
+            checkpoint = listing_index.checkpoint
+            if checkpoint is None:
+                return 0
+            if self.synced_block is None:
+                from_block = 0
+            else:
+                from_block = max(0, self.synced_block - listing_index.confirmations + 1)
+            # Listing ids grow with block number, so the rows to drop are at the end of the id index.
+            stale = []
+            for listing_id in reversed(self._ids):
+                record = self._records[listing_id]
+                if record.block_number is not None and record.block_number < from_block:
+                    break
+                stale.append(listing_id)
+            for listing_id in stale:
+                self._remove(listing_id)
+            records = [ListingRecord.from_dict(row) for row in listing_index.listings_since(from_block)]
+            if len(records) > 64:
+                self.add_many(records)
+            else:
+                for record in records:
+                    self.add(record)
+            self.synced_block = checkpoint
+            return len(records)
+
+    def query(self, text=None, seller=None, sellers=None, exclude_seller=None, exclude_sellers=None,
+              min_price_wei=None, max_price_wei=None, order_by='price', limit=None, offset=0, active_only=True,
+              exclude_ids=None):
+        """Listings matching every given filter; `order_by` is 'price', 'id' or 'newest'.
+
+        `exclude_ids` is any container of listing ids (a set, an EntitlementStore).
+        """
+        with self._lock:
+            required = self._required_sets(text, seller, sellers)
+            if required and not required[0]:
+                return []
+            excluded = {address.lower() for address in (exclude_sellers or ())}
+            if exclude_seller:
+                excluded.add(exclude_seller.lower())
+
+            def accept(record):
+                return (
+                    (not active_only or record.active)
+                    and record.seller_key not in excluded
+                    and (exclude_ids is None or record.id not in exclude_ids)
+                    and (min_price_wei is None or record.price >= min_price_wei)
+                    and (max_price_wei is None or record.price <= max_price_wei)
+                )
+
+            wanted = None if limit is None else offset + limit
+            if required and len(required[0]) < SORT_CANDIDATES_BELOW:
+                others = required[1:]
+                records = [
+                    self._records[listing_id] for listing_id in required[0]
+                    if all(listing_id in other for other in others)
+                ]
+                matches = sorted((record for record in records if accept(record)), key=self._sort_key(order_by))
+                return matches[offset:wanted]
+
+            # Walk the sorted index and stop at `wanted`; set lookups stand in for an intersection.
+            matches = []
+            for listing_id in self._walk(order_by, min_price_wei, max_price_wei):
+                if required and not all(listing_id in ids for ids in required):
+                    continue
+                record = self._records[listing_id]
+                if accept(record):
+                    matches.append(record)
+                    if wanted is not None and len(matches) >= wanted:
+                        break
+            return matches[offset:wanted]
+
+    def _required_sets(self, text, seller, sellers):
+        """Id sets a listing must be in for the text and seller filters, smallest first."""
+        required = [self._by_token.get(token, set()) for token in tokenize(text)]
+        seller_keys = {address.lower() for address in (sellers or ())}
+        if seller:
+            seller_keys.add(seller.lower())
+        if len(seller_keys) == 1:
+            required.append(self._by_seller.get(seller_keys.pop(), set()))
+        elif seller_keys:
+            required.append(set().union(*(self._by_seller.get(key, set()) for key in seller_keys)))
+        required.sort(key=len)
+        return required
+
+    def _walk(self, order_by, min_price_wei, max_price_wei):
+        # Index ranges rather than slices: callers usually stop after a few entries. The lock is held meanwhile.
+        if order_by == 'price':
+            by_price = self._by_price
+            start = 0 if min_price_wei is None else bisect_left(by_price, (min_price_wei,))
+            end = len(by_price) if max_price_wei is None else bisect_right(by_price, (max_price_wei, float('inf')))
+            return (by_price[position][1] for position in range(start, end))
+        ids = self._ids
+        if order_by == 'id':
+            return (ids[position] for position in range(len(ids)))
+        if order_by == 'newest':
+            return (ids[position] for position in range(len(ids) - 1, -1, -1))
+        raise ValueError(f"Unknown order_by: {order_by!r}")
+
+    @staticmethod
+    def _sort_key(order_by):
+        if order_by == 'price':
+            return lambda record: (record.price, record.id)
+        if order_by == 'id':
+            return lambda record: record.id
+        if order_by == 'newest':
+            return lambda record: -record.id
+        raise ValueError(f"Unknown order_by: {order_by!r}")
@@ -0,0 +1,308 @@
+import os
+import sqlite3
+import threading
+from web3 import Web3
+from rpc_batch import RpcBatch
+
+DATA_LISTED_SIGNATURE = "DataListed(uint256,address,string,string,string,uint256,address)"
+DATA_PURCHASED_SIGNATURE = "DataPurchased(uint256,address,address,uint256,address)"
+DATA_LISTED_TOPIC = Web3.to_hex(Web3.keccak(text=DATA_LISTED_SIGNATURE))
+DATA_PURCHASED_TOPIC = Web3.to_hex(Web3.keccak(text=DATA_PURCHASED_SIGNATURE))
+
+# uint256 does not fit in an SQLite INTEGER, so prices are stored as
+# zero-padded decimal text which sorts and compares like the number itself.
+PRICE_WIDTH = 78
+
+# getListing reads per round trip when filling in descriptions, which DataListed does not carry.
+DESCRIPTION_READS_PER_BATCH = 200
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS listings (
+    id INTEGER PRIMARY KEY,
+    seller TEXT NOT NULL,
+    name TEXT NOT NULL,
+    description TEXT,
+    data_cid TEXT NOT NULL,
+    metadata_cid TEXT NOT NULL,
+    price TEXT NOT NULL,
+    token_address TEXT,
+    active INTEGER NOT NULL DEFAULT 1,
+    block_number INTEGER NOT NULL,
+    tx_hash TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS listings_seller ON listings (seller);
+CREATE INDEX IF NOT EXISTS listings_price ON listings (price);
+CREATE INDEX IF NOT EXISTS listings_block ON listings (block_number);
+
+CREATE TABLE IF NOT EXISTS purchases (
+    tx_hash TEXT NOT NULL,
+    log_index INTEGER NOT NULL,
+    listing_id INTEGER NOT NULL,
+    buyer TEXT NOT NULL,
+    seller TEXT NOT NULL,
+    price TEXT NOT NULL,
+    block_number INTEGER NOT NULL,
+    PRIMARY KEY (tx_hash, log_index)
+);
+CREATE INDEX IF NOT EXISTS purchases_listing ON purchases (listing_id);
+CREATE INDEX IF NOT EXISTS purchases_buyer ON purchases (buyer);
+CREATE INDEX IF NOT EXISTS purchases_block ON purchases (block_number);
+
+CREATE TABLE IF NOT EXISTS sync_state (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+def _encode_price(price_wei):
+    return f"{int(price_wei):0{PRICE_WIDTH}d}"
+
+
+def _topic0(log):
+    topic = log['topics'][0]
+    return topic if isinstance(topic, str) else Web3.to_hex(topic)
+
+
+class ListingIndex:
+    """Local SQLite mirror of DataRegistry listings, built from event logs.
+
+    `sync()` is the only method that talks to the node; every query reads
+    the local database.
+    """
+
+    def __init__(self, w3, registry_contract, db_path, start_block=0,
+                 chunk_size=2000, confirmations=6):
+        self.w3 = w3
+        self.registry = registry_contract
+        self.registry_address = registry_contract.address
+        self.db_path = db_path
+        self.start_block = start_block
+        self.chunk_size = chunk_size
+        self.max_chunk_size = chunk_size
+        self.confirmations = confirmations
+        self._lock = threading.RLock()
+
+        db_dir = os.path.dirname(os.path.abspath(db_path))
+        os.makedirs(db_dir, exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+        self._check_contract()
+
+    def _check_contract(self):
+        # A redeploy changes the registry address; the old index is useless then.
+        stored = self._get_state('registry_address')
+        if stored and stored.lower() != self.registry_address.lower():
+            print(f"Listing index was built for registry {stored}; rebuilding for {self.registry_address}.")
+            with self._conn:
+                self._conn.execute("DELETE FROM listings")
+                self._conn.execute("DELETE FROM purchases")
+                self._conn.execute("DELETE FROM sync_state")
+        with self._conn:
+            self._set_state('registry_address', self.registry_address)
+
+    def _get_state(self, key):
+        row = self._conn.execute("SELECT value FROM sync_state WHERE key = ?", (key,)).fetchone()
+        return row['value'] if row else None
+
+    def _set_state(self, key, value):
+        self._conn.execute(
+            "INSERT INTO sync_state (key, value) VALUES (?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+            (key, str(value)),
+        )
+
+    @property
+    def checkpoint(self):
+        value = self._get_state('checkpoint_block')
+        return int(value) if value is not None else None
+
+    def sync(self, to_block=None):
+        """Fetch DataListed/DataPurchased logs for blocks not yet indexed.
+
+        The last `confirmations` blocks below the checkpoint are always dropped
+        and re-read, so a shallow reorg never leaves stale rows behind.
+        Descriptions of the new listings are read right after. Returns the
+        number of events ingested.
+        """
+        with self._lock:
+            head = self.w3.eth.block_number if to_block is None else to_block
+            checkpoint = self.checkpoint
+            if checkpoint is None:
+                from_block = self.start_block
+            else:
+                from_block = max(self.start_block, checkpoint - self.confirmations + 1)
+            if from_block > head:
+                return 0
+
+            with self._conn:
+                self._conn.execute("DELETE FROM listings WHERE block_number >= ?", (from_block,))
+                self._conn.execute("DELETE FROM purchases WHERE block_number >= ?", (from_block,))
+
+            ingested = 0
+            chunk_start = from_block
+            while chunk_start <= head:
+                chunk_end = min(chunk_start + self.chunk_size - 1, head)
+                try:
+                    logs = self._get_logs(chunk_start, chunk_end)
+                except Exception as e:
+                    if self.chunk_size <= 1:
+                        raise
+                    # Providers cap the block range or result size; shrink and retry.
+                    self.chunk_size = max(1, self.chunk_size // 2)
+                    print(f"eth_getLogs failed for blocks {chunk_start}-{chunk_end} ({e}). Retrying with chunk size {self.chunk_size}.")
+                    continue
+
+                with self._conn:
+                    for log in logs:
+                        self._ingest(log)
+                    self._set_state('checkpoint_block', chunk_end)
+                ingested += len(logs)
+                chunk_start = chunk_end + 1
+                if self.chunk_size < self.max_chunk_size:
+                    self.chunk_size = min(self.max_chunk_size, self.chunk_size * 2)
+            self.backfill_descriptions()
+            return ingested
+
+    def _get_logs(self, from_block, to_block):
+        return self.w3.eth.get_logs({
+            'address': self.registry_address,
+            'fromBlock': from_block,
+            'toBlock': to_block,
+            'topics': [[DATA_LISTED_TOPIC, DATA_PURCHASED_TOPIC]],
+        })
+
+    def _ingest(self, log):
+        topic = _topic0(log)
+        tx_hash = Web3.to_hex(log['transactionHash'])
+        if topic == DATA_LISTED_TOPIC:
+            event = self.registry.events.DataListed().process_log(log)
+            args = event['args']
+            self._conn.execute(
+                "INSERT OR REPLACE INTO listings "
+                "(id, seller, name, description, data_cid, metadata_cid, price, token_address, active, block_number, tx_hash) "
+                "VALUES (?, ?, ?, NULL, ?, ?, ?, ?, 1, ?, ?)",
+                (
+                    args['listingId'], args['seller'], args['name'], args['dataCID'], args['metadataCID'],
+                    _encode_price(args['price']), args['tokenAddress'], log['blockNumber'], tx_hash,
+                ),
+            )
+        elif topic == DATA_PURCHASED_TOPIC:
+            event = self.registry.events.DataPurchased().process_log(log)
+            args = event['args']
+            self._conn.execute(
+                "INSERT OR REPLACE INTO purchases "
+                "(tx_hash, log_index, listing_id, buyer, seller, price, block_number) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    tx_hash, log['logIndex'], args['listingId'], args['buyer'], args['seller'],
+                    _encode_price(args['price']), log['blockNumber'],
+                ),
+            )
+
+    def backfill_descriptions(self, batch_size=DESCRIPTION_READS_PER_BATCH):
+        """DataListed does not carry the description; read it once per listing via getListing, batched.
+
+        Returns the number of descriptions filled in. Listings whose read
+        fails are tried again on the next call.
+        """
+        with self._lock:
+            filled = 0
+            last_id = -1
+            while True:
+                rows = self._conn.execute(
+                    "SELECT id FROM listings WHERE description IS NULL AND id > ? ORDER BY id LIMIT ?",
+                    (last_id, batch_size),
+                ).fetchall()
+                if not rows:
+                    return filled
+                last_id = rows[-1]['id']
+                batch = RpcBatch(self.w3)
+                reads = [(row['id'], batch.call(self.registry.functions.getListing(row['id']))) for row in rows]
+                batch.execute()
+                with self._conn:
+                    for listing_id, read in reads:
+                        try:
+                            raw_listing = read.get()
+                        except Exception as e:
+                            print(f"Could not backfill description for listing ID {listing_id}: {e}")
+                            continue
+                        self._conn.execute("UPDATE listings SET description = ? WHERE id = ?", (raw_listing[3], listing_id))
+                        filled += 1
+
+    def _row_to_listing(self, row):
+        return {
+            'id': row['id'], 'seller': row['seller'], 'name': row['name'],
+            'description': row['description'] or '', 'dataCID': row['data_cid'],
+            'metadataCID': row['metadata_cid'], 'price_token_wei': int(row['price']),
+            'active': bool(row['active']), 'block_number': row['block_number'],
+        }
+
+    def query(self, limit=None, offset=0, seller=None, exclude_seller=None,
+              min_price_wei=None, max_price_wei=None, order_by='id'):
+        clauses, params = ["active = 1"], []
+        if seller:
+            clauses.append("seller = ? COLLATE NOCASE")
+            params.append(seller)
+        if exclude_seller:
+            clauses.append("seller != ? COLLATE NOCASE")
+            params.append(exclude_seller)
+        if min_price_wei is not None:
+            clauses.append("price >= ?")
+            params.append(_encode_price(min_price_wei))
+        if max_price_wei is not None:
+            clauses.append("price <= ?")
+            params.append(_encode_price(max_price_wei))
+        order = {'id': "id", 'price': "price, id", 'newest': "id DESC"}[order_by]
+        sql = f"SELECT * FROM listings WHERE {' AND '.join(clauses)} ORDER BY {order}"
+        if limit is not None:
+            sql += " LIMIT ? OFFSET ?"
+            params.extend([limit, offset])
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [self._row_to_listing(row) for row in rows]
+
+    def listings_since(self, block_number):
+        """Every listing indexed at or after `block_number`, active or not, in id order."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM listings WHERE block_number >= ? ORDER BY id", (int(block_number),)
+            ).fetchall()
+        return [self._row_to_listing(row) for row in rows]
+
+    def get_listing(self, listing_id):
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM listings WHERE id = ?", (int(listing_id),)).fetchone()
+        return self._row_to_listing(row) if row else None
+
+    def count(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM listings WHERE active = 1").fetchone()[0]
+
+    def purchases(self, buyer=None, listing_id=None):
+        clauses, params = [], []
+        if buyer:
+            clauses.append("buyer = ? COLLATE NOCASE")
+            params.append(buyer)
+        if listing_id is not None:
+            clauses.append("listing_id = ?")
+            params.append(int(listing_id))
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT * FROM purchases {where} ORDER BY block_number, log_index", params
+            ).fetchall()
+        return [
+            {
+                'listing_id': row['listing_id'], 'buyer': row['buyer'], 'seller': row['seller'],
+                'price_token_wei': int(row['price']), 'block_number': row['block_number'],
+                'tx_hash': row['tx_hash'],
+            }
+            for row in rows
+        ]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,126 @@
+import time
+import asyncio
+import threading
+from web3 import AsyncWeb3, WebSocketProvider
+from listing_index import DATA_LISTED_TOPIC
+
+# After a dropped WebSocket the watcher polls, and tries to subscribe again this often.
+WS_RETRY_SECONDS = 30
+
+
+class ListingWatcher:
+    """Follows DataListed events from `from_block` on and hands each new listing to `on_listing`.
+
+    With `ws_url` the node pushes the logs over an eth_subscribe('logs')
+    subscription. Without one, or while the socket is down, the watcher
+    polls eth_blockNumber and reads every new block range with eth_getLogs.
+    `on_listing` is called on the watcher thread in listing order, with the
+    same dicts ListingIndex.query() returns (the event carries no
+    description). A handler that blocks, on a full queue say, holds the
+    watcher back; the block cursor only moves past logs already handled,
+    so nothing is skipped.
+    """
+
+    def __init__(self, w3, registry_contract, on_listing, from_block, poll_interval=1.0, ws_url=None,
+                 chunk_size=2000):
+        self.w3 = w3
+        self.registry = registry_contract
+        self.on_listing = on_listing
+        self.next_block = from_block
+        self.poll_interval = poll_interval
+        self.ws_url = ws_url
+        self.chunk_size = chunk_size
+        self.last_listing_id = None
+        self.mode = None
+        self._ws_retry_at = 0.0
+        self._stopped = threading.Event()
+        self._thread = None
+        self._loop = None
+        self._task = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="listing-watcher", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=5):
+        self._stopped.set()
+        loop, task = self._loop, self._task
+        if loop is not None and task is not None:
+            loop.call_soon_threadsafe(task.cancel)
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self):
+        while not self._stopped.is_set():
+            if self.ws_url and time.monotonic() >= self._ws_retry_at:
+                try:
+                    asyncio.run(self._follow_subscription())
+                except asyncio.CancelledError:
+                    break
+                except Exception as e:
+                    print(f"Listing subscription at {self.ws_url} failed ({e}); polling for new blocks instead.")
+                self._ws_retry_at = time.monotonic() + WS_RETRY_SECONDS
+                continue
+            self.mode = 'poll'
+            try:
+                self.poll_once()
+            except Exception as e:
+                print(f"Polling for DataListed events failed: {e}")
+            self._stopped.wait(self.poll_interval)
+
+    def poll_once(self):
+        """Reads DataListed logs from the cursor up to the head. Returns the number of new listings."""
+        head = self.w3.eth.block_number
+        delivered = 0
+        while self.next_block <= head and not self._stopped.is_set():
+            to_block = min(head, self.next_block + self.chunk_size - 1)
+            logs = self.w3.eth.get_logs({
+                'address': self.registry.address,
+                'fromBlock': self.next_block,
+                'toBlock': to_block,
+                'topics': [DATA_LISTED_TOPIC],
+            })
+            for log in logs:
+                delivered += self._deliver(log)
+            self.next_block = to_block + 1
+        return delivered
+
+    async def _follow_subscription(self):
+        self._loop = asyncio.get_running_loop()
+        self._task = asyncio.current_task()
+        try:
+            if not self._stopped.is_set():
+                await self._read_subscription()
+        finally:
+            self._loop = self._task = None
+
+    async def _read_subscription(self):
+        async with AsyncWeb3(WebSocketProvider(self.ws_url)) as ws_w3:
+            await ws_w3.eth.subscribe('logs', {'address': self.registry.address, 'topics': [DATA_LISTED_TOPIC]})
+            self.mode = 'subscription'
+            print(f"Subscribed to DataListed events at {self.ws_url}.")
+            # Listings made before the subscription took effect are read back with eth_getLogs.
+            await asyncio.to_thread(self.poll_once)
+            async for message in ws_w3.socket.process_subscriptions():
+                log = message['result']
+                if log.get('removed'):
+                    continue
+                await asyncio.to_thread(self._deliver, log)
+                # The block is read again if the socket drops; ids already seen are skipped then.
+                self.next_block = max(self.next_block, log['blockNumber'])
+
+    def _deliver(self, log):
+        args = self.registry.events.DataListed().process_log(log)['args']
+        listing_id = args['listingId']
+        # Listing ids only grow, which makes overlapping reads (catch-up vs subscription, a re-read block) harmless.
+        if self.last_listing_id is not None and listing_id <= self.last_listing_id:
+            return 0
+        listing = {
+            'id': listing_id, 'seller': args['seller'], 'name': args['name'], 'description': '',
+            'dataCID': args['dataCID'], 'metadataCID': args['metadataCID'], 'price_token_wei': args['price'],
+            'active': True, 'block_number': log['blockNumber'],
+        }
+        self.on_listing(listing)
+        self.last_listing_id = listing_id
+        return 1
@@ -0,0 +1,590 @@
+import os
+import json
+import time
+import socket
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import rlp
+from hexbytes import HexBytes
+from eth_abi import encode, decode
+from eth_account import Account
+from eth_account.typed_transactions import TypedTransaction
+from eth_utils import keccak, to_checksum_address, to_hex
+from eth_utils.abi import (
+    get_abi_input_types, get_abi_output_types, function_abi_to_4byte_selector, event_abi_to_log_topic,
+)
+
+DEFAULT_DEPLOYMENT_FILE = os.path.join(os.path.dirname(__file__), '..', 'deployments', 'sepolia.json')
+ERROR_SELECTOR = bytes.fromhex('08c379a0')  # Error(string)
+ZERO_HASH = '0x' + '00' * 32
+GAS = {
+    'transfer_eth': 21000, 'approve': 46000, 'transfer': 52000, 'transferFrom': 60000, 'mint': 70000,
+    'listData': 260000, 'purchaseData': 85000,
+}
+
+
+class Revert(Exception):
+    pass
+
+
+class RpcError(Exception):
+    def __init__(self, code, message, data=None):
+        super().__init__(message)
+        self.code = code
+        self.data = data
+
+
+def _int(value):
+    return int(value, 16) if isinstance(value, str) else value
+
+
+def _address(value):
+    return to_checksum_address(value)
+
+
+def _contract_address(label):
+    return to_checksum_address(keccak(text=f"auraweave-mock-{label}")[-20:])
+
+
+class _Contract:
+    """ABI lookup tables for one emulated contract."""
+
+    def __init__(self, address, abi):
+        self.address = address
+        self.abi = abi
+        self.functions = {}
+        self.events = {}
+        for entry in abi:
+            if entry.get('type') == 'function':
+                self.functions[function_abi_to_4byte_selector(entry)] = entry
+            elif entry.get('type') == 'event':
+                self.events[entry['name']] = entry
+
+    def encode_call(self, function_name, *args):
+        entry = next(e for e in self.functions.values() if e['name'] == function_name and len(e['inputs']) == len(args))
+        return function_abi_to_4byte_selector(entry) + encode(get_abi_input_types(entry), args)
+
+    def decode_call(self, data):
+        entry = self.functions.get(bytes(data[:4]))
+        if entry is None:
+            raise Revert(f"unknown function selector 0x{bytes(data[:4]).hex()}")
+        return entry, decode(get_abi_input_types(entry), bytes(data[4:]))
+
+    def encode_output(self, entry, values):
+        types = get_abi_output_types(entry)
+        if len(types) == 1:
+            values = (values,)
+        return encode(types, values)
+
+    def log(self, event_name, **args):
+        entry = self.events[event_name]
+        topics = [event_abi_to_log_topic(entry)]
+        data_types, data_values = [], []
+        for param in entry['inputs']:
+            value = args[param['name']]
+            if param.get('indexed'):
+                topics.append(encode([param['type']], [value]))
+            else:
+                data_types.append(param['type'])
+                data_values.append(value)
+        return {'address': self.address, 'topics': [to_hex(topic) for topic in topics],
+                'data': to_hex(encode(data_types, data_values))}
+
+
+class MockChain:
+    """In-memory chain running the DataRegistry and MockERC20 logic in Python.
+
+    Every transaction is mined into its own block as soon as it arrives,
+    like Hardhat's automine, and emits the same events as the contracts.
+    State is only kept for the latest block. A `blockNumber` given to
+    eth_call, eth_getBalance, etc. is ignored. This is enough to drive the
+    agents and the faucet end to end without a node. It is not an EVM.
+    """
+
+    def __init__(self, registry_abi, token_abi, chain_id=31337, base_fee_wei=10 ** 9,
+                 priority_fee_wei=10 ** 9, token_owner=None):
+        self.chain_id = chain_id
+        self.base_fee_wei = base_fee_wei
+        self.priority_fee_wei = priority_fee_wei
+        self.token = _Contract(_contract_address('MockERC20'), token_abi)
+        self.registry = _Contract(_contract_address('DataRegistry'), registry_abi)
+        self.token_owner = _address(token_owner) if token_owner else None
+        self.eth_balances = {}
+        self.nonces = {}
+        self.token_balances = {}
+        self.allowances = {}
+        self.total_supply = 0
+        self.listings = {}
+        self.active_listing_ids = []
+        self.blocks = []
+        self.transactions = {}
+        self.receipts = {}
+        self._queued = {}
+        self._lock = threading.RLock()
+        self._mine([], timestamp=int(time.time()))
+
+    @classmethod
+    def from_deployment_file(cls, path=DEFAULT_DEPLOYMENT_FILE, **kwargs):
+        with open(path) as f:
+            deployment = json.load(f)
+        return cls(deployment['DataRegistry']['abi'], deployment['MockERC20']['abi'], **kwargs)
+
+    def deployment(self):
+        """The deployments/<network>.json layout config.py reads, pointing at this chain."""
+        return {
+            'DataRegistry': {'address': self.registry.address, 'abi': self.registry.abi, 'blockNumber': 0},
+            'MockERC20': {'address': self.token.address, 'abi': self.token.abi},
+        }
+
+    @property
+    def head(self):
+        return self.blocks[-1]
+
+    # --- direct state setup (no transaction) ---
+
+    def fund(self, address, wei):
+        with self._lock:
+            address = _address(address)
+            self.eth_balances[address] = self.eth_balances.get(address, 0) + wei
+
+    def mint(self, address, amount_wei):
+        with self._lock:
+            address = _address(address)
+            self.token_balances[address] = self.token_balances.get(address, 0) + amount_wei
+            self.total_supply += amount_wei
+
+    def transact(self, sender, to, data=b'', value=0):
+        """Mines a call from `sender` without a signature; for seeding state with real events."""
+        with self._lock:
+            sender = _address(sender)
+            nonce = self.nonces.get(sender, 0)
+            tx_hash = to_hex(keccak(b'mock-tx' + sender.encode() + nonce.to_bytes(8, 'big')))
+            transaction = {'hash': tx_hash, 'from': sender, 'to': _address(to), 'input': bytes(data), 'value': value,
+                           'nonce': nonce, 'gas': 10 ** 7, 'gasPrice': 0, 'type': 0}
+            self._include(transaction)
+            return self.receipts[tx_hash]
+
+    # --- execution ---
+
+    def execute(self, sender, to, data, value=0, apply=False):
+        """Returns (gas_used, output_bytes, logs); raises Revert."""
+        sender = _address(sender)
+        data = bytes(data or b'')
+        if to is None:
+            raise Revert("contract creation is not supported")
+        to = _address(to)
+        if to == self.token.address:
+            return self._token_call(sender, data, apply)
+        if to == self.registry.address:
+            return self._registry_call(sender, data, apply)
+        if value and apply:
+            self.eth_balances[to] = self.eth_balances.get(to, 0) + value
+        return GAS['transfer_eth'], b'', []
+
+    def _token_call(self, sender, data, apply):
+        entry, args = self.token.decode_call(data)
+        name = entry['name']
+        if name == 'balanceOf':
+            return 0, self.token.encode_output(entry, self.token_balances.get(_address(args[0]), 0)), []
+        if name == 'allowance':
+            return 0, self.token.encode_output(entry, self.allowances.get((_address(args[0]), _address(args[1])), 0)), []
+        if name == 'decimals':
+            return 0, self.token.encode_output(entry, 18), []
+        if name == 'name':
+            return 0, self.token.encode_output(entry, "MockUSDC"), []
+        if name == 'symbol':
+            return 0, self.token.encode_output(entry, "MUSDC"), []
+        if name == 'totalSupply':
+            return 0, self.token.encode_output(entry, self.total_supply), []
+        if name == 'owner':
+            return 0, self.token.encode_output(entry, self.token_owner or '0x' + '00' * 20), []
+        if name == 'approve':
+            spender, amount = _address(args[0]), args[1]
+            if apply:
+                self.allowances[(sender, spender)] = amount
+            return GAS['approve'], self.token.encode_output(entry, True), [
+                self.token.log('Approval', owner=sender, spender=spender, value=amount)]
+        if name == 'transfer':
+            logs = self._move_tokens(sender, _address(args[0]), args[1], apply)
+            return GAS['transfer'], self.token.encode_output(entry, True), logs
+        if name == 'transferFrom':
+            owner, recipient, amount = _address(args[0]), _address(args[1]), args[2]
+            logs = self._spend_allowance(owner, sender, amount, apply) + self._move_tokens(owner, recipient, amount, apply)
+            return GAS['transferFrom'], self.token.encode_output(entry, True), logs
+        if name == 'mint':
+            if self.token_owner and sender != self.token_owner:
+                raise Revert("Ownable: caller is not the owner")
+            recipient, amount = _address(args[0]), args[1]
+            if apply:
+                self.mint(recipient, amount)
+            return GAS['mint'], b'', [self.token.log('Transfer', **{'from': '0x' + '00' * 20, 'to': recipient, 'value': amount})]
+        raise Revert(f"MockERC20.{name} is not emulated")
+
+    def _spend_allowance(self, owner, spender, amount, apply):
+        allowed = self.allowances.get((owner, spender), 0)
+        if allowed < amount:
+            raise Revert("ERC20: insufficient allowance")
+        if apply:
+            self.allowances[(owner, spender)] = allowed - amount
+        return []
+
+    def _move_tokens(self, sender, recipient, amount, apply):
+        balance = self.token_balances.get(sender, 0)
+        if balance < amount:
+            raise Revert("ERC20: transfer amount exceeds balance")
+        if apply:
+            self.token_balances[sender] = balance - amount
+            self.token_balances[recipient] = self.token_balances.get(recipient, 0) + amount
+        return [self.token.log('Transfer', **{'from': sender, 'to': recipient, 'value': amount})]
+
+    def _listing_tuple(self, listing_id):
+        listing = self.listings.get(listing_id)
+        if listing is None:
+            return (0, '0x' + '00' * 20, '', '', '', '', 0, False)
+        return listing
+
+    def _registry_call(self, sender, data, apply):
+        entry, args = self.registry.decode_call(data)
+        name = entry['name']
+        if name == 'acceptedTokenAddress':
+            return 0, self.registry.encode_output(entry, self.token.address), []
+        if name == 'getListing':
+            if not 0 < args[0] <= len(self.listings):
+                raise Revert("Invalid listing ID")
+            return 0, self.registry.encode_output(entry, self._listing_tuple(args[0])), []
+        if name == 'listings':
+            # The public mapping getter returns the struct fields flat, not as one tuple.
+            return 0, encode(get_abi_output_types(entry), self._listing_tuple(args[0])), []
+        if name == 'activeListingIds':
+            if args[0] >= len(self.active_listing_ids):
+                raise Revert("")
+            return 0, self.registry.encode_output(entry, self.active_listing_ids[args[0]]), []
+        if name == 'getActiveListingsDetails':
+            limit, offset = args
+            ids = self.active_listing_ids[offset:offset + limit]
+            return 0, self.registry.encode_output(entry, [self._listing_tuple(i) for i in ids]), []
+        if name == 'listData':
+            listing_name, description, data_cid, metadata_cid, price = args
+            if price <= 0:
+                raise Revert("Price must be > 0")
+            if not data_cid:
+                raise Revert("Data CID required")
+            listing_id = len(self.listings) + 1
+            if apply:
+                self.listings[listing_id] = (listing_id, sender, listing_name, description, data_cid, metadata_cid, price, True)
+                self.active_listing_ids.append(listing_id)
+            return GAS['listData'] + 16 * len(description), b'', [self.registry.log(
+                'DataListed', listingId=listing_id, seller=sender, name=listing_name, dataCID=data_cid,
+                metadataCID=metadata_cid, price=price, tokenAddress=self.token.address)]
+        if name == 'purchaseData':
+            listing = self.listings.get(args[0])
+            if listing is None or not listing[7]:
+                raise Revert("Listing not active")
+            seller, price = listing[1], listing[6]
+            if self.allowances.get((sender, self.registry.address), 0) < price:
+                raise Revert("Check token allowance for DataRegistry contract")
+            logs = self._spend_allowance(sender, self.registry.address, price, apply)
+            logs += self._move_tokens(sender, seller, price, apply)
+            logs.append(self.registry.log('DataPurchased', listingId=args[0], buyer=sender, seller=seller,
+                                          price=price, tokenAddress=self.token.address))
+            return GAS['purchaseData'], b'', logs
+        raise Revert(f"DataRegistry.{name} is not emulated")
+
+    # --- blocks and transactions ---
+
+    def _mine(self, transactions, timestamp=None):
+        number = len(self.blocks)
+        parent = self.blocks[-1]['hash'] if self.blocks else ZERO_HASH
+        block_hash = to_hex(keccak(b'mock-block' + number.to_bytes(8, 'big') + bytes.fromhex(parent[2:])))
+        block = {
+            'number': number, 'hash': block_hash, 'parentHash': parent,
+            'timestamp': timestamp or max(int(time.time()), self.blocks[-1]['timestamp'] + 1),
+            'baseFeePerGas': self.base_fee_wei, 'gasLimit': 30_000_000, 'gasUsed': 0,
+            'transactions': [], 'receipts': [],
+        }
+        self.blocks.append(block)
+        for index, (transaction, receipt) in enumerate(transactions):
+            receipt.update({'blockNumber': number, 'blockHash': block_hash, 'transactionIndex': index})
+            for log in receipt['logs']:
+                log.update({'blockNumber': number, 'blockHash': block_hash, 'transactionIndex': index})
+            transaction.update({'blockNumber': number, 'blockHash': block_hash, 'transactionIndex': index})
+            block['gasUsed'] += receipt['gasUsed']
+            block['transactions'].append(transaction['hash'])
+            block['receipts'].append(receipt)
+        return block
+
+    def _include(self, transaction):
+        sender = transaction['from']
+        if transaction['type'] == 2:
+            price = min(transaction['maxFeePerGas'], self.base_fee_wei + transaction['maxPriorityFeePerGas'])
+        else:
+            price = transaction['gasPrice']
+        status = 1
+        try:
+            gas_used, _, logs = self.execute(sender, transaction['to'], transaction['input'], transaction['value'], apply=False)
+            gas_used = min(gas_used, transaction['gas'])
+            self.execute(sender, transaction['to'], transaction['input'], transaction['value'], apply=True)
+        except Revert:
+            status, gas_used, logs = 0, min(transaction['gas'], 30000), []
+        self.eth_balances[sender] = self.eth_balances.get(sender, 0) - gas_used * price - (transaction['value'] if status else 0)
+        self.nonces[sender] = transaction['nonce'] + 1
+        for log_index, log in enumerate(logs):
+            log.update({'logIndex': log_index, 'transactionHash': transaction['hash'], 'removed': False})
+        receipt = {
+            'transactionHash': transaction['hash'], 'from': sender, 'to': transaction['to'],
+            'gasUsed': gas_used, 'cumulativeGasUsed': gas_used, 'effectiveGasPrice': price,
+            'status': status, 'logs': logs, 'contractAddress': None, 'type': transaction['type'],
+        }
+        self.transactions[transaction['hash']] = transaction
+        self.receipts[transaction['hash']] = receipt
+        self._mine([(transaction, receipt)])
+
+    def send_raw_transaction(self, raw):
+        raw = bytes.fromhex(raw[2:]) if isinstance(raw, str) else bytes(raw)
+        if raw[0] >= 0xc0:
+            nonce, gas_price, gas, to, value, data, *_ = rlp.decode(raw)
+            fields = {'type': 0, 'nonce': int.from_bytes(nonce, 'big'), 'gasPrice': int.from_bytes(gas_price, 'big'),
+                      'gas': int.from_bytes(gas, 'big'), 'to': to or None,
+                      'value': int.from_bytes(value, 'big'), 'input': data}
+        else:
+            decoded = TypedTransaction.from_bytes(HexBytes(raw)).as_dict()
+            fields = {key: decoded.get(key) for key in ('type', 'nonce', 'gas', 'value', 'maxFeePerGas', 'maxPriorityFeePerGas', 'gasPrice')}
+            fields.update({'to': decoded.get('to') or None, 'input': bytes(decoded.get('data') or b'')})
+            if decoded.get('chainId') not in (None, self.chain_id):
+                raise RpcError(-32000, f"invalid chain id {decoded.get('chainId')}")
+        fields['to'] = _address(fields['to']) if fields['to'] else None
+        fields['from'] = Account.recover_transaction(raw)
+        fields['hash'] = to_hex(keccak(raw))
+        with self._lock:
+            if fields['hash'] in self.transactions:
+                raise RpcError(-32000, "already known")
+            expected = self.nonces.get(fields['from'], 0)
+            if fields['nonce'] < expected:
+                raise RpcError(-32000, f"nonce too low: next nonce {expected}, tx nonce {fields['nonce']}")
+            # Future nonces wait for the gap to close, like a node's queued pool.
+            queue = self._queued.setdefault(fields['from'], {})
+            if fields['nonce'] in queue:
+                raise RpcError(-32000, "replacement transaction underpriced")
+            queue[fields['nonce']] = fields
+            while self.nonces.get(fields['from'], 0) in queue:
+                self._include(queue.pop(self.nonces.get(fields['from'], 0)))
+        return fields['hash']
+
+    def block(self, identifier):
+        if identifier in ('latest', 'pending', 'safe', 'finalized', None):
+            return self.head
+        if identifier == 'earliest':
+            return self.blocks[0]
+        number = _int(identifier)
+        return self.blocks[number] if number < len(self.blocks) else None
+
+    def get_logs(self, criteria):
+        if criteria.get('blockHash'):
+            blocks = [block for block in self.blocks if block['hash'] == criteria['blockHash']]
+        else:
+            start = self.block(criteria.get('fromBlock', 'latest'))['number']
+            end_block = self.block(criteria.get('toBlock', 'latest'))
+            end = end_block['number'] if end_block else self.head['number']
+            blocks = self.blocks[start:end + 1]
+        addresses = criteria.get('address')
+        if isinstance(addresses, str):
+            addresses = [addresses]
+        addresses = {address.lower() for address in addresses} if addresses else None
+        topic_filters = [
+            None if wanted is None else {t.lower() for t in ([wanted] if isinstance(wanted, str) else wanted)}
+            for wanted in criteria.get('topics') or []
+        ]
+        matched = []
+        for block in blocks:
+            for receipt in block['receipts']:
+                for log in receipt['logs']:
+                    if addresses is not None and log['address'].lower() not in addresses:
+                        continue
+                    if len(topic_filters) > len(log['topics']):
+                        continue
+                    if all(wanted is None or log['topics'][i].lower() in wanted for i, wanted in enumerate(topic_filters)):
+                        matched.append(log)
+        return matched
+
+
+def _rpc_block(block):
+    fields = {key: value for key, value in block.items() if key != 'receipts'}
+    fields.update({
+        'miner': '0x' + '00' * 20, 'difficulty': 0, 'totalDifficulty': 0, 'extraData': '0x', 'size': 1000,
+        'nonce': '0x' + '00' * 8, 'mixHash': ZERO_HASH, 'sha3Uncles': ZERO_HASH, 'stateRoot': ZERO_HASH,
+        'receiptsRoot': ZERO_HASH, 'transactionsRoot': ZERO_HASH, 'logsBloom': '0x' + '00' * 256, 'uncles': [],
+    })
+    return _quantities(fields)
+
+
+def _rpc_receipt(receipt):
+    fields = dict(receipt, logs=[_quantities(dict(log)) for log in receipt['logs']], logsBloom='0x' + '00' * 256)
+    return _quantities(fields)
+
+
+def _rpc_transaction(transaction):
+    return _quantities(dict(transaction, input=to_hex(transaction['input'])))
+
+
+def _quantities(fields):
+    return {key: hex(value) if isinstance(value, int) and not isinstance(value, bool) else value
+            for key, value in fields.items()}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        super().setup()
+        # Headers and body go out in separate writes; without this, Nagle + delayed ACK add ~40 ms per response.
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        # Request counters, for benchmarks; not part of JSON-RPC and not counted.
+        self._send(200, self.server.rpc.counts())
+
+    def do_POST(self):
+        rpc = self.server.rpc
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        if rpc.latency:
+            time.sleep(rpc.latency)
+        try:
+            payload = json.loads(body)
+        except ValueError:
+            return self._send(200, {'jsonrpc': '2.0', 'id': None, 'error': {'code': -32700, 'message': 'parse error'}})
+        requests_made = payload if isinstance(payload, list) else [payload]
+        rpc.record(requests_made)
+        replies = [rpc.handle(request) for request in requests_made]
+        self._send(200, replies if isinstance(payload, list) else replies[0])
+
+
+class MockRpcServer:
+    """JSON-RPC over HTTP in front of a MockChain, with an optional delay per HTTP round trip.
+
+    The delay is what a remote provider costs each request. Batched calls
+    pay it once, which is the difference the benchmarks are meant to show.
+    `GET /` returns the method and round-trip counts.
+    """
+
+    def __init__(self, chain, latency=0.0, host='127.0.0.1', port=0):
+        self.chain = chain
+        self.latency = latency
+        self.methods = {}
+        self.round_trips = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), _Handler)
+        self._server.daemon_threads = True
+        self._server.rpc = self
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name='mock-rpc', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def record(self, requests_made):
+        with self._lock:
+            self.round_trips += 1
+            for request in requests_made:
+                method = request.get('method') if isinstance(request, dict) else None
+                self.methods[method] = self.methods.get(method, 0) + 1
+
+    def counts(self):
+        with self._lock:
+            return {'round_trips': self.round_trips, 'calls': sum(self.methods.values()), 'methods': dict(self.methods)}
+
+    def handle(self, request):
+        reply = {'jsonrpc': '2.0', 'id': request.get('id')}
+        try:
+            with self.chain._lock:
+                reply['result'] = self.dispatch(request.get('method'), request.get('params') or [])
+        except Revert as e:
+            reason = str(e)
+            reply['error'] = {'code': 3, 'message': f"execution reverted: {reason}",
+                              'data': to_hex(ERROR_SELECTOR + encode(['string'], [reason]))}
+        except RpcError as e:
+            reply['error'] = {'code': e.code, 'message': str(e)}
+            if e.data is not None:
+                reply['error']['data'] = e.data
+        except Exception as e:
+            reply['error'] = {'code': -32603, 'message': f"{type(e).__name__}: {e}"}
+        return reply
+
+    def dispatch(self, method, params):
+        chain = self.chain
+        if method == 'eth_chainId':
+            return hex(chain.chain_id)
+        if method == 'net_version':
+            return str(chain.chain_id)
+        if method == 'web3_clientVersion':
+            return "AuraweaveMockRpc/1.0"
+        if method == 'eth_blockNumber':
+            return hex(chain.head['number'])
+        if method in ('eth_getBlockByNumber', 'eth_getBlockByHash'):
+            if method == 'eth_getBlockByHash':
+                block = next((b for b in chain.blocks if b['hash'] == params[0]), None)
+            else:
+                block = chain.block(params[0])
+            return _rpc_block(block) if block else None
+        if method == 'eth_gasPrice':
+            return hex(chain.base_fee_wei + chain.priority_fee_wei)
+        if method == 'eth_maxPriorityFeePerGas':
+            return hex(chain.priority_fee_wei)
+        if method == 'eth_feeHistory':
+            count = min(_int(params[0]), len(chain.blocks))
+            return {'oldestBlock': hex(chain.head['number'] - count + 1),
+                    'baseFeePerGas': [hex(chain.base_fee_wei)] * (count + 1), 'gasUsedRatio': [0.5] * count,
+                    'reward': [[hex(chain.priority_fee_wei)] * len(params[2] if len(params) > 2 else [])] * count}
+        if method == 'eth_accounts':
+            return []
+        if method == 'eth_getBalance':
+            return hex(chain.eth_balances.get(_address(params[0]), 0))
+        if method == 'eth_getTransactionCount':
+            return hex(chain.nonces.get(_address(params[0]), 0))
+        if method == 'eth_getCode':
+            address = _address(params[0])
+            return '0x6080' if address in (chain.token.address, chain.registry.address) else '0x'
+        if method in ('eth_call', 'eth_estimateGas'):
+            call = params[0]
+            data = call.get('data') or call.get('input') or '0x'
+            gas, output, _ = chain.execute(call.get('from') or '0x' + '00' * 20, call.get('to'),
+                                           bytes.fromhex(data[2:]), _int(call.get('value', 0)))
+            return to_hex(output) if method == 'eth_call' else hex(max(gas, 21000))
+        if method == 'eth_sendRawTransaction':
+            return chain.send_raw_transaction(params[0])
+        if method == 'eth_getTransactionReceipt':
+            receipt = chain.receipts.get(params[0].lower())
+            return _rpc_receipt(receipt) if receipt else None
+        if method == 'eth_getTransactionByHash':
+            transaction = chain.transactions.get(params[0].lower())
+            return _rpc_transaction(transaction) if transaction else None
+        if method == 'eth_getBlockReceipts':
+            block = chain.block(params[0])
+            return [_rpc_receipt(receipt) for receipt in block['receipts']] if block else None
+        if method == 'eth_getLogs':
+            return [_quantities(dict(log)) for log in chain.get_logs(params[0])]
+        if method == 'evm_mine':
+            chain._mine([])
+            return '0x0'
+        raise RpcError(-32601, f"the method {method} does not exist/is not available")
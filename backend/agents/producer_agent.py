@@ -1,41 +1,149 @@
+import os
+import sys
 import time
 import random
 import json
+import argparse
+import tempfile
+from concurrent.futures import ThreadPoolExecutor, wait
 from web3 import Web3
-import ipfshttpclient
-from config import (
-    RPC_URL, PRODUCER_PRIVATE_KEY, IPFS_CLIENT_URL,
-    DATA_REGISTRY_ADDRESS, DATA_REGISTRY_ABI,
-)
-
-w3 = Web3(Web3.HTTPProvider(RPC_URL))
-if not w3.is_connected():
-    print(f"ERROR: Failed to connect to Ethereum node at {RPC_URL}")
-    exit()
-
-if not PRODUCER_PRIVATE_KEY:
-    print("ERROR: PRODUCER_PRIVATE_KEY not found in environment. Exiting.")
-    exit()
-producer_account = w3.eth.account.from_key(PRODUCER_PRIVATE_KEY)
-print(f"Producer Agent Address: {producer_account.address}")
-try:
-    balance_eth = w3.from_wei(w3.eth.get_balance(producer_account.address), 'ether')
-    print(f"Producer Balance (ETH for gas): {balance_eth} ETH")
-except Exception as e:
-    print(f"Could not fetch ETH balance for producer: {e}")
-
-
-try:
-    ipfs_client = ipfshttpclient.connect(IPFS_CLIENT_URL)
-    print(f"Connected to IPFS node: {IPFS_CLIENT_URL}")
-except Exception as e:
-    print(f"ERROR: Could not connect to IPFS: {e}. Make sure IPFS daemon is running.")
-    ipfs_client = None 
-
-if not DATA_REGISTRY_ADDRESS or not DATA_REGISTRY_ABI:
-    print("ERROR: DataRegistry contract address or ABI not loaded from config. Exiting producer.")
-    exit()
-data_registry_contract = w3.eth.contract(address=DATA_REGISTRY_ADDRESS, abi=DATA_REGISTRY_ABI)
+from web3.exceptions import TransactionNotFound
+import config
+from clients import get_web3, get_contract, require_connection, memoized
+from chain_state import get_chain_state
+from receipt_tracker import TransactionReplaced
+from tx_engine import get_tx_engine, TransactionRejected
+from ipfs_upload import IpfsUploader
+from listing_index import ListingIndex
+from publish_manifest import PublishManifest, hash_bytes, hash_path, hash_columns, json_bytes
+from record_stream import iter_records
+from columnar import FORMATS as COLUMNAR_FORMATS, SENSOR_SCHEMA, records_to_columns, describe_columns, write_columns
+from metrics import get_metrics, IPFS_REQUESTS
+from tracing import get_tracer, configure_logging
+
+# Importing this module reads no settings and touches nothing; the getters
+# below build what they need on first use, and start() checks it all.
+tracer = get_tracer()
+
+
+@memoized
+def get_w3():
+    return get_web3(config.RPC_URLS, hedge_reads=config.RPC_HEDGE_READS)
+
+
+@memoized
+def get_producer_account():
+    if not config.PRODUCER_PRIVATE_KEY:
+        raise ValueError("PRODUCER_PRIVATE_KEY not found in environment.")
+    return get_w3().eth.account.from_key(config.PRODUCER_PRIVATE_KEY)
+
+
+def get_data_registry_contract():
+    if not config.DATA_REGISTRY_ADDRESS or not config.DATA_REGISTRY_ABI:
+        raise ValueError("DataRegistry contract address or ABI not loaded from config.")
+    return get_contract(get_w3(), config.DATA_REGISTRY_ADDRESS, config.DATA_REGISTRY_ABI)
+
+
+def get_chain_cache():
+    return get_chain_state(get_w3())
+
+
+def get_engine():
+    return get_tx_engine(get_w3(), get_producer_account())
+
+
+def configure_runtime():
+    """Metrics, logging and tracing setup from config; run by the CLI rather than on import."""
+    if config.METRICS_SNAPSHOT_FILE:
+        get_metrics().dump_at_exit(config.METRICS_SNAPSHOT_FILE)
+    configure_logging(config.LOG_LEVEL)
+    if config.TRACE_FILE:
+        tracer.configure(config.TRACE_FILE, config.TRACE_SAMPLE_RATE)
+
+
+@memoized
+def get_ipfs_client():
+    try:
+        import ipfshttpclient
+        client = ipfshttpclient.connect(config.IPFS_CLIENT_URL)
+        print(f"Connected to IPFS node: {config.IPFS_CLIENT_URL}")
+        return client
+    except Exception as e:
+        print(f"ERROR: Could not connect to IPFS: {e}. Make sure IPFS daemon is running.")
+        return None
+
+
+@memoized
+def get_ipfs_uploader():
+    try:
+        # Talks to /api/v0/add directly, so it also works with daemons newer than ipfshttpclient supports.
+        uploader = IpfsUploader(config.IPFS_CLIENT_URL, chunker=config.IPFS_ADD_CHUNKER, cid_version=config.IPFS_ADD_CID_VERSION)
+        print(f"IPFS streaming uploads via {uploader.api_url} (daemon {uploader.version()})")
+        return uploader
+    except Exception as e:
+        print(f"WARNING: IPFS API not reachable for streaming uploads: {e}")
+        return None
+
+
+@memoized
+def get_listing_index():
+    try:
+        return ListingIndex(
+            get_w3(), get_data_registry_contract(), config.LISTING_INDEX_DB,
+            start_block=config.DATA_REGISTRY_START_BLOCK, chunk_size=config.LOG_CHUNK_BLOCKS,
+            confirmations=config.REORG_CONFIRMATIONS,
+        )
+    except Exception as e:
+        print(f"WARNING: Could not open listing index at {config.LISTING_INDEX_DB}: {e}")
+        return None
+
+
+@memoized
+def get_publish_manifest():
+    try:
+        return PublishManifest(config.PUBLISH_MANIFEST_DB, config.DATA_REGISTRY_ADDRESS)
+    except Exception as e:
+        print(f"WARNING: Could not open publish manifest at {config.PUBLISH_MANIFEST_DB}: {e}. "
+              f"Datasets will be uploaded and listed without checking for earlier runs.")
+        return None
+
+
+def reconcile_publish_manifest():
+    """Trues the publish manifest up against this producer's DataListed events."""
+    manifest = get_publish_manifest()
+    listing_index = get_listing_index()
+    if not manifest or not listing_index:
+        return False
+    try:
+        listing_index.sync()
+    except Exception as e:
+        print(f"Could not read DataListed events; publish manifest not reconciled: {e}")
+        return False
+    added, confirmed, forgotten = manifest.reconcile(get_producer_account().address, listing_index)
+    uploads, listings = manifest.counts()
+    print(f"Publish manifest: {uploads} uploads, {listings} live listings "
+          f"({added} found on chain, {confirmed} confirmed, {forgotten} no longer on chain).")
+    return True
+
+
+def start():
+    """Checks the settings and the node and shows the account; run by the CLI rather than on import."""
+    configure_runtime()
+    config.print_config_summary()
+    try:
+        get_producer_account()
+        get_data_registry_contract()
+        require_connection(get_w3())
+    except (ValueError, ConnectionError) as e:
+        print(f"ERROR: {e} Exiting producer.")
+        exit()
+    print(f"Producer Agent Address: {get_producer_account().address}")
+    try:
+        balance_eth = Web3.from_wei(get_w3().eth.get_balance(get_producer_account().address), 'ether')
+        print(f"Producer Balance (ETH for gas): {balance_eth} ETH")
+    except Exception as e:
+        print(f"Could not fetch ETH balance for producer: {e}")
+    reconcile_publish_manifest()
 
 
 def generate_dummy_data(sensor_id="aura_sensor_01"):
@@ -47,75 +155,224 @@ def generate_dummy_data(sensor_id="aura_sensor_01"):
         "co2_ppm": random.randint(400, 1200)
     }
 
-def generate_dummy_metadata(data_name):
-    return {
+def generate_dummy_readings(sensor_id="aura_sensor_01", count=1000, interval_seconds=60.0):
+    """`count` readings from one sensor, oldest first, `interval_seconds` apart and ending now."""
+    start_time = time.time() - interval_seconds * (count - 1)
+    for index in range(count):
+        reading = generate_dummy_data(sensor_id)
+        reading["timestamp"] = start_time + index * interval_seconds
+        yield reading
+
+def generate_dummy_metadata(data_name, layout=None):
+    metadata = {
         "name": data_name,
         "data_type": "environmental_sensor",
         "schema": {"timestamp": "unix_float", "sensor_id": "string", "temperature_celsius": "float", "...": "..."}
     }
+    if layout:
+        # Columnar datasets: the format, row count and exact column dtypes (see columnar.describe_columns).
+        metadata.update(format=layout['format'], rows=layout['rows'], schema=layout['columns'])
+    return metadata
+
+def uploaded_cid(content_hash, label):
+    """The CID an earlier run got for this content, if the publish manifest has it."""
+    manifest = get_publish_manifest()
+    cid = manifest.cid_for(content_hash) if manifest else None
+    if cid:
+        print(f"'{label}' already uploaded (CID {cid}); skipping upload.")
+    return cid
+
+
+def remember_upload(content_hash, cid, size=None):
+    manifest = get_publish_manifest()
+    if manifest and cid:
+        manifest.record_upload(content_hash, cid, size)
+
 
 def upload_to_ipfs(content_dict, filename_hint="file.json"):
     
+    content_bytes = json_bytes(content_dict)
+    content_hash = hash_bytes(content_bytes)
+    known_cid = uploaded_cid(content_hash, filename_hint)
+    if known_cid:
+        return known_cid
+    ipfs_client = get_ipfs_client()
     if not ipfs_client:
         print(f"Skipping IPFS upload for {filename_hint} as client is not available.")
         return f"DUMMY_CID_FOR_{filename_hint.split('.')[0]}"
     try:
-        content_bytes = json.dumps(content_dict).encode('utf-8')
-        res = ipfs_client.add_bytes(content_bytes)
+        with tracer.span('ipfs.add', bytes=len(content_bytes)), IPFS_REQUESTS.time('add', config.IPFS_CLIENT_URL):
+            res = ipfs_client.add_bytes(content_bytes)
         print(f"Content '{filename_hint}' uploaded to IPFS. CID: {res}")
+        remember_upload(content_hash, res, len(content_bytes))
         return res
     except Exception as e:
         print(f"Error uploading {filename_hint} to IPFS: {e}")
         return None
 
 
+def print_upload_progress(label, min_interval=1.0):
+    last_printed = [0.0]
+
+    def report(sent, total):
+        now = time.monotonic()
+        if now - last_printed[0] < min_interval and sent != total:
+            return
+        last_printed[0] = now
+        if total:
+            print(f"  Uploading {label}: {sent / 1024 / 1024:.1f} / {total / 1024 / 1024:.1f} MiB")
+        else:
+            print(f"  Uploading {label}: {sent / 1024 / 1024:.1f} MiB")
+    return report
+
+
+def upload_path_to_ipfs(path, progress=None, content_hash=None):
+    """Streams a file or a whole directory to IPFS and returns the root CID.
+
+    Content the publish manifest already has a CID for is not sent again;
+    `content_hash` saves hashing the path when the caller knows it.
+    """
+    content_hash = content_hash or hash_path(path)
+    known_cid = uploaded_cid(content_hash, path)
+    if known_cid:
+        return known_cid
+    ipfs_uploader = get_ipfs_uploader()
+    if not ipfs_uploader:
+        print(f"Skipping IPFS upload for {path} as client is not available.")
+        return f"DUMMY_CID_FOR_{os.path.basename(path.rstrip(os.sep)).split('.')[0]}"
+    try:
+        res = ipfs_uploader.add_path(path, progress=progress or print_upload_progress(path))
+        print(f"'{path}' uploaded to IPFS. CID: {res}")
+        remember_upload(content_hash, res)
+        return res
+    except Exception as e:
+        print(f"Error uploading {path} to IPFS: {e}")
+        return None
+
+
+def upload_records_to_ipfs(records, filename_hint="records.ndjson", progress=None):
+    """Streams records from any iterable (e.g. a generator reading a sensor export) to IPFS as NDJSON."""
+    ipfs_uploader = get_ipfs_uploader()
+    if not ipfs_uploader:
+        print(f"Skipping IPFS upload for {filename_hint} as client is not available.")
+        return f"DUMMY_CID_FOR_{filename_hint.split('.')[0]}"
+    try:
+        res = ipfs_uploader.add_records(records, filename=filename_hint,
+                                        progress=progress or print_upload_progress(filename_hint))
+        print(f"Records '{filename_hint}' uploaded to IPFS. CID: {res}")
+        return res
+    except Exception as e:
+        print(f"Error uploading {filename_hint} to IPFS: {e}")
+        return None
+
+
+def upload_columns_to_ipfs(records, data_format="npz", filename_hint="readings", schema=SENSOR_SCHEMA):
+    """Packs records into one columnar file (COLUMNAR_FORMATS) and uploads it.
+
+    Returns (cid, layout); `layout` belongs in the metadata so consumers know
+    how to map the file.
+    """
+    columns = records_to_columns(records, schema)
+    layout = describe_columns(columns, data_format)
+    content_hash = hash_columns(columns, data_format)
+    known_cid = uploaded_cid(content_hash, filename_hint)
+    if known_cid:
+        return known_cid, layout
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = write_columns(columns, os.path.join(tmp_dir, f"{filename_hint}.{data_format}"), data_format)
+        print(f"Packed {layout['rows']} rows into {os.path.getsize(path)} bytes of {data_format}.")
+        return upload_path_to_ipfs(path, content_hash=content_hash), layout
+
+
+def listing_id_from_receipt(receipt):
+    events = get_data_registry_contract().events.DataListed().process_receipt(receipt)
+    return events[0]['args']['listingId'] if events else None
+
+
+def published_listing(data_cid):
+    """This producer's listing of `data_cid` from the publish manifest, or None if it still needs listing.
+
+    The row has a `listing_id` once confirmed. A listing an earlier run sent
+    but never saw confirmed is looked up by its tx hash: mined, it is
+    recorded; still pending, the row comes back without a `listing_id`;
+    dropped or reverted, it is forgotten so it gets listed again.
+    """
+    manifest = get_publish_manifest()
+    row = manifest.listing_for(get_producer_account().address, data_cid) if manifest else None
+    if not row or row['listing_id'] is not None:
+        return row
+    if not row['tx_hash']:
+        return None
+    try:
+        receipt = get_w3().eth.get_transaction_receipt(row['tx_hash'])
+    except TransactionNotFound:
+        try:
+            get_w3().eth.get_transaction(row['tx_hash'])
+        except TransactionNotFound:
+            manifest.forget_listing(get_producer_account().address, data_cid)
+            return None
+        print(f"Listing tx {row['tx_hash']} for {data_cid} is still pending; not listing it again.")
+        return row
+    listing_id = listing_id_from_receipt(receipt) if receipt['status'] == 1 else None
+    if listing_id is None:
+        manifest.forget_listing(get_producer_account().address, data_cid)
+        return None
+    manifest.record_listed(get_producer_account().address, data_cid, listing_id, receipt['blockNumber'])
+    return manifest.listing_for(get_producer_account().address, data_cid)
+
+
+def remember_listing_sent(data_cid, metadata_cid, name, tx_hash):
+    manifest = get_publish_manifest()
+    if manifest:
+        manifest.record_sent(get_producer_account().address, data_cid, metadata_cid, name, tx_hash)
+
+
+def remember_listing(data_cid, listing_id, block_number, tx_hash=None):
+    manifest = get_publish_manifest()
+    if manifest and listing_id is not None:
+        manifest.record_listed(get_producer_account().address, data_cid, listing_id, block_number, tx_hash)
+
+
 def list_data_on_chain(name, description, data_cid, metadata_cid, price_mock_stablecoin_units):
-    price_token_wei = w3.to_wei(price_mock_stablecoin_units, 'ether') 
+    with tracer.span('listing', data_cid=data_cid) as span:
+        listed = _list_data_on_chain(name, description, data_cid, metadata_cid, price_mock_stablecoin_units)
+        span.set(ok=listed)
+    return listed
+
+
+def _list_data_on_chain(name, description, data_cid, metadata_cid, price_mock_stablecoin_units):
+    price_token_wei = Web3.to_wei(price_mock_stablecoin_units, 'ether') 
 
     print(f"\nAttempting to list data: '{name}'")
     print(f"  Data CID: {data_cid}, Metadata CID: {metadata_cid}, Price: {price_mock_stablecoin_units} MUSDC ({price_token_wei} token_wei)")
+    existing = published_listing(data_cid)
+    if existing:
+        if existing['listing_id'] is not None:
+            print(f"Data CID {data_cid} is already listed as ID {existing['listing_id']}; not listing it again.")
+        return True
 
     try:
-        nonce = w3.eth.get_transaction_count(producer_account.address)
-        
-        try:
-            estimated_gas = data_registry_contract.functions.listData(
-                name, description, data_cid, metadata_cid, price_token_wei
-            ).estimate_gas({'from': producer_account.address})
-        except Exception as e:
-            print(f"Gas estimation failed for listData: {e}. Using default.")
-            estimated_gas = 600000 
-        tx_params = {
-            'from': producer_account.address, 'nonce': nonce,
-            'gas': estimated_gas + 50000, 
-            
-        }
-        if hasattr(w3.eth, 'max_priority_fee'):
-            tx_params['maxPriorityFeePerGas'] = w3.eth.max_priority_fee
-            tx_params['maxFeePerGas'] = w3.eth.gas_price * 2 + w3.eth.max_priority_fee
-
-
-        transaction = data_registry_contract.functions.listData(
+        call = get_data_registry_contract().functions.listData(
             name, description, data_cid, metadata_cid, price_token_wei
-        ).build_transaction(tx_params)
-
-        signed_tx = w3.eth.account.sign_transaction(transaction, PRODUCER_PRIVATE_KEY)
-  
+        )
         try:
-            tx_hash_bytes = w3.eth.send_raw_transaction(signed_tx.raw_transaction) 
-            tx_hash = w3.to_hex(tx_hash_bytes)
-            print(f"LISTING TX SENT: {tx_hash}")
+            submission = get_engine().submit(call, default_gas=650000, label=f"listing '{name}'")
+        except TransactionRejected as e:
+            print(f"ERROR: Listing '{name}' rejected by the contract: {e}")
+            return False
         except Exception as e_send:
             print(f"Error sending raw transaction: {e_send}")
             import traceback
             traceback.print_exc()
             return False
+        print(f"LISTING TX SENT: {submission.tx_hash}")
+        remember_listing_sent(data_cid, metadata_cid, name, submission.tx_hash)
         print(f"Waiting for tx receipt (listing: '{name}')...")
-        tx_receipt = w3.eth.wait_for_transaction_receipt(tx_hash, timeout=240)
+        tx_receipt = submission.wait()
 
         if tx_receipt.status == 1:
             print(f"SUCCESS: Data '{name}' listed. Block: {tx_receipt.blockNumber}")
-           
+            remember_listing(data_cid, listing_id_from_receipt(tx_receipt), tx_receipt.blockNumber, submission.tx_hash)
             return True
         else:
             print(f"ERROR: Listing tx for '{name}' FAILED. Receipt: {tx_receipt}")
@@ -126,14 +383,226 @@ def list_data_on_chain(name, description, data_cid, metadata_cid, price_mock_sta
         traceback.print_exc()
         return False
 
-if __name__ == "__main__":
+
+def load_manifest(manifest_path):
+    """A manifest is a JSON array, or NDJSON, of datasets:
+
+    {"name": ..., "description": ..., "price": 0.5,
+     "data": {...} | "data_file": "path", "metadata": {...} | "metadata_file": "path"}
+
+    `data_file` may also be a directory, which is uploaded as one IPFS
+    directory. Relative file paths are resolved against the manifest's directory. Metadata
+    is generated when omitted.
+
+    With "format": "npz" or "arrow", `data` (a list of records) or
+    `data_file` (JSON/NDJSON records) is packed into that columnar format
+    first; "schema" maps columns to numpy dtypes (SENSOR_SCHEMA by default).
+    """
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        text = f.read()
+    stripped = text.lstrip()
+    if stripped.startswith('['):
+        entries = json.loads(text)
+    else:
+        entries = [json.loads(line) for line in text.splitlines() if line.strip()]
+    base_dir = os.path.dirname(os.path.abspath(manifest_path))
+    for entry in entries:
+        for key in ('data_file', 'metadata_file'):
+            if entry.get(key) and not os.path.isabs(entry[key]):
+                entry[key] = os.path.join(base_dir, entry[key])
+    return entries
+
+
+def upload_manifest_item(item):
+    entry = item['entry']
+    if not item.get('dataCID'):
+        if entry.get('format') in COLUMNAR_FORMATS:
+            records = iter_records(entry['data_file']) if entry.get('data_file') else entry.get('data', [])
+            try:
+                item['dataCID'], item['layout'] = upload_columns_to_ipfs(
+                    records, entry['format'], f"{entry['name']}-data", entry.get('schema') or SENSOR_SCHEMA,
+                )
+            except (ImportError, KeyError, TypeError, ValueError) as e:
+                print(f"Could not pack '{entry['name']}' as {entry['format']}: {e}")
+                item['dataCID'] = None
+        elif entry.get('data_file'):
+            item['dataCID'] = upload_path_to_ipfs(entry['data_file'])
+        else:
+            item['dataCID'] = upload_to_ipfs(entry.get('data', {}), f"{entry['name']}-data.json")
+    if not item.get('metadataCID'):
+        if entry.get('metadata_file'):
+            item['metadataCID'] = upload_path_to_ipfs(entry['metadata_file'])
+        else:
+            metadata = entry.get('metadata') or generate_dummy_metadata(entry['name'], item.get('layout'))
+            item['metadataCID'] = upload_to_ipfs(metadata, f"{entry['name']}-meta.json")
+    if not item['dataCID'] or not item['metadataCID']:
+        item['status'] = 'upload_failed'
+        item['error'] = "IPFS upload failed"
+        return item
+    item['status'] = 'uploaded'
+    existing = published_listing(item['dataCID'])
+    if existing:
+        # Listed by an earlier run (or still pending from one): nothing to send.
+        item['listingId'] = existing['listing_id']
+        item['txHash'] = existing['tx_hash']
+        item['blockNumber'] = existing['block_number']
+        item['status'] = 'listed' if existing['listing_id'] is not None else 'unconfirmed'
+        item['error'] = None if existing['listing_id'] is not None else "listing tx from an earlier run is pending"
+        item['deduplicated'] = True
+    return item
+
+
+def submit_listing_batch(items, receipt_timeout=240):
+    """Sends listData for every item back-to-back on consecutive nonces from the tx engine.
+
+    Gas is estimated for the whole batch in one round trip. The engine keeps
+    the nonce sequence intact when a send fails, so one failure does not hold
+    back the rest; the failed item goes out again in the next round.
+    """
+    calls = [
+        get_data_registry_contract().functions.listData(
+            item['entry']['name'], item['entry'].get('description', ''),
+            item['dataCID'], item['metadataCID'], Web3.to_wei(item['entry']['price'], 'ether'),
+        )
+        for item in items
+    ]
+    gas_limits = get_engine().estimate_many(calls, default_gas=650000)
+    fee_state = get_chain_cache().fees()
+
+    sent = []
+    for item, call, gas in zip(items, calls, gas_limits):
+        if isinstance(gas, TransactionRejected):
+            # Would revert on-chain too; don't spend gas on it, and don't retry.
+            item['status'] = 'rejected'
+            item['error'] = str(gas)
+            print(f"Listing '{item['entry']['name']}' rejected by the contract: {gas}")
+            continue
+        item['attempts'] += 1
+        try:
+            submission = get_engine().submit(
+                call, gas=gas, fee_state=fee_state, timeout=receipt_timeout,
+                label=f"listing '{item['entry']['name']}'",
+            )
+        except Exception as e:
+            item['status'] = 'send_failed'
+            item['error'] = str(e)
+            print(f"Error sending listing tx for '{item['entry']['name']}': {e}")
+            continue
+        item['status'] = 'sent'
+        item['txHash'] = submission.tx_hash
+        item['nonce'] = submission.nonce
+        item['receipt'] = submission.receipt
+        remember_listing_sent(item['dataCID'], item['metadataCID'], item['entry']['name'], submission.tx_hash)
+        sent.append(item)
+        print(f"LISTING TX SENT (nonce {item['nonce']}): {item['txHash']} '{item['entry']['name']}'")
+    return sent
+
+
+def collect_listing_receipts(items):
+    # The shared tracker polls every pending listing together; this just waits on the results.
+    wait([item['receipt'] for item in items])
+    for item in items:
+        try:
+            receipt = item.pop('receipt').result()
+        except TransactionReplaced as e:
+            item['status'] = 'replaced'
+            item['error'] = str(e)
+            continue
+        except TimeoutError as e:
+            # Still in the mempool: re-listing with a new nonce could list it twice, so leave it to the caller.
+            item['status'] = 'unconfirmed'
+            item['error'] = str(e)
+            continue
+        item['blockNumber'] = receipt['blockNumber']
+        if receipt['status'] == 1:
+            item['status'] = 'listed'
+            item['error'] = None
+            item['listingId'] = listing_id_from_receipt(receipt)
+            remember_listing(item['dataCID'], item['listingId'], receipt['blockNumber'], item['txHash'])
+        else:
+            item['status'] = 'reverted'
+            item['error'] = f"listData reverted in block {receipt['blockNumber']}"
+
+
+def skip_duplicate_items(items, to_send):
+    """Entries of one manifest with the same data share a CID: only the first is listed."""
+    first_by_cid = {}
+    for item in items:
+        first_by_cid.setdefault(item['dataCID'], item)
+    kept = []
+    for item in to_send:
+        first = first_by_cid[item['dataCID']]
+        if first is item:
+            kept.append(item)
+        else:
+            item['status'] = 'duplicate'
+            item['error'] = f"same data as #{first['index']} '{first['entry']['name']}'"
+    return kept
+
+
+def bulk_list_from_manifest(manifest_path, max_attempts=3, upload_workers=8, receipt_timeout=240, report_path=None):
+    entries = load_manifest(manifest_path)
+    items = [
+        {'index': index, 'entry': entry, 'status': 'new', 'attempts': 0, 'dataCID': None,
+         'metadataCID': None, 'txHash': None, 'listingId': None, 'blockNumber': None, 'error': None}
+        for index, entry in enumerate(entries)
+    ]
+    print(f"\nBulk listing {len(items)} datasets from {manifest_path}")
+
+    for round_number in range(1, max_attempts + 1):
+        to_upload = [item for item in items if item['status'] in ('new', 'upload_failed')]
+        if to_upload:
+            with ThreadPoolExecutor(max_workers=upload_workers) as executor:
+                list(executor.map(upload_manifest_item, to_upload))
+
+        to_send = [item for item in items if item['status'] in ('uploaded', 'send_failed', 'reverted', 'replaced')]
+        to_send = [item for item in to_send if item['attempts'] < max_attempts]
+        to_send = skip_duplicate_items(items, to_send)
+        if to_send:
+            print(f"Round {round_number}: submitting {len(to_send)} listing transactions")
+            sent = submit_listing_batch(to_send, receipt_timeout=receipt_timeout)
+            collect_listing_receipts(sent)
+
+        retryable = [
+            item for item in items
+            if item['status'] in ('upload_failed', 'uploaded', 'send_failed', 'reverted', 'replaced')
+            and item['attempts'] < max_attempts
+        ]
+        if not retryable:
+            break
+        print(f"{len(retryable)} datasets need another attempt.")
+
+    report = [{key: value for key, value in item.items() if key != 'entry'} for item in items]
+    for row, item in zip(report, items):
+        row['name'] = item['entry']['name']
+    listed = sum(1 for row in report if row['status'] == 'listed')
+    print(f"\nBulk listing finished: {listed}/{len(report)} listed.")
+    for row in report:
+        if row['status'] != 'listed':
+            print(f"  [{row['status']}] #{row['index']} '{row['name']}': {row['error']}")
+    if report_path:
+        with open(report_path, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {report_path}")
+    return report
+
+
+def upload_demo_dataset(data_name, sensor_id, data_format="json", readings=1000):
+    """(dataCID, metadataCID): one JSON reading, or `readings` of them packed in a columnar format."""
+    layout = None
+    if data_format == "json":
+        cid_data = upload_to_ipfs(generate_dummy_data(sensor_id), f"{sensor_id}.json")
+    else:
+        cid_data, layout = upload_columns_to_ipfs(generate_dummy_readings(sensor_id, readings), data_format, sensor_id)
+    cid_meta = upload_to_ipfs(generate_dummy_metadata(data_name, layout), f"{sensor_id}-meta.json")
+    return cid_data, cid_meta
+
+
+def run_demo(data_format="json", readings=1000):
     print("\n--- Auraweave Producer Agent Starting (Sepolia & Stablecoin Mode) ---")
 
     data_name1 = "Office Sensor Data Set A"
-    data1 = generate_dummy_data("office_A_env")
-    metadata1 = generate_dummy_metadata(data_name1)
-    cid_data1 = upload_to_ipfs(data1, "data1.json")
-    cid_meta1 = upload_to_ipfs(metadata1, "meta1.json")
+    cid_data1, cid_meta1 = upload_demo_dataset(data_name1, "office_A_env", data_format, readings)
 
     if cid_data1 and cid_meta1:
         list_data_on_chain(data_name1, "Temp, Hum, CO2 from Office A", cid_data1, cid_meta1, 0.5) # Price: 0.5 MUSDC
@@ -141,12 +610,29 @@ if __name__ == "__main__":
     time.sleep(5) 
 
     data_name2 = "Lab Pressure Readings B"
-    data2 = generate_dummy_data("lab_B_pressure")
-    metadata2 = generate_dummy_metadata(data_name2)
-    cid_data2 = upload_to_ipfs(data2, "data2.json")
-    cid_meta2 = upload_to_ipfs(metadata2, "meta2.json")
+    cid_data2, cid_meta2 = upload_demo_dataset(data_name2, "lab_B_pressure", data_format, readings)
 
     if cid_data2 and cid_meta2:
         list_data_on_chain(data_name2, "High-res pressure data from Lab B", cid_data2, cid_meta2, 1.2) # Price: 1.2 MUSDC
 
-    print("\n--- Auraweave Producer Agent Finished ---")
\ No newline at end of file
+    print("\n--- Auraweave Producer Agent Finished ---")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Auraweave producer agent")
+    parser.add_argument('--manifest', help="List every dataset in this JSON/NDJSON manifest")
+    parser.add_argument('--report', help="Write the per-dataset status report here (JSON)")
+    parser.add_argument('--max-attempts', type=int, default=3)
+    parser.add_argument('--upload-workers', type=int, default=8)
+    parser.add_argument('--format', choices=('json',) + COLUMNAR_FORMATS, default='json',
+                        help="Demo dataset format; npz/arrow pack --readings readings per dataset")
+    parser.add_argument('--readings', type=int, default=1000)
+    args = parser.parse_args()
+    start()
+    if args.manifest:
+        report = bulk_list_from_manifest(
+            args.manifest, max_attempts=args.max_attempts,
+            upload_workers=args.upload_workers, report_path=args.report,
+        )
+        sys.exit(0 if all(row['status'] in ('listed', 'duplicate') for row in report) else 1)
+    run_demo(data_format=args.format, readings=args.readings)
\ No newline at end of file
@@ -0,0 +1,213 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from ipfs_upload import walk_tree
+
+HASH_READ_BYTES = 1024 * 1024
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS uploads (
+    content_hash TEXT PRIMARY KEY,
+    cid TEXT NOT NULL,
+    size INTEGER,
+    uploaded_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS uploads_cid ON uploads (cid);
+
+CREATE TABLE IF NOT EXISTS listings (
+    seller TEXT NOT NULL,
+    data_cid TEXT NOT NULL,
+    metadata_cid TEXT,
+    name TEXT,
+    listing_id INTEGER,
+    tx_hash TEXT,
+    block_number INTEGER,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (seller, data_cid)
+);
+
+CREATE TABLE IF NOT EXISTS manifest_state (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+def hash_bytes(content):
+    return hashlib.sha256(content).hexdigest()
+
+
+def json_bytes(content):
+    """The exact bytes upload_to_ipfs sends for a JSON document, so hash and upload agree."""
+    return json.dumps(content).encode('utf-8')
+
+
+def hash_path(path, include_hidden=False):
+    """sha256 of a file, or of a directory tree (relative paths and contents, in sorted order).
+
+    Hidden files count only with `include_hidden`, as in IpfsUploader.add_path.
+    """
+    digest = hashlib.sha256()
+    if os.path.isdir(path):
+        for root, names in walk_tree(path, include_hidden):
+            for name in names:
+                file_path = os.path.join(root, name)
+                digest.update(os.path.relpath(file_path, path).replace(os.sep, '/').encode('utf-8') + b'\0')
+                _update_from_file(digest, file_path)
+    else:
+        _update_from_file(digest, path)
+    return digest.hexdigest()
+
+
+def _update_from_file(digest, file_path):
+    with open(file_path, 'rb') as f:
+        while True:
+            chunk = f.read(HASH_READ_BYTES)
+            if not chunk:
+                return
+            digest.update(chunk)
+
+
+def hash_columns(columns, data_format):
+    """sha256 of named typed columns. Packed files embed timestamps (npz), so the arrays are hashed instead."""
+    digest = hashlib.sha256(data_format.encode())
+    for name in sorted(columns):
+        array = columns[name]
+        digest.update(f"\0{name}\0{array.dtype.str}\0{array.shape}\0".encode())
+        digest.update(array.tobytes())
+    return digest.hexdigest()
+
+
+class PublishManifest:
+    """What a producer has already uploaded and listed, so re-runs only publish new content.
+
+    `uploads` maps a sha256 of the uploaded bytes to its CID; `listings`
+    maps (seller, data CID) to the listing id, or to the tx hash while the
+    listing is unconfirmed. CIDs are content addresses, so identical data
+    shares a CID and one listing. `reconcile()` trues the listings up
+    against DataListed events from a ListingIndex.
+    """
+
+    def __init__(self, db_path, registry_address):
+        self.db_path = db_path
+        self.registry_address = registry_address
+        self._lock = threading.RLock()
+
+        db_dir = os.path.dirname(os.path.abspath(db_path))
+        os.makedirs(db_dir, exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+        self._check_contract()
+
+    def _check_contract(self):
+        # After a redeploy the old listings are gone, but every uploaded CID is still good.
+        row = self._conn.execute("SELECT value FROM manifest_state WHERE key = 'registry_address'").fetchone()
+        if row and row['value'].lower() != self.registry_address.lower():
+            print(f"Publish manifest was kept for registry {row['value']}; forgetting its listings.")
+            with self._conn:
+                self._conn.execute("DELETE FROM listings")
+        with self._conn:
+            self._conn.execute(
+                "INSERT INTO manifest_state (key, value) VALUES ('registry_address', ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+                (self.registry_address,),
+            )
+
+    def cid_for(self, content_hash):
+        with self._lock:
+            row = self._conn.execute("SELECT cid FROM uploads WHERE content_hash = ?", (content_hash,)).fetchone()
+        return row['cid'] if row else None
+
+    def record_upload(self, content_hash, cid, size=None):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO uploads (content_hash, cid, size, uploaded_at) VALUES (?, ?, ?, ?)",
+                (content_hash, cid, size, time.time()),
+            )
+
+    def listing_for(self, seller, data_cid):
+        """{'listing_id', 'tx_hash', 'block_number', ...} for this seller's listing of `data_cid`, or None."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM listings WHERE seller = ? AND data_cid = ?", (seller.lower(), data_cid)
+            ).fetchone()
+        return dict(row) if row else None
+
+    def record_sent(self, seller, data_cid, metadata_cid, name, tx_hash):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO listings (seller, data_cid, metadata_cid, name, listing_id, tx_hash, block_number, updated_at) "
+                "VALUES (?, ?, ?, ?, NULL, ?, NULL, ?) "
+                "ON CONFLICT(seller, data_cid) DO UPDATE SET metadata_cid = excluded.metadata_cid, "
+                "name = excluded.name, listing_id = NULL, tx_hash = excluded.tx_hash, block_number = NULL, "
+                "updated_at = excluded.updated_at",
+                (seller.lower(), data_cid, metadata_cid, name, tx_hash, time.time()),
+            )
+
+    def record_listed(self, seller, data_cid, listing_id, block_number, tx_hash=None, metadata_cid=None, name=None):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO listings (seller, data_cid, metadata_cid, name, listing_id, tx_hash, block_number, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(seller, data_cid) DO UPDATE SET "
+                "metadata_cid = COALESCE(excluded.metadata_cid, metadata_cid), name = COALESCE(excluded.name, name), "
+                "listing_id = excluded.listing_id, tx_hash = COALESCE(excluded.tx_hash, tx_hash), "
+                "block_number = excluded.block_number, updated_at = excluded.updated_at",
+                (seller.lower(), data_cid, metadata_cid, name, int(listing_id), tx_hash, block_number, time.time()),
+            )
+
+    def forget_listing(self, seller, data_cid):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM listings WHERE seller = ? AND data_cid = ?", (seller.lower(), data_cid))
+
+    def reconcile(self, seller, listing_index):
+        """Matches this seller's manifest listings to the (synced) index.
+
+        Listings on chain but missing here are added, so content listed by a
+        crashed run or another machine is not listed twice; confirmed
+        listings the chain no longer has are forgotten, so they get listed
+        again. Sent-but-unconfirmed listings are left for the caller, which
+        can look their transaction up. Returns (added, confirmed, forgotten).
+        """
+        on_chain = {}
+        for listing in listing_index.query(seller=seller):
+            # The oldest listing wins if the same data was listed twice.
+            on_chain.setdefault(listing['dataCID'], listing)
+        added = confirmed = forgotten = 0
+        with self._lock:
+            rows = {
+                row['data_cid']: dict(row)
+                for row in self._conn.execute("SELECT * FROM listings WHERE seller = ?", (seller.lower(),))
+            }
+            for data_cid, listing in on_chain.items():
+                row = rows.get(data_cid)
+                if row and row['listing_id'] == listing['id']:
+                    continue
+                self.record_listed(
+                    seller, data_cid, listing['id'], listing['block_number'],
+                    metadata_cid=listing['metadataCID'], name=listing['name'],
+                )
+                if row:
+                    confirmed += 1
+                else:
+                    added += 1
+            for data_cid, row in rows.items():
+                if row['listing_id'] is not None and data_cid not in on_chain:
+                    self.forget_listing(seller, data_cid)
+                    forgotten += 1
+        return added, confirmed, forgotten
+
+    def counts(self):
+        with self._lock:
+            uploads = self._conn.execute("SELECT COUNT(*) FROM uploads").fetchone()[0]
+            listings = self._conn.execute("SELECT COUNT(*) FROM listings WHERE listing_id IS NOT NULL").fetchone()[0]
+        return uploads, listings
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,96 @@
+from listing_catalog import tokenize
+
+
+class PurchasePolicy:
+    """Which listings a consumer is willing to buy, and how much it may spend in one go.
+
+    Prices are in token wei. `plan()` walks candidates in the order given
+    (cheapest first by default) and keeps every listing that passes the
+    filters and still fits the remaining budget. The budget is the smaller of
+    `total_budget_wei` and the balance passed in. Listings the catalog has not
+    filtered (e.g. from DataListed events) go through `rejection_reason()`,
+    which checks every filter including `search`. `owned` is any container of
+    listing ids the buyer already has (an EntitlementStore); those are never
+    bought again.
+    """
+
+    def __init__(self, max_price_wei=None, min_price_wei=None, allow_sellers=None, deny_sellers=None,
+                 total_budget_wei=None, max_items=None, exclude_own=True, order_by='price', search=None):
+        self.max_price_wei = max_price_wei
+        self.min_price_wei = min_price_wei
+        self.allow_sellers = {seller.lower() for seller in allow_sellers} if allow_sellers else None
+        self.deny_sellers = {seller.lower() for seller in deny_sellers} if deny_sellers else set()
+        self.total_budget_wei = total_budget_wei
+        self.max_items = max_items
+        self.exclude_own = exclude_own
+        self.order_by = order_by
+        self.search = search
+        self.search_tokens = tokenize(search)
+
+    def query_filters(self, own_address=None, owned=None):
+        """Filters ListingCatalog.query() can apply itself, so fewer rejected listings come back."""
+        filters = {'order_by': self.order_by}
+        if self.search:
+            filters['text'] = self.search
+        if self.allow_sellers is not None:
+            filters['sellers'] = self.allow_sellers
+        if self.deny_sellers:
+            filters['exclude_sellers'] = self.deny_sellers
+        if self.max_price_wei is not None:
+            filters['max_price_wei'] = self.max_price_wei
+        if self.min_price_wei is not None:
+            filters['min_price_wei'] = self.min_price_wei
+        if self.exclude_own and own_address:
+            filters['exclude_seller'] = own_address
+        if owned is not None:
+            filters['exclude_ids'] = owned
+        return filters
+
+    def rejection_reason(self, listing, own_address=None, owned=None):
+        seller = listing['seller'].lower()
+        price = listing['price_token_wei']
+        if listing.get('active') is False:
+            return "inactive"
+        if owned is not None and listing['id'] in owned:
+            return "already owned"
+        if self.exclude_own and own_address and seller == own_address.lower():
+            return "own listing"
+        if self.allow_sellers is not None and seller not in self.allow_sellers:
+            return "seller not in allow list"
+        if seller in self.deny_sellers:
+            return "seller in deny list"
+        if self.max_price_wei is not None and price > self.max_price_wei:
+            return "above price cap"
+        if self.min_price_wei is not None and price < self.min_price_wei:
+            return "below minimum price"
+        if self.search_tokens and not self.search_tokens <= tokenize(listing['name']) | tokenize(listing.get('description')):
+            return "does not match search"
+        return None
+
+    def plan(self, listings, balance_wei, own_address=None, spent_wei=0, bought=0, owned=None):
+        """Returns (selected, skipped) where skipped is a list of (listing, reason).
+
+        `spent_wei` and `bought` are what earlier plans under this policy
+        already used, for callers (the daemon) that buy in several rounds.
+        """
+        budget = balance_wei if self.total_budget_wei is None else min(balance_wei, self.total_budget_wei - spent_wei)
+        selected, skipped = [], []
+        for listing in listings:
+            reason = self.rejection_reason(listing, own_address, owned)
+            if reason is None and self.max_items is not None and bought + len(selected) >= self.max_items:
+                reason = "item limit reached"
+            if reason is None and listing['price_token_wei'] > budget:
+                reason = "over remaining budget"
+            if reason:
+                skipped.append((listing, reason))
+                continue
+            selected.append(listing)
+            budget -= listing['price_token_wei']
+        return selected, skipped
+
+    def exhausted(self, spent_wei, bought):
+        """Whether `spent_wei` and `bought` use up the total budget or the item limit."""
+        return (
+            (self.total_budget_wei is not None and spent_wei >= self.total_budget_wei)
+            or (self.max_items is not None and bought >= self.max_items)
+        )
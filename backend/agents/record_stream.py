@@ -0,0 +1,90 @@
+import json
+
+READ_CHUNK_CHARS = 64 * 1024
+_WHITESPACE = ' \t\r\n'
+_NUMBER_CHARS = frozenset('0123456789.eE+-')
+
+
+def decode_ipfs_content(content_bytes):
+    """JSON if the bytes parse as JSON, else text if they are UTF-8, else the bytes themselves."""
+    try:
+        content_str = content_bytes.decode('utf-8')
+    except UnicodeDecodeError:
+        return content_bytes
+    try:
+        return json.loads(content_str)
+    except json.JSONDecodeError:
+        return content_str
+
+
+def _open_text(source):
+    if hasattr(source, 'read'):
+        return source, False
+    return open(source, 'r', encoding='utf-8'), True
+
+
+def iter_records(source, chunk_chars=READ_CHUNK_CHARS):
+    """Yields JSON records one at a time from a path or text file object.
+
+    Handles NDJSON, concatenated JSON values, and a top-level JSON array, whose
+    elements are yielded one by one. Only the record being decoded is held in
+    memory, so a multi-GB array costs about as much as its biggest element.
+    """
+    decoder = json.JSONDecoder()
+    stream, owned = _open_text(source)
+    try:
+        buffer = ''
+        position = 0
+        eof = False
+        in_array = None
+
+        def fill():
+            nonlocal buffer, position, eof
+            chunk = stream.read(chunk_chars)
+            if not chunk:
+                eof = True
+                return False
+            buffer = buffer[position:] + chunk
+            position = 0
+            return True
+
+        def skip(separators):
+            nonlocal position
+            while True:
+                while position < len(buffer) and buffer[position] in separators:
+                    position += 1
+                if position < len(buffer) or not fill():
+                    return
+
+        while True:
+            skip(_WHITESPACE if not in_array else _WHITESPACE + ',')
+            if position >= len(buffer):
+                if in_array:
+                    raise ValueError("Unterminated JSON array")
+                return
+            if in_array is None:
+                in_array = buffer[position] == '['
+                if in_array:
+                    position += 1
+                    continue
+            if in_array and buffer[position] == ']':
+                position += 1
+                in_array = False
+                continue
+            while True:
+                try:
+                    record, end = decoder.raw_decode(buffer, position)
+                except json.JSONDecodeError:
+                    if eof or not fill():
+                        raise
+                    continue
+                # A number the buffer ends inside of may be cut in half ("1." of "1.5e3"); read on to be sure.
+                if (not eof and type(record) in (int, float)
+                        and all(char in _NUMBER_CHARS for char in buffer[end:]) and fill()):
+                    continue
+                break
+            position = end
+            yield record
+    finally:
+        if owned:
+            stream.close()
@@ -0,0 +1,312 @@
+import time
+import logging
+import itertools
+import requests
+from web3 import Web3
+from web3.datastructures import AttributeDict
+from metrics import record_batch
+
+logger = logging.getLogger(__name__)
+
+# Multicall3 is deployed at the same address on Sepolia, mainnet and most L2s.
+MULTICALL3_ADDRESS = "0xcA11bde05977b3631167028862bE2a173976CA11"
+AGGREGATE3_SELECTOR = Web3.keccak(text="aggregate3((address,bool,bytes)[])")[:4]
+
+QUANTITY_METHODS = {
+    'eth_blockNumber', 'eth_chainId', 'eth_gasPrice', 'eth_maxPriorityFeePerGas',
+    'eth_getBalance', 'eth_getTransactionCount', 'eth_estimateGas',
+}
+BLOCK_QUANTITY_FIELDS = (
+    'number', 'timestamp', 'gasLimit', 'gasUsed', 'baseFeePerGas', 'size',
+    'difficulty', 'blobGasUsed', 'excessBlobGas',
+)
+RECEIPT_QUANTITY_FIELDS = (
+    'blockNumber', 'status', 'gasUsed', 'cumulativeGasUsed', 'effectiveGasPrice',
+    'transactionIndex', 'type',
+)
+LOG_QUANTITY_FIELDS = ('blockNumber', 'logIndex', 'transactionIndex')
+
+_sessions = {}
+_request_ids = itertools.count(1)
+
+
+class BatchCallError(Exception):
+    pass
+
+
+class BatchItem:
+    __slots__ = ('method', 'params', 'formatter', 'result', 'error', 'done')
+
+    def __init__(self, method, params, formatter=None):
+        self.method = method
+        self.params = list(params)
+        self.formatter = formatter
+        self.result = None
+        self.error = None
+        self.done = False
+
+    def set_raw_result(self, raw_result):
+        try:
+            self.result = self.formatter(raw_result) if self.formatter else raw_result
+        except Exception as e:
+            self.error = BatchCallError(f"Could not decode {self.method} result: {e}")
+        self.done = True
+
+    def set_error(self, error):
+        message = error.get('message', error) if isinstance(error, dict) else error
+        self.error = BatchCallError(f"{self.method} failed: {message}")
+        self.done = True
+
+    def get(self):
+        if not self.done:
+            raise BatchCallError(f"{self.method} has not been executed yet")
+        if self.error:
+            raise self.error
+        return self.result
+
+
+def _to_int(value):
+    if value is None or isinstance(value, int):
+        return value
+    return int(value, 16)
+
+
+def _format_block(raw_block):
+    if raw_block is None:
+        return None
+    block = dict(raw_block)
+    for field in BLOCK_QUANTITY_FIELDS:
+        if field in block:
+            block[field] = _to_int(block[field])
+    return AttributeDict(block)
+
+
+def format_receipt(raw_receipt):
+    if raw_receipt is None:
+        return None
+    receipt = dict(raw_receipt)
+    for field in RECEIPT_QUANTITY_FIELDS:
+        if field in receipt:
+            receipt[field] = _to_int(receipt[field])
+    logs = []
+    for raw_log in receipt.get('logs') or []:
+        log = dict(raw_log)
+        for field in LOG_QUANTITY_FIELDS:
+            if field in log:
+                log[field] = _to_int(log[field])
+        logs.append(AttributeDict(log))
+    receipt['logs'] = logs
+    return AttributeDict(receipt)
+
+
+def _abi_type(param):
+    abi_type = param['type']
+    if abi_type.startswith('tuple'):
+        inner = ','.join(_abi_type(component) for component in param['components'])
+        return f"({inner}){abi_type[len('tuple'):]}"
+    return abi_type
+
+
+def _normalize(param, value):
+    # Match what ContractFunction.call() returns: checksummed addresses, tuples for structs.
+    abi_type = param['type']
+    if abi_type.endswith(']'):
+        element = dict(param, type=abi_type[:abi_type.rindex('[')])
+        return [_normalize(element, item) for item in value]
+    if abi_type == 'tuple':
+        return tuple(_normalize(component, item) for component, item in zip(param['components'], value))
+    if abi_type == 'address':
+        return Web3.to_checksum_address(value)
+    return value
+
+
+def _call_decoder(w3, outputs):
+    output_types = [_abi_type(output) for output in outputs]
+
+    def decode(raw_result):
+        data = Web3.to_bytes(hexstr=raw_result) if isinstance(raw_result, str) else bytes(raw_result)
+        if not data and output_types:
+            raise BatchCallError("empty return data (contract missing or call reverted)")
+        values = [_normalize(output, value) for output, value in zip(outputs, w3.codec.decode(output_types, data))]
+        if len(values) == 1:
+            return values[0]
+        return values
+    return decode
+
+
+def _session_for(endpoint_uri):
+    session = _sessions.get(endpoint_uri)
+    if session is None:
+        session = requests.Session()
+        _sessions[endpoint_uri] = session
+    return session
+
+
+class RpcBatch:
+    """Collects independent JSON-RPC reads and sends them in one round-trip.
+
+    Falls back to Multicall3 `aggregate3` for the eth_calls (plus plain
+    requests for everything else) when the endpoint rejects batches.
+    """
+
+    def __init__(self, w3, use_multicall=True, timeout=30):
+        self.w3 = w3
+        self.use_multicall = use_multicall
+        self.timeout = timeout
+        self.items = []
+
+    def add(self, method, params=(), formatter=None):
+        if formatter is None and method in QUANTITY_METHODS:
+            formatter = _to_int
+        item = BatchItem(method, params, formatter)
+        self.items.append(item)
+        return item
+
+    def call(self, contract_function, block_identifier='latest'):
+        tx = {'to': contract_function.address, 'data': contract_function._encode_transaction_data()}
+        return self.add('eth_call', [tx, self._block_param(block_identifier)],
+                        _call_decoder(self.w3, contract_function.abi['outputs']))
+
+    def get_block(self, block_identifier='latest', full_transactions=False):
+        return self.add('eth_getBlockByNumber', [self._block_param(block_identifier), full_transactions], _format_block)
+
+    def get_transaction_count(self, address, block_identifier='pending'):
+        return self.add('eth_getTransactionCount', [address, self._block_param(block_identifier)])
+
+    def get_balance(self, address, block_identifier='latest'):
+        return self.add('eth_getBalance', [address, self._block_param(block_identifier)])
+
+    def get_transaction_receipt(self, tx_hash):
+        tx_hash = tx_hash if isinstance(tx_hash, str) else Web3.to_hex(tx_hash)
+        return self.add('eth_getTransactionReceipt', [tx_hash], format_receipt)
+
+    def gas_price(self):
+        return self.add('eth_gasPrice')
+
+    def max_priority_fee(self):
+        return self.add('eth_maxPriorityFeePerGas')
+
+    def block_number(self):
+        return self.add('eth_blockNumber')
+
+    @staticmethod
+    def _block_param(block_identifier):
+        if isinstance(block_identifier, int):
+            return hex(block_identifier)
+        return block_identifier
+
+    def execute(self):
+        pending = [item for item in self.items if not item.done]
+        if not pending:
+            return self.items
+        if len(pending) == 1 or not self._send_batch(pending):
+            self._send_fallback(pending)
+        return self.items
+
+    def _send_batch(self, items):
+        # A PooledHTTPProvider picks (and hedges or fails over between) endpoints itself.
+        post_batch = getattr(self.w3.provider, 'post_batch', None)
+        endpoint_uri = getattr(self.w3.provider, 'endpoint_uri', None)
+        if post_batch is None and (not endpoint_uri or not str(endpoint_uri).startswith('http')):
+            return False
+        payload = []
+        by_id = {}
+        for item in items:
+            request_id = next(_request_ids)
+            by_id[request_id] = item
+            payload.append({'jsonrpc': '2.0', 'id': request_id, 'method': item.method, 'params': item.params})
+        started = time.perf_counter()
+        try:
+            if post_batch is not None:
+                responses = post_batch(payload)
+            else:
+                request_kwargs = dict(self.w3.provider.get_request_kwargs())
+                request_kwargs.setdefault('timeout', self.timeout)
+                response = _session_for(endpoint_uri).post(endpoint_uri, json=payload, **request_kwargs)
+                response.raise_for_status()
+                responses = response.json()
+        except Exception as e:
+            record_batch([item.method for item in items], time.perf_counter() - started)
+            logger.warning(f"JSON-RPC batch request failed ({e}). Falling back.")
+            return False
+        if not isinstance(responses, list):
+            # Providers without batch support answer with a single error object.
+            record_batch([item.method for item in items], time.perf_counter() - started)
+            return False
+        by_response_id = {raw.get('id'): raw for raw in responses if isinstance(raw, dict)}
+        record_batch([request['method'] for request in payload], time.perf_counter() - started,
+                     [by_response_id.get(request['id']) for request in payload])
+        for raw in responses:
+            item = by_id.pop(raw.get('id'), None)
+            if item is None:
+                continue
+            if raw.get('error') is not None:
+                item.set_error(raw['error'])
+            else:
+                item.set_raw_result(raw.get('result'))
+        for item in by_id.values():
+            item.set_error("missing from batch response")
+        return True
+
+    def _send_fallback(self, items):
+        calls = [item for item in items if item.method == 'eth_call']
+        if self.use_multicall and len(calls) > 1 and self._aggregate(calls):
+            items = [item for item in items if item.method != 'eth_call']
+        for item in items:
+            self._send_single(item)
+
+    def _send_single(self, item):
+        try:
+            raw = self.w3.provider.make_request(item.method, item.params)
+        except Exception as e:
+            item.set_error(str(e))
+            return
+        if raw.get('error') is not None:
+            item.set_error(raw['error'])
+        else:
+            item.set_raw_result(raw.get('result'))
+
+    def _aggregate(self, calls):
+        block_params = {item.params[1] for item in calls}
+        if len(block_params) != 1 or not multicall_available(self.w3):
+            return False
+        encoded_calls = [
+            (item.params[0]['to'], True, Web3.to_bytes(hexstr=item.params[0]['data'])) for item in calls
+        ]
+        data = AGGREGATE3_SELECTOR + self.w3.codec.encode(['(address,bool,bytes)[]'], [encoded_calls])
+        try:
+            raw = self.w3.provider.make_request(
+                'eth_call', [{'to': MULTICALL3_ADDRESS, 'data': Web3.to_hex(data)}, block_params.pop()]
+            )
+            if raw.get('error') is not None:
+                return False
+            (results,) = self.w3.codec.decode(['(bool,bytes)[]'], Web3.to_bytes(hexstr=raw['result']))
+        except Exception as e:
+            # The calls are still unanswered; the caller sends them one by one instead.
+            logger.warning(f"Multicall3 aggregate3 failed ({e}). Sending the calls separately.")
+            return False
+        if len(results) != len(calls):
+            return False
+        for item, (success, return_data) in zip(calls, results):
+            # One bad return only fails its own call, as a JSON-RPC error in a batch would.
+            try:
+                if success:
+                    item.set_raw_result(return_data)
+                else:
+                    item.set_error(f"call reverted (0x{return_data.hex()})")
+            except Exception as e:
+                item.set_error(f"could not decode aggregate3 result: {e}")
+        return True
+
+
+_multicall_available = {}
+
+
+def multicall_available(w3):
+    endpoint = getattr(w3.provider, 'endpoint_uri', id(w3.provider))
+    if endpoint not in _multicall_available:
+        try:
+            _multicall_available[endpoint] = len(w3.eth.get_code(MULTICALL3_ADDRESS)) > 0
+        except Exception:
+            _multicall_available[endpoint] = False
+    return _multicall_available[endpoint]
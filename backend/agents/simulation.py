@@ -0,0 +1,355 @@
+"""Multi-agent load test against a local dev chain.
+
+    python simulation.py --producers 4 --consumers 8 --listings 10 --purchases 5
+
+Needs a local node (npx hardhat node, or anvil) with the contracts deployed
+to `localhost`. The funder (SIM_FUNDER_PRIVATE_KEY, default Hardhat account
+#0, which deploy.js uses as the MockERC20 owner) gives every simulated agent
+ETH for gas and consumers MUSDC. IPFS is replaced by an in-process stand-in,
+so that only the agents and the chain are measured.
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import requests
+from web3 import Web3
+from eth_account import Account
+
+# Hardhat's well-known account #0; only ever funded on local dev chains.
+HARDHAT_ACCOUNT_0_KEY = "0xac0974bec39a17e36ba4a6b4d238ff944bacb478cbed5efcae784d7bf4f2ff80"
+PHASES = ('upload', 'list', 'discover', 'purchase', 'fetch')
+
+
+class RpcCounter:
+    """Counts JSON-RPC methods and HTTP round-trips a worker process makes, by patching
+    requests.Session.post. It also records transaction hashes per phase, so gas can
+    be totalled afterwards. Only installed inside simulation workers."""
+
+    def __init__(self, rpc_url):
+        self.rpc_url = rpc_url
+        self.methods = {}
+        self.round_trips = 0
+        self.tx_hashes = {}
+        self.phase = None
+
+    def install(self):
+        original_post = requests.Session.post
+        counter = self
+
+        def post(session, url, data=None, json=None, **kwargs):
+            response = original_post(session, url, data=data, json=json, **kwargs)
+            if url == counter.rpc_url:
+                counter.observe(json if json is not None else data, response)
+            return response
+        requests.Session.post = post
+        return self
+
+    def observe(self, payload, response):
+        try:
+            requests_made = payload if isinstance(payload, (list, dict)) else json.loads(payload)
+        except Exception:
+            return
+        requests_made = requests_made if isinstance(requests_made, list) else [requests_made]
+        self.round_trips += 1
+        sends = set()
+        for request in requests_made:
+            self.methods[request.get('method')] = self.methods.get(request.get('method'), 0) + 1
+            if request.get('method') == 'eth_sendRawTransaction':
+                sends.add(request.get('id'))
+        if not sends:
+            return
+        try:
+            replies = response.json()
+        except Exception:
+            return
+        for reply in replies if isinstance(replies, list) else [replies]:
+            if reply.get('id') in sends and reply.get('result'):
+                self.tx_hashes.setdefault(self.phase or 'other', []).append(reply['result'])
+
+
+class PhaseTimer:
+    def __init__(self, counter):
+        self.counter = counter
+        self.latencies = {}
+        self.successes = {}
+
+    def run(self, phase, operation, *args, **kwargs):
+        self.counter.phase = phase
+        started = time.perf_counter()
+        try:
+            result = operation(*args, **kwargs)
+        finally:
+            self.counter.phase = None
+        self.latencies.setdefault(phase, []).append(time.perf_counter() - started)
+        if result:
+            self.successes[phase] = self.successes.get(phase, 0) + 1
+        return result
+
+
+def _prepare_worker(role, private_key, settings, worker_id):
+    env_key = 'PRODUCER_PRIVATE_KEY' if role == 'producer' else 'CONSUMER_PRIVATE_KEY'
+    # Config settings are read on first use and then kept, so the environment has to be set before the agent import.
+    os.environ.update({
+        'AURAWEAVE_NETWORK': 'localhost',
+        'PRODUCER_PRIVATE_KEY': private_key,
+        'CONSUMER_PRIVATE_KEY': private_key,
+        env_key: private_key,
+        'IPFS_HTTP_CLIENT_URL': settings['ipfs_api'],
+        'IPFS_GATEWAY_URL': settings['ipfs_gateway'],
+        'IPFS_GATEWAY_URLS': settings['ipfs_gateway'],
+        'AURAWEAVE_CACHE_DIR': os.path.join(settings['cache_root'], f"{role}-{worker_id}"),
+    })
+    return RpcCounter(settings['rpc_url']).install()
+
+
+def _worker_result(role, worker_id, timer, counter, started):
+    return {
+        'role': role, 'worker': worker_id, 'started': started, 'finished': time.time(),
+        'latencies': timer.latencies, 'successes': timer.successes,
+        'rpc_methods': counter.methods, 'rpc_round_trips': counter.round_trips,
+        'tx_hashes': counter.tx_hashes,
+    }
+
+
+def run_producer(worker_id, private_key, settings):
+    counter = _prepare_worker('producer', private_key, settings, worker_id)
+    import producer_agent as agent
+    timer = PhaseTimer(counter)
+    started = time.time()
+    for index in range(settings['listings_per_producer']):
+        name = f"sim-p{worker_id}-{index}"
+        data = agent.generate_dummy_data(name)
+        data['payload'] = 'x' * settings['payload_bytes']
+        cids = timer.run('upload', lambda: (
+            agent.upload_to_ipfs(data, f"{name}-data.json"),
+            agent.upload_to_ipfs(agent.generate_dummy_metadata(name), f"{name}-meta.json"),
+        ))
+        if not all(cids):
+            continue
+        price = round(random.uniform(settings['min_price'], settings['max_price']), 2)
+        timer.run('list', agent.list_data_on_chain, name, "simulated dataset", cids[0], cids[1], price)
+    return _worker_result('producer', worker_id, timer, counter, started)
+
+
+def run_consumer(worker_id, private_key, settings):
+    counter = _prepare_worker('consumer', private_key, settings, worker_id)
+    import consumer_agent as agent
+    timer = PhaseTimer(counter)
+    started = time.time()
+    deadline = time.time() + settings['listing_wait_seconds']
+    purchases = 0
+    while purchases < settings['purchases_per_consumer'] and time.time() < deadline:
+        listings = timer.run('discover', agent.discover_listings, limit=50,
+                             exclude_seller=agent.get_consumer_account().address)
+        if not listings:
+            time.sleep(1)
+            continue
+        listing = random.choice(listings)
+        if not timer.run('purchase', agent.purchase_data_on_chain, listing['id']):
+            continue
+        purchases += 1
+        deadline = time.time() + settings['listing_wait_seconds']
+        timer.run('fetch', agent.fetch_from_ipfs, listing['dataCID'])
+    return _worker_result('consumer', worker_id, timer, counter, started)
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * pct / 100
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def fund_agents(w3, funder, token, producer_keys, consumer_keys, eth_each, musdc_each):
+    from tx_engine import get_tx_engine
+
+    engine = get_tx_engine(w3, funder)
+    futures = []
+    for key in producer_keys + consumer_keys:
+        address = Account.from_key(key).address
+        futures.append(engine.submit({'to': address, 'value': w3.to_wei(eth_each, 'ether')}, gas=21000).receipt)
+    for key in consumer_keys:
+        address = Account.from_key(key).address
+        call = token.functions.mint(address, w3.to_wei(musdc_each, 'ether'))
+        futures.append(engine.submit(call, gas=120000).receipt)
+    failed = [future for future in futures if future.result()['status'] != 1]
+    if failed:
+        raise RuntimeError(f"{len(failed)} funding transactions failed (is the funder the MockERC20 owner?)")
+
+
+def total_gas(w3, tx_hashes_by_phase):
+    from rpc_batch import RpcBatch
+    gas = {}
+    for phase, hashes in tx_hashes_by_phase.items():
+        for start in range(0, len(hashes), 200):
+            batch = RpcBatch(w3)
+            reads = [batch.get_transaction_receipt(tx_hash) for tx_hash in hashes[start:start + 200]]
+            batch.execute()
+            for read in reads:
+                try:
+                    receipt = read.get()
+                except Exception:
+                    continue
+                if receipt is None:
+                    continue
+                entry = gas.setdefault(phase, {'transactions': 0, 'gas_used': 0, 'fees_wei': 0})
+                entry['transactions'] += 1
+                entry['gas_used'] += receipt['gasUsed']
+                entry['fees_wei'] += receipt['gasUsed'] * (receipt.get('effectiveGasPrice') or 0)
+    return gas
+
+
+def build_report(results, wall_seconds, gas, ipfs_counts):
+    latencies, successes, methods = {}, {}, {}
+    round_trips = 0
+    for result in results:
+        for phase, values in result['latencies'].items():
+            latencies.setdefault(phase, []).extend(values)
+        for phase, count in result['successes'].items():
+            successes[phase] = successes.get(phase, 0) + count
+        for method, count in result['rpc_methods'].items():
+            methods[method] = methods.get(method, 0) + count
+        round_trips += result['rpc_round_trips']
+
+    def active_seconds(role):
+        spans = [(r['started'], r['finished']) for r in results if r['role'] == role]
+        return (max(end for _, end in spans) - min(start for start, _ in spans)) if spans else 0
+
+    producer_seconds, consumer_seconds = active_seconds('producer'), active_seconds('consumer')
+    return {
+        'wall_seconds': round(wall_seconds, 3),
+        'throughput': {
+            'listings': successes.get('list', 0),
+            'listings_per_second': round(successes.get('list', 0) / producer_seconds, 3) if producer_seconds else None,
+            'purchases': successes.get('purchase', 0),
+            'purchases_per_second': round(successes.get('purchase', 0) / consumer_seconds, 3) if consumer_seconds else None,
+        },
+        'latency_seconds': {
+            phase: {
+                'count': len(values), 'ok': successes.get(phase, 0),
+                'mean': round(sum(values) / len(values), 4),
+                'p50': round(percentile(values, 50), 4), 'p95': round(percentile(values, 95), 4),
+                'p99': round(percentile(values, 99), 4),
+            }
+            for phase, values in latencies.items() if values
+        },
+        'rpc': {'round_trips': round_trips, 'calls': sum(methods.values()),
+                'by_method': dict(sorted(methods.items(), key=lambda item: -item[1]))},
+        'gas': gas,
+        'ipfs': ipfs_counts,
+    }
+
+
+def print_report(report):
+    print("\n=== Simulation report ===")
+    throughput = report['throughput']
+    print(f"Wall time: {report['wall_seconds']}s")
+    print(f"Listings: {throughput['listings']} ({throughput['listings_per_second']}/s)   "
+          f"Purchases: {throughput['purchases']} ({throughput['purchases_per_second']}/s)")
+    print(f"\n{'phase':<10}{'count':>7}{'ok':>6}{'mean':>9}{'p50':>9}{'p95':>9}{'p99':>9}   (seconds)")
+    for phase in PHASES:
+        stats = report['latency_seconds'].get(phase)
+        if stats:
+            print(f"{phase:<10}{stats['count']:>7}{stats['ok']:>6}{stats['mean']:>9.3f}{stats['p50']:>9.3f}"
+                  f"{stats['p95']:>9.3f}{stats['p99']:>9.3f}")
+    rpc = report['rpc']
+    print(f"\nJSON-RPC: {rpc['calls']} calls in {rpc['round_trips']} HTTP round-trips")
+    for method, count in rpc['by_method'].items():
+        print(f"  {method:<32}{count:>8}")
+    print("\nGas:")
+    for phase, entry in report['gas'].items():
+        average = entry['gas_used'] // entry['transactions'] if entry['transactions'] else 0
+        print(f"  {phase:<10}{entry['transactions']:>6} txs  {entry['gas_used']:>12} gas  (avg {average})")
+    print(f"\nIPFS stand-in requests: {report['ipfs']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Auraweave multi-agent load test (local chain only)")
+    parser.add_argument('--producers', type=int, default=2)
+    parser.add_argument('--consumers', type=int, default=4)
+    parser.add_argument('--listings', type=int, default=5, help="Listings per producer")
+    parser.add_argument('--purchases', type=int, default=3, help="Purchases per consumer")
+    parser.add_argument('--payload-bytes', type=int, default=1024, help="Padding added to each dataset")
+    parser.add_argument('--min-price', type=float, default=0.1)
+    parser.add_argument('--max-price', type=float, default=2.0)
+    parser.add_argument('--eth', type=float, default=10, help="ETH given to each agent for gas")
+    parser.add_argument('--musdc', type=float, default=1000, help="MUSDC minted to each consumer")
+    parser.add_argument('--listing-wait', type=float, default=60,
+                        help="How long a consumer waits for something new to buy before giving up")
+    parser.add_argument('--seed', type=int, default=None, help="Derive agent keys deterministically")
+    parser.add_argument('--json', help="Also write the report here")
+    args = parser.parse_args()
+
+    os.environ.setdefault('AURAWEAVE_NETWORK', 'localhost')
+    from config import ACTIVE_NETWORK, RPC_URL, MOCK_ERC20_ADDRESS, MOCK_ERC20_ABI
+    from ipfs_standin import IpfsStandIn
+    if ACTIVE_NETWORK != 'localhost':
+        print("ERROR: The simulation mints tokens and spends gas freely; it only runs against localhost.")
+        sys.exit(1)
+
+    w3 = Web3(Web3.HTTPProvider(RPC_URL))
+    if not w3.is_connected():
+        print(f"ERROR: No node at {RPC_URL}. Start one with 'npx hardhat node' and deploy first.")
+        sys.exit(1)
+    funder = Account.from_key(os.getenv('SIM_FUNDER_PRIVATE_KEY', HARDHAT_ACCOUNT_0_KEY))
+    token = w3.eth.contract(address=MOCK_ERC20_ADDRESS, abi=MOCK_ERC20_ABI)
+
+    def new_key(index):
+        if args.seed is None:
+            return Account.create().key.hex()
+        return Web3.to_hex(Web3.keccak(text=f"auraweave-sim-{args.seed}-{index}"))
+
+    producer_keys = [new_key(index) for index in range(args.producers)]
+    consumer_keys = [new_key(args.producers + index) for index in range(args.consumers)]
+    print(f"Funding {len(producer_keys)} producers and {len(consumer_keys)} consumers from {funder.address}...")
+    fund_agents(w3, funder, token, producer_keys, consumer_keys, args.eth, args.musdc)
+
+    ipfs = IpfsStandIn().start()
+    cache_root = tempfile.mkdtemp(prefix='auraweave-sim-')
+    settings = {
+        'rpc_url': RPC_URL, 'ipfs_api': ipfs.api_multiaddr, 'ipfs_gateway': ipfs.gateway_url,
+        'cache_root': cache_root, 'listings_per_producer': args.listings,
+        'purchases_per_consumer': args.purchases, 'payload_bytes': args.payload_bytes,
+        'min_price': args.min_price, 'max_price': args.max_price, 'listing_wait_seconds': args.listing_wait,
+    }
+
+    print(f"Starting {args.producers + args.consumers} agent processes...")
+    started = time.perf_counter()
+    results = []
+    # spawn + one task per process: each agent imports the agent module fresh with its own key.
+    with ProcessPoolExecutor(max_workers=args.producers + args.consumers,
+                             mp_context=multiprocessing.get_context('spawn'), max_tasks_per_child=1) as pool:
+        futures = [pool.submit(run_producer, index, key, settings) for index, key in enumerate(producer_keys)]
+        futures += [pool.submit(run_consumer, index, key, settings) for index, key in enumerate(consumer_keys)]
+        for future in as_completed(futures):
+            try:
+                results.append(future.result())
+            except BaseException as e:
+                print(f"Agent process failed: {e!r}")
+    wall_seconds = time.perf_counter() - started
+
+    tx_hashes = {}
+    for result in results:
+        for phase, hashes in result['tx_hashes'].items():
+            tx_hashes.setdefault(phase, []).extend(hashes)
+    report = build_report(results, wall_seconds, total_gas(w3, tx_hashes), dict(ipfs.counts))
+    ipfs.stop()
+    print_report(report)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
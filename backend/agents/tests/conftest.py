@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The agents are flat modules run from backend/agents; tests import them the same way.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
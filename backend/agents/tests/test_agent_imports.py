@@ -0,0 +1,35 @@
+import os
+import sys
+import subprocess
+
+AGENTS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHECK = """
+import config
+import consumer_agent, producer_agent, async_agent
+assert not config._env_loaded, "importing an agent loaded .env"
+assert config._read_deployment.cache_info().currsize == 0, "importing an agent parsed a deployment file"
+print("imported")
+"""
+
+
+def test_importing_the_agents_reads_no_settings_and_does_not_exit():
+    # No keys and no deployment file: the checks belong to start() / __main__, not to import.
+    env = {key: value for key, value in os.environ.items()
+           if not key.endswith('_PRIVATE_KEY') and key != 'AURAWEAVE_DEPLOYMENT_FILE'}
+    env['AURAWEAVE_DEPLOYMENT_FILE'] = os.path.join(AGENTS_DIR, 'no-such-deployment.json')
+    result = subprocess.run([sys.executable, '-c', CHECK], cwd=AGENTS_DIR, env=env,
+                            capture_output=True, text=True, timeout=60)
+    assert result.returncode == 0, result.stderr
+    assert result.stdout == "imported\n"
+
+
+def test_consumer_start_exits_when_the_key_is_missing():
+    env = {key: value for key, value in os.environ.items() if key != 'CONSUMER_PRIVATE_KEY'}
+    env['CONSUMER_PRIVATE_KEY'] = ''
+    result = subprocess.run(
+        [sys.executable, '-c', "import consumer_agent; consumer_agent.start(); print('still running')"],
+        cwd=AGENTS_DIR, env=env, capture_output=True, text=True, timeout=60,
+    )
+    assert "CONSUMER_PRIVATE_KEY not found in environment" in result.stdout
+    assert "still running" not in result.stdout
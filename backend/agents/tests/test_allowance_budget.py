@@ -0,0 +1,60 @@
+import os
+import json
+from eth_account import Account
+from web3 import Web3
+import rpc_batch
+from allowance_budget import AllowanceBudget
+from listing_index import DATA_PURCHASED_TOPIC
+from rpc_fakes import ScriptedProvider
+
+DEPLOYMENT = os.path.join(os.path.dirname(__file__), '..', '..', 'deployments', 'sepolia.json')
+REGISTRY = Web3.to_checksum_address('0x' + '42' * 20)
+TOKEN = Web3.to_checksum_address('0x' + '43' * 20)
+SELLER = '0x' + 'ab' * 20
+
+
+def topic(value):
+    return '0x' + f"{value:064x}"
+
+
+def purchased_log(w3, buyer, price, block):
+    return {
+        'address': REGISTRY, 'blockNumber': hex(block), 'logIndex': '0x0', 'transactionIndex': '0x0',
+        'transactionHash': topic(block), 'blockHash': '0x' + '00' * 32, 'removed': False,
+        'topics': [DATA_PURCHASED_TOPIC, topic(block), '0x' + '00' * 12 + buyer[2:].lower(),
+                   '0x' + '00' * 12 + SELLER[2:]],
+        'data': Web3.to_hex(w3.codec.encode(['uint256', 'address'], [price, TOKEN])),
+    }
+
+
+def test_sync_applies_purchases_made_by_other_processes():
+    rpc_batch._multicall_available.clear()
+    account = Account.create()
+    chain = {'head': 100, 'logs': []}
+
+    def handler(method, params):
+        if method == 'eth_blockNumber':
+            return {'result': hex(chain['head'])}
+        if method == 'eth_getBlockByNumber':
+            return {'result': {'number': hex(chain['head']), 'baseFeePerGas': hex(10**9)}}
+        if method == 'eth_call':
+            return {'result': Web3.to_hex(w3.codec.encode(['uint256'], [1000]))}
+        if method == 'eth_getLogs':
+            assert params[0]['fromBlock'] == hex(101)
+            return {'result': chain['logs']}
+        raise AssertionError(method)
+
+    w3 = Web3(ScriptedProvider(handler))
+    with open(DEPLOYMENT) as f:
+        deployment = json.load(f)
+    token = w3.eth.contract(address=TOKEN, abi=deployment['MockERC20']['abi'])
+    registry = w3.eth.contract(address=REGISTRY, abi=deployment['DataRegistry']['abi'])
+    budget = AllowanceBudget(w3, token, registry, account, budget_wei=1000)
+
+    budget.sync()
+    assert budget.remaining == 1000
+    chain['head'] = 105
+    chain['logs'] = [purchased_log(w3, account.address, 300, 103)]
+    budget.sync()
+    assert budget.remaining == 700
+    assert budget.synced_block == 105
@@ -0,0 +1,161 @@
+import os
+import json
+import asyncio
+import pytest
+import config
+from async_agent import AsyncAgent, AsyncReceiptWaiter
+
+DEPLOYMENT = os.path.join(os.path.dirname(__file__), '..', '..', 'deployments', 'sepolia.json')
+
+
+def tx_hash(index):
+    return '0x' + f"{index:064x}"
+
+
+def receipt(tx, block=5):
+    return {
+        'transactionHash': tx, 'blockHash': '0x' + '00' * 32, 'blockNumber': hex(block), 'status': '0x1',
+        'gasUsed': '0x5208', 'cumulativeGasUsed': '0x5208', 'effectiveGasPrice': '0x1', 'logs': [],
+        'transactionIndex': '0x0', 'type': '0x2', 'from': '0x' + 'aa' * 20, 'to': '0x' + 'bb' * 20,
+        'contractAddress': None, 'logsBloom': '0x' + '00' * 256,
+    }
+
+
+class FakeResponse:
+    def __init__(self, body):
+        self.body = body
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def raise_for_status(self):
+        pass
+
+    async def json(self, content_type=None):
+        return self.body
+
+
+class FakeSession:
+    """Answers each batch POST with `answer(payload)`."""
+
+    def __init__(self, answer):
+        self.answer = answer
+        self.payloads = []
+
+    def post(self, url, json):
+        self.payloads.append(json)
+        return FakeResponse(self.answer(json))
+
+
+def test_timed_out_hash_is_no_longer_polled():
+    async def scenario():
+        session = FakeSession(lambda payload: [{'jsonrpc': '2.0', 'id': r['id'], 'result': None} for r in payload])
+        waiter = AsyncReceiptWaiter(session, 'http://node', poll_interval=0.01)
+        with pytest.raises(asyncio.TimeoutError):
+            await waiter.wait(tx_hash(1), timeout=0.05)
+        assert waiter._waiting == {}
+        await asyncio.sleep(0.05)
+        polled = len(session.payloads)
+        await asyncio.sleep(0.05)
+        assert len(session.payloads) == polled
+    asyncio.run(scenario())
+
+
+def test_receipts_are_matched_by_id_and_bad_answers_do_not_kill_the_poller():
+    wanted = [tx_hash(1), tx_hash(2)]
+    answers = [
+        {'jsonrpc': '2.0', 'id': None, 'error': {'code': -32600, 'message': 'batch not supported'}},
+        # Out of order and short: only the second hash is answered.
+        lambda payload: [{'jsonrpc': '2.0', 'id': payload[1]['id'], 'result': receipt(payload[1]['params'][0])}],
+        lambda payload: [{'jsonrpc': '2.0', 'id': r['id'], 'result': receipt(r['params'][0], 7)} for r in payload],
+    ]
+
+    def answer(payload):
+        current = answers.pop(0) if len(answers) > 1 else answers[0]
+        return current(payload) if callable(current) else current
+
+    async def scenario():
+        waiter = AsyncReceiptWaiter(FakeSession(answer), 'http://node', poll_interval=0.01)
+        first, second = await asyncio.gather(*(waiter.wait(tx, timeout=2) for tx in wanted))
+        assert (first['blockNumber'], second['blockNumber']) == (7, 5)
+        assert (first['transactionHash'], second['transactionHash']) == tuple(wanted)
+    asyncio.run(scenario())
+
+
+class FakeChain:
+    """Allowance, listings and sends for AsyncAgent. Approvals mine at once; purchases wait for release()."""
+
+    def __init__(self, prices):
+        self.prices = prices
+        self.allowance = 0
+        self.approvals = []
+        self.purchases = {}
+
+    async def call(self, call):
+        if call.fn_name == 'getListing':
+            return (0,) * 6 + (self.prices[call.args[0]], True)
+        if call.fn_name == 'balanceOf':
+            return 10 ** 30
+        if call.fn_name == 'allowance':
+            return self.allowance
+        raise AssertionError(call.fn_name)
+
+    async def estimate_gas(self, call, default_gas, margin=0, label=None):
+        return default_gas
+
+    async def send(self, call, gas, label=None):
+        tx = tx_hash(len(self.approvals) + len(self.purchases) + 1)
+        if call.fn_name == 'approve':
+            self.approvals.append(call.args[1])
+            self.allowance = call.args[1]
+        else:
+            self.purchases[tx] = asyncio.get_running_loop().create_future()
+        return tx, None
+
+    async def wait(self, tx, timeout=240):
+        if tx not in self.purchases:
+            return {'status': 1, 'blockNumber': 9}
+        return await self.purchases[tx]
+
+    def release(self):
+        for future in self.purchases.values():
+            if not future.done():
+                future.set_result({'status': 1, 'blockNumber': 9})
+
+
+async def settle():
+    for _ in range(50):
+        await asyncio.sleep(0)
+
+
+def test_an_approval_leaves_room_for_purchases_still_in_flight(monkeypatch):
+    with open(DEPLOYMENT) as f:
+        deployment = json.load(f)
+    for name, contract, field in (('DATA_REGISTRY_ADDRESS', 'DataRegistry', 'address'),
+                                  ('DATA_REGISTRY_ABI', 'DataRegistry', 'abi'),
+                                  ('MOCK_ERC20_ADDRESS', 'MockERC20', 'address'),
+                                  ('MOCK_ERC20_ABI', 'MockERC20', 'abi')):
+        monkeypatch.setattr(config, name, deployment[contract][field], raising=False)
+
+    async def scenario():
+        chain = FakeChain({1: 30, 2: 50})
+        agent = AsyncAgent('0x' + '33' * 32, rpc_url='http://node')
+        agent._call, agent.tx_engine, agent.receipts = chain.call, chain, chain
+
+        first = asyncio.ensure_future(agent.purchase_data_on_chain(1))
+        await settle()
+        # Listing 1's purchase has not mined, so the 30 it will spend must stay approved.
+        second = asyncio.ensure_future(agent.purchase_data_on_chain(2))
+        await settle()
+        batch = asyncio.ensure_future(agent.purchase_many([{'id': 3, 'price_token_wei': 20},
+                                                           {'id': 4, 'price_token_wei': 10}]))
+        await settle()
+
+        assert chain.approvals == [30, 80, 110]
+        chain.release()
+        assert await asyncio.wait_for(asyncio.gather(first, second, batch), 5) == [True, True, [True, True]]
+        assert agent._committed_wei == 0
+    asyncio.run(scenario())
@@ -0,0 +1,34 @@
+import os
+import time
+from blob_store import BlobStore
+
+
+def make_store(tmp_path, **kwargs):
+    return BlobStore(str(tmp_path / 'blobs'), max_bytes=1000, memory_max_bytes=0, **kwargs)
+
+
+def test_eviction_frees_down_to_low_water_and_scans_once_per_batch(tmp_path, monkeypatch):
+    store = make_store(tmp_path)
+    scans = []
+    real_scan = store._scan
+    monkeypatch.setattr(store, '_scan', lambda: scans.append(1) or real_scan())
+    for index in range(30):
+        store.put(f"bafy{index:04d}", b'x' * 100)
+    # Over 1000 bytes at the 11th put; each eviction then leaves room for one more blob before the next.
+    assert store._disk_bytes <= store.max_bytes
+    assert len(scans) < 30 - 10
+    assert store._disk_bytes == sum(size for _, size, _ in real_scan())
+
+
+def test_eviction_removes_least_recently_used_first(tmp_path):
+    store = make_store(tmp_path, low_water=0.5)
+    for index in range(10):
+        store.put(f"bafy{index:04d}", b'x' * 100)
+        past = time.time() - 100 + index
+        os.utime(store.path_for(f"bafy{index:04d}"), (past, past))
+    store.get("bafy0000")
+    store.put("bafy0010", b'x' * 100)
+    assert "bafy0000" in store
+    assert "bafy0001" not in store
+    assert "bafy0010" in store
+    assert store._disk_bytes <= 500
@@ -0,0 +1,14 @@
+from chain_state import bump_fees, compute_fee_params
+
+
+def test_bump_fees_raises_by_an_eighth():
+    bumped = bump_fees({'maxFeePerGas': 1000, 'maxPriorityFeePerGas': 100, 'nonce': 3})
+    assert bumped == {'maxFeePerGas': 1126, 'maxPriorityFeePerGas': 113, 'nonce': 3}
+    assert bump_fees({'gasPrice': 1000}) == {'gasPrice': 1126}
+
+
+def test_bump_fees_never_goes_below_current_fees():
+    current = compute_fee_params(base_fee=4000, priority_fee=500, gas_price=None)
+    bumped = bump_fees({'maxFeePerGas': 1000, 'maxPriorityFeePerGas': 100}, current)
+    assert bumped == {'maxFeePerGas': 8500, 'maxPriorityFeePerGas': 500}
+    assert bump_fees({'gasPrice': 1000}, {'gasPrice': 5000}) == {'gasPrice': 5000}
@@ -0,0 +1,38 @@
+import hashlib
+import base64
+from cid_utils import verify_cid, StreamVerifier, DEFAULT_CHUNK_SIZE, encode_varint, CODEC_RAW, MULTIHASH_SHA2_256
+
+# `ipfs add` (CIDv0, default chunker) of b'hello world' and of an empty file.
+HELLO_CID = 'Qmf412jQZiuVUtdgnB36FXFX7xg5V6KEbSJ4dpQuhkLyfD'
+EMPTY_CID = 'QmbFMke1KXqnYyBBWxB74N4c5SBnJMVAiMNRcGu6x1AwQH'
+
+
+def raw_cid(content):
+    digest = hashlib.sha256(content).digest()
+    cid = encode_varint(1) + encode_varint(CODEC_RAW) + encode_varint(MULTIHASH_SHA2_256) + encode_varint(32) + digest
+    return 'b' + base64.b32encode(cid).decode().lower().rstrip('=')
+
+
+def test_single_block_dag_pb_content_is_checked_both_ways():
+    assert verify_cid(HELLO_CID, b'hello world') is True
+    assert verify_cid(EMPTY_CID, b'') is True
+    assert verify_cid(HELLO_CID, b'hello world!') is False
+    assert verify_cid(HELLO_CID, b'<html>gateway error page</html>') is False
+
+
+def test_raw_cids_are_checked_and_what_cannot_be_checked_is_none():
+    content = b'{"temperature": 21}'
+    assert verify_cid(raw_cid(content), content) is True
+    assert verify_cid(raw_cid(content), content + b' ') is False
+    # Bigger than one block: only the DAG could tell.
+    assert verify_cid(HELLO_CID, b'x' * (DEFAULT_CHUNK_SIZE + 1)) is None
+    assert verify_cid('not-a-cid', b'hello world') is None
+
+
+def test_stream_verifier_agrees_with_verify_cid():
+    for cid, content in ((HELLO_CID, b'hello world'), (HELLO_CID, b'hello there'),
+                         (raw_cid(b'abc' * 1000), b'abc' * 1000), (HELLO_CID, b'y' * (DEFAULT_CHUNK_SIZE + 10))):
+        verifier = StreamVerifier(cid)
+        for offset in range(0, len(content), 4096):
+            verifier.update(content[offset:offset + 4096])
+        assert verifier.result() is verify_cid(cid, content)
@@ -0,0 +1,47 @@
+import os
+from ipfs_upload import IpfsUploader
+from publish_manifest import hash_path
+
+
+def make_tree(root, with_hidden):
+    os.makedirs(os.path.join(root, 'sub'))
+    with open(os.path.join(root, 'a.csv'), 'w') as f:
+        f.write('a,b\n1,2\n')
+    with open(os.path.join(root, 'sub', 'b.json'), 'w') as f:
+        f.write('{"b": 1}')
+    if with_hidden:
+        os.makedirs(os.path.join(root, '.git'))
+        with open(os.path.join(root, '.git', 'HEAD'), 'w') as f:
+            f.write('ref: refs/heads/main\n')
+        with open(os.path.join(root, 'sub', '.env'), 'w') as f:
+            f.write('SECRET=1\n')
+
+
+def capture_add(monkeypatch, uploader):
+    calls = []
+
+    def post_add(entries, progress, total, params):
+        calls.append({'lazy': not isinstance(entries, list), 'names': [name for name, _, _ in entries],
+                      'total': total})
+        return [{'Name': calls[-1]['names'][0].split('/')[0], 'Hash': 'bafyroot'}]
+    monkeypatch.setattr(uploader, '_post_add', post_add)
+    return calls
+
+
+def test_add_path_walks_lazily_and_skips_hidden_files(tmp_path, monkeypatch):
+    root = str(tmp_path / 'dataset')
+    make_tree(root, with_hidden=True)
+    uploader = IpfsUploader('http://127.0.0.1:5001')
+    calls = capture_add(monkeypatch, uploader)
+    assert uploader.add_path(root) == 'bafyroot'
+    assert calls[0]['lazy']
+    assert calls[0]['names'] == ['dataset', 'dataset/a.csv', 'dataset/sub', 'dataset/sub/b.json']
+    assert calls[0]['total'] == len('a,b\n1,2\n') + len('{"b": 1}')
+
+
+def test_hash_path_uses_the_upload_hidden_file_rule(tmp_path):
+    plain, with_hidden = str(tmp_path / 'plain'), str(tmp_path / 'hidden')
+    make_tree(plain, with_hidden=False)
+    make_tree(with_hidden, with_hidden=True)
+    assert hash_path(with_hidden) == hash_path(plain)
+    assert hash_path(with_hidden, include_hidden=True) != hash_path(plain)
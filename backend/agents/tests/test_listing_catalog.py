@@ -0,0 +1,106 @@
+import random
+import pytest
+import listing_catalog
+from listing_catalog import ListingCatalog, ListingRecord, tokenize
+
+SELLERS = ['0x' + digit * 40 for digit in 'abcd']
+WORDS = ['weather', 'berlin', 'traffic', 'sensor', 'hourly', 'daily']
+
+
+def random_records(count, seed=7):
+    rng = random.Random(seed)
+    return [
+        ListingRecord(
+            listing_id, rng.choice(SELLERS), ' '.join(rng.sample(WORDS, 2)), rng.choice(WORDS + [None]),
+            f'data-{listing_id}', f'meta-{listing_id}', rng.randrange(1, 50) * 10 ** 17,
+            active=rng.random() > 0.1, block_number=listing_id // 4,
+        )
+        for listing_id in range(1, count + 1)
+    ]
+
+
+def reference_query(records, text=None, seller=None, exclude_seller=None, min_price_wei=None,
+                    max_price_wei=None, order_by='price', limit=None, offset=0, exclude_ids=()):
+    words = tokenize(text)
+    matches = [
+        record for record in records
+        if record.active
+        and words <= record.tokens()
+        and (seller is None or record.seller_key == seller.lower())
+        and (exclude_seller is None or record.seller_key != exclude_seller.lower())
+        and record.id not in exclude_ids
+        and (min_price_wei is None or record.price >= min_price_wei)
+        and (max_price_wei is None or record.price <= max_price_wei)
+    ]
+    key = {'price': lambda r: (r.price, r.id), 'id': lambda r: r.id, 'newest': lambda r: -r.id}[order_by]
+    matches.sort(key=key)
+    return [record.id for record in matches[offset:None if limit is None else offset + limit]]
+
+
+QUERIES = [
+    {},
+    {'order_by': 'id', 'limit': 5},
+    {'order_by': 'newest', 'limit': 3, 'offset': 2},
+    {'text': 'Weather', 'limit': 10},
+    {'text': 'berlin sensor', 'order_by': 'newest'},
+    {'text': 'nothing-matches'},
+    {'seller': SELLERS[1].upper().replace('0X', '0x'), 'max_price_wei': 2 * 10 ** 18},
+    {'exclude_seller': SELLERS[0], 'min_price_wei': 10 ** 18, 'max_price_wei': 3 * 10 ** 18, 'limit': 7},
+    {'text': 'daily', 'exclude_ids': {3, 4, 5, 6, 7}, 'order_by': 'id'},
+]
+
+
+@pytest.mark.parametrize('sort_below', [0, 10 ** 6])
+@pytest.mark.parametrize('query', QUERIES)
+def test_query_matches_a_brute_force_filter(monkeypatch, query, sort_below):
+    # sort_below picks the strategy: 0 always walks the sorted index, a large value always sorts the candidates.
+    monkeypatch.setattr(listing_catalog, 'SORT_CANDIDATES_BELOW', sort_below)
+    records = random_records(300)
+    catalog = ListingCatalog()
+    catalog.add_many(records)
+
+    got = [record.id for record in catalog.query(**query)]
+
+    assert got == reference_query(records, **query)
+
+
+def test_add_replaces_and_remove_unindexes():
+    catalog = ListingCatalog()
+    catalog.add_many(random_records(20))
+    catalog.add(ListingRecord(5, SELLERS[0], 'renamed listing', 'glacier', 'd', 'm', 1))
+
+    assert [record.id for record in catalog.query(text='glacier')] == [5]
+    assert catalog.query(order_by='price', limit=1)[0].id == 5
+
+    catalog.remove(5)
+
+    assert catalog.query(text='glacier') == []
+    assert 5 not in catalog
+    assert len(catalog) == 19
+
+
+class FakeIndex:
+    def __init__(self, rows, checkpoint, confirmations=2):
+        self.rows = rows
+        self.checkpoint = checkpoint
+        self.confirmations = confirmations
+
+    def listings_since(self, from_block):
+        return [row for row in self.rows if row['block_number'] >= from_block]
+
+
+def test_sync_from_index_rereads_the_blocks_a_reorg_may_have_rewritten():
+    rows = [record.to_dict() for record in random_records(40)]
+    index = FakeIndex(rows, checkpoint=10)
+    catalog = ListingCatalog()
+    assert catalog.sync_from_index(index) == 40
+
+    # Blocks 9 and 10 were rewritten: listing 39 is gone and 41 took its place.
+    index.rows = [row for row in rows if row['id'] != 39]
+    index.rows.append(dict(rows[-1], id=41, name='replacement', block_number=10))
+    index.checkpoint = 11
+    catalog.sync_from_index(index)
+
+    assert 39 not in catalog
+    assert catalog.get(41).name == 'replacement'
+    assert sorted(record.id for record in catalog.query(active_only=False)) == sorted(row['id'] for row in index.rows)
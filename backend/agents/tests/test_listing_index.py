@@ -0,0 +1,84 @@
+import os
+import json
+from web3 import Web3
+import rpc_batch
+from listing_index import ListingIndex, DATA_LISTED_TOPIC
+from listing_catalog import ListingCatalog
+from rpc_fakes import ScriptedProvider
+
+DEPLOYMENT = os.path.join(os.path.dirname(__file__), '..', '..', 'deployments', 'sepolia.json')
+REGISTRY = '0x' + '42' * 20
+SELLER = Web3.to_checksum_address('0x' + 'ab' * 20)
+TOKEN = Web3.to_checksum_address('0x' + 'cd' * 20)
+LISTINGS = {
+    1: ('Berlin air', 'Hourly temperature and humidity readings'),
+    2: ('Ship positions', 'AIS vessel tracks for the North Sea'),
+    3: ('Paris air', 'Hourly temperature readings'),
+}
+
+
+def listed_log(w3, listing_id):
+    name, _ = LISTINGS[listing_id]
+    data = w3.codec.encode(['string', 'string', 'string', 'uint256', 'address'],
+                           [name, f"bafydata{listing_id}", f"bafymeta{listing_id}", 10**18 * listing_id, TOKEN])
+    return {
+        'address': REGISTRY, 'blockNumber': hex(10 + listing_id), 'logIndex': '0x0', 'transactionIndex': '0x0',
+        'transactionHash': '0x' + f"{listing_id:064x}", 'blockHash': '0x' + '00' * 32, 'removed': False,
+        'topics': [DATA_LISTED_TOPIC, '0x' + f"{listing_id:064x}", '0x' + '00' * 12 + SELLER[2:].lower()],
+        'data': Web3.to_hex(data),
+    }
+
+
+def make_index(tmp_path, failing_ids=()):
+    rpc_batch._multicall_available.clear()
+
+    def handler(method, params):
+        if method == 'eth_blockNumber':
+            return {'result': hex(20)}
+        if method == 'eth_getLogs':
+            return {'result': [listed_log(w3, listing_id) for listing_id in LISTINGS]}
+        if method == 'eth_getCode':
+            return {'result': '0x'}
+        if method == 'eth_call':
+            (listing_id,) = w3.codec.decode(['uint256'], Web3.to_bytes(hexstr=params[0]['data'])[4:])
+            if listing_id in failing_ids:
+                return {'error': {'code': -32000, 'message': 'execution reverted'}}
+            name, description = LISTINGS[listing_id]
+            listing = (listing_id, SELLER, name, description, f"bafydata{listing_id}", f"bafymeta{listing_id}",
+                       10**18 * listing_id, True)
+            encoded = w3.codec.encode(['(uint256,address,string,string,string,string,uint256,bool)'], [listing])
+            return {'result': Web3.to_hex(encoded)}
+        raise AssertionError(method)
+
+    w3 = Web3(ScriptedProvider(handler))
+    with open(DEPLOYMENT) as f:
+        abi = json.load(f)['DataRegistry']['abi']
+    registry = w3.eth.contract(address=Web3.to_checksum_address(REGISTRY), abi=abi)
+    return ListingIndex(w3, registry, str(tmp_path / 'listings.db'))
+
+
+def test_sync_fills_in_descriptions_so_the_catalog_can_search_them(tmp_path):
+    index = make_index(tmp_path)
+    assert index.sync() == 3
+    assert [listing['description'] for listing in index.query()] == [LISTINGS[i][1] for i in (1, 2, 3)]
+
+    catalog = ListingCatalog()
+    catalog.sync_from_index(index)
+    assert [record.id for record in catalog.query(text='temperature', order_by='id')] == [1, 3]
+    assert [record.id for record in catalog.query(text='vessel')] == [2]
+
+
+def test_backfill_reads_in_batches_and_retries_failures_later(tmp_path):
+    index = make_index(tmp_path, failing_ids={2})
+    index.sync()
+    assert index.get_listing(2)['description'] == ''
+    calls = [method for method in index.w3.provider.methods() if method == 'eth_call']
+    assert len(calls) == 3
+
+    index.w3.provider.handler = lambda method, params: (
+        {'result': Web3.to_hex(index.w3.codec.encode(
+            ['(uint256,address,string,string,string,string,uint256,bool)'],
+            [(2, SELLER, 'Ship positions', 'AIS vessel tracks', 'bafydata2', 'bafymeta2', 1, True)]))}
+    )
+    assert index.backfill_descriptions(batch_size=1) == 1
+    assert index.get_listing(2)['description'] == 'AIS vessel tracks'
@@ -0,0 +1,58 @@
+from purchase_policy import PurchasePolicy
+from listing_catalog import ListingCatalog, ListingRecord
+
+OWN = '0x' + 'aa' * 20
+OTHER = '0x' + 'bb' * 20
+DENIED = '0x' + 'cc' * 20
+
+
+def listing(listing_id, price, seller=OTHER, name='weather data', description='', active=True):
+    return {'id': listing_id, 'seller': seller, 'name': name, 'description': description,
+            'price_token_wei': price, 'active': active, 'dataCID': f'd{listing_id}', 'metadataCID': f'm{listing_id}'}
+
+
+def test_plan_keeps_what_fits_the_budget_and_says_why_the_rest_was_skipped():
+    policy = PurchasePolicy(max_price_wei=50, deny_sellers=[DENIED.upper().replace('0X', '0x')],
+                            total_budget_wei=100, max_items=3, search='weather')
+    listings = [
+        listing(1, 10), listing(2, 10, seller=OWN), listing(3, 10, seller=DENIED), listing(4, 60),
+        listing(5, 10, name='traffic'), listing(6, 10, active=False), listing(7, 10), listing(8, 40),
+        listing(9, 45), listing(10, 5),
+    ]
+
+    selected, skipped = policy.plan(listings, balance_wei=1000, own_address=OWN, owned={7})
+
+    assert [item['id'] for item in selected] == [1, 8, 9]
+    assert {item['id']: reason for item, reason in skipped} == {
+        2: "own listing", 3: "seller in deny list", 4: "above price cap", 5: "does not match search",
+        6: "inactive", 7: "already owned", 10: "item limit reached",
+    }
+
+
+def test_plan_budget_is_the_smaller_of_balance_and_what_is_left():
+    policy = PurchasePolicy(total_budget_wei=100)
+    listings = [listing(1, 30), listing(2, 30), listing(3, 30)]
+
+    assert len(policy.plan(listings, balance_wei=50)[0]) == 1
+    selected, skipped = policy.plan(listings, balance_wei=1000, spent_wei=40, bought=1)
+    assert [item['id'] for item in selected] == [1, 2]
+    assert skipped[0][1] == "over remaining budget"
+    assert policy.exhausted(100, 0) and not policy.exhausted(99, 0)
+
+
+def test_query_filters_select_the_same_listings_as_rejection_reason():
+    policy = PurchasePolicy(max_price_wei=40, min_price_wei=10, allow_sellers=[OTHER, DENIED],
+                            deny_sellers=[DENIED], search='berlin')
+    listings = [
+        listing(1, 20, name='berlin weather'), listing(2, 5, name='berlin'), listing(3, 20, seller=DENIED, name='berlin'),
+        listing(4, 20, seller=OWN, name='berlin'), listing(5, 20, name='paris'), listing(6, 50, name='berlin'),
+        listing(7, 30, description='Berlin traffic'), listing(8, 25, name='berlin'),
+    ]
+    catalog = ListingCatalog()
+    catalog.add_many(ListingRecord.from_dict(item) for item in listings)
+
+    queried = [record.id for record in catalog.query(**policy.query_filters(OWN, owned={8}))]
+
+    assert queried == [item['id'] for item in sorted(listings, key=lambda item: (item['price_token_wei'], item['id']))
+                       if policy.rejection_reason(item, OWN, owned={8}) is None]
+    assert queried == [1, 7]
@@ -0,0 +1,123 @@
+import time
+import pytest
+from concurrent.futures import Future
+from web3 import Web3
+from receipt_tracker import ReceiptTracker, TransactionReplaced
+from tx_engine import Submission
+from rpc_fakes import ScriptedProvider
+
+SENDER = '0x' + 'aa' * 20
+
+
+def tx_hash(index):
+    return '0x' + f"{index:064x}"
+
+
+def receipt_for(tx, block):
+    return {'transactionHash': tx, 'blockNumber': hex(block), 'status': '0x1', 'gasUsed': '0x5208', 'logs': []}
+
+
+def idle_tracker(handler, **kwargs):
+    tracker = ReceiptTracker(Web3(ScriptedProvider(handler)), **kwargs)
+    tracker._ensure_running = lambda: None  # tests drive poll() themselves
+    return tracker
+
+
+def test_deadline_expires_while_the_node_is_unreachable():
+    def handler(method, params):
+        raise ConnectionError("node down")
+
+    tracker = ReceiptTracker(Web3(ScriptedProvider(handler)), poll_interval=0.02)
+    future = tracker.track(tx_hash(1), timeout=0.2)
+    with pytest.raises(TimeoutError, match='not mined'):
+        future.result(5)
+    assert tracker.pending_count() == 0
+
+
+def test_fresh_hash_is_looked_up_even_when_block_receipts_are_used():
+    mined_early = tx_hash(99)
+
+    def handler(method, params):
+        if method == 'eth_blockNumber':
+            return {'result': hex(11)}
+        if method == 'eth_getBlockReceipts':
+            return {'result': []}
+        if method == 'eth_getTransactionReceipt':
+            return {'result': receipt_for(mined_early, 9) if params[0] == mined_early else None}
+        if method == 'eth_getTransactionCount':
+            return {'result': hex(100)}
+        raise AssertionError(method)
+
+    tracker = idle_tracker(handler, block_receipts_threshold=16)
+    for index in range(16):
+        tracker.track(tx_hash(index), transaction={'from': SENDER, 'nonce': 200 + index})
+    tracker._unchecked.clear()
+    tracker._last_block = 10
+    future = tracker.track(mined_early, transaction={'from': SENDER, 'nonce': 42})
+
+    tracker.poll()
+    tracker.poll()
+    assert future.result(0)['blockNumber'] == 9
+    lookups = [params[0] for method, params in tracker.w3.provider.requests if method == 'eth_getTransactionReceipt']
+    assert lookups == [mined_early]
+    assert 'eth_getBlockReceipts' in tracker.w3.provider.methods()
+
+
+def test_nonce_moving_past_an_unmined_hash_means_replaced():
+    def handler(method, params):
+        if method == 'eth_blockNumber':
+            handler.head += 1
+            return {'result': hex(handler.head)}
+        if method == 'eth_getTransactionReceipt':
+            return {'result': None}
+        return {'result': hex(8)}
+    handler.head = 0
+
+    tracker = idle_tracker(handler)
+    future = tracker.track(tx_hash(1), transaction={'from': SENDER, 'nonce': 7})
+    tracker.poll()
+    assert not future.done()
+    tracker.poll()
+    with pytest.raises(TransactionReplaced):
+        future.result(0)
+
+
+def test_submission_wait_is_bounded(monkeypatch):
+    monkeypatch.setattr('tx_engine.RESULT_GRACE_SECONDS', 0)
+    submission = Submission(tx_hash(1), 0, {}, Future(), timeout=0.05)
+    started = time.monotonic()
+    with pytest.raises(TimeoutError):
+        submission.wait()
+    assert time.monotonic() - started < 2
+
+
+def test_failed_first_lookup_is_retried_before_the_nonce_calls_it_replaced():
+    mined_early = tx_hash(99)
+
+    def handler(method, params):
+        if method == 'eth_blockNumber':
+            handler.head += 1
+            return {'result': hex(handler.head)}
+        if method == 'eth_getBlockReceipts':
+            return {'result': []}
+        if method == 'eth_getTransactionReceipt':
+            handler.lookups += 1
+            if handler.lookups == 1:
+                return {'error': {'code': -32000, 'message': 'header not found'}}
+            return {'result': receipt_for(mined_early, 9) if params[0] == mined_early else None}
+        if method == 'eth_getTransactionCount':
+            return {'result': hex(300)}  # every tracked nonce is spent
+        raise AssertionError(method)
+    handler.head = 10
+    handler.lookups = 0
+
+    tracker = idle_tracker(handler, block_receipts_threshold=16)
+    for index in range(16):
+        tracker.track(tx_hash(index), transaction={'from': SENDER, 'nonce': 200 + index})
+    tracker._unchecked.clear()
+    tracker._last_block = 10
+    future = tracker.track(mined_early, transaction={'from': SENDER, 'nonce': 42})
+
+    for _ in range(3):
+        tracker.poll()
+    assert future.result(0)['blockNumber'] == 9
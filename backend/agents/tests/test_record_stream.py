@@ -0,0 +1,22 @@
+import io
+import pytest
+from record_stream import iter_records
+
+CASES = [
+    ('[1.5e3, 2]', [1500.0, 2]),
+    ('[{"a":1}, 1e5]', [{'a': 1}, 100000.0]),
+    ('[-12.25E-2, 3, true, null, "x"]', [-0.1225, 3, True, None, 'x']),
+    ('1.5e3\n2\n-0.5\n', [1500.0, 2, -0.5]),
+    ('{"a": 1}{"b": [1, 2]} 7', [{'a': 1}, {'b': [1, 2]}, 7]),
+]
+
+
+@pytest.mark.parametrize('text,expected', CASES)
+@pytest.mark.parametrize('chunk_chars', range(1, 9))
+def test_records_survive_every_chunk_split(text, expected, chunk_chars):
+    assert list(iter_records(io.StringIO(text), chunk_chars=chunk_chars)) == expected
+
+
+def test_unterminated_array_raises():
+    with pytest.raises(ValueError):
+        list(iter_records(io.StringIO('[1, 2'), chunk_chars=2))
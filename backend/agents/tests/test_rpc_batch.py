@@ -0,0 +1,60 @@
+from web3 import Web3
+import rpc_batch
+from rpc_batch import RpcBatch, MULTICALL3_ADDRESS
+from rpc_fakes import ScriptedProvider
+
+
+def uint_call(to):
+    return {'to': to, 'data': '0x'}
+
+
+def decode_uint(raw):
+    return Web3.to_int(raw if isinstance(raw, bytes) else Web3.to_bytes(hexstr=raw))
+
+
+def batch_for(handler):
+    rpc_batch._multicall_available.clear()
+    w3 = Web3(ScriptedProvider(handler))
+    return w3, RpcBatch(w3)
+
+
+def encoded(w3, value):
+    return w3.codec.encode(['uint256'], [value])
+
+
+def test_malformed_aggregate_result_falls_back_to_single_calls():
+    targets = ['0x' + '11' * 20, '0x' + '22' * 20]
+
+    def handler(method, params):
+        if method == 'eth_getCode':
+            return {'result': '0x60'}
+        if params[0]['to'] == MULTICALL3_ADDRESS:
+            return {'result': '0xdeadbeef'}
+        return {'result': Web3.to_hex(encoded(w3, targets.index(params[0]['to']) + 1))}
+
+    w3, batch = batch_for(handler)
+    reads = [batch.add('eth_call', [uint_call(to), 'latest'], decode_uint) for to in targets]
+    batch.execute()
+    assert [read.get() for read in reads] == [1, 2]
+
+
+def test_one_bad_return_in_aggregate_only_fails_that_call():
+    def handler(method, params):
+        if method == 'eth_getCode':
+            return {'result': '0x60'}
+        results = [(True, encoded(w3, 7)), (True, b'\x01'), (False, b'')]
+        return {'result': Web3.to_hex(w3.codec.encode(['(bool,bytes)[]'], [results]))}
+
+    w3, batch = batch_for(handler)
+
+    def strict_uint(raw):
+        if len(raw) != 32:
+            raise ValueError("not a uint256")
+        return decode_uint(raw)
+
+    reads = [batch.add('eth_call', [uint_call('0x' + '33' * 20), 'latest'], strict_uint) for _ in range(3)]
+    batch.execute()
+    assert reads[0].get() == 7
+    for read in reads[1:]:
+        assert read.error is not None
+    assert sum(1 for method, params in w3.provider.requests if method == 'eth_call') == 1
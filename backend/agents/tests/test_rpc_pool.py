@@ -0,0 +1,45 @@
+import json
+from rpc_pool import PooledHTTPProvider
+
+ADDRESS = '0x' + 'aa' * 20
+
+
+def scripted_pool():
+    pool = PooledHTTPProvider(['http://node-a:8545', 'http://node-b:8545'])
+    posts = []
+    for endpoint in pool.endpoints:
+        def post(body, endpoint=endpoint):
+            posts.append(endpoint.label)
+            request = json.loads(body)
+            if isinstance(request, list):
+                return json.dumps([{'jsonrpc': '2.0', 'id': item['id'], 'result': '0x7'} for item in request]).encode()
+            return json.dumps({'jsonrpc': '2.0', 'id': request['id'], 'result': '0x7'}).encode()
+        endpoint.post = post
+    return pool, posts
+
+
+def test_batch_with_a_pending_nonce_read_goes_to_the_sticky_endpoint():
+    pool, posts = scripted_pool()
+    pool.make_request('eth_sendRawTransaction', ['0x00'])
+    sticky = posts[-1]
+    # The sticky endpoint now ranks last for plain reads.
+    for endpoint in pool.endpoints:
+        endpoint.latencies.extend([5.0 if endpoint.label == sticky else 0.01] * 8)
+    assert pool.ranked()[0].label != sticky
+
+    payload = [
+        {'jsonrpc': '2.0', 'id': 1, 'method': 'eth_getBlockByNumber', 'params': ['latest', False]},
+        {'jsonrpc': '2.0', 'id': 2, 'method': 'eth_getTransactionCount', 'params': [ADDRESS, 'pending']},
+    ]
+    posts.clear()
+    assert [item['result'] for item in pool.post_batch(payload)] == ['0x7', '0x7']
+    assert posts == [sticky]
+
+
+def test_read_only_batch_uses_the_best_ranked_endpoint():
+    pool, posts = scripted_pool()
+    pool.hedge_reads = False
+    pool.endpoints[0].latencies.extend([5.0] * 8)
+    pool.endpoints[1].latencies.extend([0.01] * 8)
+    pool.post_batch([{'jsonrpc': '2.0', 'id': 1, 'method': 'eth_getTransactionCount', 'params': [ADDRESS, 'latest']}])
+    assert posts == [pool.endpoints[1].label]
@@ -0,0 +1,128 @@
+import threading
+import pytest
+from web3 import Web3
+from eth_account import Account
+from tx_engine import TxEngine, is_rejection, send_failure_action, retry_nonce
+from rpc_fakes import ScriptedProvider
+
+ACCOUNT = Account.from_key('0x' + '22' * 32)
+TRANSFER = {'to': Web3.to_checksum_address('0x' + 'bb' * 20), 'value': 1}
+
+
+class Node:
+    """Pending nonce `chain_nonce`; each send is answered by the next scripted error, or accepted."""
+
+    def __init__(self, chain_nonce=5, send_errors=()):
+        self.chain_nonce = chain_nonce
+        self.send_errors = list(send_errors)
+        self.sent = []
+        self.lock = threading.Lock()
+
+    def handle(self, method, params):
+        if method == 'eth_chainId':
+            return {'result': '0x7a69'}
+        if method == 'eth_getBlockByNumber':
+            return {'result': {'number': '0x10', 'baseFeePerGas': '0x3b9aca00', 'timestamp': '0x1'}}
+        if method in ('eth_maxPriorityFeePerGas', 'eth_gasPrice'):
+            return {'result': '0x3b9aca00'}
+        if method == 'eth_getTransactionCount':
+            return {'result': hex(self.chain_nonce)}
+        if method == 'eth_sendRawTransaction':
+            with self.lock:
+                if self.send_errors:
+                    return {'error': {'code': -32000, 'message': self.send_errors.pop(0)}}
+                self.sent.append(Account.recover_transaction(params[0]))
+            return {'result': Web3.to_hex(Web3.keccak(hexstr=params[0]))}
+        raise AssertionError(method)
+
+
+def engine_for(node):
+    return TxEngine(Web3(ScriptedProvider(node.handle)), ACCOUNT)
+
+
+def test_nonces_are_local_and_consecutive_across_threads():
+    node = Node(chain_nonce=5)
+    engine = engine_for(node)
+
+    submissions = []
+
+    def send():
+        submissions.append(engine.submit(dict(TRANSFER), gas=21000, track=False))
+
+    threads = [threading.Thread(target=send) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(submission.nonce for submission in submissions) == list(range(5, 13))
+    nonce_reads = [method for method in engine.w3.provider.methods() if method == 'eth_getTransactionCount']
+    assert len(nonce_reads) == 1
+    assert len(node.sent) == 8
+
+
+def test_nonce_too_low_resyncs_and_resigns():
+    node = Node(chain_nonce=5, send_errors=['nonce too low'])
+    engine = engine_for(node)
+    engine.nonces.sync(3)  # stale: another process used 3 and 4
+
+    submission = engine.submit(dict(TRANSFER), gas=21000, track=False)
+
+    assert submission.nonce == 5
+    assert engine.nonces.next_nonce == 6
+
+
+def test_already_known_counts_as_sent():
+    node = Node(send_errors=['already known'])
+    engine = engine_for(node)
+
+    submission = engine.submit(dict(TRANSFER), gas=21000, track=False)
+
+    assert submission.nonce == 5
+    assert engine.nonces.next_nonce == 6
+    assert node.sent == []
+
+
+def test_underpriced_on_our_own_slot_bumps_the_fees():
+    node = Node(send_errors=['replacement transaction underpriced'])
+    engine = engine_for(node)
+
+    submission = engine.submit(dict(TRANSFER), gas=21000, track=False)
+
+    assert submission.nonce == 5
+    fees = engine.chain_state.fee_params()
+    assert submission.transaction['maxFeePerGas'] > fees['maxFeePerGas']
+    assert submission.transaction['maxPriorityFeePerGas'] > fees['maxPriorityFeePerGas']
+
+
+def test_unknown_send_error_drops_the_local_nonce_and_raises():
+    node = Node(send_errors=['insufficient funds for gas * price + value'])
+    engine = engine_for(node)
+
+    with pytest.raises(Exception, match='insufficient funds'):
+        engine.submit(dict(TRANSFER), gas=21000, track=False)
+
+    assert engine.nonces.needs_sync()
+
+
+def test_only_a_json_rpc_error_counts_as_a_rejection():
+    engine = engine_for(Node(send_errors=['insufficient funds for gas * price + value']))
+    with pytest.raises(Exception) as rejected:
+        engine.submit(dict(TRANSFER), gas=21000, track=False)
+
+    assert is_rejection(rejected.value)
+    assert not is_rejection(TimeoutError("read timed out"))
+    assert not is_rejection(ConnectionError("connection reset"))
+
+
+def test_send_failure_action_and_retry_nonce_are_the_shared_retry_rules():
+    assert send_failure_action(ValueError('already known'), 0) == 'sent'
+    assert send_failure_action(ValueError('nonce too low'), 0) == 'resync'
+    assert send_failure_action(ValueError('nonce too low'), 3) == 'raise'
+    assert send_failure_action(ValueError('insufficient funds'), 0) == 'raise'
+
+    transaction = {'maxFeePerGas': 100, 'maxPriorityFeePerGas': 10}
+    assert retry_nonce(transaction, ValueError('nonce too low'), 5, 8) == 8
+    assert transaction['maxFeePerGas'] == 100
+    assert retry_nonce(transaction, ValueError('replacement transaction underpriced'), 5, 5) == 5
+    assert transaction['maxFeePerGas'] > 100 and transaction['maxPriorityFeePerGas'] > 10
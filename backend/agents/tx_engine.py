@@ -0,0 +1,265 @@
+import logging
+import threading
+from web3 import Web3
+from web3.exceptions import ContractLogicError
+from rpc_batch import RpcBatch
+from chain_state import get_chain_state, bump_fees
+from receipt_tracker import get_receipt_tracker, raw_bytes, RESULT_GRACE_SECONDS
+from tracing import get_tracer
+
+DEFAULT_GAS_MARGIN = 50000
+MAX_SEND_RETRIES = 3
+
+logger = logging.getLogger(__name__)
+_engines = {}
+_engines_lock = threading.Lock()
+tracer = get_tracer()
+
+
+class TransactionRejected(Exception):
+    """eth_estimateGas says the call reverts; nothing was sent."""
+
+
+def is_revert(error):
+    return isinstance(error, ContractLogicError) or 'revert' in str(error).lower()
+
+
+def is_rejection(error):
+    """Whether the node answered with a JSON-RPC error, so the transaction is known not to be in its pool.
+
+    Timeouts and connection errors are not: the node may have taken it.
+    """
+    if getattr(error, 'rpc_response', None) is not None:
+        return True
+    # web3 6 raises the error object itself as a ValueError.
+    return isinstance(error, ValueError) and bool(error.args) and isinstance(error.args[0], dict)
+
+
+def send_error_kind(error):
+    message = str(error).lower()
+    if 'already known' in message or 'known transaction' in message:
+        return 'known'
+    if 'nonce too low' in message or 'nonce is too low' in message:
+        return 'nonce_too_low'
+    if 'replacement transaction underpriced' in message or 'replacement fee too low' in message:
+        return 'underpriced'
+    return None
+
+
+def send_failure_action(error, retries, max_retries=MAX_SEND_RETRIES):
+    """What a failed eth_sendRawTransaction means, for TxEngine and AsyncTxEngine alike.
+
+    'sent': the node already has it. 'resync': read the pending nonce and
+    hand it to retry_nonce(). 'raise': give up and drop the local nonce.
+    """
+    kind = send_error_kind(error)
+    if kind == 'known':
+        return 'sent'
+    if kind is None or retries >= max_retries:
+        return 'raise'
+    return 'resync'
+
+
+def retry_nonce(transaction, error, used_nonce, pending_nonce):
+    """The nonce to re-sign on after a resync. Bumps `transaction`'s fees in place when the slot is ours."""
+    if send_error_kind(error) == 'underpriced' and pending_nonce <= used_nonce:
+        # The pool holds a transaction of ours on this nonce but the node does not count it: replace it.
+        transaction.update(bump_fees(transaction))
+        return used_nonce
+    return pending_nonce
+
+
+class NonceManager:
+    """The next nonce of one account, kept locally instead of asked for per transaction.
+
+    It is read from the chain ('pending') the first time it is needed and
+    again after anything that leaves it in doubt. Not thread-safe on its own;
+    TxEngine holds its send lock around every use.
+    """
+
+    def __init__(self, w3, address):
+        self.w3 = w3
+        self.address = address
+        self.next_nonce = None
+
+    def needs_sync(self):
+        return self.next_nonce is None
+
+    def sync(self, value=None):
+        self.next_nonce = value if value is not None else self.w3.eth.get_transaction_count(self.address, 'pending')
+        return self.next_nonce
+
+    def peek(self):
+        return self.sync() if self.next_nonce is None else self.next_nonce
+
+    def advance(self, used_nonce):
+        self.next_nonce = max(self.next_nonce or 0, used_nonce + 1)
+
+    def reset(self):
+        self.next_nonce = None
+
+
+class Submission:
+    __slots__ = ('tx_hash', 'nonce', 'transaction', 'receipt', 'timeout')
+
+    def __init__(self, tx_hash, nonce, transaction, receipt, timeout=240):
+        self.tx_hash = tx_hash
+        self.nonce = nonce
+        self.transaction = transaction
+        self.receipt = receipt
+        self.timeout = timeout
+
+    def wait(self):
+        # The tracker fails the Future at the deadline; the grace only matters if its thread is stuck.
+        with tracer.span('tx.receipt_wait', tx_hash=self.tx_hash, nonce=self.nonce) as span:
+            receipt = self.receipt.result(self.timeout + RESULT_GRACE_SECONDS)
+            span.set(block=receipt['blockNumber'], status=receipt['status'])
+        return receipt
+
+
+class TxEngine:
+    """Estimates, signs and sends the transactions of one account.
+
+    Sends are serialized behind one lock, so threads can submit at the same
+    time and still get consecutive nonces that reach the node in order. Fees
+    and the chain id come from the shared ChainStateCache. A send that fails
+    with "nonce too low" resyncs the nonce and re-signs; "replacement
+    transaction underpriced" resyncs too, or bumps the fees when the slot is
+    really ours; "already known" counts as sent. Any other failure drops the
+    local nonce so the next send starts from the chain's view.
+    """
+
+    def __init__(self, w3, account, max_retries=MAX_SEND_RETRIES):
+        self.w3 = w3
+        self.account = account
+        self.max_retries = max_retries
+        self.chain_state = get_chain_state(w3)
+        self.nonces = NonceManager(w3, account.address)
+        self._lock = threading.Lock()
+
+    def _estimate_params(self, call):
+        if isinstance(call, dict):
+            params = {'from': self.account.address, 'to': call['to'], 'value': hex(call.get('value', 0))}
+            if call.get('data'):
+                params['data'] = call['data']
+            return params
+        return {'from': self.account.address, 'to': call.address, 'data': call._encode_transaction_data()}
+
+    def estimate_gas(self, call, default_gas, margin=DEFAULT_GAS_MARGIN, label=None):
+        """Estimate plus `margin`, or `default_gas` if the node cannot estimate. Raises TransactionRejected on a revert."""
+        try:
+            with tracer.span('tx.estimate_gas', label=label):
+                if isinstance(call, dict):
+                    estimate = self.w3.eth.estimate_gas({**call, 'from': self.account.address})
+                else:
+                    estimate = call.estimate_gas({'from': self.account.address})
+        except Exception as e:
+            if is_revert(e):
+                raise TransactionRejected(f"{label or 'transaction'} would revert: {e}") from e
+            logger.warning(f"Gas estimation failed for {label or 'transaction'}: {e}. Using default gas limit: {default_gas}")
+            return default_gas
+        return estimate + margin
+
+    def estimate_many(self, calls, default_gas, margin=DEFAULT_GAS_MARGIN):
+        """estimate_gas for many calls in one JSON-RPC batch; a rejected call gets a TransactionRejected in its place."""
+        batch = RpcBatch(self.w3)
+        reads = [batch.add('eth_estimateGas', [self._estimate_params(call)]) for call in calls]
+        with tracer.span('tx.estimate_gas', calls=len(calls)):
+            batch.execute()
+        gas_limits = []
+        for read in reads:
+            try:
+                gas_limits.append(read.get() + margin)
+            except Exception as e:
+                if is_revert(e):
+                    gas_limits.append(TransactionRejected(str(e)))
+                else:
+                    logger.warning(f"Gas estimation failed: {e}. Using default gas limit: {default_gas}")
+                    gas_limits.append(default_gas)
+        return gas_limits
+
+    def _build(self, call, gas, fee_params):
+        fields = {'from': self.account.address, 'gas': gas, 'chainId': self.chain_state.chain_id(), **fee_params}
+        if isinstance(call, dict):
+            return {**call, **fields}
+        # Every field build_transaction would look up is given, so this makes no RPC calls.
+        return call.build_transaction({**fields, 'nonce': 0})
+
+    def submit(self, call, gas=None, default_gas=None, margin=DEFAULT_GAS_MARGIN, fee_state=None,
+               label=None, track=True, timeout=240, before_send=None):
+        """Sends `call` (a contract function call, or a transaction dict) on the next local nonce.
+
+        `fee_state` is a ChainStateCache read that includes FEE_KEYS; without
+        it the cached fees are used. `before_send(nonce, tx_hash, raw_tx)`
+        runs right before each broadcast, e.g. to persist the signed bytes.
+        With `track`, the returned Submission carries a receipt Future.
+        """
+        with tracer.span('tx.submit', label=label) as span:
+            if gas is None:
+                gas = self.estimate_gas(call, default_gas, margin, label)
+            with self._lock:
+                if fee_state is None:
+                    with tracer.span('tx.fee_lookup'):
+                        nonce_read = None
+                        if self.nonces.needs_sync():
+                            # The nonce rides along with the fee read: one round trip for both.
+                            nonce_read = {'nonce': lambda b: b.get_transaction_count(self.account.address, 'pending')}
+                        fee_state = self.chain_state.fees(extra=nonce_read)
+                        if nonce_read:
+                            self.nonces.sync(fee_state['nonce'])
+                with tracer.span('tx.build'):
+                    transaction = self._build(call, gas, self.chain_state.fee_params(fee_state))
+                tx_hash = self._send(transaction, label, before_send)
+            span.set(tx_hash=tx_hash, nonce=transaction['nonce'], gas=gas)
+        receipt = None
+        if track:
+            receipt = get_receipt_tracker(self.w3).track(
+                tx_hash, timeout=timeout, transaction=transaction, account=self.account, label=label,
+            )
+        return Submission(tx_hash, transaction['nonce'], transaction, receipt, timeout)
+
+    def transact(self, call, **kwargs):
+        """submit() and wait for the receipt."""
+        return self.submit(call, **kwargs).wait()
+
+    def _send(self, transaction, label, before_send):
+        # `transaction` is updated in place, so the caller sees the nonce and fees that went out.
+        retries = 0
+        while True:
+            transaction['nonce'] = self.nonces.peek()
+            with tracer.span('tx.sign'):
+                signed = self.account.sign_transaction(transaction)
+            raw_tx = raw_bytes(signed)
+            tx_hash = Web3.to_hex(signed.hash)
+            if before_send is not None:
+                before_send(transaction['nonce'], tx_hash, raw_tx)
+            try:
+                with tracer.span('tx.send', nonce=transaction['nonce'], attempt=retries + 1):
+                    self.w3.eth.send_raw_transaction(raw_tx)
+            except Exception as e:
+                action = send_failure_action(e, retries, self.max_retries)
+                if action == 'sent':
+                    self.nonces.advance(transaction['nonce'])
+                    return tx_hash
+                if action == 'raise':
+                    # The node may or may not have taken it; ask the chain next time.
+                    self.nonces.reset()
+                    raise
+                retries += 1
+                used_nonce = transaction['nonce']
+                self.nonces.sync(retry_nonce(transaction, e, used_nonce, self.nonces.sync()))
+                logger.warning(f"Send of {label or 'transaction'} on nonce {used_nonce} failed ({e}); "
+                               f"retrying on nonce {self.nonces.next_nonce}.")
+                continue
+            self.nonces.advance(transaction['nonce'])
+            return tx_hash
+
+
+def get_tx_engine(w3, account, **kwargs):
+    key = (id(w3), account.address.lower())
+    with _engines_lock:
+        engine = _engines.get(key)
+        if engine is None or engine.w3 is not w3:
+            engine = TxEngine(w3, account, **kwargs)
+            _engines[key] = engine
+        return engine
@@ -23,6 +23,7 @@ async function main() {
   const dataRegistry = await DataRegistryFactory.deploy(mockERC20Address);
   await dataRegistry.waitForDeployment();
   const dataRegistryAddress = await dataRegistry.getAddress();
+  const dataRegistryReceipt = await dataRegistry.deploymentTransaction().wait();
   console.log("DataRegistry deployed to:", dataRegistryAddress, "using token:", mockERC20Address);
   const dataRegistryArtifact = hre.artifacts.readArtifactSync("DataRegistry");
 
@@ -36,6 +37,7 @@ async function main() {
     },
     DataRegistry: {
       address: dataRegistryAddress,
+      blockNumber: dataRegistryReceipt.blockNumber,
       abi: dataRegistryArtifact.abi,
     },
     
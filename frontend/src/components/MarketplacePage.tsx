@@ -117,6 +117,23 @@ const MarketplacePage: React.FC = () => {
 
             if (response.ok) {
                 console.log("Faucet response OK:", data);
+                if (response.status === 202 && data.jobId) {
+                    // The faucet queues the mint; poll until it has a transaction hash.
+                    setFaucetMessage(`Faucet: ${data.message} Waiting for the mint transaction...`);
+                    for (let attempt = 0; attempt < 30 && !data.transactionHash && data.status !== 'failed'; attempt++) {
+                        await new Promise(resolve => setTimeout(resolve, 2000));
+                        const statusResponse = await fetch(`${FAUCET_API_URL}/${data.jobId}`);
+                        if (statusResponse.ok) {
+                            Object.assign(data, await statusResponse.json());
+                        }
+                    }
+                    if (data.status === 'failed') {
+                        const errorMsg = `Faucet Error: ${data.error || 'Mint transaction failed.'}`;
+                        setFaucetMessage(errorMsg);
+                        alert(errorMsg);
+                        return;
+                    }
+                }
                 const successMsg = `Faucet: ${data.message || 'Tokens sent!'}. Tx: ${data.transactionHash ? data.transactionHash.substring(0, 10) + '...' : 'N/A'}`;
                 setFaucetMessage(successMsg);
                 alert(successMsg);